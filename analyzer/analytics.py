@@ -0,0 +1,201 @@
+"""
+Camada de serviço analítico do analyzer.
+
+Reúne o que antes rodava dentro do script do Streamlit (carga, pontuação, filtros,
+facetas, tendência e detalhes do lote) em um objeto compartilhado: a cada versão dos
+dados (LotCache.data_version()) o DataFrame é pontuado e indexado uma única vez, e todas
+as consultas, de qualquer sessão ou cliente da API, usam esse mesmo snapshot.
+
+O modelo de preço usado é sempre o último salvo; o retreino roda fora da requisição (ver
+price_model) e, quando termina, o próximo snapshot já sai com as estimativas do modelo novo.
+
+É usado diretamente pelo dashboard (modo local) e exposto em HTTP por api.py.
+"""
+import hashlib
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_access import PRICE_TREND_COLUMNS, LotCache, aggregate_price_trends, load_price_trends
+from facets import TODOS, anos, build_facet_index, faixa, modelos, opcoes
+from pagination import ordenar, pagina, total_paginas
+from price_model import lotes_sem_fipe, modelo_salvo, prever, treinar_em_segundo_plano
+from scoring import FiltrosLotes, combinar, estimar_valor, possui_valores_validos
+
+# Critérios aceitos pelas consultas de lotes (todos opcionais)
+CRITERIOS = [
+    "modelo", "ano", "tipo_veiculo", "preco_min", "preco_max", "mercado_min", "mercado_max",
+    "data_inicio", "data_fim", "somente_oportunidades",
+]
+# Campos do lote usados na avaliação por IA
+CAMPOS_AVALIACAO = ["lote_id", "source_table", "modelo", "ano", "km", "preco_lote", "valor_mercado", "desconto_percentual"]
+
+
+def registros(df):
+    """DataFrame -> lista de dicts serializáveis em JSON (NaN/NA viram None, datas em ISO)."""
+    return json.loads(df.to_json(orient="records", date_format="iso", force_ascii=False))
+
+
+class AnalyticsService:
+    """Snapshot pontuado por versão dos dados e as consultas do dashboard sobre ele."""
+
+    def __init__(self, cache=None, avaliador=None):
+        self.cache = cache or LotCache()
+        # Serviço de IA opcional: pré-avalia as melhores oportunidades a cada nova versão
+        self.avaliador = avaliador
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def snapshot(self):
+        """Dados da versão atual: DataFrame pontuado, máscaras e índice de facetas."""
+        df = self.cache.load_lots(view="dashboard")
+        modelo_preco = modelo_salvo()
+        # Um modelo recém-treinado muda as estimativas tanto quanto dados novos
+        versao = (self.cache.data_version(), modelo_preco["treinado_em"] if modelo_preco else None)
+        with self._lock:
+            if self._snapshot is not None and self._snapshot["versao"] == versao:
+                return self._snapshot
+            if not df.empty:
+                try:
+                    treinar_em_segundo_plano(df)
+                except Exception as e:
+                    print(f"[WARN] Não foi possível iniciar o treino do modelo de preço: {e}")
+                # Lotes sem FIPE recebem a estimativa do modelo local como valor de mercado
+                df = estimar_valor(df, prever(modelo_preco, df, linhas=lotes_sem_fipe(df)) if modelo_preco else None)
+            self._snapshot = {
+                "versao": versao,
+                "etag": hashlib.sha256(repr(versao).encode("utf-8")).hexdigest()[:16],
+                "df": df,
+                "filtros": FiltrosLotes(df),
+                "facetas": build_facet_index(df, versao) if not df.empty else None,
+            }
+            snapshot = self._snapshot
+        if self.avaliador is not None and not df.empty:
+            self.avaliador.pre_avaliar(df)
+        return snapshot
+
+    def etag(self):
+        return self.snapshot()["etag"]
+
+    def status(self):
+        """Resumo da carga: linhas, memória, se há valores para o desconto e o estado de cada tabela."""
+        snapshot = self.snapshot()
+        df = snapshot["df"]
+        return {
+            "versao": snapshot["etag"],
+            "linhas": len(df),
+            "colunas": list(df.columns),
+            "memoria_mb": round(float(df.memory_usage(deep=True).sum()) / 1024 / 1024, 2),
+            "valores_validos": bool(not df.empty and possui_valores_validos(df)),
+            "carga": dict(self.cache.last_refresh),
+        }
+
+    def facets(self, modelo=TODOS, ano=TODOS):
+        """Opções dos filtros e faixas dos sliders para o modelo/ano selecionados."""
+        facetas = self.snapshot()["facetas"]
+        if facetas is None:
+            return {"total": 0, "oportunidades": 0, "modelos": [], "tipos_veiculo": [], "modelos_por_tipo": {},
+                    "anos": [], "anos_oportunidades": [], "faixas": {}}
+        return {
+            "total": facetas["total"],
+            "oportunidades": facetas["oportunidades"]["total"],
+            "modelos": opcoes(facetas, "modelo"),
+            "tipos_veiculo": opcoes(facetas, "tipo_veiculo"),
+            "modelos_por_tipo": {tipo: modelos(facetas, tipo) for tipo in opcoes(facetas, "tipo_veiculo")},
+            "anos": anos(facetas, modelo),
+            "anos_oportunidades": anos(facetas, modelo, oportunidades=True),
+            "faixas": {
+                col: [None if pd.isna(v) else (pd.Timestamp(v).date().isoformat() if col == "data_leilao" else float(v))
+                      for v in faixa(facetas, col, modelo, ano)]
+                for col in ("preco_lote", "valor_mercado", "data_leilao")
+            },
+        }
+
+    def _mascara(self, filtros, criterios):
+        mascara = filtros.verdadeiro("oportunidade") if criterios.get("somente_oportunidades", True) else filtros.todos()
+        for coluna in ("modelo", "tipo_veiculo"):
+            if criterios.get(coluna) not in (None, TODOS):
+                mascara = combinar(mascara, filtros.igual(coluna, criterios[coluna]))
+        if criterios.get("ano") not in (None, TODOS):
+            mascara = combinar(mascara, filtros.igual("ano", int(criterios["ano"])))
+        for coluna, minimo, maximo in (("preco_lote", "preco_min", "preco_max"), ("valor_mercado", "mercado_min", "mercado_max")):
+            if criterios.get(minimo) is not None or criterios.get(maximo) is not None:
+                mascara = combinar(mascara, filtros.intervalo(coluna, criterios.get(minimo), criterios.get(maximo)))
+        if criterios.get("data_inicio") is not None or criterios.get("data_fim") is not None:
+            inicio, fim = criterios.get("data_inicio"), criterios.get("data_fim")
+            mascara = combinar(mascara, filtros.intervalo(
+                "data_leilao",
+                None if inicio is None else np.datetime64(pd.Timestamp(inicio), "s"),
+                None if fim is None else np.datetime64(pd.Timestamp(fim), "s"),
+            ))
+        return mascara
+
+    def opportunities(self, criterios=None, ordenar_por="desconto_percentual", decrescente=True,
+                      numero_pagina=1, tamanho=50, colunas=None):
+        """
+        Página de lotes que atendem aos critérios, ordenada no servidor, e o melhor lote
+        (maior desconto) de cada modelo para a avaliação por IA.
+        """
+        snapshot = self.snapshot()
+        df = snapshot["df"]
+        if df.empty:
+            return {"total": 0, "pagina": 1, "paginas": 1, "tamanho": tamanho, "itens": df, "melhores_por_modelo": df}
+        criterios = criterios or {}
+        posicoes = np.flatnonzero(self._mascara(snapshot["filtros"], criterios))
+        paginas = total_paginas(len(posicoes), tamanho)
+        numero_pagina = min(max(1, int(numero_pagina)), paginas)
+
+        por_desconto = ordenar(df, posicoes, "desconto_percentual", decrescente=True)
+        if ordenar_por == "desconto_percentual" and decrescente:
+            ordenadas = por_desconto
+        else:
+            ordenadas = ordenar(df, posicoes, ordenar_por if ordenar_por in df.columns else "desconto_percentual", decrescente)
+
+        # Primeira ocorrência de cada modelo na ordem de desconto = melhor lote do modelo
+        codigos = df["modelo"].cat.codes.to_numpy()[por_desconto]
+        _, primeiras = np.unique(codigos, return_index=True)
+        melhores = df.iloc[por_desconto[np.sort(primeiras)]][CAMPOS_AVALIACAO]
+        return {
+            "total": len(posicoes),
+            "pagina": numero_pagina,
+            "paginas": paginas,
+            "tamanho": tamanho,
+            "itens": pagina(df, ordenadas, numero_pagina, tamanho, colunas),
+            "melhores_por_modelo": melhores[melhores["modelo"].notna()],
+        }
+
+    def trends(self, modelo, ano=None):
+        """Agregados diários do modelo: cubo pré-calculado ou, sem ele, calculado do snapshot."""
+        try:
+            tendencia = load_price_trends(modelo, ano)
+        except Exception as e:
+            print(f"[WARN] Não foi possível ler a tendência de preços: {e}")
+            tendencia = None
+        if tendencia is not None and not tendencia.empty:
+            return tendencia
+        snapshot = self.snapshot()
+        if snapshot["df"].empty:
+            return pd.DataFrame(columns=PRICE_TREND_COLUMNS)
+        filtros = snapshot["filtros"]
+        mascara = filtros.igual("modelo", modelo)
+        if ano is not None:
+            mascara = combinar(mascara, filtros.igual("ano", int(ano)))
+        mascara = combinar(mascara, filtros.preenchido("data_leilao", "source_table"))
+        return aggregate_price_trends(filtros.selecionar(
+            mascara, colunas=["preco_lote", "valor_fipe", "data_leilao", "source_table"]
+        ))
+
+    def lot(self, lote_id, source_table=None):
+        """
+        Linhas com o id informado (os ids são por tabela; 'source_table' desambigua).
+        Retorna um DataFrame com zero, uma ou mais linhas.
+        """
+        df = self.snapshot()["df"]
+        if df.empty:
+            return df
+        mascara = df["lote_id"].to_numpy() == int(lote_id)
+        if source_table is not None:
+            mascara &= (df["source_table"] == source_table).to_numpy(dtype=bool)
+        return df.iloc[np.flatnonzero(mascara)]
@@ -0,0 +1,140 @@
+"""
+API de leitura do analyzer (FastAPI), separada do Streamlit.
+
+Um único AnalyticsService por processo: o snapshot pontuado e indexado é montado uma vez
+por versão dos dados e compartilhado por todos os clientes. As respostas levam um ETag
+(versão dos dados + rota + parâmetros); um pedido com If-None-Match igual recebe 304 sem
+que a consulta seja refeita. Respostas grandes vão comprimidas com gzip.
+
+A fila de avaliações por IA e a thread que a consome também ficam só aqui: no modo com API
+o dashboard consulta e enfileira pelas rotas /avaliacao (api_client.AvaliacaoClient).
+
+    uvicorn api:app --host 0.0.0.0 --port 8000
+
+Rotas:
+    GET /status
+    GET /facets?modelo=&ano=
+    GET /opportunities?modelo=&ano=&tipo_veiculo=&preco_min=&preco_max=&mercado_min=&mercado_max=
+                       &data_inicio=&data_fim=&somente_oportunidades=&ordenar_por=&decrescente=
+                       &pagina=&tamanho=&colunas=a,b,c
+    GET /trends?modelo=&ano=
+    GET /lot/{lote_id}?source_table=
+    GET /avaliacao?modelo=&ano=&km=&preco_lote=&valor_mercado=
+    POST /avaliacao?prioridade=   (corpo: o lote em JSON)
+"""
+import hashlib
+import json
+import os
+from datetime import date
+
+from dotenv import load_dotenv
+from fastapi import Body, FastAPI, HTTPException, Query, Request, Response
+from fastapi.middleware.gzip import GZipMiddleware
+
+load_dotenv()
+
+from analytics import AnalyticsService, registros
+from facets import TODOS
+from ia_service import PRIORIDADE_USUARIO, AvaliacaoService
+
+# Respostas menores que isso não compensam a compressão
+GZIP_MINIMUM_SIZE = int(os.getenv("ANALYTICS_GZIP_MINIMUM_SIZE", "1024"))
+# Pré-avaliação por IA das melhores oportunidades a cada nova versão dos dados
+PRE_AVALIAR_IA = os.getenv("ANALYTICS_PRE_AVALIAR_IA", "1") == "1"
+
+app = FastAPI(title="Análise de Leilões")
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+
+# Única thread de avaliação por IA do sistema (o dashboard, com a API, só usa as rotas /avaliacao)
+avaliacoes = AvaliacaoService().iniciar()
+service = AnalyticsService(avaliador=avaliacoes if PRE_AVALIAR_IA else None)
+
+
+def _etag(request):
+    """ETag fraco o bastante para o caso: versão dos dados + rota + parâmetros ordenados."""
+    parametros = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    conteudo = f"{request.url.path}?{parametros}"
+    return f'"{service.etag()}-{hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:16]}"'
+
+def responder(request, montar):
+    """304 se o cliente já tem esta versão; senão monta o corpo (só então a consulta roda)."""
+    etag = _etag(request)
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cabecalhos)
+    corpo = json.dumps(montar(), ensure_ascii=False, default=str)
+    return Response(content=corpo, media_type="application/json", headers=cabecalhos)
+
+
+@app.get("/status")
+def status():
+    # Sem ETag: é o que o cliente usa para saber o estado da carga a cada execução
+    return service.status()
+
+@app.get("/facets")
+def facets(request: Request, modelo: str = TODOS, ano: str = TODOS):
+    return responder(request, lambda: service.facets(modelo, TODOS if ano == TODOS else int(ano)))
+
+@app.get("/opportunities")
+def opportunities(
+    request: Request,
+    modelo: str = TODOS,
+    ano: str = TODOS,
+    tipo_veiculo: str = TODOS,
+    preco_min: float = None,
+    preco_max: float = None,
+    mercado_min: float = None,
+    mercado_max: float = None,
+    data_inicio: date = None,
+    data_fim: date = None,
+    somente_oportunidades: bool = True,
+    ordenar_por: str = "desconto_percentual",
+    decrescente: bool = True,
+    pagina: int = Query(1, ge=1),
+    tamanho: int = Query(50, ge=1, le=1000),
+    colunas: str = None,
+):
+    criterios = {
+        "modelo": modelo, "ano": ano, "tipo_veiculo": tipo_veiculo,
+        "preco_min": preco_min, "preco_max": preco_max, "mercado_min": mercado_min, "mercado_max": mercado_max,
+        "data_inicio": data_inicio, "data_fim": data_fim, "somente_oportunidades": somente_oportunidades,
+    }
+
+    def montar():
+        resultado = service.opportunities(
+            criterios, ordenar_por, decrescente, pagina, tamanho,
+            colunas.split(",") if colunas else None,
+        )
+        return {
+            **resultado,
+            "itens": registros(resultado["itens"]),
+            "melhores_por_modelo": registros(resultado["melhores_por_modelo"]),
+        }
+    return responder(request, montar)
+
+@app.get("/trends")
+def trends(request: Request, modelo: str, ano: int = None):
+    return responder(request, lambda: registros(service.trends(modelo, ano)))
+
+@app.get("/lot/{lote_id}")
+def lot(request: Request, lote_id: int, source_table: str = None):
+    linhas = service.lot(lote_id, source_table)
+    if linhas.empty:
+        raise HTTPException(status_code=404, detail=f"Lote {lote_id} não encontrado.")
+    if len(linhas) > 1:
+        raise HTTPException(status_code=409, detail={
+            "mensagem": f"O id {lote_id} existe em mais de uma tabela; informe 'source_table'.",
+            "source_table": sorted(linhas["source_table"].astype(str).unique().tolist()),
+        })
+    return responder(request, lambda: registros(linhas)[0])
+
+@app.get("/avaliacao")
+def avaliacao(modelo: str = None, ano: int = None, km: int = None, preco_lote: float = None, valor_mercado: float = None):
+    # Sem ETag: o status muda enquanto o pedido está na fila
+    status, texto = avaliacoes.consultar({"modelo": modelo, "ano": ano, "km": km,
+                                          "preco_lote": preco_lote, "valor_mercado": valor_mercado})
+    return {"status": status, "texto": texto}
+
+@app.post("/avaliacao")
+def pedir_avaliacao(lote: dict = Body(...), prioridade: int = PRIORIDADE_USUARIO):
+    return {"enfileirados": avaliacoes.enfileirar([lote], prioridade)}
@@ -0,0 +1,129 @@
+"""
+Cliente HTTP da API de leitura (api.py) com a mesma interface do AnalyticsService
+(AnalyticsClient) e da consulta/enfileiramento do AvaliacaoService (AvaliacaoClient).
+
+O dashboard usa este cliente quando ANALYTICS_API_URL está definido. Cada resposta fica
+guardada junto com o ETag; na repetição do pedido o servidor responde 304 e o corpo em
+memória é reaproveitado (nada é recalculado nem transferido de novo).
+"""
+import gzip
+import json
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pandas as pd
+
+from facets import TODOS
+from ia_service import PRIORIDADE_PRE_AVALIACAO, normalizar_lote
+
+ANALYTICS_API_TIMEOUT = 30
+# Colunas de data que voltam como texto ISO no JSON
+COLUNAS_DATA = ["data_leilao", "data_extracao", "dia"]
+# Limite de respostas guardadas (as mais antigas saem primeiro)
+MAX_RESPOSTAS = 256
+
+
+def _frame(itens, colunas=None):
+    """Lista de dicts -> DataFrame com as datas convertidas de volta."""
+    df = pd.DataFrame(itens, columns=colunas)
+    for col in COLUNAS_DATA:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce").astype("datetime64[s]")
+    return df
+
+
+class AnalyticsClient:
+    def __init__(self, base_url, timeout=ANALYTICS_API_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._respostas = {}  # url -> (etag, corpo)
+
+    def _get(self, rota, **parametros):
+        query = urllib.parse.urlencode({k: v for k, v in parametros.items() if v is not None})
+        url = f"{self.base_url}{rota}" + (f"?{query}" if query else "")
+        with self._lock:
+            guardada = self._respostas.get(url)
+        request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+        if guardada:
+            request.add_header("If-None-Match", guardada[0])
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                dados = response.read()
+                if response.headers.get("Content-Encoding") == "gzip":
+                    dados = gzip.decompress(dados)
+                corpo = json.loads(dados.decode("utf-8"))
+                etag = response.headers.get("ETag")
+        except urllib.error.HTTPError as e:
+            if e.code == 304 and guardada:
+                return guardada[1]
+            raise
+        if etag:
+            with self._lock:
+                if len(self._respostas) >= MAX_RESPOSTAS:
+                    self._respostas.pop(next(iter(self._respostas)))
+                self._respostas[url] = (etag, corpo)
+        return corpo
+
+    def status(self):
+        return self._get("/status")
+
+    def facets(self, modelo=TODOS, ano=TODOS):
+        return self._get("/facets", modelo=modelo, ano=ano)
+
+    def opportunities(self, criterios=None, ordenar_por="desconto_percentual", decrescente=True,
+                      numero_pagina=1, tamanho=50, colunas=None):
+        parametros = {k: (str(v).lower() if isinstance(v, bool) else v) for k, v in (criterios or {}).items()}
+        corpo = self._get(
+            "/opportunities", **parametros, ordenar_por=ordenar_por, decrescente=str(decrescente).lower(),
+            pagina=numero_pagina, tamanho=tamanho, colunas=",".join(colunas) if colunas else None,
+        )
+        return {
+            **corpo,
+            "itens": _frame(corpo["itens"], colunas),
+            "melhores_por_modelo": _frame(corpo["melhores_por_modelo"]),
+        }
+
+    def trends(self, modelo, ano=None):
+        return _frame(self._get("/trends", modelo=modelo, ano=ano))
+
+    def lot(self, lote_id, source_table=None):
+        try:
+            return _frame([self._get(f"/lot/{int(lote_id)}", source_table=source_table)])
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return _frame([])
+            raise
+
+
+class AvaliacaoClient:
+    """Avaliações por IA pela API: a fila e a thread de avaliação ficam no processo da API."""
+
+    def __init__(self, base_url, timeout=ANALYTICS_API_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _pedir(self, request):
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def consultar(self, lote):
+        """(status, texto) do lote, como em AvaliacaoService.consultar."""
+        query = urllib.parse.urlencode({k: v for k, v in normalizar_lote(lote).items() if v is not None})
+        corpo = self._pedir(urllib.request.Request(f"{self.base_url}/avaliacao?{query}"))
+        return corpo["status"], corpo["texto"]
+
+    def enfileirar(self, lotes, prioridade=PRIORIDADE_PRE_AVALIACAO):
+        """Enfileira os lotes na API. Retorna quantos entraram."""
+        novos = 0
+        for lote in lotes:
+            request = urllib.request.Request(
+                f"{self.base_url}/avaliacao?prioridade={int(prioridade)}",
+                data=json.dumps(normalizar_lote(lote)).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            novos += self._pedir(request)["enfileirados"]
+        return novos
@@ -0,0 +1,99 @@
+"""
+Mede o custo da tabela de oportunidades antes e depois da paginação no servidor.
+
+Gera um DataFrame sintético com os mesmos tipos da visão 'dashboard' (data_access.py),
+pontua com scoring.estimar_valor e compara:
+  - antes: todas as oportunidades formatadas e serializadas de uma vez;
+  - depois: ordenação das posições + uma página formatada e serializada.
+O tamanho do payload é o do Arrow IPC, o formato que o st.dataframe envia ao navegador.
+
+    python benchmark_paginacao.py --linhas 100000 --tamanho-pagina 50
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from pagination import formatar_colunas, ordenar, pagina
+from scoring import estimar_valor
+
+COLUNAS = [
+    "modelo", "ano", "km", "preco_lote", "valor_mercado", "origem_valor_mercado", "desconto_percentual",
+    "oportunidade", "data_leilao", "source_table", "tipo_veiculo",
+]
+
+
+def formatar_moeda(valor):
+    if pd.isna(valor):
+        return "N/A"
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def gerar_lotes(linhas, seed=0):
+    """Lotes sintéticos com a distribuição aproximada dos dados raspados."""
+    rng = np.random.default_rng(seed)
+    modelos = np.array([f"MODELO {i:03d}" for i in range(400)])
+    fipe = rng.uniform(15_000, 250_000, linhas).astype("float32")
+    preco = (fipe * rng.uniform(0.3, 1.2, linhas)).astype("float32")
+    fipe[rng.random(linhas) < 0.1] = np.nan
+    datas = pd.Timestamp("2025-07-01") + pd.to_timedelta(rng.integers(0, 90, linhas), unit="D")
+    return pd.DataFrame({
+        "titulo": [f"LOTE {i}" for i in range(linhas)],
+        "fabricante": pd.Categorical(rng.choice(["FIAT", "VW - VolksWagen", "GM - Chevrolet", "FORD", "HONDA"], linhas)),
+        "modelo": pd.Categorical(rng.choice(modelos, linhas)),
+        "ano": pd.array(rng.integers(2005, 2025, linhas), dtype="Int16"),
+        "km": pd.array(rng.integers(0, 250_000, linhas), dtype="Int32"),
+        "preco_lote": preco,
+        "valor_fipe": fipe,
+        "data_leilao": datas.astype("datetime64[s]"),
+        "tipo_veiculo": pd.Categorical(rng.choice(["carros", "motos", "caminhoes"], linhas, p=[0.8, 0.15, 0.05])),
+        "source_table": pd.Categorical(rng.choice(["leilo", "loop", "parque_leiloes_oficial"], linhas)),
+        "lote_id": np.arange(linhas, dtype="int32"),
+    })
+
+def payload_bytes(df):
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return sink.getvalue().size
+
+def medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da tabela de oportunidades paginada.")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--tamanho-pagina", type=int, default=50)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    df = estimar_valor(gerar_lotes(args.linhas))
+    mascara = df["oportunidade"].to_numpy()
+    print(f"[INFO] {len(df)} lotes sintéticos, {int(mascara.sum())} oportunidades.")
+
+    def antes():
+        # Fluxo anterior: fatia e ordena todas as oportunidades e formata todas as linhas
+        selecionados = df[mascara].sort_values("desconto_percentual", ascending=False)[COLUNAS]
+        return payload_bytes(formatar_colunas(selecionados, formatar_moeda))
+
+    def depois():
+        posicoes = ordenar(df, np.flatnonzero(mascara), "desconto_percentual", decrescente=True)
+        return payload_bytes(formatar_colunas(pagina(df, posicoes, 1, args.tamanho_pagina, COLUNAS), formatar_moeda))
+
+    tempo_antes, bytes_antes = medir(antes, args.repeticoes)
+    tempo_depois, bytes_depois = medir(depois, args.repeticoes)
+    print(f"{'':<10}{'tempo (ms)':>12}{'payload (KB)':>15}")
+    print(f"{'antes':<10}{tempo_antes * 1000:>12.1f}{bytes_antes / 1024:>15.1f}")
+    print(f"{'depois':<10}{tempo_depois * 1000:>12.1f}{bytes_depois / 1024:>15.1f}")
+    print(f"[INFO] {tempo_antes / tempo_depois:.0f}x mais rápido, payload {bytes_antes / bytes_depois:.0f}x menor.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Camada de acesso a dados do dashboard.
+
+Carrega os lotes das tabelas 'leilo', 'parque_leiloes_oficial' e 'loop' já com as colunas
+padronizadas e mantém um cache por tabela, validado por um token barato de mudança
+(quantidade de linhas, maior id, maior data_extracao e soma dos ids):
+  - token igual: devolve o cache, sem reler a tabela;
+  - linhas novas ou atualizadas (upsert do loop): carrega só o delta (id/data_extracao maiores);
+  - linhas removidas (a soma dos ids já em cache diminuiu, mesmo que outras tenham entrado
+    no lugar) ou TTL expirado: recarrega a tabela inteira (cobre atualizações em
+    colunas que não mexem em data_extracao, como o enriquecimento FIPE);
+  - o total em memória é limitado e as tabelas menos usadas são descartadas primeiro.
+
+Cada visão (VIEW_COLUMNS) lê só as colunas de que precisa. As conversões de texto
+(ano, km, data do leilão) são feitas no próprio SELECT, as linhas vêm por um cursor do
+lado do servidor em blocos, e o DataFrame já sai com dtypes explícitos (float32 para
+valores, Int16 para ano, category para fabricante/modelo/origem/tipo).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import psycopg2
+from pandas.api.types import union_categoricals
+from psycopg2 import sql
+
+from common.vehicle_type import classify_vehicle_types, normalize_vehicle_type
+from db_utils.db_operations import fetch_price_trends
+
+DB_HOST = os.getenv("PG_HOST")
+DB_NAME = os.getenv("PG_DATABASE")
+DB_USER = os.getenv("PG_USER")
+DB_PASS = os.getenv("PG_PASSWORD")
+
+# Tempo máximo de vida de uma tabela no cache antes de uma recarga completa
+CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL", "600"))
+# Limite de memória do cache (todas as tabelas somadas)
+CACHE_MAX_BYTES = int(os.getenv("DASHBOARD_CACHE_MAX_MB", "256")) * 1024 * 1024
+# Intervalo mínimo entre consultas do token (o Streamlit reexecuta o script a cada interação)
+TOKEN_CHECK_INTERVAL_SECONDS = int(os.getenv("DASHBOARD_TOKEN_CHECK_INTERVAL", "15"))
+# Linhas por bloco lido do cursor do lado do servidor
+FETCH_CHUNK_SIZE = int(os.getenv("DASHBOARD_FETCH_CHUNK_SIZE", "5000"))
+
+# Mapeamento das colunas de cada tabela para os nomes padronizados do dashboard
+TABLE_COLUMN_MAPS = {
+    "leilo": {
+        "veiculo_titulo": "titulo",
+        "veiculo_link_lote": "link_lote",
+        "veiculo_imagem": "imagem",
+        "veiculo_patio_uf": "patio_uf",
+        "veiculo_ano_fabricacao": "ano_fabricacao",
+        "veiculo_km": "km",
+        "veiculo_valor_lance_atual": "preco_lote",
+        "veiculo_data_leilao": "data_leilao",
+        "veiculo_tipo_combustivel": "tipo_combustivel",
+        "veiculo_cor": "cor",
+        "veiculo_possui_chave": "possui_chave",
+        "veiculo_tipo_retomada": "tipo_retomada",
+        "veiculo_tipo": "tipo_veiculo",
+        "veiculo_valor_fipe": "valor_fipe",
+        "veiculo_modelo": "modelo",
+        "veiculo_fabricante": "fabricante",
+        "veiculo_patio_uf_localizacao": "patio_uf_localizacao",
+        "veiculo_fipe_status": "fipe_status", # Preenchido pela etapa de enriquecimento FIPE (leilo/fipe.py)
+        "veiculo_diferenca_percentual": "diferenca_percentual_fipe",
+    },
+    "parque_leiloes_oficial": {
+        "veiculo_titulo": "titulo",
+        "veiculo_link_lote": "link_lote",
+        "veiculo_imagem": "imagem",
+        "veiculo_km": "km",
+        "veiculo_valor_lance_atual": "preco_lote",
+        "veiculo_data_leilao": "data_leilao",
+        "veiculo_fabricante": "fabricante",
+        "veiculo_final_placa": "final_placa",
+        "veiculo_ano_fabricacao": "ano_fabricacao",
+        "veiculo_ano_modelo": "ano_modelo",
+        "veiculo_possui_chave": "possui_chave",
+        "veiculo_condicao_motor": "condicao_motor",
+        "veiculo_valor_fipe": "valor_fipe",
+        "veiculo_tipo_combustivel": "tipo_combustivel",
+        "veiculo_tipo_retomada": "tipo_retomada",
+        "veiculo_total_lances": "total_lances",
+        "veiculo_modelo": "modelo",
+        "veiculo_tipo": "tipo_veiculo",
+        "veiculo_fipe_status": "fipe_status",
+        "veiculo_diferenca_percentual": "diferenca_percentual_fipe",
+    },
+    "loop": {
+        "veiculo_link_lote": "link_lote",
+        "veiculo_titulo": "titulo",
+        "veiculo_fabricante": "fabricante",
+        "veiculo_modelo": "modelo",
+        "veiculo_versao": "versao",
+        "veiculo_ano_fabricacao": "ano_fabricacao",
+        "veiculo_ano_modelo": "ano_modelo",
+        "veiculo_valor_fipe": "valor_fipe",
+        "veiculo_blindado": "blindado",
+        "veiculo_chave": "possui_chave",
+        "veiculo_funcionando": "funcionando",
+        "veiculo_tipo_combustivel": "tipo_combustivel",
+        "veiculo_km": "km",
+        "veiculo_total_lances": "total_lances",
+        "veiculo_numero_visualizacoes": "numero_visualizacoes",
+        "veiculo_data_leilao": "data_leilao",
+        "veiculo_horario_leilao": "horario_leilao",
+        "veiculo_lance_atual": "preco_lote",
+        "veiculo_situacao_lote": "situacao",
+        "veiculo_tipo": "tipo_veiculo",
+        "veiculo_fipe_status": "fipe_status",
+        "veiculo_diferenca_percentual": "diferenca_percentual_fipe",
+    },
+}
+
+# Tipo de cada coluna padronizada no DataFrame (as não listadas ficam como texto)
+COLUMN_KINDS = {
+    "preco_lote": "float32",
+    "valor_fipe": "float32",
+    "diferenca_percentual_fipe": "float32",
+    "ano": "year",
+    "ano_fabricacao": "year",
+    "ano_modelo": "year",
+    "km": "int",
+    "total_lances": "int",
+    "numero_visualizacoes": "int",
+    "data_leilao": "date",
+}
+# Colunas com poucos valores distintos, guardadas como 'category'
+CATEGORY_COLUMNS = {"fabricante", "modelo", "source_table", "tipo_veiculo", "fipe_status", "tipo_combustivel", "tipo_retomada"}
+
+PANDAS_DTYPES = {"float32": "float32", "year": "Int16", "int": "Int32"}
+
+# Colunas que cada visão precisa; só elas são lidas do banco
+VIEW_COLUMNS = {
+    "dashboard": [
+        "titulo", "link_lote", "fabricante", "modelo", "ano", "km", "preco_lote", "valor_fipe",
+        "data_leilao", "tipo_veiculo", "fipe_status", "diferenca_percentual_fipe",
+        # Usadas pelo modelo local de preço (price_model.py)
+        "tipo_combustivel", "tipo_retomada",
+    ],
+    "completo": sorted({col for column_map in TABLE_COLUMN_MAPS.values() for col in column_map.values()} | {"ano"}),
+}
+
+# Colunas auxiliares para derivar 'ano' e 'tipo_veiculo' (lidas se a visão pedir a derivada)
+DERIVED_DEPENDENCIES = {
+    "ano": ["ano_fabricacao", "ano_modelo"],
+    "tipo_veiculo": ["fabricante", "modelo", "titulo"],
+}
+
+
+def connect():
+    return psycopg2.connect(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASS,
+        host=DB_HOST,
+        port="5432" # Porta padrão do PostgreSQL dentro da rede Docker
+    )
+
+def get_change_token(conn, table_name):
+    """
+    (linhas, maior id, maior data_extracao, soma dos ids) da tabela: muda a cada inserção,
+    upsert ou remoção. A soma dos ids permite ver remoções mesmo quando o total de linhas
+    não diminui (ids são seriais e positivos).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            sql.SQL("SELECT COUNT(*), MAX(id), MAX(data_extracao), COALESCE(SUM(id), 0) FROM {}").format(
+                sql.Identifier(table_name))
+        )
+        count, max_id, max_extracao, soma_ids = cursor.fetchone()
+        return count, max_id, max_extracao, int(soma_ids)
+    finally:
+        cursor.close()
+
+def get_table_columns(conn, table_name):
+    """{coluna: tipo} das colunas que existem na tabela."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s", (table_name,)
+        )
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+def _cast_expression(db_col, db_type, kind):
+    """Expressão SQL que já devolve a coluna no tipo final (a conversão de texto acontece no banco)."""
+    col = sql.Identifier(db_col)
+    is_text = db_type in ("character varying", "text", "character")
+    if kind == "float32":
+        return sql.SQL("{}::real").format(col) if not is_text else \
+            sql.SQL("NULLIF(regexp_replace(replace({}, ',', '.'), '[^0-9.]', '', 'g'), '')::real").format(col)
+    if kind == "year":
+        return sql.SQL("{}::smallint").format(col) if not is_text else \
+            sql.SQL("substring({} from '\\d{{4}}')::smallint").format(col)
+    if kind == "int":
+        return sql.SQL("round({})::integer").format(col) if not is_text else \
+            sql.SQL("NULLIF(regexp_replace({}, '\\D', '', 'g'), '')::integer").format(col)
+    if kind == "date":
+        return sql.SQL("to_date(substring({}::text from '^\\d{{2}}/\\d{{2}}/\\d{{4}}'), 'DD/MM/YYYY')").format(col)
+    return col
+
+def build_select(table_name, table_columns, view_columns):
+    """
+    Monta as expressões do SELECT (já convertidas) para as colunas da visão que existem na tabela.
+    Retorna [(expressão SQL, nome padronizado), ...].
+    """
+    reverse_map = {mapped: db_col for db_col, mapped in TABLE_COLUMN_MAPS[table_name].items() if db_col in table_columns}
+    wanted = list(view_columns)
+    for derived, dependencies in DERIVED_DEPENDENCIES.items():
+        if derived in view_columns:
+            wanted += [dep for dep in dependencies if dep not in wanted]
+
+    selects = []
+    for name in wanted:
+        if name == "ano":
+            anos = [_cast_expression(reverse_map[c], table_columns[reverse_map[c]], "year")
+                    for c in DERIVED_DEPENDENCIES["ano"] if c in reverse_map]
+            if anos:
+                selects.append((sql.SQL("COALESCE({})").format(sql.SQL(", ").join(anos)), name))
+        elif name in reverse_map:
+            db_col = reverse_map[name]
+            selects.append((_cast_expression(db_col, table_columns[db_col], COLUMN_KINDS.get(name)), name))
+    selects += [(sql.SQL("id"), "lote_id"), (sql.SQL("data_extracao"), "data_extracao")]
+    return selects
+
+def _typed_frame(rows, names):
+    """Aplica os dtypes explícitos a um bloco de linhas vindo do cursor."""
+    df = pd.DataFrame.from_records(rows, columns=names)
+    for col in names:
+        kind = COLUMN_KINDS.get(col)
+        if kind in PANDAS_DTYPES:
+            df[col] = df[col].astype(PANDAS_DTYPES[kind])
+        elif kind == "date":
+            df[col] = pd.to_datetime(df[col]).astype("datetime64[s]")
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+    df["lote_id"] = df["lote_id"].astype("int32")
+    return df
+
+def concat_typed(frames):
+    """Concatena mantendo as colunas 'category' (o pd.concat viraria object com categorias diferentes)."""
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return pd.DataFrame()
+    # Blocos vazios não contribuem e podem ter categorias de outro dtype
+    frames = [frame for frame in frames if not frame.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    category_cols = [col for col in frames[0].columns
+                     if isinstance(frames[0][col].dtype, pd.CategoricalDtype)
+                     and all(col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames)]
+    combined = pd.concat(frames, ignore_index=True)
+    for col in category_cols:
+        partes = [f[col] for f in frames]
+        # Coluna ausente em uma tabela (toda nula) tem categorias vazias de outro dtype
+        referencia = next((p.cat.categories for p in partes if len(p.cat.categories)), None)
+        if referencia is not None:
+            partes = [p if len(p.cat.categories) else p.cat.set_categories(referencia[:0]) for p in partes]
+        combined[col] = union_categoricals(partes)
+    return combined
+
+def fetch_table_rows(conn, table_name, selects, since=None, chunk_size=FETCH_CHUNK_SIZE):
+    """
+    Lê as linhas por um cursor nomeado (do lado do servidor), em blocos de 'chunk_size',
+    convertendo cada bloco para os tipos finais. Com 'since' = (maior id, maior data_extracao)
+    já em cache, lê só as linhas novas ou atualizadas.
+    """
+    names = [name for _, name in selects]
+    query = sql.SQL("SELECT {} FROM {}").format(
+        sql.SQL(", ").join(sql.SQL("{} AS {}").format(expr, sql.Identifier(name)) for expr, name in selects),
+        sql.Identifier(table_name),
+    )
+    params = None
+    if since is not None:
+        query += sql.SQL(" WHERE id > %s OR data_extracao > %s")
+        params = since
+
+    cursor = conn.cursor(name=f"carga_{table_name}")
+    cursor.itersize = chunk_size
+    chunks = []
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunks.append(_typed_frame(rows, names))
+    finally:
+        cursor.close()
+    conn.commit()
+    return concat_typed(chunks) if chunks else _typed_frame([], names)
+
+def prepare_table_frame(df, table_name, view_columns):
+    """Padroniza as linhas de uma tabela para a visão (tipo de veículo, origem e colunas ausentes)."""
+    df["source_table"] = pd.Categorical([table_name] * len(df))
+
+    if "tipo_veiculo" in view_columns:
+        # Rótulo do site quando reconhecido ('motocicleta' -> 'motos'); sem tipo, classifica pela marca/modelo
+        tipo_site = df["tipo_veiculo"].astype(object).map(normalize_vehicle_type) if "tipo_veiculo" in df.columns \
+            else pd.Series(None, index=df.index, dtype=object)
+        vazia = pd.Series(None, index=df.index, dtype=object)
+        fabricantes, modelos, titulos = (df[col].astype(object) if col in df.columns else vazia
+                                         for col in ("fabricante", "modelo", "titulo"))
+        tipo_classificado = classify_vehicle_types(fabricantes, modelos, titulos)
+        df["tipo_veiculo"] = tipo_site.fillna(pd.Series(tipo_classificado.to_numpy(), index=df.index)).astype("category")
+
+    # Colunas da visão que a tabela não tem: criadas vazias, já no tipo certo
+    for col in view_columns:
+        if col not in df.columns:
+            kind = COLUMN_KINDS.get(col)
+            if kind in PANDAS_DTYPES:
+                df[col] = pd.Series(index=df.index, dtype=PANDAS_DTYPES[kind])
+            elif kind == "date":
+                df[col] = pd.Series(index=df.index, dtype="datetime64[s]")
+            elif col in CATEGORY_COLUMNS:
+                df[col] = pd.Categorical([None] * len(df))
+            else:
+                df[col] = pd.Series(None, index=df.index, dtype=object)
+    return df[list(view_columns) + ["source_table", "lote_id", "data_extracao"]]
+
+# Colunas do cubo de tendência de preços (tabela 'tendencia_precos_diaria', ver db_utils)
+PRICE_TREND_COLUMNS = [
+    "source_table", "dia", "quantidade", "preco_medio", "preco_mediano", "preco_p25", "preco_p75",
+    "mercado_medio", "mercado_mediano", "mercado_p25", "mercado_p75",
+]
+
+def _typed_trends(df):
+    valores = [col for col in PRICE_TREND_COLUMNS if col not in ("source_table", "dia", "quantidade")]
+    df[valores] = df[valores].astype("float32")
+    df["quantidade"] = df["quantidade"].astype("int32")
+    df["dia"] = pd.to_datetime(df["dia"]).astype("datetime64[s]")
+    return df
+
+def load_price_trends(modelo, ano=None, connect_fn=connect):
+    """
+    Agregados diários do modelo (e ano; None = todos os anos) lidos do cubo pré-calculado.
+    Retorna None se o cubo não estiver disponível (tabela ainda não criada, por exemplo).
+    """
+    conn = connect_fn()
+    try:
+        rows = fetch_price_trends(conn, modelo, ano)
+    finally:
+        conn.close()
+    if rows is None:
+        return None
+    return _typed_trends(pd.DataFrame(rows, columns=PRICE_TREND_COLUMNS))
+
+def aggregate_price_trends(df):
+    """
+    Mesmo formato de load_price_trends, calculado a partir dos lotes já carregados
+    (usado quando o cubo ainda não foi gerado). Como no cubo, zeros contam como ausentes e
+    o "mercado" é só o valor FIPE: a estimativa do modelo local fica fora da série histórica.
+    """
+    df = df.assign(preco_lote=df["preco_lote"].where(df["preco_lote"] > 0),
+                   valor_fipe=df["valor_fipe"].where(df["valor_fipe"] > 0))
+    grupos = df.groupby(["data_leilao", "source_table"], observed=True)
+    agregados = pd.DataFrame({
+        "quantidade": grupos.size(),
+        "preco_medio": grupos["preco_lote"].mean(),
+        "preco_mediano": grupos["preco_lote"].median(),
+        "preco_p25": grupos["preco_lote"].quantile(0.25),
+        "preco_p75": grupos["preco_lote"].quantile(0.75),
+        "mercado_medio": grupos["valor_fipe"].mean(),
+        "mercado_mediano": grupos["valor_fipe"].median(),
+        "mercado_p25": grupos["valor_fipe"].quantile(0.25),
+        "mercado_p75": grupos["valor_fipe"].quantile(0.75),
+    }).reset_index().rename(columns={"data_leilao": "dia"})
+    agregados["source_table"] = agregados["source_table"].astype(str)
+    return _typed_trends(agregados[PRICE_TREND_COLUMNS])
+
+
+class LotCache:
+    """Cache por tabela e visão, validado pelo token de mudança, com TTL e limite de memória (LRU)."""
+
+    def __init__(self, ttl_seconds=CACHE_TTL_SECONDS, max_bytes=CACHE_MAX_BYTES,
+                 token_check_interval=TOKEN_CHECK_INTERVAL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.token_check_interval = token_check_interval
+        self._entries = OrderedDict()
+        self._combined = {}
+        self._lock = threading.Lock()
+        self.last_refresh = {}
+
+    def _needs_token_check(self, entry, now):
+        return entry is None or now - entry["checked_at"] >= self.token_check_interval
+
+    def _refresh_table(self, conn, table_name, view, entry, now):
+        """Atualiza uma tabela no cache e retorna o tipo de carga feita ('cache', 'delta' ou 'completa')."""
+        key = (table_name, view)
+        token = get_change_token(conn, table_name)
+        if entry is not None and token == entry["token"] and now - entry["loaded_at"] < self.ttl_seconds:
+            entry["checked_at"] = now
+            return "cache"
+
+        view_columns = VIEW_COLUMNS[view]
+        table_columns = get_table_columns(conn, table_name)
+        selects = build_select(table_name, table_columns, view_columns)
+        if len(selects) <= 2:
+            print(f"[WARN] Nenhuma coluna mapeada encontrada na tabela '{table_name}'.")
+            self._entries.pop(key, None)
+            return "vazia"
+
+        count = token[0]
+        select_signature = [name for _, name in selects]
+        can_delta = (entry is not None and now - entry["loaded_at"] < self.ttl_seconds
+                     and entry["columns"] == select_signature and count >= entry["token"][0]
+                     and entry["token"][1] is not None)
+        if can_delta:
+            delta = prepare_table_frame(fetch_table_rows(conn, table_name, selects, since=entry["token"][1:3]),
+                                        table_name, view_columns)
+            # Sem remoções, a soma atual dos ids é a do cache mais a dos ids novos do delta
+            ids = delta["lote_id"].to_numpy(dtype="int64")
+            novos = int(ids[ids > entry["token"][1]].sum())
+            can_delta = token[3] - novos == entry["token"][3]
+            if not can_delta:
+                print(f"[DB] '{table_name}': linhas removidas desde a última carga.")
+        if can_delta:
+            kept = entry["df"][~entry["df"]["lote_id"].isin(delta["lote_id"])]
+            df = concat_typed([kept, delta]) if not delta.empty else kept
+            load_type = "delta"
+            loaded_at = entry["loaded_at"]
+            print(f"[DB] '{table_name}': carga incremental de {len(delta)} linha(s).")
+        else:
+            df = prepare_table_frame(fetch_table_rows(conn, table_name, selects), table_name, view_columns)
+            load_type = "completa"
+            loaded_at = now
+            print(f"[DB] '{table_name}': carga completa de {len(df)} linha(s).")
+
+        self._entries[key] = {
+            "df": df,
+            "token": token,
+            "columns": select_signature,
+            "loaded_at": loaded_at,
+            "checked_at": now,
+            "version": (entry["version"] + 1) if entry else 1,
+            "nbytes": int(df.memory_usage(deep=True).sum()),
+        }
+        return load_type
+
+    def _evict(self):
+        total = sum(entry["nbytes"] for entry in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            total -= entry["nbytes"]
+            self._combined.pop(key[1], None)
+            print(f"[INFO] Cache do dashboard acima do limite; '{key[0]}' ({key[1]}) descartada.")
+
+    def load_lots(self, connect_fn=connect, view="dashboard", tables=None):
+        """Retorna o DataFrame combinado das tabelas para a visão, atualizando só o que mudou."""
+        tables = tables or list(TABLE_COLUMN_MAPS)
+        with self._lock:
+            now = time.monotonic()
+            stale = [t for t in tables if self._needs_token_check(self._entries.get((t, view)), now)]
+            if stale:
+                conn = connect_fn()
+                try:
+                    for table_name in stale:
+                        try:
+                            self.last_refresh[table_name] = self._refresh_table(
+                                conn, table_name, view, self._entries.get((table_name, view)), now)
+                        except Exception as e:
+                            conn.rollback()
+                            self.last_refresh[table_name] = f"erro: {e}"
+                            print(f"[DB ERROR] Não foi possível carregar a tabela '{table_name}': {e}")
+                finally:
+                    conn.close()
+
+            for table_name in tables:
+                if (table_name, view) in self._entries:
+                    self._entries.move_to_end((table_name, view))
+            self._evict()
+
+            # O combinado só é refeito quando alguma tabela mudou de versão
+            versions = tuple((t, self._entries[(t, view)]["version"]) for t in tables if (t, view) in self._entries)
+            cached = self._combined.get(view)
+            if cached is None or cached[0] != versions:
+                frames = [self._entries[(t, view)]["df"] for t, _ in versions]
+                combined = concat_typed(frames) if frames else pd.DataFrame(columns=VIEW_COLUMNS[view])
+                self._combined[view] = (versions, combined)
+            return self._combined[view][1]
+
+    def data_version(self, view="dashboard"):
+        """Identifica a versão atual dos dados da visão (útil para caches derivados)."""
+        cached = self._combined.get(view)
+        return cached[0] if cached else None
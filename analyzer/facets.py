@@ -0,0 +1,103 @@
+"""
+Índice de facetas do dashboard.
+
+Construído uma vez por versão dos dados (LotCache.data_version()): valores distintos e
+contagens de cada dimensão, anos por modelo e as faixas (mín/máx) de preço, valor de
+mercado e data por modelo/ano. Assim as opções dos selectboxes e os limites dos sliders
+são consultas a dicionários, sem percorrer o DataFrame a cada interação.
+"""
+import pandas as pd
+
+TODOS = "Todos"
+
+# Dimensões com lista de valores distintos e contagens
+FACET_DIMENSIONS = ["modelo", "ano", "tipo_veiculo", "fabricante", "source_table"]
+# Colunas com faixa (mín, máx) pré-calculada
+RANGE_COLUMNS = ["preco_lote", "valor_mercado", "data_leilao"]
+
+
+def _contagens(serie):
+    """[(valor, contagem), ...] ordenado pelo valor, sem os ausentes."""
+    contagens = serie.value_counts(dropna=True, sort=False)
+    contagens = contagens[contagens > 0]
+    return sorted(zip(contagens.index.tolist(), contagens.tolist()), key=lambda item: item[0])
+
+def _anos_por_modelo(df):
+    """{modelo: [anos em ordem decrescente]} e a lista de todos os anos em TODOS."""
+    pares = df[["modelo", "ano"]].dropna().drop_duplicates()
+    anos = {TODOS: sorted({int(ano) for ano in pares["ano"]}, reverse=True)}
+    for modelo, grupo in pares.groupby("modelo", observed=True)["ano"]:
+        anos[modelo] = sorted((int(ano) for ano in grupo), reverse=True)
+    return anos
+
+def _modelos_por_tipo(df):
+    """{tipo_veiculo: [modelos]} para restringir os modelos ao tipo selecionado."""
+    pares = df[["tipo_veiculo", "modelo"]].dropna().drop_duplicates()
+    return {tipo: sorted(grupo.tolist()) for tipo, grupo in pares.groupby("tipo_veiculo", observed=True)["modelo"]}
+
+def _faixas(df):
+    """
+    {(modelo, ano): {coluna: (mín, máx)}} com TODOS no lugar de modelo e/ou ano.
+    Calcula por (modelo, ano) e agrega os mínimos/máximos para os níveis acima.
+    """
+    colunas = [col for col in RANGE_COLUMNS if col in df.columns]
+    chaves = df[["modelo", "ano"]].astype(object).fillna(TODOS)
+    grupos = df[colunas].groupby([chaves["modelo"], chaves["ano"]], dropna=False).agg(["min", "max"])
+
+    faixas = {}
+    for nivel, agrupado in (
+        ("modelo_ano", grupos),
+        ("modelo", grupos.groupby(level=0).agg({(c, s): s for c in colunas for s in ("min", "max")})),
+        ("ano", grupos.groupby(level=1).agg({(c, s): s for c in colunas for s in ("min", "max")})),
+    ):
+        for chave, linha in agrupado.iterrows():
+            if nivel == "modelo":
+                chave = (chave, TODOS)
+            elif nivel == "ano":
+                chave = (TODOS, chave)
+            faixas[(chave[0], int(chave[1]) if chave[1] != TODOS else TODOS)] = {
+                col: (linha[(col, "min")], linha[(col, "max")]) for col in colunas
+            }
+    faixas[(TODOS, TODOS)] = {col: (df[col].min(), df[col].max()) for col in colunas}
+    return faixas
+
+def build_facet_index(df, version=None):
+    """Monta o índice a partir do DataFrame já pontuado (ver scoring.estimar_valor)."""
+    oportunidades = df[df["oportunidade"]] if "oportunidade" in df.columns else df.iloc[0:0]
+    return {
+        "versao": version,
+        "total": len(df),
+        "valores": {dim: _contagens(df[dim]) for dim in FACET_DIMENSIONS if dim in df.columns},
+        "anos_por_modelo": _anos_por_modelo(df),
+        "modelos_por_tipo": _modelos_por_tipo(df) if "tipo_veiculo" in df.columns else {},
+        "oportunidades": {
+            "total": len(oportunidades),
+            "anos_por_modelo": _anos_por_modelo(oportunidades),
+            "faixas": _faixas(oportunidades) if len(oportunidades) else {},
+        },
+    }
+
+def opcoes(index, dimensao):
+    """Valores distintos da dimensão, em ordem."""
+    return [valor for valor, _ in index["valores"].get(dimensao, [])]
+
+def modelos(index, tipo_veiculo=TODOS):
+    """Modelos disponíveis, opcionalmente só os do tipo de veículo informado."""
+    if tipo_veiculo == TODOS:
+        return opcoes(index, "modelo")
+    return index["modelos_por_tipo"].get(tipo_veiculo, [])
+
+def contagem(index, dimensao, valor):
+    return dict(index["valores"].get(dimensao, [])).get(valor, 0)
+
+def anos(index, modelo=TODOS, oportunidades=False):
+    """Anos disponíveis para o modelo (todos os lotes ou só as oportunidades)."""
+    fonte = index["oportunidades"] if oportunidades else index
+    return fonte["anos_por_modelo"].get(modelo, [])
+
+def faixa(index, coluna, modelo=TODOS, ano=TODOS):
+    """(mín, máx) da coluna entre as oportunidades do modelo/ano, ou (None, None)."""
+    limites = index["oportunidades"]["faixas"].get((modelo, ano), {}).get(coluna)
+    if limites is None or pd.isna(limites[0]):
+        return None, None
+    return limites
@@ -0,0 +1,69 @@
+"""
+Endpoint local que imita o modelo de linguagem, para testar o ia_service sem a API do Gemini.
+
+    python fake_llm.py --port 8765 --latencia 1.5
+    IA_LLM_URL=http://localhost:8765 streamlit run dashboard.py
+
+Responde a POST {"prompt": ...} com {"text": ...}: um veredito determinístico calculado a
+partir do preço e do valor FIPE presentes no prompt.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _valor(prompt, rotulo):
+    match = re.search(rf"{rotulo}:\s*R\$\s*([\d.]+,\d{{2}})", prompt)
+    return float(match.group(1).replace(".", "").replace(",", ".")) if match else None
+
+def veredito(prompt):
+    preco = _valor(prompt, "Preço no leilão")
+    mercado = _valor(prompt, r"Valor de mercado \(FIPE\)")
+    if not preco or not mercado:
+        return "Dados insuficientes para avaliar a oportunidade (resposta simulada)."
+    desconto = (mercado - preco) / mercado * 100
+    conclusao = "Boa oportunidade" if desconto > 20 else "Oportunidade fraca"
+    return f"{conclusao}: o lance está {desconto:.1f}% abaixo da FIPE (resposta simulada)."
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    latencia = 0.0
+    chamadas = 0
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        corpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with FakeLLMHandler._lock:
+            FakeLLMHandler.chamadas += 1
+        time.sleep(self.latencia)
+        resposta = json.dumps({"text": veredito(corpo.get("prompt", ""))}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(resposta)))
+        self.end_headers()
+        self.wfile.write(resposta)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_server(port=0, latencia=0.0):
+    """Sobe o servidor em uma thread e retorna (servidor, url)."""
+    FakeLLMHandler.latencia = latencia
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Modelo de linguagem falso para testes locais.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=1.0, help="Segundos de espera por resposta.")
+    args = parser.parse_args()
+    FakeLLMHandler.latencia = args.latencia
+    print(f"[INFO] LLM falso ouvindo em http://127.0.0.1:{args.port}")
+    ThreadingHTTPServer(("127.0.0.1", args.port), FakeLLMHandler).serve_forever()
+
+if __name__ == "__main__":
+    main()
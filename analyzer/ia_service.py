@@ -0,0 +1,273 @@
+"""
+Serviço de avaliação de lotes por IA (Gemini).
+
+As respostas ficam na tabela 'avaliacoes_ia', indexadas por (modelo, ano, km, preço do lote,
+valor de mercado, versão do prompt): o mesmo lote nunca é avaliado duas vezes. As consultas
+ao modelo rodam em uma thread de fundo, a partir de uma fila com prioridade:
+  - o dashboard enfileira as N melhores oportunidades a cada nova versão dos dados
+    (ou seja, após cada raspagem) e os pedidos do usuário passam na frente;
+  - a thread retira até IA_BATCH_SIZE lotes por vez, consulta o cache de uma só vez,
+    avalia os que faltam com no máximo IA_MAX_CONCURRENCY chamadas simultâneas e grava
+    as respostas em um único upsert.
+
+Com IA_LLM_URL definido, as chamadas vão para esse endpoint HTTP em vez do Gemini
+(ver fake_llm.py, usado em testes locais).
+
+Uso pela linha de comando (pré-avaliação após uma raspagem):
+    python ia_service.py --top 20
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from data_access import LotCache, connect
+from db_utils.db_operations import create_ia_evaluations_table, get_ia_evaluations, upsert_ia_evaluations
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash")
+# Endpoint HTTP alternativo (POST {"prompt": ...} -> {"text": ...}), ex.: o fake_llm.py local
+IA_LLM_URL = os.getenv("IA_LLM_URL")
+IA_MAX_CONCURRENCY = int(os.getenv("IA_MAX_CONCURRENCY", "2"))
+IA_BATCH_SIZE = int(os.getenv("IA_BATCH_SIZE", "8"))
+IA_TOP_N = int(os.getenv("IA_TOP_N", "20"))
+IA_REQUEST_TIMEOUT = int(os.getenv("IA_REQUEST_TIMEOUT", "60"))
+
+# Mudou o texto do prompt? Incremente a versão para que as respostas antigas não sejam reaproveitadas.
+PROMPT_VERSION = "v1"
+
+PRIORIDADE_USUARIO = 0
+PRIORIDADE_PRE_AVALIACAO = 1
+
+STATUS_PRONTO = "pronto"
+STATUS_PENDENTE = "pendente"
+
+
+def formatar_brl(valor):
+    if valor is None or pd.isna(valor):
+        return "N/A"
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+def _inteiro(valor):
+    return None if valor is None or pd.isna(valor) else int(valor)
+
+def _dinheiro(valor):
+    return None if valor is None or pd.isna(valor) else round(float(valor), 2)
+
+def normalizar_lote(lote):
+    """Campos do lote usados no prompt e na chave do cache, já normalizados."""
+    modelo = lote.get("modelo")
+    return {
+        "modelo": None if modelo is None or pd.isna(modelo) else str(modelo).strip().upper(),
+        "ano": _inteiro(lote.get("ano")),
+        "km": _inteiro(lote.get("km")),
+        "preco_lote": _dinheiro(lote.get("preco_lote")),
+        "valor_mercado": _dinheiro(lote.get("valor_mercado")),
+    }
+
+def chave_avaliacao(dados):
+    """Hash de (modelo, ano, km, preço, valor de mercado, versão do prompt)."""
+    conteudo = json.dumps([dados["modelo"], dados["ano"], dados["km"], dados["preco_lote"],
+                           dados["valor_mercado"], PROMPT_VERSION])
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+def build_prompt(dados):
+    return f"""
+    Analise a seguinte oportunidade de compra de veículo em leilão:
+    Modelo: {dados['modelo']}
+    Ano: {dados['ano']}
+    Quilometragem: {dados['km']}
+    Preço no leilão: {formatar_brl(dados['preco_lote'])}
+    Valor de mercado (FIPE): {formatar_brl(dados['valor_mercado'])}
+
+    Isso representa uma boa oportunidade de compra? Qual é a sua justificativa?
+    Considere o preço do leilão em comparação com o valor de mercado (FIPE), bem como a idade (ano) e a quilometragem do veículo.
+    Se o preço do leilão for significativamente menor que o valor de mercado (FIPE), é provável que seja uma boa oportunidade.
+    """
+
+def gerar_resposta(prompt):
+    """Consulta o modelo de linguagem (endpoint HTTP se IA_LLM_URL estiver definido, senão o Gemini)."""
+    if IA_LLM_URL:
+        request = urllib.request.Request(
+            IA_LLM_URL,
+            data=json.dumps({"prompt": prompt, "model": GEMINI_MODEL}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=IA_REQUEST_TIMEOUT) as response:
+            return json.loads(response.read().decode("utf-8"))["text"].strip()
+
+    if not GEMINI_API_KEY:
+        raise RuntimeError("Chave de API do Gemini não configurada. Por favor, defina GEMINI_API_KEY.")
+    import google.generativeai as genai # Só é necessário quando o Gemini é usado de fato
+    genai.configure(api_key=GEMINI_API_KEY)
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    return model.generate_content(prompt, request_options={"timeout": IA_REQUEST_TIMEOUT}).text.strip()
+
+
+class AvaliacaoService:
+    """Fila de avaliações com cache persistente e uma thread de fundo."""
+
+    def __init__(self, connect_fn=connect, max_concurrency=IA_MAX_CONCURRENCY, batch_size=IA_BATCH_SIZE,
+                 gerar_fn=gerar_resposta):
+        self.connect_fn = connect_fn
+        self.batch_size = batch_size
+        self.gerar_fn = gerar_fn
+        self._fila = queue.PriorityQueue()
+        self._sequencia = 0
+        self._lock = threading.Lock()
+        self._respostas = {}  # chave -> resposta (espelho em memória do que já está no banco)
+        self._status = {}     # chave -> STATUS_PENDENTE ou mensagem de erro
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ia")
+        self._tabela_verificada = False
+        self._worker = None
+
+    def iniciar(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._loop, name="ia-worker", daemon=True)
+            self._worker.start()
+        return self
+
+    def _garantir_tabela(self, conn):
+        if not self._tabela_verificada:
+            create_ia_evaluations_table(conn)
+            self._tabela_verificada = True
+
+    def enfileirar(self, lotes, prioridade=PRIORIDADE_PRE_AVALIACAO):
+        """Enfileira os lotes (dicts ou linhas do DataFrame) ainda sem resposta. Retorna quantos entraram."""
+        novos = 0
+        with self._lock:
+            for lote in lotes:
+                dados = normalizar_lote(lote)
+                chave = chave_avaliacao(dados)
+                if chave in self._respostas:
+                    continue
+                # Um erro anterior pode ser repetido; um pedido já pendente não é duplicado,
+                # a não ser que o usuário o peça (entra de novo, com prioridade maior)
+                if self._status.get(chave) == STATUS_PENDENTE and prioridade != PRIORIDADE_USUARIO:
+                    continue
+                self._status[chave] = STATUS_PENDENTE
+                self._sequencia += 1
+                self._fila.put((prioridade, self._sequencia, chave, dados))
+                novos += 1
+        return novos
+
+    def pre_avaliar(self, df, top_n=IA_TOP_N):
+        """Enfileira as 'top_n' oportunidades de maior desconto do DataFrame pontuado."""
+        oportunidades = df[df["oportunidade"]].nlargest(top_n, "desconto_percentual")
+        return self.enfileirar(oportunidades.to_dict("records"))
+
+    def consultar(self, lote):
+        """
+        (status, texto) do lote: (STATUS_PRONTO, resposta), (STATUS_PENDENTE, None),
+        (mensagem de erro, None) ou (None, None) se nunca foi pedido.
+        Lê do banco quando a resposta ainda não está em memória (ex.: avaliada pela linha de comando).
+        """
+        chave = chave_avaliacao(normalizar_lote(lote))
+        with self._lock:
+            if chave in self._respostas:
+                return STATUS_PRONTO, self._respostas[chave]
+            status = self._status.get(chave)
+        if status is None:
+            conn = self.connect_fn()
+            try:
+                self._garantir_tabela(conn)
+                resposta = get_ia_evaluations(conn, [chave]).get(chave)
+            finally:
+                conn.close()
+            if resposta is not None:
+                with self._lock:
+                    self._respostas[chave] = resposta
+                return STATUS_PRONTO, resposta
+        return status, None
+
+    def _proximo_lote(self):
+        """Bloqueia até haver um pedido e junta até 'batch_size' itens (uma entrada por chave)."""
+        itens = {}
+        _, _, chave, dados = self._fila.get()
+        itens[chave] = dados
+        while len(itens) < self.batch_size:
+            try:
+                _, _, chave, dados = self._fila.get_nowait()
+            except queue.Empty:
+                break
+            itens[chave] = dados
+        return itens
+
+    def _avaliar(self, dados):
+        return self.gerar_fn(build_prompt(dados))
+
+    def processar(self, itens):
+        """Avalia um lote de pedidos: uma consulta ao cache, chamadas em paralelo e um único upsert."""
+        conn = self.connect_fn()
+        try:
+            self._garantir_tabela(conn)
+            respostas = get_ia_evaluations(conn, list(itens))
+            faltando = {chave: dados for chave, dados in itens.items() if chave not in respostas}
+            futuros = {chave: self._executor.submit(self._avaliar, dados) for chave, dados in faltando.items()}
+
+            erros = {}
+            novas = []
+            for chave, futuro in futuros.items():
+                try:
+                    respostas[chave] = futuro.result()
+                except Exception as e:
+                    erros[chave] = f"Erro ao consultar Gemini: {e}"
+                    print(f"[ERRO] Avaliação de IA falhou para '{faltando[chave]['modelo']}': {e}")
+                    continue
+                dados = faltando[chave]
+                novas.append((chave, dados["modelo"], dados["ano"], dados["km"], dados["preco_lote"],
+                              dados["valor_mercado"], PROMPT_VERSION, GEMINI_MODEL if not IA_LLM_URL else IA_LLM_URL,
+                              respostas[chave]))
+            upsert_ia_evaluations(conn, novas)
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._respostas.update(respostas)
+            for chave in respostas:
+                self._status.pop(chave, None)
+            self._status.update(erros)
+        print(f"[INFO] Avaliações de IA: {len(itens)} pedido(s), {len(itens) - len(faltando)} no cache, "
+              f"{len(novas)} nova(s), {len(erros)} erro(s).")
+        return len(novas)
+
+    def _loop(self):
+        while True:
+            itens = self._proximo_lote()
+            try:
+                self.processar(itens)
+            except Exception as e:
+                print(f"[ERRO] Falha no processamento das avaliações de IA: {e}")
+                with self._lock:
+                    for chave in itens:
+                        self._status[chave] = f"Erro ao consultar Gemini: {e}"
+
+    def aguardar(self):
+        """Processa a fila até esvaziar, na thread atual (uso pela linha de comando)."""
+        while not self._fila.empty():
+            self.processar(self._proximo_lote())
+
+
+def main():
+    from scoring import estimar_valor
+
+    parser = argparse.ArgumentParser(description="Pré-avalia com IA as melhores oportunidades do banco.")
+    parser.add_argument("--top", type=int, default=IA_TOP_N, help="Quantidade de oportunidades avaliadas.")
+    args = parser.parse_args()
+
+    df = LotCache().load_lots(view="dashboard")
+    if df.empty:
+        print("[WARN] Nenhum lote carregado; nada a avaliar.")
+        return
+    service = AvaliacaoService()
+    print(f"[INFO] {service.pre_avaliar(estimar_valor(df), args.top)} lote(s) enfileirado(s) para avaliação.")
+    service.aguardar()
+
+if __name__ == "__main__":
+    main()
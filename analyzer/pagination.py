@@ -0,0 +1,61 @@
+"""
+Paginação e ordenação no servidor para as tabelas do dashboard.
+
+As linhas selecionadas pelos filtros chegam como posições (np.flatnonzero da máscara).
+A ordenação é feita sobre essas posições com NumPy e só as linhas da página pedida são
+fatiadas, formatadas e enviadas ao navegador.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+TAMANHOS_PAGINA = [25, 50, 100, 250]
+
+
+def chave_ordenacao(serie):
+    """
+    Array numérico que ordena como a coluna (ausentes sempre por último na ordem crescente).
+    Em 'category' usa a posição alfabética de cada categoria, sem converter os valores para texto.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        ranking = np.empty(len(serie.cat.categories), dtype="float64")
+        ranking[np.argsort(serie.cat.categories.to_numpy(dtype=object).astype(str), kind="stable")] = np.arange(len(ranking))
+        codigos = serie.cat.codes.to_numpy()
+        return np.where(codigos >= 0, ranking[codigos], np.inf)
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        valores = serie.to_numpy().astype("datetime64[s]").astype("int64").astype("float64")
+        return np.where(serie.isna().to_numpy(), np.inf, valores)
+    if pd.api.types.is_numeric_dtype(serie) or pd.api.types.is_bool_dtype(serie):
+        valores = serie.to_numpy(dtype="float64", na_value=np.nan)
+        return np.where(np.isnan(valores), np.inf, valores)
+    # Texto: fatoriza (ordenado) e ordena pelos códigos
+    codigos, _ = pd.factorize(serie, sort=True)
+    return np.where(codigos >= 0, codigos, np.inf).astype("float64")
+
+def ordenar(df, posicoes, coluna, decrescente=False):
+    """Reordena as posições pela coluna (ordenação estável; ausentes no fim nos dois sentidos)."""
+    chave = chave_ordenacao(df[coluna])[posicoes]
+    if decrescente:
+        chave = np.where(np.isinf(chave), np.inf, -chave)
+    return posicoes[np.argsort(chave, kind="stable")]
+
+def total_paginas(total, tamanho):
+    return max(1, math.ceil(total / tamanho))
+
+def pagina(df, posicoes, numero, tamanho, colunas=None):
+    """Linhas da página 'numero' (começando em 1), só com as colunas pedidas."""
+    inicio = (numero - 1) * tamanho
+    fatia = posicoes[inicio:inicio + tamanho]
+    linhas = df.iloc[fatia]
+    return linhas if colunas is None else linhas[colunas]
+
+def formatar_colunas(df_pagina, formatar_moeda):
+    """Formata para exibição as colunas de valores, desconto e data presentes na página."""
+    formatadores = {
+        "preco_lote": lambda serie: serie.map(formatar_moeda),
+        "valor_mercado": lambda serie: serie.map(formatar_moeda),
+        "desconto_percentual": lambda serie: serie.map(lambda x: f"{x:.2f}%" if pd.notna(x) else "N/A"),
+        "data_leilao": lambda serie: serie.dt.strftime("%d/%m/%Y").fillna("N/A"),
+    }
+    return df_pagina.assign(**{col: formatar(df_pagina[col]) for col, formatar in formatadores.items() if col in df_pagina.columns})
@@ -0,0 +1,227 @@
+"""
+Modelo local de estimativa de valor de mercado.
+
+Regressão por gradient boosting (HistGradientBoostingRegressor do scikit-learn) treinada
+com os lotes que têm valor FIPE, usando fabricante, modelo, ano, km, combustível, tipo de
+retomada e tabela de origem. A previsão é vetorizada sobre o DataFrame inteiro e serve
+de fallback para os lotes sem FIPE (ver scoring.estimar_valor), sem chamadas externas.
+
+O modelo é salvo com joblib junto com a assinatura dos dados de treino (quantidade e soma
+dos valores FIPE e maior data_extracao). Quem atende requisições (analytics.py) só lê o
+último modelo salvo (modelo_salvo) e, quando a assinatura dos dados mudou (nova raspagem ou
+enriquecimento FIPE), pede o retreino numa thread (treinar_em_segundo_plano): a requisição
+nunca espera o ajuste do boosting, e o modelo novo passa a valer quando o arquivo é trocado.
+
+Retreino pela linha de comando (após uma raspagem, ou agendado no cron):
+    python price_model.py
+"""
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OrdinalEncoder
+
+from data_access import LotCache
+
+MODEL_PATH = os.getenv("PRICE_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "modelos", "preco_mercado.joblib"))
+
+CATEGORICAL_FEATURES = ["fabricante", "modelo", "tipo_combustivel", "tipo_retomada", "source_table"]
+NUMERIC_FEATURES = ["ano", "km"]
+TARGET = "valor_fipe"
+
+# Abaixo disso o modelo não é treinado (as estimativas seriam ruins)
+MIN_AMOSTRAS = int(os.getenv("PRICE_MODEL_MIN_SAMPLES", "50"))
+# O boosting aceita no máximo 255 categorias por coluna; as raras viram uma categoria só
+MAX_CATEGORIAS = 250
+
+# Último artefato lido do disco (relido só quando o arquivo muda) e o treino em andamento
+_lock = threading.Lock()
+_salvo = {"chave": None, "artefato": None}
+_treino = {"thread": None, "assinatura": None}
+
+
+def _amostras_treino(df):
+    """Lotes com valor FIPE positivo: são os exemplos de treino."""
+    return df[df[TARGET].notna() & (df[TARGET] > 0)]
+
+def assinatura_treino(df):
+    """Identifica os dados de treino: muda quando entram lotes ou valores FIPE novos."""
+    treino = _amostras_treino(df)
+    ultima = treino["data_extracao"].max() if "data_extracao" in treino.columns and len(treino) else None
+    return (len(treino), float(treino[TARGET].sum()), None if pd.isna(ultima) else str(ultima))
+
+def _features(df):
+    """Matriz de entrada: categóricas como texto (ausentes viram NaN) e numéricas como float."""
+    colunas = {}
+    for col in CATEGORICAL_FEATURES:
+        serie = df[col] if col in df.columns else pd.Series(None, index=df.index)
+        colunas[col] = serie.astype(object).where(serie.notna(), np.nan)
+    for col in NUMERIC_FEATURES:
+        serie = df[col] if col in df.columns else pd.Series(np.nan, index=df.index)
+        colunas[col] = serie.to_numpy(dtype="float64", na_value=np.nan)
+    return pd.DataFrame(colunas, index=df.index)
+
+def build_pipeline():
+    encoder = OrdinalEncoder(
+        handle_unknown="use_encoded_value", unknown_value=np.nan,
+        encoded_missing_value=np.nan, max_categories=MAX_CATEGORIAS,
+    )
+    return Pipeline([
+        ("colunas", ColumnTransformer(
+            [("categoricas", encoder, CATEGORICAL_FEATURES)],
+            remainder="passthrough", verbose_feature_names_out=False,
+        )),
+        ("regressor", HistGradientBoostingRegressor(
+            categorical_features=list(range(len(CATEGORICAL_FEATURES))),
+            max_iter=300, learning_rate=0.08, random_state=0,
+        )),
+    ])
+
+def treinar(df):
+    """Treina o modelo (alvo em log, para o erro ser relativo ao preço). Retorna o artefato ou None."""
+    treino = _amostras_treino(df)
+    if len(treino) < MIN_AMOSTRAS:
+        print(f"[WARN] Apenas {len(treino)} lotes com FIPE; mínimo de {MIN_AMOSTRAS} para treinar o modelo de preço.")
+        return None
+
+    inicio = time.perf_counter()
+    pipeline = build_pipeline()
+    alvo = np.log1p(treino[TARGET].to_numpy(dtype="float64"))
+    pipeline.fit(_features(treino), alvo)
+    previsto = np.expm1(pipeline.predict(_features(treino)))
+    erro_relativo = float(np.median(np.abs(previsto - treino[TARGET].to_numpy(dtype="float64")) / treino[TARGET].to_numpy(dtype="float64")))
+    artefato = {
+        "pipeline": pipeline,
+        "assinatura": assinatura_treino(df),
+        "amostras": len(treino),
+        "erro_relativo_mediano": erro_relativo,
+        "treinado_em": datetime.now().isoformat(timespec="seconds"),
+        "sklearn": sklearn.__version__,
+    }
+    print(f"[INFO] Modelo de preço treinado com {len(treino)} lotes em {time.perf_counter() - inicio:.2f}s "
+          f"(erro relativo mediano no treino: {erro_relativo:.1%}).")
+    return artefato
+
+def carregar(path=MODEL_PATH):
+    """Artefato salvo, ou None se não existir ou for de outra versão do scikit-learn."""
+    if not os.path.exists(path):
+        return None
+    try:
+        artefato = joblib.load(path)
+    except Exception as e:
+        print(f"[WARN] Não foi possível ler o modelo de preço '{path}': {e}")
+        return None
+    if artefato.get("sklearn") != sklearn.__version__:
+        print("[INFO] Modelo de preço salvo com outra versão do scikit-learn; será retreinado.")
+        return None
+    return artefato
+
+def salvar(artefato, path=MODEL_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Grava em arquivo temporário e renomeia: um leitor nunca vê o arquivo pela metade
+    temporario = f"{path}.tmp"
+    joblib.dump(artefato, temporario)
+    os.replace(temporario, path)
+
+def garantir_modelo(df, path=MODEL_PATH):
+    """Reaproveita o modelo salvo se os dados de treino não mudaram; senão retreina e salva."""
+    artefato = carregar(path)
+    if artefato is not None and artefato["assinatura"] == assinatura_treino(df):
+        return artefato
+    novo = treinar(df)
+    if novo is not None:
+        salvar(novo, path)
+        return novo
+    return artefato
+
+def modelo_salvo(path=MODEL_PATH):
+    """Último modelo salvo (ou None), sem treinar; o arquivo só é relido quando muda no disco."""
+    try:
+        chave = (path, os.path.getmtime(path))
+    except OSError:
+        return None
+    with _lock:
+        if _salvo["chave"] != chave:
+            _salvo["chave"], _salvo["artefato"] = chave, carregar(path)
+        return _salvo["artefato"]
+
+def _treinar_e_salvar(df, path):
+    try:
+        artefato = treinar(df)
+        if artefato is not None:
+            salvar(artefato, path)
+    except Exception as e:
+        print(f"[WARN] Falha no treino do modelo de preço em segundo plano: {e}")
+    finally:
+        with _lock:
+            _treino["thread"] = None
+
+def treinar_em_segundo_plano(df, path=MODEL_PATH):
+    """
+    Retreina numa thread se os dados de treino mudaram desde o modelo salvo. Um treino por vez,
+    e a mesma assinatura não é tentada de novo (ex.: poucos lotes com FIPE). Retorna True se iniciou.
+    """
+    assinatura = assinatura_treino(df)
+    artefato = modelo_salvo(path)
+    if artefato is not None and artefato["assinatura"] == assinatura:
+        return False
+    with _lock:
+        if _treino["thread"] is not None or _treino["assinatura"] == assinatura:
+            return False
+        _treino["assinatura"] = assinatura
+        _treino["thread"] = threading.Thread(target=_treinar_e_salvar, args=(df, path), name="treino-preco", daemon=True)
+        _treino["thread"].start()
+    print("[INFO] Dados de treino mudaram; modelo de preço sendo retreinado em segundo plano.")
+    return True
+
+def prever(artefato, df, linhas=None):
+    """
+    Estimativa de valor de mercado alinhada ao df (float32), em uma única chamada ao modelo.
+    'linhas' (máscara booleana) restringe a previsão, ex.: só os lotes sem FIPE; as demais ficam NaN.
+    """
+    estimativa = np.full(len(df), np.nan, dtype="float32")
+    if artefato is None or df.empty:
+        return estimativa
+    alvo = df if linhas is None else df[linhas]
+    if len(alvo):
+        valores = np.expm1(artefato["pipeline"].predict(_features(alvo))).astype("float32")
+        if linhas is None:
+            estimativa[:] = valores
+        else:
+            estimativa[linhas] = valores
+    return estimativa
+
+def lotes_sem_fipe(df):
+    return ~(df[TARGET].to_numpy(dtype="float64", na_value=np.nan) > 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina (se os dados mudaram) o modelo local de preço.")
+    parser.add_argument("--forcar", action="store_true", help="Retreina mesmo sem mudança nos dados.")
+    args = parser.parse_args()
+
+    df = LotCache().load_lots(view="dashboard")
+    if args.forcar:
+        artefato = treinar(df)
+        if artefato is not None:
+            salvar(artefato)
+    else:
+        artefato = garantir_modelo(df)
+    if artefato is None:
+        return
+    inicio = time.perf_counter()
+    estimativas = prever(artefato, df)
+    print(f"[INFO] {len(estimativas)} estimativas ({int(lotes_sem_fipe(df).sum())} lotes sem FIPE) em {(time.perf_counter() - inicio) * 1000:.1f} ms "
+          f"(modelo treinado em {artefato['treinado_em']} com {artefato['amostras']} lotes).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Pontuação de oportunidades e filtros do dashboard.
+
+O desconto e a oportunidade são calculados em uma única expressão NumPy sobre as colunas
+já tipadas (ver data_access.py), sem copiar o DataFrame. Os filtros da tela são máscaras
+booleanas combinadas entre si; o DataFrame só é fatiado uma vez, na hora de exibir.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Desconto mínimo (%) sobre o valor de mercado para o lote ser uma oportunidade
+DESCONTO_OPORTUNIDADE = 20.0
+# Máscaras guardadas por FiltrosLotes (1 byte por lote cada; as menos usadas saem primeiro)
+MASCARAS_MAX = 32
+
+ORIGEM_FIPE = "FIPE"
+ORIGEM_MODELO = "Modelo"
+
+
+def _valores(series):
+    """Array float64 da coluna, com NaN no lugar dos valores ausentes."""
+    return series.to_numpy(dtype="float64", na_value=np.nan)
+
+def estimar_valor(df, estimativa=None):
+    """
+    Adiciona 'valor_mercado', 'origem_valor_mercado', 'desconto_percentual' e 'oportunidade'.
+    O valor de mercado é o valor_fipe (> 0); sem FIPE, usa 'estimativa' (array alinhado ao df,
+    ex.: price_model.prever) ou fica NaN. A origem só é preenchida quando há valor de mercado
+    positivo. O desconto só é calculado quando preço e valor de mercado são positivos;
+    descontos negativos (lote acima do mercado) ficam em 0.
+    """
+    preco = _valores(df["preco_lote"])
+    fipe = _valores(df["valor_fipe"])
+    tem_fipe = fipe > 0
+    alternativa = np.nan if estimativa is None else np.asarray(estimativa, dtype="float64")
+    mercado = np.where(tem_fipe, fipe, alternativa)
+    with np.errstate(invalid="ignore"):
+        origem = np.where(tem_fipe, ORIGEM_FIPE, np.where(mercado > 0, ORIGEM_MODELO, None))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        validos = (preco > 0) & (mercado > 0)
+        desconto = np.where(validos, np.maximum((mercado - preco) / mercado * 100.0, 0.0), 0.0)
+    # assign não copia os dados das colunas existentes (copy-on-write)
+    return df.assign(
+        valor_mercado=mercado.astype("float32"),
+        origem_valor_mercado=pd.Categorical(origem, categories=[ORIGEM_FIPE, ORIGEM_MODELO]),
+        desconto_percentual=desconto.astype("float32"),
+        oportunidade=desconto > DESCONTO_OPORTUNIDADE,
+    )
+
+def possui_valores_validos(df):
+    """Indica se algum lote tem preço e valor de mercado para o cálculo do desconto."""
+    return bool(((_valores(df["preco_lote"]) > 0) & (_valores(df["valor_mercado"]) > 0)).any())
+
+
+class FiltrosLotes:
+    """
+    Máscaras booleanas sobre um DataFrame de lotes. Uma instância por snapshot, compartilhada
+    por todas as sessões (analytics.py). As máscaras de categoria e booleanas, que se repetem
+    entre sessões, ficam num LRU de até MASCARAS_MAX entradas; as de intervalo (sliders, com
+    limites quase sempre diferentes) são calculadas a cada chamada. As máscaras devolvidas
+    não devem ser alteradas no lugar.
+    """
+
+    def __init__(self, df, max_mascaras=MASCARAS_MAX):
+        self.df = df
+        self.max_mascaras = max_mascaras
+        self._mascaras = OrderedDict()
+        self._lock = threading.Lock()
+
+    def todos(self):
+        return np.ones(len(self.df), dtype=bool)
+
+    def _guardar(self, chave, calcular):
+        with self._lock:
+            mascara = self._mascaras.get(chave)
+            if mascara is not None:
+                self._mascaras.move_to_end(chave)
+                return mascara
+        mascara = calcular()
+        with self._lock:
+            self._mascaras[chave] = mascara
+            while len(self._mascaras) > self.max_mascaras:
+                self._mascaras.popitem(last=False)
+        return mascara
+
+    def verdadeiro(self, coluna):
+        return self._guardar((coluna, "verdadeiro"), lambda: self.df[coluna].to_numpy(dtype=bool))
+
+    def igual(self, coluna, valor):
+        """Máscara de coluna == valor; em colunas 'category' compara só os códigos."""
+        def calcular():
+            serie = self.df[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                codigo = serie.cat.categories.get_indexer([valor])[0]
+                return serie.cat.codes.to_numpy() == codigo if codigo >= 0 else np.zeros(len(serie), dtype=bool)
+            return (serie == valor).fillna(False).to_numpy(dtype=bool)
+        return self._guardar((coluna, "igual", valor), calcular)
+
+    def intervalo(self, coluna, minimo=None, maximo=None):
+        """Máscara de minimo <= coluna <= maximo (limite None é ignorado; ausentes ficam de fora)."""
+        serie = self.df[coluna]
+        valores = serie.to_numpy() if pd.api.types.is_datetime64_any_dtype(serie) else _valores(serie)
+        mascara = ~pd.isna(valores)
+        if minimo is not None:
+            mascara &= valores >= minimo
+        if maximo is not None:
+            mascara &= valores <= maximo
+        return mascara
+
+    def preenchido(self, *colunas):
+        return self._guardar(("preenchido",) + colunas,
+                             lambda: self.df[list(colunas)].notna().all(axis=1).to_numpy())
+
+    def posicoes(self, mascara, ordenar_por=None, decrescente=False):
+        """Posições das linhas da máscara, opcionalmente ordenadas por uma coluna numérica."""
+        posicoes = np.flatnonzero(mascara)
+        if ordenar_por is not None:
+            chave = _valores(self.df[ordenar_por])[posicoes]
+            ordem = np.argsort(-chave if decrescente else chave, kind="stable")
+            posicoes = posicoes[ordem]
+        return posicoes
+
+    def selecionar(self, mascara, colunas=None, ordenar_por=None, decrescente=False):
+        """Fatia o DataFrame uma única vez: linhas da máscara, colunas pedidas e ordem opcional."""
+        df = self.df if colunas is None else self.df[colunas]
+        return df.iloc[self.posicoes(mascara, ordenar_por, decrescente)]
+
+def combinar(*mascaras):
+    """E lógico das máscaras (None é ignorado)."""
+    mascaras = [mascara for mascara in mascaras if mascara is not None]
+    return np.logical_and.reduce(mascaras) if mascaras else None
@@ -1,69 +1,345 @@
-import psycopg2
-import random
-# Importa a função de conexão do seu módulo db_operations
-from db_utils.adb_operations import connect_db, create_table_leilao_data, create_table_consolidado
+"""
+Gerador de dados sintéticos para testes de carga.
 
-def run_seed_data():
+Preenche as tabelas 'leilo', 'loop' e 'parque_leiloes_oficial' com lotes realistas, no
+mesmo formato gravado pelos scrapers (título, link, km e data como texto; valores em
+NUMERIC), para medir o dashboard, o ETL e a camada de banco com volumes de produção:
+  - marca/modelo seguem uma distribuição de popularidade (poucos modelos concentram a
+    maior parte dos lotes), o ano é concentrado nos veículos de 2 a 8 anos e a FIPE
+    deprecia com a idade;
+  - cada lote tem um histórico de lances: lance inicial abaixo da FIPE, quantidade de
+    lances maior nos modelos procurados e nos descontos grandes, e o lance atual é o
+    inicial somado aos incrementos;
+  - tudo é gerado com NumPy em blocos e gravado com COPY (db_operations.copy_rows),
+    então milhões de linhas entram em segundos, com memória limitada ao bloco.
+
+lotes_raspados() gera os mesmos lotes como dicionários com valores em reais formatados
+("R$ 15.000,00"), exatamente como os scrapers entregam a insert_data_*.
+
+    python seed_mock_data.py --linhas 1000000                 # 1 milhão por tabela
+    python seed_mock_data.py --leilo 500000 --loop 0 --limpar # só leilo, apagando o que havia
+"""
+import argparse
+import io
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from db_utils.db_operations import (
+    PRICE_TREND_TABLES, connect_db, copy_rows, create_leilo_table, create_loop_table,
+    create_parque_leiloes_oficial_table, create_price_trend_tables, refresh_price_trends,
+)
+
+# (fabricante, modelo, versão, tipo, FIPE do 0 km em reais, popularidade relativa)
+CATALOGO = [
+    ("CHEVROLET", "ONIX", "LT 1.0 TURBO", "carros", 95_000, 100),
+    ("HYUNDAI", "HB20", "COMFORT 1.0", "carros", 88_000, 85),
+    ("VOLKSWAGEN", "GOL", "1.0 MPI", "carros", 75_000, 80),
+    ("FIAT", "ARGO", "DRIVE 1.0", "carros", 85_000, 70),
+    ("FIAT", "STRADA", "FREEDOM 1.3 CD", "carros", 110_000, 70),
+    ("VOLKSWAGEN", "POLO", "COMFORTLINE 200 TSI", "carros", 105_000, 60),
+    ("FIAT", "MOBI", "LIKE 1.0", "carros", 70_000, 55),
+    ("CHEVROLET", "PRISMA", "JOY 1.0", "carros", 78_000, 50),
+    ("RENAULT", "KWID", "ZEN 1.0", "carros", 68_000, 50),
+    ("FORD", "KA", "SE 1.0", "carros", 72_000, 50),
+    ("TOYOTA", "COROLLA", "XEI 2.0", "carros", 160_000, 45),
+    ("HONDA", "CIVIC", "EXL 2.0", "carros", 170_000, 40),
+    ("JEEP", "RENEGADE", "SPORT 1.3 TURBO", "carros", 130_000, 40),
+    ("HYUNDAI", "CRETA", "ACTION 1.6", "carros", 125_000, 35),
+    ("NISSAN", "KICKS", "SENSE 1.6", "carros", 115_000, 35),
+    ("VOLKSWAGEN", "T-CROSS", "200 TSI", "carros", 125_000, 35),
+    ("TOYOTA", "HILUX", "SRV 2.8 DIESEL 4X4", "carros", 290_000, 30),
+    ("FIAT", "TORO", "FREEDOM 1.3 TURBO", "carros", 150_000, 30),
+    ("RENAULT", "SANDERO", "ZEN 1.0", "carros", 74_000, 30),
+    ("CHEVROLET", "S10", "LTZ 2.8 DIESEL 4X4", "carros", 260_000, 25),
+    ("FORD", "RANGER", "XLS 2.2 DIESEL", "carros", 240_000, 20),
+    ("TOYOTA", "ETIOS", "SEDAN PLATINUM 1.5", "carros", 82_000, 20),
+    ("NISSAN", "SENTRA", "SL 2.0 CVT", "carros", 140_000, 15),
+    ("BMW", "320I", "SPORT GP 2.0 TURBO", "carros", 290_000, 10),
+    ("BMW", "X1", "SDRIVE 20I ACTIVE", "carros", 310_000, 8),
+    ("MERCEDES-BENZ", "C-180", "AVANTGARDE 1.6 TURBO", "carros", 280_000, 8),
+    ("PEUGEOT", "3008", "GRIFFE 1.6 THP", "carros", 190_000, 6),
+    ("CHEVROLET", "AGILE", "LTZ 1.4", "carros", 52_000, 6),
+    ("HONDA", "CG 160", "FAN", "motos", 17_000, 60),
+    ("HONDA", "BIZ 125", "ES", "motos", 15_000, 35),
+    ("YAMAHA", "FAZER 250", "ABS", "motos", 24_000, 20),
+    ("HONDA", "XRE 300", "ADVENTURE", "motos", 30_000, 15),
+    ("YAMAHA", "NMAX 160", "ABS", "motos", 22_000, 15),
+    ("HONDA", "PCX 160", "DLX", "motos", 21_000, 12),
+    ("VOLKSWAGEN", "DELIVERY", "11.180", "caminhoes", 420_000, 6),
+    ("MERCEDES-BENZ", "ACCELO", "1016", "caminhoes", 380_000, 5),
+    ("SCANIA", "R 450", "HIGHLINE 6X2", "caminhoes", 850_000, 3),
+    ("VOLVO", "FH 540", "GLOBETROTTER 6X4", "caminhoes", 950_000, 3),
+]
+FABRICANTES, MODELOS, VERSOES, TIPOS, FIPE_0KM, POPULARIDADE = (np.array(col) for col in zip(*CATALOGO))
+PESOS_MODELO = POPULARIDADE / POPULARIDADE.sum()
+
+COMBUSTIVEIS = np.array(["Flex", "Gasolina", "Diesel", "Elétrico"])
+CORES = np.array(["Branca", "Preta", "Prata", "Cinza", "Vermelha", "Azul"])
+PESOS_COR = np.array([0.3, 0.25, 0.2, 0.15, 0.06, 0.04])
+RETOMADAS = np.array(["FINANCEIRA", "SEGURADORA", "FROTA", "LEILOSHOP"])
+PATIOS = np.array(["SAO PAULO-SP", "GUARULHOS-SP", "BRASILIA-DF (TAGUATINGA/DF)", "BELO HORIZONTE-MG",
+                   "CURITIBA-PR", "PORTO ALEGRE-RS", "RECIFE-PE", "MANAUS-AM", "GOIANIA-GO"])
+UFS = np.array(["SP", "SP", "DF", "MG", "PR", "RS", "PE", "AM", "GO"])
+PESOS_PATIO = np.array([0.25, 0.1, 0.1, 0.15, 0.1, 0.1, 0.08, 0.05, 0.07])
+TIPO_LEILO = {"carros": "Carros", "motos": "Motos", "caminhoes": "Caminhões"}
+
+# Depreciação anual da FIPE e quilometragem média por ano de uso
+DEPRECIACAO_ANUAL = 0.88
+KM_POR_ANO = 13_000
+# Parte dos lotes sem FIPE (lote recém-cadastrado ou modelo não encontrado)
+FRACAO_SEM_FIPE = 0.08
+
+BLOCO = 100_000
+
+MINUTOS = np.array([f"{h:02d}:{m:02d}:00" for h in range(24) for m in range(60)])
+
+# Colunas gravadas em cada tabela, na ordem do CSV
+COLUNAS = {
+    "leilo": [
+        "veiculo_titulo", "veiculo_link_lote", "veiculo_imagem", "veiculo_patio_uf", "veiculo_ano_fabricacao",
+        "veiculo_km", "veiculo_valor_lance_atual", "veiculo_situacao", "veiculo_data_leilao",
+        "veiculo_tipo_combustivel", "veiculo_cor", "veiculo_possui_chave", "veiculo_tipo_retomada", "veiculo_tipo",
+        "veiculo_valor_fipe", "veiculo_fabricante", "veiculo_modelo", "data_extracao",
+    ],
+    "loop": [
+        "veiculo_link_lote", "veiculo_titulo", "veiculo_fabricante", "veiculo_modelo", "veiculo_versao",
+        "veiculo_ano_fabricacao", "veiculo_ano_modelo", "veiculo_valor_fipe", "veiculo_blindado", "veiculo_chave",
+        "veiculo_condicao_motor", "veiculo_tipo_combustivel", "veiculo_km", "veiculo_total_lances",
+        "veiculo_numero_visualizacoes", "veiculo_data_leilao", "veiculo_horario_leilao", "veiculo_lance_atual",
+        "veiculo_situacao_lote", "data_extracao",
+    ],
+    "parque_leiloes_oficial": [
+        "veiculo_link_lote", "veiculo_titulo", "veiculo_fabricante", "veiculo_modelo", "veiculo_ano_fabricacao",
+        "veiculo_ano_modelo", "veiculo_valor_fipe", "veiculo_possui_chave", "veiculo_condicao_motor",
+        "veiculo_tipo_combustivel", "veiculo_km", "veiculo_total_lances", "veiculo_data_leilao", "veiculo_imagem",
+        "veiculo_lance_inicial", "veiculo_valor_lance_atual", "veiculo_final_placa", "veiculo_tipo_retomada",
+        "veiculo_tipo", "veiculo_valor_vendido", "veiculo_patio_uf", "data_extracao",
+    ],
+}
+CRIAR_TABELA = {
+    "leilo": create_leilo_table,
+    "loop": create_loop_table,
+    "parque_leiloes_oficial": create_parque_leiloes_oficial_table,
+}
+
+
+def formatar_brl(valores):
+    """Série de valores -> 'R$ 15.000,00' (NaN vira None)."""
+    serie = pd.Series(valores, dtype="float64")
+    texto = serie.map(lambda v: f"R$ {v:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."), na_action="ignore")
+    return texto.astype(object).where(serie.notna(), None)
+
+def _texto(valores):
+    return pd.Series(valores).astype(str)
+
+def gerar_base(rng, linhas, hoje, dias):
+    """Atributos comuns a todas as tabelas: veículo, idade, km, FIPE, data e histórico de lances."""
+    indice = rng.choice(len(CATALOGO), size=linhas, p=PESOS_MODELO)
+    # Idade concentrada entre 2 e 8 anos (gama), limitada a 25
+    idade = np.minimum(np.round(rng.gamma(shape=3.0, scale=1.8, size=linhas)), 25).astype("int64")
+    ano_modelo = hoje.year - idade
+    ano_fabricacao = ano_modelo - (rng.random(linhas) < 0.3)
+    km = np.round(np.maximum(idade, 0.3) * KM_POR_ANO * rng.lognormal(0.0, 0.45, linhas)).astype("int64")
+
+    fipe = FIPE_0KM[indice] * DEPRECIACAO_ANUAL ** idade * rng.lognormal(0.0, 0.08, linhas)
+    fipe = np.round(fipe, 0)
+
+    # Lances: inicial entre 25% e 65% da FIPE; modelos procurados e descontos grandes atraem mais lances
+    fracao_inicial = rng.beta(4.0, 5.0, linhas) * 0.6 + 0.15
+    lance_inicial = np.round(fipe * fracao_inicial, -2)
+    demanda = 2.0 + 10.0 * POPULARIDADE[indice] / POPULARIDADE.max() + 15.0 * (0.65 - fracao_inicial).clip(0)
+    total_lances = rng.poisson(demanda)
+    # Cada lance sobe em média 1,5% da FIPE: a soma de n incrementos exponenciais é uma gama(n)
+    incrementos = rng.gamma(np.maximum(total_lances, 1), fipe * 0.015) * (total_lances > 0)
+    lance_atual = np.minimum(np.round(lance_inicial + incrementos, -2), np.round(fipe * 1.1, -2))
+
+    # Datas como deslocamento em dias a partir de hoje (formatadas por tabela de consulta)
+    dia = rng.integers(-dias, 15, linhas)
+    dia_extracao = dia - rng.integers(0, 10, linhas)
+
+    sem_fipe = rng.random(linhas) < FRACAO_SEM_FIPE
+    return {
+        "indice": indice, "ano_modelo": ano_modelo, "ano_fabricacao": ano_fabricacao, "km": km,
+        "fipe": np.where(sem_fipe, np.nan, fipe), "lance_inicial": lance_inicial, "lance_atual": lance_atual,
+        "total_lances": total_lances, "dia": dia, "dia_extracao": dia_extracao,
+        "minuto_extracao": rng.integers(0, 24 * 60, linhas), "encerrado": dia < 0,
+    }
+
+def gerar_bloco(tabela, rng, linhas, primeiro_id, hoje, dias):
+    """DataFrame com as colunas de COLUNAS[tabela], no formato gravado pelo scraper da tabela."""
+    base = gerar_base(rng, linhas, hoje, dias)
+    i = base["indice"]
+    fabricante, modelo, versao, tipo = FABRICANTES[i], MODELOS[i], VERSOES[i], TIPOS[i]
+    sequencia = _texto(np.arange(primeiro_id, primeiro_id + linhas))
+    # Formata cada dia e minuto uma só vez e indexa (strftime por linha seria o gargalo)
+    dias_formatados = pd.date_range(hoje - pd.Timedelta(days=dias + 10), periods=dias + 25, freq="D")
+    data_leilao = dias_formatados.strftime("%d/%m/%Y").to_numpy(dtype=object)[base["dia"] + dias + 10]
+    extracao = (
+        _texto(dias_formatados.strftime("%Y-%m-%d ").to_numpy(dtype=object)[base["dia_extracao"] + dias + 10])
+        + _texto(MINUTOS[base["minuto_extracao"]])
+    )
+    combustivel = np.where(tipo == "caminhoes", "Diesel", rng.choice(COMBUSTIVEIS, linhas, p=[0.8, 0.12, 0.06, 0.02]))
+    patio = rng.choice(len(PATIOS), linhas, p=PESOS_PATIO)
+    slug = (_texto(fabricante) + "-" + _texto(modelo)).str.replace(" ", "-")
+
+    if tabela == "leilo":
+        return pd.DataFrame({
+            "veiculo_titulo": _texto(fabricante) + "/" + _texto(modelo) + " " + _texto(versao),
+            "veiculo_link_lote": "https://leilo.com.br/leilao/" + slug.str.lower() + "/ano." + _texto(base["ano_fabricacao"]) + "/" + sequencia,
+            "veiculo_imagem": "https://placehold.co/600x400/png?text=" + sequencia,
+            "veiculo_patio_uf": PATIOS[patio],
+            "veiculo_ano_fabricacao": _texto(base["ano_fabricacao"]),
+            "veiculo_km": _texto(base["km"]),
+            "veiculo_valor_lance_atual": base["lance_atual"],
+            "veiculo_situacao": np.where(base["encerrado"], "Leilão encerrado", "Leilão ao vivo"),
+            "veiculo_data_leilao": data_leilao,
+            "veiculo_tipo_combustivel": combustivel,
+            "veiculo_cor": rng.choice(CORES, linhas, p=PESOS_COR),
+            "veiculo_possui_chave": np.where(rng.random(linhas) < 0.85, "Sim", "Não"),
+            "veiculo_tipo_retomada": rng.choice(RETOMADAS, linhas, p=[0.5, 0.3, 0.1, 0.1]),
+            "veiculo_tipo": pd.Series(tipo).map(TIPO_LEILO),
+            "veiculo_valor_fipe": base["fipe"],
+            "veiculo_fabricante": fabricante,
+            "veiculo_modelo": modelo,
+            "data_extracao": extracao,
+        })
+
+    if tabela == "loop":
+        anos_titulo = _texto(base["ano_fabricacao"] % 100).str.zfill(2) + "/" + _texto(base["ano_modelo"] % 100).str.zfill(2)
+        return pd.DataFrame({
+            "veiculo_link_lote": "https://loopbrasil.net/lote/" + slug.str.upper() + "-" + anos_titulo.str.replace("/", "-") + "-/" + sequencia + "/",
+            "veiculo_titulo": _texto(fabricante) + " " + _texto(modelo) + " " + anos_titulo,
+            "veiculo_fabricante": fabricante,
+            "veiculo_modelo": modelo,
+            "veiculo_versao": versao,
+            "veiculo_ano_fabricacao": base["ano_fabricacao"],
+            "veiculo_ano_modelo": base["ano_modelo"],
+            "veiculo_valor_fipe": base["fipe"],
+            "veiculo_blindado": np.where(rng.random(linhas) < 0.03, "SIM", "NÃO"),
+            "veiculo_chave": np.where(rng.random(linhas) < 0.9, "SIM", "NÃO"),
+            "veiculo_condicao_motor": np.where(rng.random(linhas) < 0.92, "SIM", "NÃO"),
+            "veiculo_tipo_combustivel": pd.Series(combustivel).str.upper(),
+            "veiculo_km": _texto(base["km"]),
+            "veiculo_total_lances": base["total_lances"],
+            "veiculo_numero_visualizacoes": base["total_lances"] * 12 + rng.poisson(80, linhas),
+            "veiculo_data_leilao": data_leilao,
+            "veiculo_horario_leilao": rng.choice(["09:30h", "10:00h", "14:00h", "15:30h"], linhas),
+            "veiculo_lance_atual": base["lance_atual"],
+            "veiculo_situacao_lote": np.where(base["encerrado"], "Encerrado", "Aberto para Lances"),
+            "data_extracao": extracao,
+        })
+
+    return pd.DataFrame({
+        "veiculo_link_lote": "https://www.parquedosleiloes.com.br/lote/" + sequencia,
+        "veiculo_titulo": _texto(fabricante) + " " + _texto(modelo) + " " + _texto(versao),
+        "veiculo_fabricante": fabricante,
+        "veiculo_modelo": modelo,
+        "veiculo_ano_fabricacao": base["ano_fabricacao"],
+        "veiculo_ano_modelo": base["ano_modelo"],
+        "veiculo_valor_fipe": base["fipe"],
+        "veiculo_possui_chave": np.where(rng.random(linhas) < 0.85, "Sim", "Não"),
+        "veiculo_condicao_motor": np.where(rng.random(linhas) < 0.9, "Funcionando", "Não funcionando"),
+        "veiculo_tipo_combustivel": combustivel,
+        "veiculo_km": base["km"],
+        "veiculo_total_lances": base["total_lances"],
+        "veiculo_data_leilao": data_leilao,
+        "veiculo_imagem": "https://placehold.co/600x400/png?text=" + sequencia,
+        "veiculo_lance_inicial": base["lance_inicial"],
+        "veiculo_valor_lance_atual": base["lance_atual"],
+        "veiculo_final_placa": _texto(rng.integers(0, 10, linhas)),
+        "veiculo_tipo_retomada": rng.choice(RETOMADAS[:3], linhas, p=[0.6, 0.3, 0.1]),
+        "veiculo_tipo": tipo,
+        "veiculo_valor_vendido": np.where(base["encerrado"] & (base["total_lances"] > 0), base["lance_atual"], np.nan),
+        "veiculo_patio_uf": UFS[patio],
+        "data_extracao": extracao,
+    })
+
+def lotes_raspados(tabela, linhas, seed=0, hoje=None, dias=60):
     """
-    Script para criar a tabela 'lotes' e inserir dados fictícios.
-    Agora utiliza a função connect_db do db_utils.
+    Os mesmos lotes de gerar_bloco como dicionários no formato entregue pelos scrapers
+    (valores em reais formatados), para exercitar insert_data_* e a conversão de texto.
     """
-    print("Iniciando processo de inserção de dados fictícios...")
+    hoje = pd.Timestamp(hoje or date.today())
+    df = gerar_bloco(tabela, np.random.default_rng(seed), linhas, 1, hoje, dias).drop(columns="data_extracao")
+    for col in ("veiculo_valor_fipe", "veiculo_valor_lance_atual", "veiculo_lance_atual", "veiculo_lance_inicial", "veiculo_valor_vendido"):
+        if col in df.columns:
+            df[col] = formatar_brl(df[col])
+    if tabela == "loop":
+        df["veiculo_km"] = df["veiculo_km"] + " km"
+    return df.astype(object).where(df.notna(), None).to_dict("records")
 
-    # Tenta conectar ao banco de dados usando a função de db_operations
-    conn = connect_db()
+def _proximo_id(conn, tabela):
+    """Sequência usada nos links (únicos no 'loop'): continua depois do maior id da tabela."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{tabela}"')
+        return cursor.fetchone()[0]
+    finally:
+        cursor.close()
 
+def popular_tabela(conn, tabela, linhas, seed=0, hoje=None, dias=60, bloco=BLOCO, limpar=False):
+    """Gera e grava 'linhas' lotes na tabela, em blocos de 'bloco' linhas (um COPY por bloco)."""
+    CRIAR_TABELA[tabela](conn)
+    if limpar:
+        cursor = conn.cursor()
+        cursor.execute(f'TRUNCATE "{tabela}" RESTART IDENTITY')
+        conn.commit()
+        cursor.close()
+        print(f"[INFO] Tabela '{tabela}' esvaziada.")
+    hoje = pd.Timestamp(hoje or date.today())
+    rng = np.random.default_rng(seed)
+    primeiro_id = _proximo_id(conn, tabela)
+    inicio = time.perf_counter()
+    gravadas = 0
+    for deslocamento in range(0, linhas, bloco):
+        df = gerar_bloco(tabela, rng, min(bloco, linhas - deslocamento), primeiro_id + deslocamento, hoje, dias)
+        buffer = io.StringIO()
+        df[COLUNAS[tabela]].to_csv(buffer, header=False, index=False, float_format="%.2f")
+        buffer.seek(0)
+        gravadas += copy_rows(conn, tabela, COLUNAS[tabela], buffer)
+    duracao = time.perf_counter() - inicio
+    print(f"[INFO] '{tabela}': {gravadas} linha(s) gravada(s) em {duracao:.1f}s "
+          f"({gravadas / max(duracao, 1e-9):,.0f} linhas/s).")
+    return gravadas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Popula as tabelas de lotes com dados sintéticos para testes de carga.")
+    parser.add_argument("--linhas", type=int, default=100_000, help="Lotes por tabela (padrão para as três).")
+    for tabela in CRIAR_TABELA:
+        parser.add_argument(f"--{tabela.split('_')[0]}", dest=tabela, type=int, help=f"Lotes na tabela '{tabela}'.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dias", type=int, default=60, help="Janela de datas de leilão (dias antes de hoje).")
+    parser.add_argument("--bloco", type=int, default=BLOCO, help="Linhas por COPY.")
+    parser.add_argument("--limpar", action="store_true", help="Apaga as linhas existentes antes de gravar.")
+    parser.add_argument("--sem-tendencia", action="store_true", help="Não recalcula o cubo de tendência de preços.")
+    args = parser.parse_args()
+
+    conn = connect_db()
     if conn is None:
-        print("[ERRO] Não foi possível conectar ao banco de dados. Abortando seed de dados.")
+        print("[ERRO] Não foi possível conectar ao banco de dados. Abortando geração de dados.")
         return
-
     try:
-        cur = conn.cursor()
-
-        # Cria a tabela 'lotes' se ela não existir
-        # Nota: As funções create_table_leilao_data e create_table_consolidado
-        # já cuidam da criação de suas respectivas tabelas.
-        # Se 'lotes' for uma tabela separada que você precisa, mantenha este CREATE TABLE.
-        # Se 'lotes' deve ser 'leilao_data' ou 'consolidado', você pode remover este bloco.
-        # Mantenho aqui assumindo que 'lotes' é uma tabela adicional para este script.
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS lotes (
-                id SERIAL PRIMARY KEY,
-                modelo TEXT NOT NULL,
-                ano INTEGER NOT NULL,
-                km INTEGER NOT NULL,
-                preco_lote FLOAT NOT NULL
-            )
-        """)
-        conn.commit()
-        print("[INFO] Tabela 'lotes' verificada/criada com sucesso.")
-
-        modelos = ["Onix", "HB20", "Civic", "Corolla", "Gol", "Ka", "Fox", "Cruze", "Argo", "Toro"]
-        anos = list(range(2012, 2023))
-
-        for _ in range(100):
-            modelo = random.choice(modelos)
-            ano = random.choice(anos)
-            km = random.randint(20000, 180000)
-            preco_lote = round(random.uniform(10000, 70000), 2)
-            cur.execute(
-                "INSERT INTO lotes (modelo, ano, km, preco_lote) VALUES (%s, %s, %s, %s)",
-                (modelo, ano, km, preco_lote)
-            )
-        
-        conn.commit()
-        print("✅ 100 dados fictícios inseridos com sucesso na tabela 'lotes'.")
-
-    except Exception as e:
-        print(f"[ERRO] Erro durante a inserção de dados: {e}")
-        if conn:
-            conn.rollback() # Reverte a transação em caso de erro
+        if not args.sem_tendencia:
+            create_price_trend_tables(conn)
+        for deslocamento, tabela in enumerate(CRIAR_TABELA):
+            linhas = getattr(args, tabela) if getattr(args, tabela) is not None else args.linhas
+            if linhas <= 0:
+                continue
+            popular_tabela(conn, tabela, linhas, seed=args.seed + deslocamento, dias=args.dias,
+                           bloco=args.bloco, limpar=args.limpar)
+            cursor = conn.cursor()
+            cursor.execute(f'ANALYZE "{tabela}"')
+            conn.commit()
+            cursor.close()
+            if not args.sem_tendencia and tabela in PRICE_TREND_TABLES:
+                refresh_price_trends(conn, tabela, full=True)
     finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
-            print("[INFO] Conexão com o banco de dados fechada.")
+        conn.close()
+        print("[INFO] Conexão com o banco de dados fechada.")
 
 if __name__ == "__main__":
-    run_seed_data()
+    main()
@@ -0,0 +1,116 @@
+"""
+Comportamento do AvaliacaoService contra o LLM falso (fake_llm.py): fila, resultado e erro.
+
+O cache 'avaliacoes_ia' é trocado por um dicionário em memória; as chamadas ao modelo
+passam de verdade pelo HTTP do fake_llm.
+
+    cd analyzer && python -m pytest -q test_ia_service.py
+"""
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+sys.path[:0] = [os.path.dirname(os.path.abspath(__file__)), os.path.dirname(os.path.dirname(os.path.abspath(__file__)))]
+
+import fake_llm
+import ia_service
+from ia_service import PRIORIDADE_USUARIO, STATUS_PENDENTE, STATUS_PRONTO, AvaliacaoService, chave_avaliacao, normalizar_lote
+
+# Preço 40% abaixo da FIPE ("Boa oportunidade") e 10% abaixo ("Oportunidade fraca")
+BARATO = {"modelo": "onix", "ano": 2020, "km": 45000, "preco_lote": 30000.0, "valor_mercado": 50000.0}
+CARO = {"modelo": "HB20", "ano": 2019, "km": 60000, "preco_lote": 45000.0, "valor_mercado": 50000.0}
+OUTRO = {"modelo": "KWID", "ano": 2022, "km": 10000, "preco_lote": 20000.0, "valor_mercado": 40000.0}
+
+
+class ConexaoFalsa:
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def banco(monkeypatch):
+    """Cache de avaliações em memória no lugar da tabela 'avaliacoes_ia'."""
+    gravadas = {}
+    monkeypatch.setattr(ia_service, "create_ia_evaluations_table", lambda conn: None)
+    monkeypatch.setattr(ia_service, "get_ia_evaluations", lambda conn, keys: {k: gravadas[k] for k in keys if k in gravadas})
+    monkeypatch.setattr(ia_service, "upsert_ia_evaluations", lambda conn, entries: gravadas.update((e[0], e[-1]) for e in entries))
+    return gravadas
+
+@pytest.fixture
+def llm(monkeypatch):
+    servidor, url = fake_llm.start_server()
+    fake_llm.FakeLLMHandler.chamadas = 0
+    monkeypatch.setattr(ia_service, "IA_LLM_URL", url)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+def _servico(**kwargs):
+    return AvaliacaoService(connect_fn=ConexaoFalsa, **kwargs)
+
+def _porta_fechada():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_resultado_pela_thread_de_fundo(banco, llm):
+    servico = _servico().iniciar()
+    assert servico.enfileirar([BARATO]) == 1
+
+    limite = time.monotonic() + 10
+    status, texto = servico.consultar(BARATO)
+    while status == STATUS_PENDENTE and time.monotonic() < limite:
+        time.sleep(0.05)
+        status, texto = servico.consultar(BARATO)
+
+    assert status == STATUS_PRONTO
+    assert texto.startswith("Boa oportunidade: o lance está 40.0% abaixo da FIPE")
+    assert banco[chave_avaliacao(normalizar_lote(BARATO))] == texto
+
+def test_fila_prioridade_e_cache(banco, llm):
+    servico = _servico(batch_size=1)
+    assert servico.consultar(CARO) == (None, None)
+    assert servico.enfileirar([BARATO, CARO]) == 2
+    # Pré-avaliação repetida não duplica o pedido; o do usuário entra de novo e passa na frente
+    assert servico.enfileirar([BARATO, CARO]) == 0
+    assert servico.enfileirar([OUTRO], prioridade=PRIORIDADE_USUARIO) == 1
+    assert servico.consultar(CARO) == (STATUS_PENDENTE, None)
+
+    primeiro = servico._proximo_lote()
+    assert list(primeiro.values()) == [normalizar_lote(OUTRO)]
+    servico.processar(primeiro)
+    servico.aguardar()
+
+    assert fake_llm.FakeLLMHandler.chamadas == 3
+    assert servico.consultar(CARO)[1].startswith("Oportunidade fraca")
+    assert servico.enfileirar([BARATO, CARO, OUTRO]) == 0
+
+    # Outro processo (ex.: a API depois de reiniciar) acha as respostas no cache, sem chamar o modelo
+    novo = _servico()
+    assert novo.consultar(BARATO)[0] == STATUS_PRONTO
+    novo.enfileirar([{**CARO, "modelo": " hb20 "}])
+    assert novo.processar(novo._proximo_lote()) == 0
+    assert fake_llm.FakeLLMHandler.chamadas == 3
+
+def test_erro_e_nova_tentativa(banco, llm, monkeypatch):
+    url = ia_service.IA_LLM_URL
+    monkeypatch.setattr(ia_service, "IA_LLM_URL", _porta_fechada())
+    servico = _servico()
+    servico.enfileirar([BARATO])
+    servico.aguardar()
+
+    status, texto = servico.consultar(BARATO)
+    assert status.startswith("Erro ao consultar Gemini")
+    assert texto is None
+    assert not banco
+
+    # Um erro não bloqueia o lote: o próximo pedido vai de novo ao modelo
+    monkeypatch.setattr(ia_service, "IA_LLM_URL", url)
+    assert servico.enfileirar([BARATO]) == 1
+    servico.aguardar()
+    assert servico.consultar(BARATO)[0] == STATUS_PRONTO
+    assert fake_llm.FakeLLMHandler.chamadas == 1
@@ -0,0 +1,245 @@
+"""
+Benchmark do caminho de escrita no PostgreSQL (db_utils/db_operations.py).
+
+Compara, para cada tabela de lotes e tamanho de carga, as três formas de gravar os
+dicionários entregues pelos scrapers (gerados por analyzer/seed_mock_data.lotes_raspados):
+  - linha_a_linha: insert_data_* chamado por lote, como os scrapers fazem hoje;
+  - lote:          insert_rows (execute_values, um commit);
+  - copy:          copy_insert_rows (COPY, um commit; upsert via tabela temporária no 'loop').
+
+Para cada combinação mede linhas/s, bytes de WAL gerados (pg_current_wal_lsn antes e
+depois) e quantos commits o cliente fez. As tabelas são criadas num schema próprio
+(--schema, removido ao final) para não tocar nos dados reais; mesmo assim o WAL é do
+servidor inteiro, então use um banco sem outra carga. Cada medição começa depois de um
+CHECKPOINT (quando permitido), para que as full-page writes entrem igualmente em todas.
+
+Os resultados são acrescentados a benchmarks/results/historico_escrita_db.jsonl.
+
+    python benchmark_escrita_db.py                                   # banco de db_config (PG_HOST...)
+    python benchmark_escrita_db.py --dsn "host=localhost port=5445 dbname=base_leilao user=root password=root"
+    python benchmark_escrita_db.py --postgres-temporario --pg-bin /usr/lib/postgresql/13/bin
+    python benchmark_escrita_db.py --tamanhos 1000 10000 --tabelas loop --metodos lote copy
+"""
+import argparse
+import contextlib
+import getpass
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import sql
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+sys.path.insert(0, os.path.join(RAIZ_REPO, "analyzer"))
+
+from db_utils.db_config import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+from db_utils.db_operations import (
+    copy_insert_rows,
+    create_leilo_table,
+    create_loop_table,
+    create_parque_leiloes_oficial_table,
+    insert_data_leilo,
+    insert_data_loop,
+    insert_data_parque_leiloes_oficial,
+    insert_rows,
+)
+from seed_mock_data import lotes_raspados
+
+HISTORICO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "historico_escrita_db.jsonl")
+
+TABELAS = {
+    "leilo": (create_leilo_table, insert_data_leilo),
+    "loop": (create_loop_table, insert_data_loop),
+    "parque_leiloes_oficial": (create_parque_leiloes_oficial_table, insert_data_parque_leiloes_oficial),
+}
+
+
+class ConexaoContada(psycopg2.extensions.connection):
+    """Conexão que conta os commits feitos pelas funções de db_utils."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+        super().commit()
+
+
+def linha_a_linha(conn, tabela, linhas, page_size):
+    inserir = TABELAS[tabela][1]
+    for linha in linhas:
+        inserir(conn, linha)
+
+def lote(conn, tabela, linhas, page_size):
+    insert_rows(conn, tabela, linhas, page_size=page_size)
+
+def copy(conn, tabela, linhas, page_size):
+    copy_insert_rows(conn, tabela, linhas)
+
+METODOS = {"linha_a_linha": linha_a_linha, "lote": lote, "copy": copy}
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+@contextlib.contextmanager
+def postgres_temporario(pg_bin=None):
+    """Cluster descartável (initdb + pg_ctl) em um diretório temporário; devolve o DSN."""
+    def binario(nome):
+        return os.path.join(pg_bin, nome) if pg_bin else nome
+
+    diretorio = tempfile.mkdtemp(prefix="bench_pg_")
+    dados = os.path.join(diretorio, "dados")
+    porta = _porta_livre()
+    usuario = getpass.getuser()
+    subprocess.run([binario("initdb"), "-D", dados, "-A", "trust", "-U", usuario, "--no-sync"],
+                   check=True, stdout=subprocess.DEVNULL)
+    subprocess.run([binario("pg_ctl"), "-D", dados, "-w", "-l", os.path.join(diretorio, "postgres.log"),
+                    "-o", f"-p {porta} -k {diretorio} -c listen_addresses=''", "start"],
+                   check=True, stdout=subprocess.DEVNULL)
+    print(f"[INFO] PostgreSQL temporário em {diretorio} (porta {porta}).")
+    try:
+        yield f"host={diretorio} port={porta} dbname=postgres user={usuario}"
+    finally:
+        subprocess.run([binario("pg_ctl"), "-D", dados, "-m", "fast", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+def conectar(dsn, schema, autocommit=False):
+    conn = psycopg2.connect(dsn, connection_factory=ConexaoContada, options=f"-c search_path={schema}")
+    conn.autocommit = autocommit
+    return conn
+
+def _valor(monitor, query, parametros=None):
+    with monitor.cursor() as cursor:
+        cursor.execute(query, parametros)
+        return cursor.fetchone()[0]
+
+def _checkpoint(monitor):
+    try:
+        with monitor.cursor() as cursor:
+            cursor.execute("CHECKPOINT")
+        return True
+    except psycopg2.Error:
+        return False
+
+def medir(conn, monitor, schema, tabela, metodo, linhas, page_size):
+    """Grava as linhas numa tabela vazia e devolve as métricas da gravação."""
+    tabela_qualificada = sql.Identifier(schema, tabela)
+    with monitor.cursor() as cursor:
+        cursor.execute(sql.SQL("TRUNCATE {} RESTART IDENTITY").format(tabela_qualificada))
+    checkpoint = _checkpoint(monitor)
+    lsn_inicio = _valor(monitor, "SELECT pg_current_wal_lsn()")
+    commits_inicio = conn.commits
+
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        METODOS[metodo](conn, tabela, linhas, page_size)
+        segundos = time.perf_counter() - inicio
+
+    wal = int(_valor(monitor, "SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (lsn_inicio,)))
+    gravadas = _valor(monitor, sql.SQL("SELECT count(*) FROM {}").format(tabela_qualificada))
+    return {
+        "tabela": tabela,
+        "metodo": metodo,
+        "linhas": len(linhas),
+        "gravadas": gravadas,
+        "segundos": round(segundos, 3),
+        "linhas_por_segundo": round(len(linhas) / segundos, 1) if segundos else None,
+        "wal_bytes": wal,
+        "wal_bytes_por_linha": round(wal / len(linhas), 1) if linhas else None,
+        "commits": conn.commits - commits_inicio,
+        "checkpoint": checkpoint,
+    }
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ_REPO, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def executar(dsn, args):
+    monitor = conectar(dsn, args.schema, autocommit=True)
+    with monitor.cursor() as cursor:
+        cursor.execute(sql.SQL("CREATE SCHEMA IF NOT EXISTS {}").format(sql.Identifier(args.schema)))
+    servidor = _valor(monitor, "SHOW server_version")
+    conn = conectar(dsn, args.schema)
+    medicoes = []
+    try:
+        for tabela in args.tabelas:
+            with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+                TABELAS[tabela][0](conn)
+            dados = lotes_raspados(tabela, max(args.tamanhos), seed=args.seed)
+            for tamanho in args.tamanhos:
+                for metodo in args.metodos:
+                    # Cópias: insert_data_* completa o dicionário recebido com as colunas ausentes
+                    linhas = [dict(linha) for linha in dados[:tamanho]]
+                    medicao = medir(conn, monitor, args.schema, tabela, metodo, linhas, args.page_size)
+                    medicoes.append(medicao)
+                    print(f"[INFO] {tabela:<24}{metodo:<15}{tamanho:>8} linhas: {medicao['linhas_por_segundo']:>10} linhas/s")
+    finally:
+        conn.close()
+        if not args.manter_schema:
+            with monitor.cursor() as cursor:
+                cursor.execute(sql.SQL("DROP SCHEMA IF EXISTS {} CASCADE").format(sql.Identifier(args.schema)))
+        monitor.close()
+    return servidor, medicoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das funções de escrita de db_utils (linha a linha, lote, COPY).")
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--tabelas", nargs="+", choices=list(TABELAS), default=list(TABELAS))
+    parser.add_argument("--metodos", nargs="+", choices=list(METODOS), default=list(METODOS))
+    parser.add_argument("--page-size", type=int, default=1000, help="Linhas por INSERT no método 'lote'.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dsn", default=None, help="DSN de teste; padrão: variáveis PG_* de db_config.")
+    parser.add_argument("--postgres-temporario", action="store_true",
+                        help="Sobe um cluster descartável com initdb/pg_ctl (não pode rodar como root).")
+    parser.add_argument("--pg-bin", default=None, help="Diretório de initdb/pg_ctl (padrão: PATH).")
+    parser.add_argument("--schema", default="bench_escrita")
+    parser.add_argument("--manter-schema", action="store_true")
+    parser.add_argument("--historico", default=HISTORICO_PADRAO)
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as pilha:
+        if args.postgres_temporario:
+            dsn = pilha.enter_context(postgres_temporario(args.pg_bin))
+        else:
+            dsn = args.dsn or (f"host={DB_HOST} port={DB_PORT} dbname={DB_NAME} "
+                               f"user={DB_USER} password={DB_PASSWORD}")
+        servidor, medicoes = executar(dsn, args)
+
+    print(f"\n{'tabela':<24}{'método':<15}{'linhas':>8}{'linhas/s':>11}{'x':>7}{'WAL MB':>9}{'WAL B/linha':>12}{'commits':>9}")
+    base = {}
+    for m in medicoes:
+        if m["metodo"] == "linha_a_linha":
+            base[(m["tabela"], m["linhas"])] = m["segundos"]
+        referencia = base.get((m["tabela"], m["linhas"]))
+        ganho = f"{referencia / m['segundos']:.1f}" if referencia and m["segundos"] else "-"
+        print(f"{m['tabela']:<24}{m['metodo']:<15}{m['linhas']:>8}{m['linhas_por_segundo']:>11}{ganho:>7}"
+              f"{m['wal_bytes'] / 1024 / 1024:>9.2f}{m['wal_bytes_por_linha']:>12}{m['commits']:>9}")
+        if m["gravadas"] != m["linhas"]:
+            print(f"    [WARN] {m['gravadas']} linhas na tabela, {m['linhas']} enviadas.")
+
+    registro = {"data": datetime.now().isoformat(timespec="seconds"), "commit": commit_atual(), "servidor": servidor}
+    os.makedirs(os.path.dirname(args.historico), exist_ok=True)
+    with open(args.historico, "a", encoding="utf-8") as f:
+        for m in medicoes:
+            f.write(json.dumps({**registro, **m}, ensure_ascii=False) + "\n")
+    print(f"\n[INFO] {len(medicoes)} medições acrescentadas a {args.historico}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Benchmark offline dos caminhos quentes de extração dos scrapers.
+
+Serve as páginas gravadas em benchmarks/fixtures/ (servidor_fixtures.py) para um Chrome
+headless e compara, por site, o código atual com as alternativas de estrategias.py:
+  - leilo:  extract_lot_details (páginas de detalhe)
+  - loop:   extract_data_from_lot_detail_page (páginas de detalhe)
+  - parque: laço dos cards da listagem (extract_card_data)
+
+Para cada site/estratégia são medidos lotes/s, round trips ao WebDriver por lote (cada
+comando do protocolo enviado pelo cliente) e a latência por lote (p50/p95, tempo entre
+lotes consecutivos: nas estratégias de snapshot o custo da leitura da página cai no
+primeiro lote de cada página). 'divergencias' conta os campos diferentes do resultado
+da estratégia 'atual' nos mesmos lotes.
+
+Cada execução é acrescentada a benchmarks/results/historico.jsonl (commit, data,
+navegador) e comparada com a mediana das últimas execuções da mesma combinação: p50
+acima da tolerância ou mais round trips por lote é apontado como regressão.
+
+    python benchmark_extracao.py                                  # Chrome local (chromedriver no PATH)
+    python benchmark_extracao.py --selenium-url http://localhost:4444/wd/hub --host-fixtures host.docker.internal
+    python benchmark_extracao.py --sites parque --repeticoes 5 --falhar-em-regressao
+"""
+import argparse
+import contextlib
+import copy
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+from bs4 import BeautifulSoup
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+
+from estrategias import ESTRATEGIAS, RAIZ_REPO, carregar_scraper
+from servidor_fixtures import FIXTURES_DIR, servir
+
+HISTORICO_PADRAO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "historico.jsonl")
+# Quantas execuções anteriores formam a referência de regressão
+JANELA_REFERENCIA = 5
+
+
+def criar_driver(selenium_url=None):
+    """Chrome headless local, ou remoto quando há um Selenium Grid (ex.: o do docker-compose)."""
+    options = Options()
+    options.add_argument("--headless=new")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    # Largura de desktop: o leilo lê o bloco 'gt-sm'
+    options.add_argument("--window-size=1920,1080")
+    if selenium_url:
+        return webdriver.Remote(command_executor=selenium_url, options=options)
+    return webdriver.Chrome(options=options)
+
+def contar_round_trips(driver):
+    """Envolve driver.execute (por onde passam os comandos do driver e dos WebElements)."""
+    contador = Counter()
+    execute = driver.execute
+
+    def execute_contado(driver_command, params=None):
+        contador[driver_command] += 1
+        return execute(driver_command, params)
+    driver.execute = execute_contado
+    return contador
+
+def lotes_da_listagem(site, base_url, limite):
+    """Lotes das listagens gravadas; os links apontam para a página de detalhe local."""
+    with open(os.path.join(FIXTURES_DIR, site, "listing.html"), encoding="utf-8") as f:
+        sopa = BeautifulSoup(f.read(), "html.parser")
+    if site == "leilo":
+        lotes = []
+        for card in sopa.select(".sessao.cursor-pointer"):
+            titulo = card.select_one("div.header-card h3")
+            titulo = titulo.get_text(strip=True) if titulo else "N/A"
+            fabricante, _, modelo = titulo.partition("/")
+            lotes.append({
+                "veiculo_titulo": titulo,
+                "veiculo_fabricante": fabricante.strip(),
+                "veiculo_modelo": modelo.strip() or "N/A",
+            })
+    else:
+        lotes = [{} for _ in sopa.select("section[id^='lote'] > a.card")]
+    lotes = lotes[:limite] if limite else lotes
+    for i, lote in enumerate(lotes):
+        url = f"{base_url}/{site}/lote/{i + 1}"
+        lote["veiculo_link_lote" if site == "leilo" else "url"] = url
+    return lotes
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+def executar(estrategia, driver, alvo):
+    """Roda a estratégia uma vez; retorna (resultados, duração de cada lote em segundos)."""
+    resultados, duracoes = [], []
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        inicio = time.perf_counter()
+        for resultado in estrategia(driver, alvo):
+            agora = time.perf_counter()
+            resultados.append(resultado)
+            duracoes.append(agora - inicio)
+            inicio = agora
+    return resultados, duracoes
+
+def divergencias(referencia, resultados):
+    if referencia is None:
+        return None
+    total = abs(len(referencia) - len(resultados))
+    for esperado, obtido in zip(referencia, resultados):
+        total += sum(1 for chave in set(esperado) | set(obtido) if esperado.get(chave) != obtido.get(chave))
+    return total
+
+def medir(site, nome, driver, contador, alvo, repeticoes, referencia):
+    estrategia = ESTRATEGIAS[site][nome]
+    executar(estrategia, driver, copy.deepcopy(alvo))  # aquecimento (cache do navegador, imports)
+    contador.clear()
+    duracoes, resultados = [], None
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        obtidos, tempos = executar(estrategia, driver, copy.deepcopy(alvo))
+        resultados = resultados if resultados is not None else obtidos
+        duracoes.extend(tempos)
+    total = time.perf_counter() - inicio
+    lotes = len(duracoes)
+    return {
+        "site": site,
+        "estrategia": nome,
+        "lotes": lotes,
+        "segundos": round(total, 3),
+        "lotes_por_segundo": round(lotes / total, 2) if total else None,
+        "round_trips_por_lote": round(sum(contador.values()) / lotes, 2) if lotes else None,
+        "p50_ms": round(percentil(duracoes, 50) * 1000, 2) if lotes else None,
+        "p95_ms": round(percentil(duracoes, 95) * 1000, 2) if lotes else None,
+        "divergencias": divergencias(referencia, resultados or []),
+        "comandos": dict(contador.most_common(5)),
+    }, resultados
+
+
+def commit_atual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ_REPO, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def carregar_historico(caminho):
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+def comparar(medicao, historico, tolerancia):
+    """Compara com a mediana das últimas execuções da mesma combinação; retorna os alertas."""
+    anteriores = [
+        h for h in historico
+        if (h["site"], h["estrategia"], h.get("navegador")) == (medicao["site"], medicao["estrategia"], medicao["navegador"])
+        and h.get("p50_ms") is not None
+    ][-JANELA_REFERENCIA:]
+    if not anteriores or medicao["p50_ms"] is None:
+        return []
+    alertas = []
+    p50_ref = statistics.median(h["p50_ms"] for h in anteriores)
+    if medicao["p50_ms"] > p50_ref * (1 + tolerancia):
+        alertas.append(f"p50 {medicao['p50_ms']:.1f} ms vs {p50_ref:.1f} ms (+{medicao['p50_ms'] / p50_ref - 1:.0%})")
+    rt_ref = statistics.median(h["round_trips_por_lote"] for h in anteriores)
+    if medicao["round_trips_por_lote"] > rt_ref:
+        alertas.append(f"round trips/lote {medicao['round_trips_por_lote']} vs {rt_ref}")
+    return alertas
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline da extração dos scrapers sobre páginas gravadas.")
+    parser.add_argument("--sites", nargs="+", choices=list(ESTRATEGIAS), default=list(ESTRATEGIAS))
+    parser.add_argument("--estrategias", nargs="+", default=["atual", "page_source", "script"])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--lotes", type=int, default=0, help="Limite de lotes de detalhe por site (0 = todos da listagem).")
+    parser.add_argument("--selenium-url", default=os.getenv("SELENIUM_URL"))
+    parser.add_argument("--host-fixtures", default=None,
+                        help="Host pelo qual o navegador alcança o servidor de fixtures (padrão 127.0.0.1).")
+    parser.add_argument("--porta", type=int, default=0)
+    parser.add_argument("--pausa-leilo", type=float, default=0.0,
+                        help="Pausa após cada rolagem em extract_lot_details (o scraper usa 2s).")
+    parser.add_argument("--historico", default=HISTORICO_PADRAO)
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Piora aceita no p50 antes de apontar regressão.")
+    parser.add_argument("--falhar-em-regressao", action="store_true")
+    args = parser.parse_args()
+
+    # Com Selenium remoto o servidor precisa ser alcançável de fora do processo
+    servidor, porta = servir("0.0.0.0" if args.selenium_url else "127.0.0.1", args.porta)
+    base_url = f"http://{args.host_fixtures or '127.0.0.1'}:{porta}"
+    carregar_scraper("leilo").DETAIL_SCROLL_PAUSE = args.pausa_leilo
+
+    driver = criar_driver(args.selenium_url)
+    contador = contar_round_trips(driver)
+    navegador = f"{driver.capabilities.get('browserName')} {driver.capabilities.get('browserVersion')}"
+    print(f"[INFO] Fixtures em {base_url}, navegador: {navegador}")
+
+    medicoes = []
+    try:
+        for site in args.sites:
+            alvo = f"{base_url}/{site}/" if site == "parque" else lotes_da_listagem(site, base_url, args.lotes)
+            referencia = None
+            for nome in args.estrategias:
+                if nome not in ESTRATEGIAS[site]:
+                    print(f"[WARN] Estratégia '{nome}' não existe para {site}. Ignorando.")
+                    continue
+                medicao, resultados = medir(site, nome, driver, contador, alvo, args.repeticoes, referencia)
+                if nome == "atual":
+                    referencia = resultados
+                medicoes.append(medicao)
+    finally:
+        driver.quit()
+        servidor.shutdown()
+
+    historico = carregar_historico(args.historico)
+    registro = {"data": datetime.now().isoformat(timespec="seconds"), "commit": commit_atual(), "navegador": navegador}
+    regressoes = 0
+    print(f"\n{'site':<8}{'estratégia':<13}{'lotes':>6}{'lotes/s':>9}{'RT/lote':>9}{'p50 ms':>9}{'p95 ms':>9}{'diverg.':>8}")
+    for medicao in medicoes:
+        medicao.update(registro)
+        alertas = comparar(medicao, historico, args.tolerancia)
+        regressoes += bool(alertas)
+        colunas = ["-" if medicao[c] is None else medicao[c]
+                   for c in ("lotes_por_segundo", "round_trips_por_lote", "p50_ms", "p95_ms", "divergencias")]
+        print(f"{medicao['site']:<8}{medicao['estrategia']:<13}{medicao['lotes']:>6}"
+              f"{colunas[0]:>9}{colunas[1]:>9}{colunas[2]:>9}{colunas[3]:>9}{colunas[4]:>8}")
+        for alerta in alertas:
+            print(f"    [WARN] Regressão: {alerta}")
+
+    os.makedirs(os.path.dirname(args.historico), exist_ok=True)
+    with open(args.historico, "a", encoding="utf-8") as f:
+        for medicao in medicoes:
+            f.write(json.dumps(medicao, ensure_ascii=False) + "\n")
+    print(f"\n[INFO] {len(medicoes)} medições acrescentadas a {args.historico}.")
+    if regressoes and args.falhar_em_regressao:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Estratégias de extração comparadas pelo benchmark, por site.
+
+Cada estratégia é um gerador estrategia(driver, alvo) que devolve um dict por lote, na
+ordem da página; o benchmark mede o tempo entre lotes consecutivos e conta os comandos
+enviados ao WebDriver. 'alvo' é a lista de lotes (leilo/loop, páginas de detalhe) ou a
+URL da listagem (parque).
+
+    atual        código dos scrapers como está (um round trip por campo/espera)
+    page_source  um page_source por página; mesmos seletores resolvidos localmente (BeautifulSoup)
+    script       um execute_script por página devolvendo todos os campos de uma vez
+
+As alternativas de loop e parque reaproveitam as funções dos scrapers sobre um snapshot
+(benchmarks/snapshot.py), então o pós-processamento é exatamente o mesmo. No leilo os
+campos vêm por rótulo (XPath), então só a leitura muda e o pós-processamento abaixo
+reproduz o de extract_lot_details (bloco gt-sm, sem o fallback lt-md).
+"""
+import importlib.util
+import os
+import sys
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from snapshot import coletar_valores, snapshot_html, texto_visivel
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Os scrapers importam db_utils e common a partir da raiz (PYTHONPATH=/app nos containers)
+if RAIZ_REPO not in sys.path:
+    sys.path.insert(0, RAIZ_REPO)
+
+SCRAPERS = {
+    "leilo": os.path.join(RAIZ_REPO, "leilo", "scraper.py"),
+    "loop": os.path.join(RAIZ_REPO, "loop", "loop.py"),
+    "parque": os.path.join(RAIZ_REPO, "parque", "parquedosleiloes.py"),
+}
+_modulos = {}
+
+# Seletores de espera de cada página (os mesmos dos scrapers)
+ESPERA_DETALHE_LEILO = "div.categorias-veiculo"
+ESPERA_DETALHE_LOOP = "div.editor.taj"
+CARD_PARQUE = "li.wr3[class*='LL_box_']"
+
+# Rótulos do bloco gt-sm lidos por extract_lot_details
+ROTULOS_LEILO = ["Ano", "Combustivel", "Km", "Valor Mercado", "Cor", "Possui Chave", "Tipo Retomada", "Localização", "Tipo"]
+SCRIPT_ROTULOS_LEILO = """
+const saida = {};
+for (const rotulo of arguments[0]) {
+  const xpath = "//div[contains(@class, 'gt-sm')]//span[contains(@class, 'label-categoria') and text()='" + rotulo + "']"
+    + "/ancestor::div[contains(@class, 'col-md-4') or contains(@class, 'col-sm-6')]/a/span";
+  const no = document.evaluate(xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+  saida[rotulo] = no ? no.innerText : null;
+}
+return saida;
+"""
+# Campos lidos por parse_lot_detail_page (loop) e extract_card_data (parque)
+CAMPOS_LOOP = [
+    ("div.editor.taj", []),
+    ("h1.fwb.cor_221E1F span.LL_nome", []),
+    ("li.LL_data_fim data.dib", []),
+    ("li.LL_data_fim hora.dib", []),
+    ("div.LL_lance_atual b", []),
+    ("p.contagem", []),
+    ("ul.LL_situacao li p", []),
+]
+CAMPOS_PARQUE = [
+    ("li.LL_nome", ["innerHTML"]),
+    ("a.posr.db.m10", ["href"]),
+    ("div.header-card a", ["href"]),
+    ("img#phfotos_resposive", ["src"]),
+    ("li.LL_data_fim data.dib", ["innerHTML"]),
+    ("div.LL_lance_ini b.fz15", ["innerHTML"]),
+    ("div.LL_lance_atual b.fz15", ["innerHTML"]),
+    ("div.LL_situacao p.itm-statusname", ["innerHTML"]),
+]
+
+
+def carregar_scraper(site):
+    """Importa o módulo do scraper pelo caminho (o fluxo de raspagem só roda em main())."""
+    if site not in _modulos:
+        spec = importlib.util.spec_from_file_location(f"{site}_scraper", SCRAPERS[site])
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        _modulos[site] = modulo
+    return _modulos[site]
+
+def _abrir(driver, url, seletor):
+    driver.get(url)
+    WebDriverWait(driver, 25).until(EC.presence_of_element_located((By.CSS_SELECTOR, seletor)))
+
+
+### leilo: extract_lot_details
+
+def montar_detalhes_leilo(lote, valores):
+    """Pós-processamento de extract_lot_details sobre os textos {rótulo: texto} do bloco gt-sm."""
+    def texto(rotulo):
+        valor = (valores.get(rotulo) or "").strip().replace("\xa0", " ")
+        return valor if valor else "N/A"
+
+    ano_veiculo = texto("Ano")
+    if ano_veiculo != "N/A" and "/" in ano_veiculo:
+        ano_veiculo = ano_veiculo.split("/")[0].strip()
+    valor_mercado_fipe = texto("Valor Mercado")
+    if valor_mercado_fipe != "N/A":
+        valor_mercado_fipe = valor_mercado_fipe.replace("R$", "").replace(".", "").replace(",", ".").strip()
+    modelo_veiculo = lote.get("veiculo_modelo", "N/A")
+    veiculo_versao = "N/A"
+    if modelo_veiculo != "N/A" and " " in modelo_veiculo:
+        veiculo_versao = modelo_veiculo.split(" ", 1)[1].strip()
+        modelo_veiculo = modelo_veiculo.split(" ", 1)[0].strip()
+    lote.update({
+        "veiculo_ano_fabricacao": ano_veiculo,
+        "veiculo_tipo_combustivel": texto("Combustivel"),
+        "veiculo_km": texto("Km"),
+        "veiculo_valor_fipe": valor_mercado_fipe,
+        "veiculo_cor": texto("Cor"),
+        "veiculo_possui_chave": texto("Possui Chave"),
+        "veiculo_tipo_retomada": texto("Tipo Retomada"),
+        "veiculo_patio_uf": texto("Localização"),
+        "veiculo_tipo": texto("Tipo"),
+        "veiculo_fabricante": lote.get("veiculo_fabricante", "N/A"),
+        "veiculo_modelo": modelo_veiculo,
+        "veiculo_versao": veiculo_versao,
+    })
+    return lote
+
+def rotulos_gt_sm_html(pagina):
+    """Mesma busca do XPath de get_detail_gt_sm_by_label, feita no snapshot HTML."""
+    valores = {}
+    for span in pagina.tag.select("div.gt-sm span.label-categoria"):
+        rotulo = span.get_text()
+        if rotulo not in ROTULOS_LEILO or rotulo in valores:
+            continue
+        for ancestral in span.parents:
+            classes = " ".join(ancestral.get("class") or []) if ancestral.name == "div" else ""
+            if "col-md-4" in classes or "col-sm-6" in classes:
+                alvo = ancestral.select_one(":scope > a > span")
+                if alvo is not None:
+                    valores[rotulo] = texto_visivel(alvo)
+                break
+    return valores
+
+def leilo_atual(driver, lotes):
+    scraper = carregar_scraper("leilo")
+    for lote in lotes:
+        scraper.extract_lot_details(driver, [lote])
+        yield lote
+
+def leilo_page_source(driver, lotes):
+    # Navega na própria aba (sem abrir/fechar abas) e lê a página uma única vez
+    for lote in lotes:
+        _abrir(driver, lote["veiculo_link_lote"], ESPERA_DETALHE_LEILO)
+        yield montar_detalhes_leilo(lote, rotulos_gt_sm_html(snapshot_html(driver)))
+
+def leilo_script(driver, lotes):
+    for lote in lotes:
+        _abrir(driver, lote["veiculo_link_lote"], ESPERA_DETALHE_LEILO)
+        yield montar_detalhes_leilo(lote, driver.execute_script(SCRIPT_ROTULOS_LEILO, ROTULOS_LEILO))
+
+
+### loop: extract_data_from_lot_detail_page
+
+def loop_atual(driver, lotes):
+    scraper = carregar_scraper("loop")
+    for lote in lotes:
+        yield scraper.extract_data_from_lot_detail_page(driver, lote["url"])
+
+def loop_page_source(driver, lotes):
+    scraper = carregar_scraper("loop")
+    for lote in lotes:
+        _abrir(driver, lote["url"], ESPERA_DETALHE_LOOP)
+        yield scraper.parse_lot_detail_page(snapshot_html(driver), {"URL do Lote": lote["url"]})
+
+def loop_script(driver, lotes):
+    scraper = carregar_scraper("loop")
+    for lote in lotes:
+        _abrir(driver, lote["url"], ESPERA_DETALHE_LOOP)
+        pagina = coletar_valores(driver, CAMPOS_LOOP)[0]
+        yield scraper.parse_lot_detail_page(pagina, {"URL do Lote": lote["url"]})
+
+
+### parque: laço dos cards da listagem
+
+def parque_atual(driver, url):
+    scraper = carregar_scraper("parque")
+    _abrir(driver, url, CARD_PARQUE)
+    total = len(driver.find_elements(By.CSS_SELECTOR, CARD_PARQUE))
+    for index in range(total):
+        # Como no scraper: a lista é buscada de novo a cada card para evitar elementos obsoletos
+        lote_element = WebDriverWait(driver, 10).until(
+            lambda d: d.find_elements(By.CSS_SELECTOR, CARD_PARQUE)[index]
+        )
+        yield scraper.extract_card_data(lote_element)
+
+def parque_page_source(driver, url):
+    scraper = carregar_scraper("parque")
+    _abrir(driver, url, CARD_PARQUE)
+    for card in snapshot_html(driver).find_elements(By.CSS_SELECTOR, CARD_PARQUE):
+        yield scraper.extract_card_data(card)
+
+def parque_script(driver, url):
+    scraper = carregar_scraper("parque")
+    _abrir(driver, url, CARD_PARQUE)
+    for card in coletar_valores(driver, CAMPOS_PARQUE, raiz=CARD_PARQUE):
+        yield scraper.extract_card_data(card)
+
+
+ESTRATEGIAS = {
+    "leilo": {"atual": leilo_atual, "page_source": leilo_page_source, "script": leilo_script},
+    "loop": {"atual": loop_atual, "page_source": loop_page_source, "script": loop_script},
+    "parque": {"atual": parque_atual, "page_source": parque_page_source, "script": parque_script},
+}
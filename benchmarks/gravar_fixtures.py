@@ -0,0 +1,69 @@
+"""
+Grava as páginas reais usadas pelo benchmark em benchmarks/fixtures/<site>/.
+
+Abre a listagem de cada site no Selenium, espera os cards (mesmos seletores dos scrapers),
+salva o DOM renderizado como listing.html e, para leilo e loop, a página do primeiro lote
+como detail.html. Os <script> são removidos: a fixture é o DOM já montado, servido
+estático e sem dependência de rede.
+
+    python gravar_fixtures.py --selenium-url http://localhost:4444/wd/hub
+    python gravar_fixtures.py --sites parque
+"""
+import argparse
+import os
+import re
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from benchmark_extracao import criar_driver
+from servidor_fixtures import FIXTURES_DIR
+
+# site -> (URL da listagem, seletor dos cards, seletor do link do lote, seletor de espera do detalhe)
+PAGINAS = {
+    "leilo": ("https://leilo.com.br/leilao/carros?", ".sessao.cursor-pointer", "a.img-card", "div.categorias-veiculo"),
+    "loop": ("https://loopbrasil.net/lotes/?&cate[]=3", "section[id^='lote'] > a.card", "section[id^='lote'] > a.card", "div.editor.taj"),
+    "parque": ("https://parquedosleiloesoficial.com/lotes/veiculos", "li.wr3[class*='LL_box_']", None, None),
+}
+RE_SCRIPT = re.compile(r"<script\b.*?</script>", re.IGNORECASE | re.DOTALL)
+
+
+def salvar(driver, site, tipo):
+    caminho = os.path.join(FIXTURES_DIR, site, f"{tipo}.html")
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html>\n" + RE_SCRIPT.sub("", driver.page_source))
+    print(f"[INFO] {caminho} gravado.")
+
+def gravar(driver, site):
+    url, seletor_card, seletor_link, seletor_detalhe = PAGINAS[site]
+    driver.get(url)
+    WebDriverWait(driver, 30).until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, seletor_card)))
+    salvar(driver, site, "listing")
+    if seletor_link is None:
+        return
+    link = driver.find_element(By.CSS_SELECTOR, seletor_link).get_attribute("href")
+    driver.get(link)
+    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.CSS_SELECTOR, seletor_detalhe)))
+    salvar(driver, site, "detail")
+
+def main():
+    parser = argparse.ArgumentParser(description="Grava listagens e páginas de lote para o benchmark offline.")
+    parser.add_argument("--sites", nargs="+", choices=list(PAGINAS), default=list(PAGINAS))
+    parser.add_argument("--selenium-url", default=os.getenv("SELENIUM_URL"))
+    args = parser.parse_args()
+
+    driver = criar_driver(args.selenium_url)
+    try:
+        for site in args.sites:
+            try:
+                gravar(driver, site)
+            except TimeoutException:
+                print(f"[ERRO] Timeout ao gravar as páginas de {site}; fixtures anteriores mantidas.")
+    finally:
+        driver.quit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Replay da extração dos scrapers sobre as páginas do cache (common/page_cache.py).
+
+Relê as páginas gravadas nas raspagens com PAGE_CACHE=1 e roda de novo as funções de
+extração dos scrapers, sem acessar os sites:
+  - loop   detalhe:  parse_lot_detail_page
+  - parque listagem: extract_card_data de cada card
+  - parque detalhe:  parse_descricao_detalhada sobre o texto da aba DESCRIÇÃO
+  - leilo  detalhe:  extract_lot_details (seletores XPath: só com --navegador)
+A listagem do leilo é lida dentro de main() do scraper e não tem função para o replay.
+
+Sem --navegador cada página é interpretada localmente com BeautifulSoup (snapshot.ElementoHtml),
+na velocidade do parser. Com --navegador as páginas são servidas por um servidor local a um
+Chrome headless e extraídas pelo código dos scrapers como está.
+
+A saída tem uma linha JSON por lote (url, buscado_em, run_id, índice do card e os campos):
+serve para conferir uma mudança de seletor (--comparar com um replay anterior) ou para
+preencher um campo novo em lotes já raspados.
+
+    python replay_cache.py --site loop
+    python replay_cache.py --site parque --tipo listagem --desde 2026-10-01 --ultima-por-url
+    python replay_cache.py --site leilo --navegador --selenium-url http://localhost:4444/wd/hub --host-paginas host.docker.internal
+    python replay_cache.py --site loop --comparar results/replay/loop_detalhe_20261019_101500.jsonl
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+
+# estrategias põe a raiz do repositório no sys.path (common, db_utils)
+from estrategias import CARD_PARQUE, carregar_scraper
+from snapshot import ElementoHtml
+
+from common import page_cache
+
+SAIDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", "replay")
+# Campos exibidos no resumo de N/A e nas divergências
+TOP_CAMPOS = 20
+
+
+### Extração por (site, tipo): recebe a página (ElementoHtml ou o driver já na página) e gera os lotes
+
+def leilo_detalhe(pagina, entrada):
+    if isinstance(pagina, ElementoHtml):
+        raise NotImplementedError("leilo/detalhe usa seletores XPath: rode com --navegador.")
+    scraper = carregar_scraper("leilo")
+    lote = {"veiculo_link_lote": pagina.current_url}
+    scraper.extract_lot_details(pagina, [lote])
+    # O link lido foi o do servidor local: volta para a URL original
+    lote["veiculo_link_lote"] = entrada["url"]
+    yield lote
+
+def loop_detalhe(pagina, entrada):
+    yield carregar_scraper("loop").parse_lot_detail_page(pagina, {"URL do Lote": entrada["url"]})
+
+def parque_listagem(pagina, entrada):
+    scraper = carregar_scraper("parque")
+    for card in pagina.find_elements(By.CSS_SELECTOR, CARD_PARQUE):
+        yield scraper.extract_card_data(card)
+
+def parque_detalhe(pagina, entrada):
+    scraper = carregar_scraper("parque")
+    # Página estática: sem espera pelo texto
+    descricao = scraper.safe_get_element_text(pagina, "li.box__1 div.editor.taj p", wait_time=0)
+    detalhes = scraper.parse_descricao_detalhada(descricao) if descricao.strip() not in ("", "N/A") else {}
+    yield {"link": entrada["url"], **detalhes}
+
+
+EXTRATORES = {
+    ("leilo", page_cache.TIPO_DETALHE): leilo_detalhe,
+    ("loop", page_cache.TIPO_DETALHE): loop_detalhe,
+    ("parque", page_cache.TIPO_LISTAGEM): parque_listagem,
+    ("parque", page_cache.TIPO_DETALHE): parque_detalhe,
+}
+
+
+### Servidor das páginas do cache (--navegador)
+
+class CacheHandler(BaseHTTPRequestHandler):
+    """/pagina/<sha256> -> HTML descomprimido; qualquer outro caminho responde 404 sem rede externa."""
+
+    def do_GET(self):
+        partes = [p for p in urlparse(self.path).path.split("/") if p]
+        corpo = None
+        if len(partes) == 2 and partes[0] == "pagina":
+            try:
+                corpo = page_cache.ler_pagina(partes[1], self.server.diretorio).encode("utf-8")
+            except (OSError, ValueError):
+                corpo = None
+        if corpo is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        pass
+
+def servir_cache(host, porta, diretorio):
+    servidor = ThreadingHTTPServer((host, porta), CacheHandler)
+    servidor.daemon_threads = True
+    servidor.diretorio = diretorio
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, servidor.server_address[1]
+
+
+### Replay
+
+def replay(entradas, diretorio=None, driver=None, base_url=None):
+    """Gera (entrada, índice, dados) para cada lote extraído das páginas; erros viram dados {'_erro': ...}."""
+    for entrada in entradas:
+        extrator = EXTRATORES[(entrada["site"], entrada["tipo"])]
+        try:
+            if driver is not None:
+                driver.get(f"{base_url}/pagina/{entrada['sha256']}")
+                pagina = driver
+            else:
+                html = page_cache.ler_pagina(entrada["sha256"], diretorio)
+                pagina = ElementoHtml(BeautifulSoup(html, "html.parser"), entrada["url"])
+            for indice, dados in enumerate(extrator(pagina, entrada)):
+                yield entrada, indice, dados
+        except Exception as e:
+            yield entrada, None, {"_erro": f"{type(e).__name__}: {e}"}
+
+def _chave(linha):
+    return linha["url"], linha["buscado_em"], linha["indice"]
+
+def carregar_saida(caminho):
+    with open(caminho, encoding="utf-8") as f:
+        linhas = [json.loads(linha) for linha in f if linha.strip()]
+    return {_chave(linha): linha["dados"] for linha in linhas}
+
+def comparar(anteriores, atuais):
+    """Por campo, quantos lotes presentes nas duas saídas mudaram de valor; e um exemplo de cada."""
+    divergencias, exemplos = Counter(), {}
+    comuns = anteriores.keys() & atuais.keys()
+    for chave in comuns:
+        antes, depois = anteriores[chave], atuais[chave]
+        for campo in antes.keys() | depois.keys():
+            if antes.get(campo) != depois.get(campo):
+                divergencias[campo] += 1
+                exemplos.setdefault(campo, (chave[0], antes.get(campo), depois.get(campo)))
+    return len(comuns), divergencias, exemplos
+
+def _na(valor):
+    return valor is None or (isinstance(valor, str) and valor.strip() in ("", "N/A"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay da extração dos scrapers sobre o cache de páginas.")
+    parser.add_argument("--site", required=True, choices=sorted({site for site, _ in EXTRATORES}))
+    parser.add_argument("--tipo", choices=[page_cache.TIPO_LISTAGEM, page_cache.TIPO_DETALHE], default=None,
+                        help="Padrão: todos os tipos com extrator para o site.")
+    parser.add_argument("--desde", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--ate", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--run-id", type=int, default=None, help="Só as páginas de uma execução (scrape_runs.id).")
+    parser.add_argument("--ultima-por-url", action="store_true", help="Só a busca mais recente de cada URL.")
+    parser.add_argument("--limite", type=int, default=0, help="Máximo de páginas (0 = todas).")
+    parser.add_argument("--diretorio", default=None, help=f"Padrão: PAGE_CACHE_DIR ({page_cache.DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--saida", default=None, help=f"JSON lines de saída (padrão: {SAIDA_DIR}/<site>_<tipo>_<data>.jsonl).")
+    parser.add_argument("--comparar", default=None, help="Saída de um replay anterior para apontar os campos que mudaram.")
+    parser.add_argument("--navegador", action="store_true", help="Extrai com Chrome headless e o código dos scrapers como está.")
+    parser.add_argument("--selenium-url", default=os.getenv("SELENIUM_URL"))
+    parser.add_argument("--host-paginas", default=None,
+                        help="Host pelo qual o navegador alcança o servidor das páginas (padrão 127.0.0.1).")
+    parser.add_argument("--porta", type=int, default=0)
+    args = parser.parse_args()
+
+    # O replay lê o cache, nunca grava nele
+    page_cache.DEFAULT_ENABLED = False
+    tipos = [args.tipo] if args.tipo else [tipo for site, tipo in EXTRATORES if site == args.site]
+    entradas = []
+    for tipo in tipos:
+        if (args.site, tipo) not in EXTRATORES:
+            parser.error(f"Sem extrator para {args.site}/{tipo} (a listagem do leilo é lida dentro de main()).")
+        if (args.site, tipo) == ("leilo", page_cache.TIPO_DETALHE) and not args.navegador:
+            parser.error("leilo/detalhe usa seletores XPath: rode com --navegador.")
+        entradas += page_cache.listar_paginas(args.site, tipo, args.desde, args.ate, args.run_id,
+                                              args.ultima_por_url, args.diretorio)
+    entradas.sort(key=lambda entrada: entrada["buscado_em"])
+    if args.limite:
+        entradas = entradas[:args.limite]
+    if not entradas:
+        print(f"[WARN] Nenhuma página de {args.site} no cache com esses filtros.")
+        return
+
+    driver = base_url = servidor = None
+    if args.navegador:
+        from benchmark_extracao import criar_driver
+        # Sem as pausas de renderização do leilo: a página local já está pronta
+        carregar_scraper("leilo").DETAIL_SCROLL_PAUSE = 0
+        servidor, porta = servir_cache("0.0.0.0" if args.selenium_url else "127.0.0.1", args.porta,
+                                       args.diretorio or page_cache.DEFAULT_CACHE_DIR)
+        base_url = f"http://{args.host_paginas or '127.0.0.1'}:{porta}"
+        driver = criar_driver(args.selenium_url)
+
+    saida = args.saida or os.path.join(
+        SAIDA_DIR, f"{args.site}_{args.tipo or 'todos'}_{datetime.now():%Y%m%d_%H%M%S}.jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    print(f"[INFO] Replay de {len(entradas)} páginas de {args.site} ({'navegador' if driver else 'BeautifulSoup'}).")
+
+    atuais, preenchidos, vazios, erros, paginas = {}, Counter(), Counter(), 0, set()
+    inicio = time.perf_counter()
+    try:
+        with open(saida, "w", encoding="utf-8") as f:
+            for entrada, indice, dados in replay(entradas, args.diretorio, driver, base_url):
+                paginas.add((entrada["url"], entrada["buscado_em"]))
+                if "_erro" in dados:
+                    erros += 1
+                    print(f"[ERRO] {entrada['url']} ({entrada['buscado_em']}): {dados['_erro']}")
+                    continue
+                linha = {"site": entrada["site"], "tipo": entrada["tipo"], "url": entrada["url"],
+                         "buscado_em": entrada["buscado_em"], "run_id": entrada["run_id"],
+                         "sha256": entrada["sha256"], "indice": indice, "dados": dados}
+                f.write(json.dumps(linha, ensure_ascii=False, default=str) + "\n")
+                atuais[_chave(linha)] = dados
+                for campo, valor in dados.items():
+                    (vazios if _na(valor) else preenchidos)[campo] += 1
+    finally:
+        if driver is not None:
+            driver.quit()
+        if servidor is not None:
+            servidor.shutdown()
+    duracao = time.perf_counter() - inicio
+
+    print(f"[INFO] {len(paginas)} páginas, {len(atuais)} lotes, {erros} erros em {duracao:.1f}s "
+          f"({len(paginas) / duracao if duracao else 0:.1f} páginas/s). Saída: {saida}")
+    campos = sorted(preenchidos.keys() | vazios.keys(), key=lambda c: -vazios[c])
+    if campos:
+        print(f"    {'campo':<36}{'N/A':>8}{'% N/A':>8}")
+        for campo in campos[:TOP_CAMPOS]:
+            total = preenchidos[campo] + vazios[campo]
+            print(f"    {campo:<36}{vazios[campo]:>8}{vazios[campo] / total:>8.0%}")
+
+    if args.comparar:
+        comuns, divergencias, exemplos = comparar(carregar_saida(args.comparar), atuais)
+        print(f"\n[INFO] Comparação com {args.comparar}: {comuns} lotes em comum, "
+              f"{len(divergencias)} campos com divergência.")
+        for campo, n in divergencias.most_common(TOP_CAMPOS):
+            url, antes, depois = exemplos[campo]
+            print(f"    {campo:<36}{n:>6}  ex.: {url}: {antes!r} -> {depois!r}")
+
+if __name__ == "__main__":
+    main()
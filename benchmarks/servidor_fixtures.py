@@ -0,0 +1,77 @@
+"""
+Servidor HTTP estático das páginas gravadas em benchmarks/fixtures/.
+
+Rotas (uma pasta por site: leilo, loop, parque):
+    /<site>/               -> fixtures/<site>/listing.html
+    /<site>/lote/<id>      -> fixtures/<site>/detail.html (o mesmo arquivo para qualquer id)
+Qualquer outro caminho (imagens, scripts) responde 404 imediatamente, sem rede externa.
+
+    python servidor_fixtures.py --porta 8765
+"""
+import argparse
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SITES = ["leilo", "loop", "parque"]
+
+
+def carregar_paginas(diretorio=FIXTURES_DIR):
+    """{(site, 'listing'|'detail'): bytes} com as páginas existentes em disco."""
+    paginas = {}
+    for site in SITES:
+        for tipo in ("listing", "detail"):
+            caminho = os.path.join(diretorio, site, f"{tipo}.html")
+            if os.path.exists(caminho):
+                with open(caminho, "rb") as f:
+                    paginas[(site, tipo)] = f.read()
+    return paginas
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        partes = [p for p in urlparse(self.path).path.split("/") if p]
+        corpo = None
+        if partes and partes[0] in SITES:
+            tipo = "detail" if len(partes) >= 2 and partes[1] == "lote" else "listing"
+            corpo = self.server.paginas.get((partes[0], tipo))
+        if corpo is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, format, *args):
+        # Sem log por requisição: o servidor roda durante a medição
+        pass
+
+
+def servir(host="127.0.0.1", porta=0, diretorio=FIXTURES_DIR):
+    """Sobe o servidor em uma thread e retorna (servidor, porta). porta=0 escolhe uma livre."""
+    servidor = ThreadingHTTPServer((host, porta), FixtureHandler)
+    servidor.daemon_threads = True
+    servidor.paginas = carregar_paginas(diretorio)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, servidor.server_address[1]
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor estático das fixtures do benchmark de extração.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer((args.host, args.porta), FixtureHandler)
+    servidor.paginas = carregar_paginas()
+    print(f"[INFO] {len(servidor.paginas)} páginas servidas em http://{args.host}:{args.porta}/<site>/")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
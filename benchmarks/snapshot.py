@@ -0,0 +1,141 @@
+"""
+Snapshots do DOM com a mesma interface mínima de um WebElement do Selenium.
+
+As funções de extração dos scrapers só usam find_element(By.CSS_SELECTOR, ...), .text e
+get_attribute(...). Estes objetos oferecem essa interface sobre dados já trazidos do
+navegador em uma única chamada, de modo que o mesmo código de extração roda sem nenhum
+round trip adicional ao WebDriver:
+  - ElementoHtml: driver.page_source interpretado localmente com BeautifulSoup;
+  - ElementoValores: textos/atributos coletados por um único execute_script (ver coletar_valores).
+"""
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup, NavigableString
+from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.common.by import By
+
+# Tags que quebram linha no texto renderizado (aproximação do innerText)
+TAGS_BLOCO = {
+    "address", "article", "aside", "blockquote", "dd", "div", "dl", "dt", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+    "section", "table", "tr", "ul",
+}
+TAGS_IGNORADAS = {"script", "style", "template", "noscript", "head"}
+# Atributos que o Selenium devolve como URL absoluta (propriedade do DOM)
+ATRIBUTOS_URL = {"href", "src"}
+
+# Um execute_script: para cada raiz, o texto e os atributos pedidos de cada seletor
+SCRIPT_VALORES = """
+const raizes = arguments[0] ? Array.from(document.querySelectorAll(arguments[0])) : [document];
+const campos = arguments[1];
+return raizes.map((raiz) => {
+  const saida = {};
+  for (const [seletor, atributos] of campos) {
+    const el = raiz.querySelector(seletor);
+    if (!el) { saida[seletor] = null; continue; }
+    const attrs = {};
+    for (const nome of atributos) {
+      const prop = el[nome];
+      attrs[nome] = (typeof prop === "string") ? prop : el.getAttribute(nome);
+    }
+    saida[seletor] = {text: el.innerText, attrs: attrs};
+  }
+  return saida;
+});
+"""
+
+
+def _partes_texto(no, saida):
+    for filho in no.children:
+        if isinstance(filho, NavigableString):
+            # Comentários, doctype etc. são subclasses; só o texto comum entra
+            if type(filho) is NavigableString:
+                saida.append(str(filho))
+            continue
+        if filho.name in TAGS_IGNORADAS:
+            continue
+        if filho.name == "br":
+            saida.append("\n")
+            continue
+        bloco = filho.name in TAGS_BLOCO
+        if bloco:
+            saida.append("\n")
+        _partes_texto(filho, saida)
+        if bloco:
+            saida.append("\n")
+
+def texto_visivel(tag):
+    """Texto como o .text do Selenium: espaços colapsados, uma linha por bloco/<br>, sem linhas vazias."""
+    saida = []
+    _partes_texto(tag, saida)
+    linhas = (" ".join(linha.split()) for linha in "".join(saida).split("\n"))
+    return "\n".join(linha for linha in linhas if linha)
+
+
+class ElementoHtml:
+    """Tag do BeautifulSoup vista como WebElement (só seletores CSS)."""
+
+    def __init__(self, tag, base_url):
+        self.tag = tag
+        self.base_url = base_url
+
+    @property
+    def text(self):
+        return texto_visivel(self.tag)
+
+    def get_attribute(self, nome):
+        if nome == "innerHTML":
+            return self.tag.decode_contents()
+        valor = self.tag.get(nome)
+        if isinstance(valor, list):
+            valor = " ".join(valor)
+        if valor is not None and nome in ATRIBUTOS_URL:
+            valor = urljoin(self.base_url, valor)
+        return valor
+
+    def find_element(self, by, seletor):
+        if by != By.CSS_SELECTOR:
+            raise NotImplementedError(f"Snapshot HTML só aceita seletores CSS (recebido: {by}).")
+        tag = self.tag.select_one(seletor)
+        if tag is None:
+            raise NoSuchElementException(f"Seletor não encontrado no snapshot: {seletor}")
+        return ElementoHtml(tag, self.base_url)
+
+    def find_elements(self, by, seletor):
+        if by != By.CSS_SELECTOR:
+            raise NotImplementedError(f"Snapshot HTML só aceita seletores CSS (recebido: {by}).")
+        return [ElementoHtml(tag, self.base_url) for tag in self.tag.select(seletor)]
+
+def snapshot_html(driver):
+    """Uma chamada (page_source) e o documento inteiro interpretado localmente."""
+    return ElementoHtml(BeautifulSoup(driver.page_source, "html.parser"), driver.current_url)
+
+
+class _Valor:
+    def __init__(self, valor):
+        self.text = valor["text"] or ""
+        self._attrs = valor["attrs"]
+
+    def get_attribute(self, nome):
+        return self._attrs.get(nome)
+
+class ElementoValores:
+    """Elemento cujos seletores já foram resolvidos no navegador por SCRIPT_VALORES."""
+
+    def __init__(self, valores):
+        self.valores = valores
+
+    def find_element(self, by, seletor):
+        valor = self.valores.get(seletor)
+        if valor is None:
+            raise NoSuchElementException(f"Seletor não coletado ou ausente: {seletor}")
+        return _Valor(valor)
+
+def coletar_valores(driver, campos, raiz=None):
+    """
+    Um único execute_script para todos os campos. 'campos' é uma lista de
+    (seletor, [atributos]); com 'raiz', devolve um ElementoValores por elemento da raiz
+    (ex.: um por card da listagem), senão uma lista com um só, do documento.
+    """
+    resultado = driver.execute_script(SCRIPT_VALORES, raiz, [[s, list(a)] for s, a in campos])
+    return [ElementoValores(valores) for valores in resultado]
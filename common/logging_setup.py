@@ -0,0 +1,118 @@
+"""
+Logging com níveis, fila e amostragem para os serviços (scrapers, ETL, FIPE).
+
+Os laços quentes (um lote, um campo, uma linha inserida) usam os loggers 'leilao.*' em vez
+de print():
+  - nível por LOG_LEVEL (padrão INFO): os detalhes por campo ficam em DEBUG e nem são
+    formatados em produção (use argumentos '%s', não f-strings, nas chamadas de debug);
+  - fila: o processo só enfileira o registro (QueueHandler) e uma thread escreve no stdout
+    (QueueListener), tirando a escrita e o log driver do Docker do caminho da raspagem.
+    LOG_QUEUE=0 volta à escrita síncrona;
+  - amostragem: mensagens marcadas com extra=amostrar('<chave>') passam só 1 a cada
+    LOG_SAMPLE_EVERY (padrão 50) por chave; ERROR e acima nunca são descartados.
+
+    from common.logging_setup import amostrar, configurar_logging, obter_logger
+    logger = obter_logger("leilo")
+    configurar_logging()  # no início de main()
+    logger.info("Processando lote %s", i, extra=amostrar("leilo.lote"))
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from collections import defaultdict
+
+LOGGER_RAIZ = "leilao"
+DEFAULT_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+DEFAULT_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "50"))
+DEFAULT_QUEUE = os.getenv("LOG_QUEUE", "1") != "0"
+
+# Rótulos já usados nos print() do projeto ([INFO], [WARN], [ERRO])
+ROTULOS = {logging.DEBUG: "DEBUG", logging.INFO: "INFO", logging.WARNING: "WARN",
+           logging.ERROR: "ERRO", logging.CRITICAL: "ERRO"}
+
+_listener = None
+
+
+def amostrar(chave):
+    """extra= de uma mensagem por lote: só 1 a cada LOG_SAMPLE_EVERY da mesma chave é escrita."""
+    return {"amostra": chave}
+
+def obter_logger(nome):
+    return logging.getLogger(f"{LOGGER_RAIZ}.{nome}")
+
+
+class FormatoProjeto(logging.Formatter):
+    """'[INFO] mensagem', com os mesmos rótulos dos print() restantes."""
+
+    def format(self, record):
+        mensagem = super().format(record)
+        return f"[{ROTULOS.get(record.levelno, record.levelname)}] {mensagem}"
+
+class FiltroAmostragem(logging.Filter):
+    """Deixa passar o 1º e depois 1 a cada 'a_cada' registros de cada chave de amostragem."""
+
+    def __init__(self, a_cada):
+        super().__init__()
+        self.a_cada = max(1, a_cada)
+        self.vistos = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        chave = getattr(record, "amostra", None)
+        if chave is None or record.levelno >= logging.ERROR:
+            return True
+        with self._lock:
+            visto = self.vistos[chave]
+            self.vistos[chave] = visto + 1
+        if visto % self.a_cada:
+            return False
+        if visto:
+            record.msg = f"{record.msg} (amostra: 1 a cada {self.a_cada}, {visto + 1} até agora)"
+        return True
+
+
+def configurar_logging(nivel=None, a_cada=None, usar_fila=None, stream=None):
+    """
+    Configura o logger 'leilao' (uma vez por processo; chamadas seguintes só ajustam o nível).
+    Os loggers de bibliotecas (selenium, urllib3) não são afetados.
+    """
+    global _listener
+    raiz = logging.getLogger(LOGGER_RAIZ)
+    nivel = nivel or DEFAULT_LEVEL
+    raiz.setLevel(nivel.upper() if isinstance(nivel, str) else nivel)
+    if raiz.handlers:
+        return raiz
+    raiz.propagate = False
+
+    saida = logging.StreamHandler(stream or sys.stdout)
+    saida.setFormatter(FormatoProjeto("%(message)s"))
+    amostragem = FiltroAmostragem(DEFAULT_SAMPLE_EVERY if a_cada is None else a_cada)
+
+    if DEFAULT_QUEUE if usar_fila is None else usar_fila:
+        fila = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(fila)
+        _listener = logging.handlers.QueueListener(fila, saida)
+        _listener.start()
+        atexit.register(encerrar_logging)
+    else:
+        handler = saida
+    # A amostragem roda antes da fila: o registro descartado nem chega a ser enfileirado
+    handler.addFilter(amostragem)
+    raiz.addHandler(handler)
+    return raiz
+
+def encerrar_logging():
+    """Esvazia a fila e para a thread de escrita (também registrado no atexit)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    sys.stdout.flush()
+
+def debug_ativo(logger):
+    """Para blocos caros que só existem para depuração (ex.: df.to_string() do frame inteiro)."""
+    return logger.isEnabledFor(logging.DEBUG)
@@ -0,0 +1,210 @@
+"""
+Cache das páginas raspadas: HTML comprimido com zstd e endereçado pelo conteúdo.
+
+Com PAGE_CACHE=1 os scrapers gravam o DOM renderizado de cada listagem e página de lote:
+    <PAGE_CACHE_DIR>/objetos/<sha[:2]>/<sha256>.html.zst   um arquivo por conteúdo distinto
+    <PAGE_CACHE_DIR>/indice.sqlite                          (url, buscado_em) -> sha256, site, tipo, run_id
+Os <script> são removidos antes de gravar (como nas fixtures do benchmark): a página
+guardada é o DOM já montado, que abre no navegador sem rede.
+
+benchmarks/replay_cache.py relê essas páginas e roda de novo a extração dos scrapers sem
+acessar os sites: testar um seletor novo, repetir um benchmark ou preencher um campo
+novo em lotes já raspados.
+
+    python -m common.page_cache                      # resumo por site/tipo
+    python -m common.page_cache --remover-dias 30    # apaga buscas antigas e objetos órfãos
+"""
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import zstandard
+
+from common import tracing
+from common.logging_setup import amostrar, obter_logger
+
+DEFAULT_CACHE_DIR = os.getenv(
+    "PAGE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "page_cache"),
+)
+DEFAULT_ENABLED = os.getenv("PAGE_CACHE", "0") == "1"
+# Nível do zstd: HTML repetitivo comprime ~10x já nos níveis médios
+DEFAULT_ZSTD_LEVEL = int(os.getenv("PAGE_CACHE_ZSTD_LEVEL", "10"))
+
+TIPO_LISTAGEM = "listagem"
+TIPO_DETALHE = "detalhe"
+
+RE_SCRIPT = re.compile(r"<script\b.*?</script>", re.IGNORECASE | re.DOTALL)
+
+logger = obter_logger("page_cache")
+
+# Índice aberto pelo processo do scraper (uma conexão por diretório)
+_indices = {}
+
+
+def conectar_indice(diretorio=None):
+    """Abre (e cria, se preciso) o índice do cache."""
+    diretorio = diretorio or DEFAULT_CACHE_DIR
+    os.makedirs(diretorio, exist_ok=True)
+    # Os três scrapers podem gravar ao mesmo tempo: espera o lock em vez de falhar
+    conn = sqlite3.connect(os.path.join(diretorio, "indice.sqlite"), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS paginas (
+            url TEXT NOT NULL,
+            buscado_em TEXT NOT NULL,
+            site TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            tamanho INTEGER NOT NULL,
+            tamanho_comprimido INTEGER NOT NULL,
+            run_id INTEGER,
+            PRIMARY KEY (url, buscado_em)
+        );
+        CREATE INDEX IF NOT EXISTS idx_paginas_site_tipo ON paginas (site, tipo, buscado_em);
+        CREATE INDEX IF NOT EXISTS idx_paginas_sha256 ON paginas (sha256);
+    """)
+    return conn
+
+def _indice(diretorio):
+    if diretorio not in _indices:
+        _indices[diretorio] = conectar_indice(diretorio)
+    return _indices[diretorio]
+
+def caminho_objeto(sha256, diretorio=None):
+    return os.path.join(diretorio or DEFAULT_CACHE_DIR, "objetos", sha256[:2], f"{sha256}.html.zst")
+
+def gravar_pagina(site, tipo, url, html, run_id=None, buscado_em=None, diretorio=None):
+    """Grava o HTML (sem <script>) se o conteúdo ainda não existe e registra a busca; retorna o sha256."""
+    diretorio = diretorio or DEFAULT_CACHE_DIR
+    dados = RE_SCRIPT.sub("", html).encode("utf-8")
+    sha256 = hashlib.sha256(dados).hexdigest()
+    caminho = caminho_objeto(sha256, diretorio)
+    if os.path.exists(caminho):
+        tamanho_comprimido = os.path.getsize(caminho)
+    else:
+        comprimido = zstandard.ZstdCompressor(level=DEFAULT_ZSTD_LEVEL).compress(dados)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # Temporário + rename: um leitor nunca vê um objeto pela metade
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(comprimido)
+        os.replace(temporario, caminho)
+        tamanho_comprimido = len(comprimido)
+
+    conn = _indice(diretorio)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO paginas (url, buscado_em, site, tipo, sha256, tamanho, tamanho_comprimido, run_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, (buscado_em or datetime.now()).isoformat(timespec="milliseconds"), site, tipo, sha256,
+             len(dados), tamanho_comprimido, run_id),
+        )
+    return sha256
+
+def gravar_driver(driver, site, tipo, run_id=None):
+    """
+    Chamado pelos scrapers com a página pronta no WebDriver. Sem PAGE_CACHE=1 não faz nada;
+    uma falha no cache nunca interrompe a raspagem.
+    """
+    if not DEFAULT_ENABLED:
+        return None
+    try:
+        with tracing.span("cache.gravar", tipo=tipo):
+            sha256 = gravar_pagina(site, tipo, driver.current_url, driver.page_source, run_id)
+        tracing.contar("paginas_em_cache")
+        return sha256
+    except Exception as e:
+        logger.warning("Página não gravada no cache (%s): %s", tipo, e, extra=amostrar("page_cache.erro"))
+        return None
+
+def ler_pagina(sha256, diretorio=None):
+    with open(caminho_objeto(sha256, diretorio), "rb") as f:
+        return zstandard.ZstdDecompressor().decompress(f.read()).decode("utf-8")
+
+def listar_paginas(site=None, tipo=None, desde=None, ate=None, run_id=None, ultima_por_url=False, diretorio=None):
+    """
+    Buscas registradas no índice, em ordem de busca. 'ultima_por_url' deixa só a busca mais
+    recente de cada URL (ex.: para preencher um campo novo uma vez por lote).
+    """
+    filtros, parametros = [], []
+    for coluna, operador, valor in (("site", "=", site), ("tipo", "=", tipo), ("run_id", "=", run_id),
+                                    ("buscado_em", ">=", desde), ("buscado_em", "<", ate)):
+        if valor is not None:
+            filtros.append(f"{coluna} {operador} ?")
+            parametros.append(valor.isoformat() if isinstance(valor, datetime) else valor)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    colunas = "url, buscado_em, site, tipo, sha256, tamanho, tamanho_comprimido, run_id"
+    query = f"SELECT {colunas} FROM paginas {where}"
+    if ultima_por_url:
+        query = (f"SELECT {colunas} FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY url ORDER BY buscado_em DESC) AS ordem "
+                 f"FROM paginas {where}) WHERE ordem = 1")
+    conn = conectar_indice(diretorio)
+    try:
+        cursor = conn.execute(f"{query} ORDER BY buscado_em", parametros)
+        colunas = [d[0] for d in cursor.description]
+        return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+    finally:
+        conn.close()
+
+def remover_antigas(dias, diretorio=None):
+    """
+    Apaga do índice as buscas com mais de 'dias' e os objetos que ficaram sem referência
+    (só os com mais de uma hora: um scraper grava o objeto antes de registrar a busca).
+    """
+    diretorio = diretorio or DEFAULT_CACHE_DIR
+    limite = (datetime.now() - timedelta(days=dias)).isoformat()
+    conn = conectar_indice(diretorio)
+    try:
+        with conn:
+            buscas = conn.execute("DELETE FROM paginas WHERE buscado_em < ?", (limite,)).rowcount
+        referenciados = {sha256 for (sha256,) in conn.execute("SELECT DISTINCT sha256 FROM paginas")}
+    finally:
+        conn.close()
+    objetos = 0
+    for raiz, _, arquivos in os.walk(os.path.join(diretorio, "objetos")):
+        for nome in arquivos:
+            caminho = os.path.join(raiz, nome)
+            if (nome.endswith(".html.zst") and nome[:-len(".html.zst")] not in referenciados
+                    and os.path.getmtime(caminho) < time.time() - 3600):
+                os.remove(caminho)
+                objetos += 1
+    return buscas, objetos
+
+def resumo(diretorio=None):
+    conn = conectar_indice(diretorio)
+    try:
+        return conn.execute("""
+            SELECT site, tipo, COUNT(*), COUNT(DISTINCT url), COUNT(DISTINCT sha256), MIN(buscado_em), MAX(buscado_em)
+            FROM paginas GROUP BY site, tipo ORDER BY site, tipo
+        """).fetchall(), conn.execute("""
+            SELECT COALESCE(SUM(tamanho), 0), COALESCE(SUM(tamanho_comprimido), 0)
+            FROM (SELECT DISTINCT sha256, tamanho, tamanho_comprimido FROM paginas)
+        """).fetchone()
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo e limpeza do cache de páginas dos scrapers.")
+    parser.add_argument("--diretorio", default=None, help=f"Padrão: PAGE_CACHE_DIR ({DEFAULT_CACHE_DIR}).")
+    parser.add_argument("--remover-dias", type=int, default=None, help="Apaga as buscas com mais de N dias.")
+    args = parser.parse_args()
+
+    if args.remover_dias is not None:
+        buscas, objetos = remover_antigas(args.remover_dias, args.diretorio)
+        print(f"[INFO] {buscas} buscas e {objetos} objetos removidos do cache.")
+
+    grupos, (tamanho, comprimido) = resumo(args.diretorio)
+    print(f"{'site':<10}{'tipo':<12}{'buscas':>8}{'urls':>8}{'objetos':>9}  {'primeira':<25}{'última':<25}")
+    for site, tipo, buscas, urls, objetos, primeira, ultima in grupos:
+        print(f"{site:<10}{tipo:<12}{buscas:>8}{urls:>8}{objetos:>9}  {primeira:<25}{ultima:<25}")
+    if tamanho:
+        print(f"\n[INFO] {tamanho / 1024 / 1024:.1f} MB de HTML em {comprimido / 1024 / 1024:.1f} MB "
+              f"({tamanho / comprimido:.1f}x).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Armazenamento colunar (Parquet) dos lotes raspados e tratados.
+
+Os arquivos ficam particionados no estilo Hive:
+    <PARQUET_DIR>/<camada>/site=<site>/date=<AAAA-MM-DD>/<arquivo>.parquet
+onde a camada é 'raw' (saída dos scrapers) ou 'tratado' (saída do ETL).
+
+Cada coluna é gravada com um tipo explícito (ver COLUMN_KINDS): valores em BRL viram
+float64, anos int16, km/contagens int32 e datas date32. Assim as análises históricas
+leem só as colunas necessárias e não precisam reinterpretar strings como 'R$ 32.000,00'.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+
+# Raiz padrão: PARQUET_DIR (definido no docker-compose) ou data/parquet na raiz do repositório
+DEFAULT_PARQUET_DIR = os.getenv(
+    "PARQUET_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "parquet"),
+)
+DEFAULT_COMPRESSION = "zstd"
+
+LAYER_RAW = "raw"
+LAYER_TRATADO = "tratado"
+
+# Tipo Arrow de cada tipo lógico de coluna
+COLUMN_KINDS = {
+    "string": pa.string(),
+    "brl": pa.float64(),
+    "int": pa.int32(),
+    "year": pa.int16(),
+    "date": pa.date32(),
+}
+
+# Tipos das colunas gravadas pelos scrapers, pelos cabeçalhos atuais (as não listadas ficam
+# como string). CSVs antigos com outros cabeçalhos são renomeados para estes no ETL (etl/specs.py).
+SITE_COLUMN_TYPES = {
+    "leilo": {
+        "veiculo_ano_fabricacao": "year",
+        "veiculo_km": "int",
+        "veiculo_valor_lance_atual": "brl",
+        "veiculo_data_leilao": "date",
+        "veiculo_valor_fipe": "brl",
+    },
+    "loop": {
+        "Ano de Fabricação": "year",
+        "Ano Modelo": "year",
+        "Fipe": "brl",
+        "Km": "int",
+        "Número de Lances": "int",
+        "Número de Visualizações": "int",
+        "Data do Leilão": "date",
+        "Lance Atual": "brl",
+    },
+    "parque": {
+        "km_veiculo": "int",
+        "lance_inicial": "brl",
+        "valor_do_lance": "brl",
+        "data_leilao": "date",
+        "ano_fabricacao_veiculo": "year",
+        "ano_modelo_veiculo": "year",
+        "tabela_fipe_veiculo": "brl",
+        "total_lances": "int",
+        "veiculo_valor_vendido": "brl",
+    },
+}
+
+
+### Conversões vetorizadas (texto raspado -> tipo da coluna)
+
+def _clean_text(series):
+    """Converte para string, tirando espaços e tratando 'N/A'/vazio como nulo."""
+    text = series.astype("string").str.strip()
+    return text.mask(text.isin(["", "N/A", "nan", "None"]))
+
+def parse_brl_series(series):
+    """
+    'R$ 32.000,00' -> 32000.0 e '27500.00' -> 27500.0. Com vírgula é formato brasileiro;
+    sem vírgula, um ponto seguido de 1-2 dígitos no fim é decimal e os demais são de milhar.
+    """
+    text = _clean_text(series).str.replace(r"[R$\s]", "", regex=True)
+    is_brazilian = text.str.contains(",", regex=False, na=False)
+    is_decimal_point = text.str.fullmatch(r"\d+\.\d{1,2}", na=False)
+    normalized = text.where(is_decimal_point, text.str.replace(".", "", regex=False))
+    normalized = normalized.where(~is_brazilian, normalized.str.replace(",", ".", regex=False))
+    return pd.to_numeric(normalized, errors="coerce").astype("float64")
+
+def parse_int_series(series):
+    """'45.223 km' -> 45223."""
+    digits = _clean_text(series).str.replace(r"\D", "", regex=True)
+    return pd.to_numeric(digits.mask(digits == ""), errors="coerce").astype("Int32")
+
+def parse_year_series(series):
+    years = _clean_text(series).str.extract(r"(\d{4})")[0]
+    return pd.to_numeric(years, errors="coerce").astype("Int16")
+
+def parse_date_series(series):
+    """'15/07/2025' -> date(2025, 7, 15)."""
+    return pd.to_datetime(_clean_text(series).str.extract(r"(\d{2}/\d{2}/\d{4})")[0],
+                          format="%d/%m/%Y", errors="coerce").dt.date
+
+CONVERTERS = {
+    "string": _clean_text,
+    "brl": parse_brl_series,
+    "int": parse_int_series,
+    "year": parse_year_series,
+    "date": parse_date_series,
+}
+
+
+def build_table(df, column_types):
+    """Monta uma pyarrow.Table com schema explícito a partir do DataFrame raspado."""
+    converted = {}
+    fields = []
+    for col in df.columns:
+        kind = column_types.get(col, "string")
+        converted[col] = CONVERTERS[kind](df[col])
+        fields.append(pa.field(str(col), COLUMN_KINDS[kind]))
+    return pa.Table.from_pandas(pd.DataFrame(converted, index=df.index), schema=pa.schema(fields), preserve_index=False)
+
+def write_partition(df, site, extraction_date, file_stem, layer=LAYER_RAW, column_types=None,
+                    base_dir=None, compression=DEFAULT_COMPRESSION):
+    """
+    Grava o DataFrame em <base_dir>/<layer>/site=<site>/date=<extraction_date>/<file_stem>.parquet.
+    'column_types' complementa os tipos padrão do site. Retorna o caminho gravado.
+    """
+    types = dict(SITE_COLUMN_TYPES.get(site, {}))
+    types.update(column_types or {})
+    table = build_table(df, types)
+
+    partition_dir = os.path.join(base_dir or DEFAULT_PARQUET_DIR, layer, f"site={site}",
+                                 f"date={extraction_date.strftime('%Y-%m-%d')}")
+    os.makedirs(partition_dir, exist_ok=True)
+    output_path = os.path.join(partition_dir, f"{file_stem}.parquet")
+    pq.write_table(table, output_path, compression=compression)
+    return output_path
+
+def write_records(records, site, extraction_date, file_stem, fieldnames=None, **kwargs):
+    """Atalho para os scrapers: grava a lista de dicionários de lotes (mesmas colunas do CSV)."""
+    df = pd.DataFrame.from_records(records, columns=fieldnames)
+    return write_partition(df, site, extraction_date, file_stem, **kwargs)
+
+def read_lots(site=None, columns=None, layer=LAYER_RAW, base_dir=None, row_filter=None):
+    """
+    Lê a camada como um único dataset (com as colunas 'site' e 'date' das partições),
+    lendo só as colunas pedidas. Arquivos com colunas diferentes são unificados.
+    """
+    root = os.path.join(base_dir or DEFAULT_PARQUET_DIR, layer)
+    if site:
+        root = os.path.join(root, f"site={site}")
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns)
+
+    files = [os.path.join(dirpath, name) for dirpath, _, names in os.walk(root)
+             for name in names if name.endswith(".parquet")]
+    if not files:
+        return pd.DataFrame(columns=columns)
+    partition_schema = pa.schema([pa.field("date", pa.string())] if site else
+                                 [pa.field("site", pa.string()), pa.field("date", pa.string())])
+    schema = pa.unify_schemas([pq.read_schema(path, memory_map=True) for path in files] + [partition_schema])
+    dataset = ds.dataset(root, schema=schema, format="parquet",
+                         partitioning=ds.partitioning(partition_schema, flavor="hive"))
+    df = dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+    if site:
+        # O nível site= fica acima da raiz lida; devolve a coluna para manter o mesmo formato
+        df["site"] = site
+    return df
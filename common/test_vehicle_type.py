@@ -0,0 +1,57 @@
+"""
+Classificador de tipo de veículo sobre a fixture de linhas raspadas e casos de regressão.
+
+    python -m pytest -q common/test_vehicle_type.py
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.vehicle_type import (
+    FIXTURE_PATH, TIPO_CAMINHOES, TIPO_CARROS, TIPO_MOTOS, classify_vehicle_types, determine_vehicle_type,
+    normalize_vehicle_type,
+)
+
+
+def test_fixture_de_linhas_raspadas():
+    fixture = pd.read_csv(FIXTURE_PATH, dtype=str, keep_default_na=False)
+    fixture = fixture.astype(object).where(fixture != "", None)
+    previsto = classify_vehicle_types(fixture["fabricante"], fixture["modelo"], fixture["titulo"])
+    # Só a marca (ex.: HONDA sem modelo nem título) não decide o tipo: essas linhas ficam de fora
+    classificavel = fixture["modelo"].notna() | fixture["titulo"].notna()
+    erros = fixture[classificavel & (previsto != fixture["tipo_esperado"])]
+    assert erros.empty, erros.to_string()
+
+@pytest.mark.parametrize("marca, modelo, titulo, esperado", [
+    # Cilindrada "1.000" não é numeração de caminhão
+    ("VW", "GOL", "VW/GOL 1.000 MI", TIPO_CARROS),
+    ("FIAT", "UNO", "FIAT/UNO MILLE FIRE 1.000", TIPO_CARROS),
+    ("CHEVROLET", "CELTA", "CHEVROLET/CELTA 1.000 SPIRIT", TIPO_CARROS),
+    (None, "29.530", "VOLKSWAGEN 29.530 MTM 23/23", TIPO_CAMINHOES),
+    (None, "TGX", "MAN TGX 29.480 20/20", TIPO_CAMINHOES),
+    ("VOLKSWAGEN", "8.160", "VW 8.160 DELIVERY", TIPO_CAMINHOES),
+    # Palavras-chave de moto/caminhão dentro de nomes de carro
+    ("CHEVROLET", "ZAFIRA", "CHEVROLET/ZAFIRA ELITE", TIPO_CARROS),
+    ("FIAT", "DUCATO", "FIAT/DUCATO CARGO", TIPO_CARROS),
+    ("HYUNDAI", "HR", "HYUNDAI/HR HDB", TIPO_CARROS),
+    # Marca que faz carro e moto: o modelo ou o título decide
+    ("SUZUKI", "BANDIT", "SUZUKI BANDIT 650", TIPO_MOTOS),
+    ("HONDA", None, "HONDA CG 160 FAN 21/22", TIPO_MOTOS),
+    ("HONDA", "2013", "HONDA NX 400I 13/13", TIPO_MOTOS),
+    ("HONDA", "CIVIC", "HONDA CIVIC EXL 2.0", TIPO_CARROS),
+    ("BMW", "F800", "BMW F800 GS", TIPO_MOTOS),
+    ("BMW", "320I", "BMW 320I", TIPO_CARROS),
+])
+def test_casos(marca, modelo, titulo, esperado):
+    assert determine_vehicle_type(marca, modelo, titulo) == esperado
+
+def test_rotulos_do_site():
+    assert normalize_vehicle_type("Motocicleta") == TIPO_MOTOS
+    assert normalize_vehicle_type("veículos") == TIPO_CARROS
+    # Utilitários misturam vans e caminhões: quem decide é o classificador
+    assert normalize_vehicle_type("utilitarios") is None
+    assert normalize_vehicle_type(None) is None
@@ -0,0 +1,328 @@
+"""
+Instrumentação leve por etapa: spans, contadores e histogramas em JSON lines.
+
+Cada serviço (scrapers, ETL, enriquecimento FIPE) chama configurar('<serviço>') no início
+de main() e finalizar() no fim. No meio, o código marca as etapas com
+
+    with tracing.span("pagina.carregar", url=url):
+        driver.get(url)
+
+ou, quando o trecho é grande demais para um bloco 'with', com observar(etapa, segundos).
+Contadores (lotes, retentativas, stale_element, http_429...) usam contar(evento);
+contar_bytes_pagina(driver) soma os bytes baixados pela página aberta no WebDriver.
+
+Cada span vira uma linha em <TRACE_DIR>/<serviço>_<AAAAmmdd_HHMMSS>.jsonl; ao finalizar
+são gravados um resumo por etapa (n, total, p50/p95/máx) e os contadores, também impressos
+no log. Em memória cada etapa ocupa espaço fixo, mesmo nos serviços contínuos (scheduler,
+tracker): n, total, máximo e buckets do histograma são exatos; p50/p95 vêm de uma amostra
+de até AMOSTRAS_POR_ETAPA durações. Se PROMETHEUS_TEXTFILE_DIR estiver definido, o resumo também é exportado no
+formato textfile do node_exporter (<dir>/leilao_<serviço>.prom).
+
+Sem configurar(), as funções só acumulam em memória: importar os módulos instrumentados
+(benchmarks, notebooks) não cria arquivos.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+# Diretório dos arquivos .jsonl; TRACE_DIR vazio desliga a gravação
+DEFAULT_TRACE_DIR = os.getenv(
+    "TRACE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "traces"),
+)
+DEFAULT_TEXTFILE_DIR = os.getenv("PROMETHEUS_TEXTFILE_DIR") or None
+
+# Limites (segundos) dos buckets do histograma exportado para o Prometheus
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Durações guardadas por etapa para os percentis do resumo (amostragem de reservatório)
+AMOSTRAS_POR_ETAPA = 1024
+
+# Bytes recebidos pela rede pelo documento atual desde a última leitura (Performance API).
+# O documento conta uma vez; os recursos lidos são descartados do buffer, para que a rolagem
+# infinita e a paginação sem recarga não sejam somadas de novo. Recursos de outra origem sem
+# Timing-Allow-Origin informam transferSize 0, então o total é um piso.
+SCRIPT_BYTES_PAGINA = """
+    let total = 0;
+    if (!window.__bytesDocumentoContados) {
+        window.__bytesDocumentoContados = true;
+        performance.getEntriesByType('navigation').forEach(e => total += e.transferSize || 0);
+    }
+    performance.getEntriesByType('resource').forEach(e => total += e.transferSize || 0);
+    performance.clearResourceTimings();
+    return total;
+"""
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class DuracoesEtapa:
+    """Durações de uma etapa em espaço fixo: n, total, máximo, buckets e amostra para os percentis."""
+
+    __slots__ = ("n", "total", "maximo", "buckets", "amostra")
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.buckets = [0] * len(HISTOGRAM_BUCKETS)  # não cumulativos; o excedente só entra em n
+        self.amostra = []
+
+    def adicionar(self, segundos):
+        self.n += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+        posicao = bisect_left(HISTOGRAM_BUCKETS, segundos)
+        if posicao < len(self.buckets):
+            self.buckets[posicao] += 1
+        if len(self.amostra) < AMOSTRAS_POR_ETAPA:
+            self.amostra.append(segundos)
+        else:
+            # Cada duração vista fica na amostra com a mesma probabilidade
+            indice = random.randrange(self.n)
+            if indice < AMOSTRAS_POR_ETAPA:
+                self.amostra[indice] = segundos
+
+    def mesclar(self, outra):
+        """Soma outra etapa (de outro processo); a amostra junta as duas na proporção de n."""
+        if len(self.amostra) + len(outra.amostra) > AMOSTRAS_POR_ETAPA:
+            proprias = min(round(AMOSTRAS_POR_ETAPA * self.n / (self.n + outra.n)), len(self.amostra))
+            alheias = min(AMOSTRAS_POR_ETAPA - proprias, len(outra.amostra))
+            self.amostra = random.sample(self.amostra, proprias) + random.sample(outra.amostra, alheias)
+        else:
+            self.amostra = self.amostra + outra.amostra
+        self.n += outra.n
+        self.total += outra.total
+        self.maximo = max(self.maximo, outra.maximo)
+        self.buckets = [a + b for a, b in zip(self.buckets, outra.buckets)]
+
+    def resumo(self):
+        return {
+            "n": self.n,
+            "total_s": round(self.total, 3),
+            "p50_ms": round(_percentil(self.amostra, 50) * 1000, 2),
+            "p95_ms": round(_percentil(self.amostra, 95) * 1000, 2),
+            "max_ms": round(self.maximo * 1000, 2),
+        }
+
+
+class Tracer:
+    """Acumula as durações por etapa e os contadores de um serviço; grava os eventos em JSON lines."""
+
+    def __init__(self, servico, caminho=None, textfile_dir=None):
+        self.servico = servico
+        self.caminho = caminho
+        self.textfile_dir = textfile_dir
+        self.duracoes = defaultdict(DuracoesEtapa)
+        self.contadores = defaultdict(int)
+        self._lock = threading.Lock()
+        self._pilha = threading.local()
+        self._arquivo = None
+        if caminho:
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+            self._arquivo = open(caminho, "a", encoding="utf-8", buffering=1)
+
+    def _gravar(self, evento):
+        if self._arquivo is None:
+            return
+        linha = json.dumps(evento, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._arquivo.write(linha)
+
+    def observar(self, etapa, segundos, pai=None, **atributos):
+        with self._lock:
+            self.duracoes[etapa].adicionar(segundos)
+        evento = {
+            "tipo": "span",
+            "servico": self.servico,
+            "etapa": etapa,
+            "inicio": datetime.now().isoformat(timespec="milliseconds"),
+            "duracao_ms": round(segundos * 1000, 3),
+        }
+        if pai:
+            evento["pai"] = pai
+        evento.update(atributos)
+        self._gravar(evento)
+
+    @contextmanager
+    def span(self, etapa, **atributos):
+        """Mede o bloco; atributos extras podem ser acrescentados no dict devolvido."""
+        pilha = self._pilha.__dict__.setdefault("etapas", [])
+        pai = pilha[-1] if pilha else None
+        pilha.append(etapa)
+        inicio = time.perf_counter()
+        try:
+            yield atributos
+        except BaseException as e:
+            atributos["erro"] = type(e).__name__
+            raise
+        finally:
+            pilha.pop()
+            self.observar(etapa, time.perf_counter() - inicio, pai=pai, **atributos)
+
+    def contar(self, evento, valor=1):
+        with self._lock:
+            self.contadores[evento] += valor
+
+    def registrar(self, tipo, **dados):
+        """Grava no trace um evento avulso (ex.: o resumo do perfil WebDriver)."""
+        self._gravar({"tipo": tipo, "servico": self.servico, **dados})
+
+    def drenar(self):
+        """Devolve e zera o que foi acumulado (usado pelos processos do pool do ETL)."""
+        with self._lock:
+            estado = {"duracoes": dict(self.duracoes), "contadores": dict(self.contadores)}
+            self.duracoes.clear()
+            self.contadores.clear()
+        return estado
+
+    def mesclar(self, estado):
+        with self._lock:
+            for etapa, duracoes in estado["duracoes"].items():
+                self.duracoes[etapa].mesclar(duracoes)
+            for evento, valor in estado["contadores"].items():
+                self.contadores[evento] += valor
+
+    def resumo(self):
+        with self._lock:
+            return {etapa: duracoes.resumo() for etapa, duracoes in sorted(self.duracoes.items()) if duracoes.n}
+
+    def metricas(self):
+        """Resumo por etapa e contadores acumulados até agora (ex.: para o registro em scrape_runs)."""
+        with self._lock:
+            contadores = dict(sorted(self.contadores.items()))
+        return {"etapas": self.resumo(), "contadores": contadores}
+
+    def exportar_prometheus(self, diretorio=None):
+        """Grava o histograma por etapa e os contadores no formato textfile do node_exporter."""
+        diretorio = diretorio or self.textfile_dir
+        if not diretorio:
+            return None
+        with self._lock:
+            duracoes = {etapa: (d.n, d.total, list(d.buckets)) for etapa, d in self.duracoes.items()}
+            contadores = dict(self.contadores)
+
+        linhas = [
+            "# HELP leilao_etapa_segundos Duração das etapas instrumentadas.",
+            "# TYPE leilao_etapa_segundos histogram",
+        ]
+        for etapa, (n, total, buckets) in sorted(duracoes.items()):
+            rotulos = f'servico="{self.servico}",etapa="{etapa}"'
+            acumulado = 0
+            for limite, quantidade in zip(HISTOGRAM_BUCKETS, buckets):
+                acumulado += quantidade
+                linhas.append(f'leilao_etapa_segundos_bucket{{{rotulos},le="{limite}"}} {acumulado}')
+            linhas.append(f'leilao_etapa_segundos_bucket{{{rotulos},le="+Inf"}} {n}')
+            linhas.append(f"leilao_etapa_segundos_sum{{{rotulos}}} {total:.6f}")
+            linhas.append(f"leilao_etapa_segundos_count{{{rotulos}}} {n}")
+        linhas += [
+            "# HELP leilao_eventos_total Eventos contados durante a execução (lotes, retentativas, 429...).",
+            "# TYPE leilao_eventos_total counter",
+        ]
+        for evento, valor in sorted(contadores.items()):
+            linhas.append(f'leilao_eventos_total{{servico="{self.servico}",evento="{evento}"}} {valor}')
+        linhas += [
+            "# HELP leilao_ultima_execucao_timestamp_seconds Fim da última execução do serviço.",
+            "# TYPE leilao_ultima_execucao_timestamp_seconds gauge",
+            f'leilao_ultima_execucao_timestamp_seconds{{servico="{self.servico}"}} {time.time():.0f}',
+        ]
+
+        # Grava num temporário e renomeia: o node_exporter nunca lê um arquivo pela metade
+        os.makedirs(diretorio, exist_ok=True)
+        caminho = os.path.join(diretorio, f"leilao_{self.servico}.prom")
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas) + "\n")
+        os.replace(temporario, caminho)
+        return caminho
+
+    def finalizar(self):
+        """Grava e imprime o resumo, exporta para o Prometheus (se configurado) e fecha o arquivo."""
+        resumo = self.resumo()
+        contadores = dict(sorted(self.contadores.items()))
+        self._gravar({
+            "tipo": "resumo",
+            "servico": self.servico,
+            "fim": datetime.now().isoformat(timespec="seconds"),
+            "etapas": resumo,
+            "contadores": contadores,
+        })
+        if resumo:
+            print(f"\n[INFO] Tempo por etapa ({self.servico}):")
+            print(f"    {'etapa':<28}{'n':>7}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'máx ms':>10}")
+            for etapa, r in resumo.items():
+                print(f"    {etapa:<28}{r['n']:>7}{r['total_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['max_ms']:>10}")
+        if contadores:
+            print(f"[INFO] Contadores ({self.servico}): " + ", ".join(f"{k}={v}" for k, v in contadores.items()))
+        try:
+            caminho_prom = self.exportar_prometheus()
+            if caminho_prom:
+                print(f"[INFO] Métricas exportadas para '{caminho_prom}'.")
+        except OSError as e:
+            print(f"[WARN] Não foi possível exportar as métricas para o Prometheus: {e}")
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+            print(f"[INFO] Trace gravado em '{self.caminho}'.")
+
+
+# Tracer do processo; até configurar() ser chamado, só acumula em memória
+_tracer = Tracer("padrao")
+
+def configurar(servico, caminho=None, trace_dir=None, textfile_dir=None):
+    """
+    Define o tracer do processo. Sem 'caminho', grava em
+    <trace_dir ou TRACE_DIR>/<serviço>_<timestamp>.jsonl (nada, se o diretório for vazio).
+    """
+    global _tracer
+    if caminho is None:
+        trace_dir = DEFAULT_TRACE_DIR if trace_dir is None else trace_dir
+        if trace_dir:
+            caminho = os.path.join(trace_dir, f"{servico}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+    _tracer = Tracer(servico, caminho, textfile_dir or DEFAULT_TEXTFILE_DIR)
+    return _tracer
+
+def obter_tracer():
+    return _tracer
+
+def span(etapa, **atributos):
+    return _tracer.span(etapa, **atributos)
+
+def observar(etapa, segundos, **atributos):
+    _tracer.observar(etapa, segundos, **atributos)
+
+def contar(evento, valor=1):
+    _tracer.contar(evento, valor)
+
+def drenar():
+    return _tracer.drenar()
+
+def mesclar(estado):
+    _tracer.mesclar(estado)
+
+def registrar(tipo, **dados):
+    _tracer.registrar(tipo, **dados)
+
+def metricas():
+    return _tracer.metricas()
+
+def contar_bytes_pagina(driver, evento="bytes_baixados"):
+    """Soma em 'evento' os bytes baixados pela página aberta no WebDriver; chame antes de sair dela."""
+    try:
+        total = int(driver.execute_script(SCRIPT_BYTES_PAGINA) or 0)
+    except Exception:
+        return 0
+    _tracer.contar(evento, total)
+    return total
+
+def finalizar():
+    _tracer.finalizar()
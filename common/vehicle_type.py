@@ -0,0 +1,203 @@
+"""
+Classificação do tipo de veículo (carros, motos, caminhoes) a partir de marca, modelo e título.
+
+As palavras-chave são compiladas em uma única regex de alternância com grupos nomeados
+e aplicadas com um só 'str.extract' sobre a coluna inteira. A primeira palavra-chave
+encontrada (da esquerda para a direita em "marca modelo título") decide o tipo; por isso as
+marcas exclusivas de um tipo sempre vencem, e modelos de carro conhecidos (ex.: Ducato
+Cargo) podem anular uma palavra-chave de caminhão que apareça depois. O título entra por
+último: nas linhas raspadas a marca costuma vir vazia e o modelo às vezes é só o ano
+("HONDA", "2013" / "HONDA NX 400I 13/13"), e só o título diz o que é o veículo.
+
+A fixture (common/fixtures/vehicle_types.csv) são linhas reais dos CSVs raspados, rotuladas
+pela categoria do próprio site (coluna 'origem': o campo de tipo ou, no Leilo, a categoria do
+link); os utilitários do Parque, que misturam vans e caminhões, foram rotulados à mão. Ela é
+verificada por common/test_vehicle_type.py, junto com casos de regressão fora dela.
+
+Uso como script (mede acurácia e velocidade na fixture rotulada):
+    python -m common.vehicle_type [--linhas 100000]
+"""
+import argparse
+import os
+import re
+import time
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+TIPO_CARROS = "carros"
+TIPO_MOTOS = "motos"
+TIPO_CAMINHOES = "caminhoes"
+
+# Fixture rotulada (fabricante, modelo, titulo, tipo_esperado, origem) usada para medir acurácia e velocidade
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "vehicle_types.csv")
+
+# Cada entrada é um fragmento de regex aplicado sobre o texto normalizado "marca modelo título"
+# (minúsculo, sem acentos). Marcas que fabricam mais de um tipo (Honda, Suzuki, BMW, Volvo,
+# Mercedes-Benz, Volkswagen...) não entram aqui; nesses casos quem decide é o modelo.
+MOTO_KEYWORDS = [
+    # Marcas exclusivas de motos
+    r"yamaha", r"kawasaki", r"harley(?:-davidson)?", r"triumph", r"ducati", r"dafra", r"shineray",
+    r"haojue", r"royal enfield", r"ktm", r"kasinski", r"traxx", r"sundown", r"mv agusta", r"bajaj", r"kymco",
+    # Termos genéricos
+    r"moto", r"motocicleta", r"motoneta", r"scooter", r"ciclomotor",
+    # Modelos
+    r"cg", r"biz", r"pop", r"titan", r"fan", r"cbr?\d*[a-z]?", r"cbx", r"xre", r"bros", r"nxr", r"pcx",
+    r"elite", r"twister", r"hornet", r"sahara", r"falcon", r"fazer", r"factor", r"lander", r"crosser",
+    r"ybr", r"xtz", r"nmax", r"xmax", r"mt-?0\d", r"tenere", r"xj6", r"ninja", r"z\d{3,4}", r"versys",
+    r"gsx\S*", r"gs", r"v-strom", r"intruder", r"burgman", r"yes", r"bandit", r"adv", r"neo", r"fluo",
+    r"fz\d{2}", r"nx ?4\d{2}i?", r"vfr", r"vt ?\d{3,4}\w*", r"shadow", r"apache", r"vulcan", r"himalayan",
+    r"agility", r"txr",
+    # Motos BMW: letra de série seguida da cilindrada (R 1250 GS, F 850 GS, G 310 R)
+    r"bmw [rfgks] ?\d{3,4}",
+]
+
+CAMINHAO_KEYWORDS = [
+    # Marcas exclusivas de caminhões
+    r"scania", r"iveco", r"daf", r"agrale", r"international",
+    # Termos genéricos
+    r"caminhao", r"cavalo mecanico", r"vuc", r"truck",
+    # Modelos
+    r"cargo", r"accelo", r"atego", r"axor", r"actros", r"constellation", r"delivery", r"worker",
+    r"tector", r"stralis", r"daily", r"fh", r"fm", r"vm", r"nh", r"meteor", r"tgx", r"crc", r"xf", r"cf\d*",
+    r"l ?1\d{3}", r"f-?[1-9]\d{3}",
+    # Volkswagen/MAN pela numeração peso/potência logo após a marca (VOLKSWAGEN 24.250, MAN 29.480).
+    # Sozinho, "1.000" é cilindrada de carro (GOL 1.000 MI); por isso o número exige a marca antes.
+    r"(?:volkswagen|vw|man) (?:[5-9]|[1-3]\d)\.\d{3}",
+    # Implementos pelo fabricante
+    r"semi ?reboque", r"facchini", r"randon", r"librelato", r"noma", r"niju",
+]
+
+# Modelos de carro/utilitário que contêm palavras-chave de caminhão ou de moto (ex.: "DUCATO
+# CARGO", "ZAFIRA ELITE"). Como a primeira correspondência vence, listá-los aqui evita o falso
+# positivo. HR e Bongo ficam como carros: a FIPE os lista em carros e o Leilo os anuncia assim.
+CARRO_KEYWORDS = [
+    r"ducato", r"fiorino", r"doblo", r"kangoo", r"sprinter", r"master", r"jumper", r"boxer",
+    r"civic", r"city", r"fit", r"accord", r"hr-v", r"wr-v", r"cr-v", r"hr", r"bongo", r"zafira", r"dolphin",
+]
+
+# Rótulos de tipo usados pelos sites/tabelas e o tipo canônico correspondente.
+# "Utilitários" no Parque mistura vans (carros na FIPE) e caminhões: o rótulo não decide
+# (None) e o tipo sai da marca/modelo.
+TIPO_ALIASES = {
+    "carro": TIPO_CARROS, "carros": TIPO_CARROS, "veiculo": TIPO_CARROS, "veiculos": TIPO_CARROS,
+    "passeio": TIPO_CARROS, "utilitario": None, "utilitarios": None,
+    "moto": TIPO_MOTOS, "motos": TIPO_MOTOS, "motocicleta": TIPO_MOTOS, "motocicletas": TIPO_MOTOS,
+    "caminhao": TIPO_CAMINHOES, "caminhoes": TIPO_CAMINHOES, "pesados": TIPO_CAMINHOES,
+}
+
+
+def _build_pattern():
+    """Monta a regex única: um grupo nomeado por tipo, cada um com a alternância das suas palavras-chave."""
+    groups = []
+    for group_name, keywords in (("carro", CARRO_KEYWORDS), ("moto", MOTO_KEYWORDS), ("caminhao", CAMINHAO_KEYWORDS)):
+        # Alternativas mais longas primeiro, para "harley-davidson" não parar em "harley"
+        alternation = "|".join(sorted(keywords, key=len, reverse=True))
+        groups.append(f"(?P<{group_name}>{alternation})")
+    return re.compile(r"(?<![\w-])(?:" + "|".join(groups) + r")(?!\w)")
+
+VEHICLE_TYPE_PATTERN = _build_pattern()
+
+
+def _normalize_text(series):
+    """Minúsculas, sem acentos e com espaços simples (vetorizado)."""
+    return (series.fillna("").astype(str)
+            .str.normalize("NFKD").str.encode("ascii", errors="ignore").str.decode("ascii")
+            .str.lower()
+            .str.replace(r"[^a-z0-9\s.-]", " ", regex=True)
+            .str.replace(r"\s+", " ", regex=True)
+            .str.strip())
+
+def classify_vehicle_types(marcas, modelos, titulos=None):
+    """
+    Classifica em lote. Recebe sequências alinhadas de marca, modelo e (opcional) título
+    e devolve uma Series de 'carros', 'motos' ou 'caminhoes' (padrão: carros).
+    """
+    marcas = pd.Series(marcas, dtype="object").reset_index(drop=True)
+    modelos = pd.Series(modelos, dtype="object").reset_index(drop=True)
+    titulos = pd.Series(titulos if titulos is not None else [None] * len(marcas), dtype="object").reset_index(drop=True)
+    if marcas.empty:
+        return pd.Series([], dtype="object")
+
+    # Lotes repetem muito as mesmas combinações: normaliza e aplica a regex só uma vez por combinação
+    codes, uniques = pd.factorize(marcas.fillna("").astype(str) + "\x1f" + modelos.fillna("").astype(str)
+                                  + "\x1f" + titulos.fillna("").astype(str))
+    partes = pd.Series(uniques).str.split("\x1f", n=2, expand=True)
+    text = _normalize_text(partes[0]) + " " + _normalize_text(partes[1]) + " " + _normalize_text(partes[2])
+
+    matches = text.str.extract(VEHICLE_TYPE_PATTERN)
+    tipos = np.select(
+        [matches["moto"].notna().to_numpy(), matches["caminhao"].notna().to_numpy()],
+        [TIPO_MOTOS, TIPO_CAMINHOES],
+        default=TIPO_CARROS,
+    ).astype(object)
+    return pd.Series(tipos[codes], index=marcas.index, dtype="object")
+
+def determine_vehicle_type(brand_name, model_name, title=None):
+    """Versão escalar de 'classify_vehicle_types', para classificar um único veículo."""
+    return classify_vehicle_types([brand_name], [model_name], [title]).iloc[0]
+
+def normalize_vehicle_type(label):
+    """
+    Converte o rótulo de tipo usado por um site ('motocicleta', 'veiculos'...) para o tipo
+    canônico. Retorna None se o rótulo não for reconhecido ou não decidir o tipo ('utilitarios').
+    """
+    if not isinstance(label, str):
+        return None
+    key = unicodedata.normalize("NFKD", label).encode("ascii", "ignore").decode("ascii").strip().lower()
+    return TIPO_ALIASES.get(key)
+
+
+def _legacy_determine_vehicle_type(brand_name, model_name):
+    """Classificador antigo (varredura de palavras-chave linha a linha), mantido só para comparação."""
+    brand_name_lower = brand_name.lower() if brand_name else ''
+    model_name_lower = model_name.lower() if model_name else ''
+    moto_keywords = ["moto", "honda", "yamaha", "suzuki", "kawasaki", "bmw gs", "triumph", "harley"]
+    if any(keyword in brand_name_lower or keyword in model_name_lower for keyword in moto_keywords):
+        return "motos"
+    caminhao_keywords = ["caminhao", "mercedes benz caminhao", "volkswagen caminhao", "iveco", "scania", "volvo caminhao", "ford cargo", "agrle"]
+    if any(keyword in brand_name_lower or keyword in model_name_lower for keyword in caminhao_keywords):
+        return "caminhoes"
+    return "carros"
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede acurácia e velocidade do classificador de tipo de veículo.")
+    parser.add_argument("--fixture", default=FIXTURE_PATH, help="CSV rotulado com fabricante, modelo, titulo e tipo_esperado.")
+    parser.add_argument("--linhas", type=int, default=100000, help="Quantidade de linhas para o teste de velocidade.")
+    args = parser.parse_args()
+
+    # Campos vazios viram None, como chegam do banco
+    fixture = pd.read_csv(args.fixture, dtype=str, keep_default_na=False)
+    fixture = fixture.astype(object).where(fixture != "", None)
+    esperado = fixture["tipo_esperado"]
+
+    previsto = classify_vehicle_types(fixture["fabricante"], fixture["modelo"], fixture["titulo"])
+    # O classificador antigo só vê marca/modelo
+    legado = fixture.apply(lambda r: _legacy_determine_vehicle_type(r["fabricante"], r["modelo"]), axis=1)
+    print(f"[INFO] Fixture: {len(fixture)} veículos rotulados.")
+    print(f"[INFO] Acurácia (novo):   {(previsto == esperado).mean():.1%}")
+    print(f"[INFO] Acurácia (antigo): {(legado == esperado).mean():.1%}")
+    erros = fixture[previsto != esperado]
+    for _, row in erros.iterrows():
+        print(f"[WARN] Erro ({row['origem']}): {row['fabricante']} | {row['modelo']} | {row['titulo']} "
+              f"-> esperado {row['tipo_esperado']}, previsto {previsto[row.name]}")
+
+    repeticoes = max(1, args.linhas // len(fixture))
+    grande = pd.concat([fixture] * repeticoes, ignore_index=True)
+
+    inicio = time.perf_counter()
+    classify_vehicle_types(grande["fabricante"], grande["modelo"], grande["titulo"])
+    tempo_novo = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    [_legacy_determine_vehicle_type(m, md) for m, md in zip(grande["fabricante"], grande["modelo"])]
+    tempo_legado = time.perf_counter() - inicio
+
+    print(f"[INFO] Velocidade em {len(grande)} linhas: novo {len(grande) / tempo_novo:,.0f} linhas/s, "
+          f"antigo {len(grande) / tempo_legado:,.0f} linhas/s.")
+
+
+if __name__ == "__main__":
+    main()
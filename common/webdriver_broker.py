@@ -0,0 +1,271 @@
+"""
+Sessões WebDriver dos scrapers e do scheduler sobre um ou mais endpoints do Selenium.
+
+SELENIUM_URLS lista os endpoints (o standalone do docker-compose e/ou o hub do perfil 'grid').
+Antes de abrir uma sessão o broker consulta o /status de cada um e escolhe o que tem mais slots
+livres; endpoint que não responde ou recusa a sessão fica de fora por um tempo que dobra a cada
+falha. As tentativas (SELENIUM_CONNECT_TRIES) passam pelos endpoints em vez de insistir num só.
+
+Cada sessão é reaproveitada até SELENIUM_PAGES_PER_SESSION páginas (driver.get) e então trocada
+por uma nova, para conter a memória que o Chrome acumula numa raspagem longa. A troca só acontece
+em renovar(driver), chamado pelo scraper onde a página atual pode ser descartada (antes de abrir
+um lote); perto do limite a próxima sessão já é aberta em segundo plano, se houver slot livre.
+
+    broker = BrokerSessoes(options, ao_criar=lambda d: d.implicitly_wait(1))
+    driver = broker.obter()
+    ...
+    driver = broker.renovar(driver)   # mesma sessão, ou outra se passou do limite ou morreu
+    driver.get(link)
+    ...
+    broker.encerrar()                 # no finally, no lugar de driver.quit()
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from common import tracing
+from common import webdriver_profiler
+from common.logging_setup import amostrar, obter_logger
+
+# Endpoints do Selenium (standalone ou hub), separados por vírgula
+SELENIUM_URLS = [url.strip() for url in os.getenv("SELENIUM_URLS", os.getenv("SELENIUM_URL", "http://selenium:4444/wd/hub")).split(",")
+                 if url.strip()]
+# Páginas carregadas numa sessão antes de trocá-la por outra (0 desliga a troca)
+DEFAULT_PAGES_PER_SESSION = int(os.getenv("SELENIUM_PAGES_PER_SESSION", "150"))
+DEFAULT_TRIES = int(os.getenv("SELENIUM_CONNECT_TRIES", "10"))
+DEFAULT_RETRY_SECONDS = float(os.getenv("SELENIUM_RETRY_SECONDS", "3"))
+# Fração do limite de páginas em que a próxima sessão começa a ser aberta em segundo plano
+AQUECER_EM = 0.9
+STATUS_TIMEOUT_S = 3
+# Maior tempo de um endpoint fora da escolha depois de falhas seguidas
+ESPERA_MAXIMA_S = 60
+
+logger = obter_logger("webdriver")
+
+
+class NoSelenium:
+    """Um endpoint do Selenium: saúde (/status) e afastamento após falhas."""
+
+    def __init__(self, url):
+        self.url = url
+        self.falhas = 0
+        self.fora_ate = 0.0
+        self.sessoes = 0  # sessões abertas por este processo
+
+    def disponivel(self):
+        return time.monotonic() >= self.fora_ate
+
+    def status(self):
+        """Slots livres informados pelo endpoint; None se ele não respondeu ou não está pronto."""
+        try:
+            with urllib.request.urlopen(self.url.rstrip("/") + "/status", timeout=STATUS_TIMEOUT_S) as resposta:
+                valor = json.load(resposta).get("value", {})
+        except Exception as e:
+            self.falhou(f"/status: {e}")
+            return None
+        if not valor.get("ready"):
+            self.falhou(valor.get("message") or "não está pronto")
+            return None
+        nos = valor.get("nodes")
+        if not nos:
+            return 1
+        return sum(1 for no in nos if no.get("availability", "UP") == "UP"
+                   for slot in no.get("slots", []) if not slot.get("session"))
+
+    def falhou(self, motivo):
+        self.falhas += 1
+        self.fora_ate = time.monotonic() + min(DEFAULT_RETRY_SECONDS * 2 ** (self.falhas - 1), ESPERA_MAXIMA_S)
+        tracing.contar("selenium_falhas_no")
+        logger.warning("Selenium em %s indisponível (%s); fora da escolha por %.0fs.", self.url, motivo,
+                       self.fora_ate - time.monotonic(), extra=amostrar(f"webdriver.no.{self.url}"))
+
+    def ok(self):
+        self.falhas = 0
+        self.fora_ate = 0.0
+
+
+class Sessao:
+    __slots__ = ("driver", "no", "paginas", "aquecida")
+
+    def __init__(self, driver, no):
+        self.driver = driver
+        self.no = no
+        self.paginas = 0
+        self.aquecida = False  # a sucessora já foi pedida em segundo plano
+
+
+class BrokerSessoes:
+    def __init__(self, opcoes, urls=None, paginas_por_sessao=DEFAULT_PAGES_PER_SESSION, tentativas=DEFAULT_TRIES,
+                 espera_s=DEFAULT_RETRY_SECONDS, ao_criar=None):
+        self.opcoes = opcoes
+        self.nos = [NoSelenium(url) for url in (urls or SELENIUM_URLS)]
+        self.paginas_por_sessao = paginas_por_sessao
+        self.tentativas = tentativas
+        self.espera_s = espera_s
+        self.ao_criar = ao_criar
+        self._sessoes = {}  # session_id -> Sessao entregue
+        self._reserva = None
+        self._aquecendo = None
+        self._lock = threading.Lock()
+        self.estatisticas = {"criadas": 0, "recicladas": 0, "mortas": 0, "aquecidas": 0}
+
+    ### Escolha do endpoint e abertura da sessão
+
+    def _escolher_no(self, exigir_slot=False):
+        melhor = None
+        for no in self.nos:
+            if not no.disponivel():
+                continue
+            livres = no.status()
+            if livres is None or (exigir_slot and livres <= 0):
+                continue
+            chave = (livres > 0, livres - no.sessoes, -no.sessoes)
+            if melhor is None or chave > melhor[0]:
+                melhor = (chave, no)
+        return melhor[1] if melhor else None
+
+    def _abrir(self, no):
+        driver = webdriver_profiler.perfilar(webdriver.Remote(command_executor=no.url, options=self.opcoes))
+        if self.ao_criar:
+            self.ao_criar(driver)
+        no.ok()
+        no.sessoes += 1
+        sessao = Sessao(driver, no)
+        get_original = driver.get
+
+        # driver.get conta as páginas da sessão (o limite só é aplicado em renovar)
+        def get(url):
+            sessao.paginas += 1
+            if self.paginas_por_sessao and not sessao.aquecida and sessao.paginas >= self.paginas_por_sessao * AQUECER_EM:
+                sessao.aquecida = True
+                self._aquecer()
+            return get_original(url)
+
+        driver.get = get
+        with self._lock:
+            self.estatisticas["criadas"] += 1
+        tracing.contar("selenium_sessoes")
+        return sessao
+
+    def _nova_sessao(self):
+        for tentativa in range(self.tentativas):
+            no = self._escolher_no()
+            if no is None:
+                print(f"[WARN] Nenhum Selenium disponível ({tentativa + 1}/{self.tentativas}).")
+            else:
+                print(f"[INFO] Tentando conectar ao Selenium em {no.url} ({tentativa + 1}/{self.tentativas})...")
+                try:
+                    sessao = self._abrir(no)
+                    print(f"[INFO] Conectado ao Selenium em {no.url}.")
+                    return sessao
+                except WebDriverException as e:
+                    no.falhou(e.msg or type(e).__name__)
+            if tentativa + 1 < self.tentativas:
+                tracing.contar("retentativas")
+                time.sleep(self.espera_s)
+        raise WebDriverException(f"Nenhum Selenium aceitou a sessão após {self.tentativas} tentativas ({', '.join(n.url for n in self.nos)}).")
+
+    def _aquecer(self):
+        """Abre a próxima sessão numa thread, se nenhuma estiver pronta ou abrindo e houver slot livre."""
+        with self._lock:
+            if self._reserva is not None or self._aquecendo is not None:
+                return
+            self._aquecendo = threading.Thread(target=self._abrir_reserva, name="webdriver-reserva", daemon=True)
+            self._aquecendo.start()
+
+    def _abrir_reserva(self):
+        sessao = None
+        no = self._escolher_no(exigir_slot=True)
+        if no is not None:
+            try:
+                sessao = self._abrir(no)
+            except WebDriverException as e:
+                no.falhou(e.msg or type(e).__name__)
+        with self._lock:
+            self._reserva = sessao
+            self._aquecendo = None
+
+    def _tomar_reserva(self):
+        thread = self._aquecendo
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            sessao, self._reserva = self._reserva, None
+        if sessao is not None and not self._viva(sessao):
+            self._fechar(sessao)
+            return None
+        if sessao is not None:
+            self.estatisticas["aquecidas"] += 1
+        return sessao
+
+    ### Sessões entregues
+
+    def _viva(self, sessao):
+        try:
+            sessao.driver.execute_script("return document.readyState")
+            return True
+        except Exception:
+            return False
+
+    def _fechar(self, sessao):
+        sessao.no.sessoes -= 1
+        try:
+            sessao.driver.quit()
+        except Exception:
+            pass
+
+    def _entregar(self, sessao):
+        self._sessoes[sessao.driver.session_id] = sessao
+        return sessao.driver
+
+    def obter(self):
+        """Sessão aberta (a reserva aquecida, se houver); WebDriverException se nenhum endpoint aceitou."""
+        return self._entregar(self._tomar_reserva() or self._nova_sessao())
+
+    def renovar(self, driver):
+        """
+        O próprio driver, ou outro no lugar dele se a sessão passou de paginas_por_sessao páginas
+        ou não responde mais. Chame só onde a página aberta pode ser perdida.
+        """
+        sessao = self._sessoes.get(driver.session_id)
+        if sessao is None:
+            return driver
+        limite = self.paginas_por_sessao and sessao.paginas >= self.paginas_por_sessao
+        if not limite and self._viva(sessao):
+            return driver
+        if limite:
+            self.estatisticas["recicladas"] += 1
+            tracing.contar("selenium_recicladas")
+            logger.info("Sessão %s trocada após %d páginas.", driver.session_id, sessao.paginas,
+                        extra=amostrar("webdriver.reciclada"))
+        else:
+            self.estatisticas["mortas"] += 1
+            tracing.contar("selenium_mortas")
+            print(f"[WARN] Sessão do Selenium em {sessao.no.url} não responde; abrindo outra.")
+        self.descartar(driver)
+        # A antiga sai antes: num endpoint de um slot só a reserva (ou a nova) pega a vaga dela
+        return self.obter()
+
+    def descartar(self, driver):
+        sessao = self._sessoes.pop(driver.session_id, None)
+        if sessao is not None:
+            self._fechar(sessao)
+
+    def encerrar(self):
+        """Fecha as sessões entregues e a reserva."""
+        for sessao in list(self._sessoes.values()):
+            self._fechar(sessao)
+        self._sessoes.clear()
+        if self._aquecendo is not None:
+            self._aquecendo.join()
+        if self._reserva is not None:
+            self._fechar(self._reserva)
+            self._reserva = None
+        e = self.estatisticas
+        print(f"[INFO] Sessões do Selenium: {e['criadas']} abertas ({e['aquecidas']} em segundo plano), "
+              f"{e['recicladas']} trocadas pelo limite de páginas, {e['mortas']} perdidas.")
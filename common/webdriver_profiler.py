@@ -0,0 +1,191 @@
+"""
+Perfil dos comandos WebDriver dos scrapers (opcional, ligado por WEBDRIVER_PROFILE=1).
+
+Todo comando do Selenium (find_element, .text, get_attribute, execute_script,
+switch_to.window...) passa por WebDriver.execute; perfilar(driver) envolve esse método
+na instância e conta/mede cada comando por tipo e pelo local de chamada no scraper
+(arquivo:função, ex.: 'scraper.py:safe_get_element_text'). Desligado, perfilar()
+devolve o driver intacto e as demais funções não fazem nada.
+
+    driver = webdriver_profiler.perfilar(webdriver.Remote(...))
+    with webdriver_profiler.lote(link):       # ou iniciar_lote(link) / encerrar_lote()
+        ...
+    webdriver_profiler.finalizar()           # antes de tracing.finalizar()
+
+Cada lote vira um span 'webdriver.lote' no trace (comandos, tempo e os comandos mais
+frequentes); no fim são impressas as tabelas por comando e por local de chamada, o resumo
+completo vai para o trace e os totais entram nos contadores (webdriver_comandos/erros).
+"""
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from common import tracing
+from common.logging_setup import amostrar, obter_logger
+
+DEFAULT_ENABLED = os.getenv("WEBDRIVER_PROFILE", "0") == "1"
+# Linhas das tabelas impressas no fim da execução
+TOP_N = int(os.getenv("WEBDRIVER_PROFILE_TOP", "15"))
+
+logger = obter_logger("webdriver")
+
+# Frames do próprio Selenium e deste módulo não contam como local de chamada
+_IGNORADOS = (f"{os.sep}selenium{os.sep}", os.path.abspath(__file__))
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+def _local_de_chamada(frame):
+    while frame is not None:
+        arquivo = frame.f_code.co_filename
+        if not any(trecho in arquivo for trecho in _IGNORADOS):
+            return f"{os.path.basename(arquivo)}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+class PerfilWebDriver:
+    """Acumula duração e erros por (comando, local de chamada) e por lote."""
+
+    def __init__(self, servico):
+        self.servico = servico
+        self.duracoes = defaultdict(list)      # comando -> [segundos, ...]
+        self.por_local = defaultdict(lambda: [0, 0.0, 0])  # (comando, local) -> [n, segundos, erros]
+        self.erros = Counter()
+        self._lock = threading.Lock()
+        self._lote = None
+
+    def instalar(self, driver):
+        execute_original = driver.execute
+
+        def execute(driver_command, params=None):
+            local = _local_de_chamada(sys._getframe(1))
+            inicio = time.perf_counter()
+            falhou = False
+            try:
+                return execute_original(driver_command, params)
+            except Exception:
+                falhou = True
+                raise
+            finally:
+                self.registrar(driver_command, local, time.perf_counter() - inicio, falhou)
+
+        # WebElement chama parent.execute: o atributo na instância cobre os elementos também
+        driver.execute = execute
+        return driver
+
+    def registrar(self, comando, local, segundos, falhou=False):
+        with self._lock:
+            self.duracoes[comando].append(segundos)
+            estatistica = self.por_local[(comando, local)]
+            estatistica[0] += 1
+            estatistica[1] += segundos
+            if falhou:
+                estatistica[2] += 1
+                self.erros[comando] += 1
+            if self._lote is not None:
+                self._lote["comandos"][comando] += 1
+                self._lote["segundos"] += segundos
+
+    def iniciar_lote(self, rotulo):
+        if self._lote is not None:
+            self.encerrar_lote()
+        self._lote = {"rotulo": rotulo, "inicio": time.perf_counter(), "comandos": Counter(), "segundos": 0.0}
+
+    def encerrar_lote(self):
+        lote, self._lote = self._lote, None
+        if lote is None:
+            return
+        total = sum(lote["comandos"].values())
+        duracao = time.perf_counter() - lote["inicio"]
+        mais_frequentes = dict(lote["comandos"].most_common(5))
+        tracing.observar("webdriver.lote", lote["segundos"], lote=lote["rotulo"], comandos=total,
+                         duracao_lote_ms=round(duracao * 1000, 1), mais_frequentes=mais_frequentes)
+        logger.info("Lote %s: %d comandos WebDriver, %.2fs em comandos de %.2fs no lote (%s)", lote["rotulo"], total,
+                    lote["segundos"], duracao, mais_frequentes, extra=amostrar("webdriver.lote"))
+
+    def resumo(self):
+        with self._lock:
+            duracoes = {comando: list(valores) for comando, valores in self.duracoes.items()}
+            por_local = {chave: list(valor) for chave, valor in self.por_local.items()}
+            erros = dict(self.erros)
+        por_comando = {
+            comando: {
+                "n": len(valores),
+                "total_s": round(sum(valores), 3),
+                "p50_ms": round(_percentil(valores, 50) * 1000, 2),
+                "p95_ms": round(_percentil(valores, 95) * 1000, 2),
+                "erros": erros.get(comando, 0),
+            }
+            for comando, valores in sorted(duracoes.items(), key=lambda item: -sum(item[1]))
+        }
+        locais = [
+            {"comando": comando, "local": local, "n": n, "total_s": round(segundos, 3), "erros": falhas}
+            for (comando, local), (n, segundos, falhas) in sorted(por_local.items(), key=lambda item: -item[1][1])
+        ]
+        return {"por_comando": por_comando, "por_local": locais}
+
+    def finalizar(self):
+        """Fecha o lote aberto, imprime as tabelas, grava o resumo no trace e soma os contadores."""
+        self.encerrar_lote()
+        resumo = self.resumo()
+        if not resumo["por_comando"]:
+            return resumo
+        total_comandos = sum(r["n"] for r in resumo["por_comando"].values())
+        total_erros = sum(r["erros"] for r in resumo["por_comando"].values())
+        print(f"\n[INFO] Comandos WebDriver ({self.servico}): {total_comandos} comandos, "
+              f"{sum(r['total_s'] for r in resumo['por_comando'].values()):.1f}s, {total_erros} com erro")
+        print(f"    {'comando':<28}{'n':>8}{'total s':>10}{'p50 ms':>10}{'p95 ms':>10}{'erros':>8}")
+        for comando, r in list(resumo["por_comando"].items())[:TOP_N]:
+            print(f"    {comando:<28}{r['n']:>8}{r['total_s']:>10}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['erros']:>8}")
+        print(f"    {'local de chamada':<48}{'comando':<24}{'n':>8}{'total s':>10}{'erros':>8}")
+        for r in resumo["por_local"][:TOP_N]:
+            print(f"    {r['local']:<48}{r['comando']:<24}{r['n']:>8}{r['total_s']:>10}{r['erros']:>8}")
+        tracing.registrar("webdriver", **resumo)
+        tracing.contar("webdriver_comandos", total_comandos)
+        tracing.contar("webdriver_erros", total_erros)
+        return resumo
+
+
+# Perfil do processo; None enquanto perfilar() não for chamado com o perfil ligado
+_perfil = None
+
+def perfilar(driver, servico=None, ativo=None):
+    """Instala o perfil no driver se WEBDRIVER_PROFILE=1 (ou ativo=True); devolve o próprio driver."""
+    global _perfil
+    if not (DEFAULT_ENABLED if ativo is None else ativo):
+        return driver
+    if _perfil is None:
+        _perfil = PerfilWebDriver(servico or tracing.obter_tracer().servico)
+        print(f"[INFO] Perfil de comandos WebDriver ativo ({_perfil.servico}).")
+    return _perfil.instalar(driver)
+
+def obter_perfil():
+    return _perfil
+
+def iniciar_lote(rotulo):
+    if _perfil is not None:
+        _perfil.iniciar_lote(rotulo)
+
+def encerrar_lote():
+    if _perfil is not None:
+        _perfil.encerrar_lote()
+
+@contextmanager
+def lote(rotulo):
+    iniciar_lote(rotulo)
+    try:
+        yield
+    finally:
+        encerrar_lote()
+
+def finalizar():
+    if _perfil is not None:
+        return _perfil.finalizar()
+    return None
@@ -1,11 +1,21 @@
+import csv
+import io
+import json
+import socket
+
 import psycopg2
 from psycopg2 import sql
 from psycopg2.errors import DuplicateTable, UndefinedTable
+from psycopg2.extras import Json, execute_values
 from datetime import datetime
 import re 
 
 # Importação RELATIVA CORRETA para db_config
 from .db_config import DB_HOST, DB_NAME, DB_USER, DB_PASSWORD, DB_PORT
+# Mensagens por linha inserida: nível DEBUG ou amostradas (common/logging_setup.py)
+from common.logging_setup import amostrar, obter_logger
+
+logger = obter_logger("db")
 
 def connect_db():
     """Conecta ao banco de dados PostgreSQL e retorna o objeto de conexão."""
@@ -26,6 +36,220 @@ def connect_db():
         print(f"[ERRO] Não foi possível conectar ao PostgreSQL: {e}")
         return None
 
+### Conversão e escrita dos lotes raspados
+
+# Colunas gravadas em cada tabela de lotes e como o texto raspado é convertido:
+# 'numericas' viram float (formato 'R$ 1.234,56'), 'inteiras' ficam só com os dígitos e
+# 'km_texto' guarda o km como texto numérico. 'conflito' é a chave do upsert, quando há.
+INSERT_TABLES = {
+    "parque_leiloes_oficial": {
+        "colunas": [
+            "veiculo_titulo", "veiculo_link_lote", "veiculo_imagem", "veiculo_km", "veiculo_lance_inicial",
+            "veiculo_valor_lance_atual", "veiculo_data_leilao", "veiculo_fabricante", "veiculo_final_placa",
+            "veiculo_ano_fabricacao", "veiculo_ano_modelo", "veiculo_possui_chave", "veiculo_condicao_motor",
+            "veiculo_valor_fipe", "veiculo_tipo_combustivel", "veiculo_tipo_retomada", "veiculo_tipo",
+            "veiculo_total_lances", "veiculo_modelo", "veiculo_valor_vendido", "veiculo_patio_uf",
+            "veiculo_categoria_site", "run_id",
+        ],
+        "numericas": ["veiculo_lance_inicial", "veiculo_valor_lance_atual", "veiculo_valor_fipe", "veiculo_valor_vendido", "veiculo_km"],
+        "inteiras": ["veiculo_total_lances", "veiculo_ano_fabricacao", "veiculo_ano_modelo"],
+        "km_texto": False,
+        "conflito": None,
+    },
+    "leilo": {
+        "colunas": [
+            "veiculo_titulo", "veiculo_link_lote", "veiculo_imagem", "veiculo_patio_uf", "veiculo_ano_fabricacao",
+            "veiculo_km", "veiculo_valor_lance_atual", "veiculo_situacao", "veiculo_data_leilao",
+            "veiculo_tipo_combustivel", "veiculo_cor", "veiculo_possui_chave", "veiculo_tipo_retomada",
+            "veiculo_tipo", "veiculo_valor_fipe", "veiculo_fabricante", "veiculo_modelo", "run_id",
+        ],
+        "numericas": ["veiculo_valor_lance_atual", "veiculo_valor_fipe"],
+        "inteiras": ["veiculo_ano_fabricacao", "veiculo_ano_modelo", "veiculo_total_lances", "veiculo_numero_visualizacoes"],
+        "km_texto": True,
+        "conflito": None,
+    },
+    "loop": {
+        "colunas": [
+            "veiculo_link_lote", "veiculo_titulo", "veiculo_fabricante", "veiculo_modelo", "veiculo_versao",
+            "veiculo_ano_fabricacao", "veiculo_ano_modelo", "veiculo_valor_fipe", "veiculo_blindado",
+            "veiculo_chave", "veiculo_condicao_motor", "veiculo_tipo_combustivel", "veiculo_km",
+            "veiculo_total_lances", "veiculo_numero_visualizacoes", "veiculo_data_leilao",
+            "veiculo_horario_leilao", "veiculo_lance_atual", "veiculo_situacao_lote", "run_id",
+        ],
+        "numericas": ["veiculo_valor_fipe", "veiculo_lance_atual"],
+        "inteiras": ["veiculo_ano_fabricacao", "veiculo_ano_modelo", "veiculo_total_lances", "veiculo_numero_visualizacoes"],
+        "km_texto": True,
+        "conflito": "veiculo_link_lote",
+    },
+}
+# Execução (scrape_runs.id) que gravou o lote; opcional nos dicionários recebidos.
+# No 'loop' o upsert guarda a última execução que viu o lote.
+RUN_ID_COLUMN = "run_id"
+
+def convert_row_values(table_name, data_row_dict, verbose=True):
+    """
+    Converte um dicionário raspado (chaves = colunas 'PARA') na lista de valores na ordem
+    de INSERT_TABLES[table_name]['colunas']. Com 'verbose', registra as colunas ausentes/extras.
+    """
+    spec = INSERT_TABLES[table_name]
+    columns_to_insert = spec["colunas"]
+
+    if verbose:
+        logger.debug("Colunas para inserção na tabela '%s': %s", table_name, columns_to_insert)
+
+        data_keys = set(data_row_dict.keys())
+        expected_columns_set = set(columns_to_insert)
+
+        missing_in_data = expected_columns_set - data_keys - {RUN_ID_COLUMN}
+        extra_in_data = data_keys - expected_columns_set
+
+        if missing_in_data:
+            logger.warning("Colunas esperadas na tabela '%s', mas ausentes nos dados recebidos: %s", table_name, missing_in_data,
+                           extra=amostrar(f"db.ausentes.{table_name}"))
+            for col in missing_in_data:
+                data_row_dict[col] = None 
+        
+        if extra_in_data:
+            logger.warning("Colunas presentes nos dados recebidos, mas não esperadas na tabela '%s': %s", table_name, extra_in_data,
+                           extra=amostrar(f"db.extras.{table_name}"))
+
+    values_to_insert = []
+    for col_name in columns_to_insert:
+        val = data_row_dict.get(col_name)
+
+        if col_name in spec["numericas"]:
+            try:
+                if isinstance(val, (int, float)):
+                    values_to_insert.append(float(val))
+                else:
+                    s_val = str(val).replace('R$', '').strip()
+                    s_val = s_val.replace('.', '')
+                    s_val = s_val.replace(',', '.')
+                    values_to_insert.append(float(s_val) if s_val and s_val.lower() != "n/a" else None)
+            except (ValueError, TypeError):
+                print(f"[DB ERROR] Falha ao converter valor '{val}' para numérico na coluna '{col_name}'. Definindo como None.")
+                values_to_insert.append(None)
+        elif col_name in spec["inteiras"]:
+            try:
+                numeric_val = re.sub(r'\D', '', str(val)) 
+                values_to_insert.append(int(numeric_val) if numeric_val and numeric_val.lower() != "n/a" else None)
+            except (ValueError, TypeError):
+                print(f"[DB ERROR] Falha ao converter valor '{val}' para inteiro na coluna '{col_name}'. Definindo como None.")
+                values_to_insert.append(None)
+        elif col_name == "veiculo_km" and spec["km_texto"]:
+            try:
+                if isinstance(val, (int, float)):
+                    values_to_insert.append(str(val))
+                else:
+                    cleaned_km = str(val).lower().replace('km', '').strip()
+                    numeric_km = re.sub(r'[^\d,.]', '', cleaned_km).replace('.', '').replace(',', '.')
+                    values_to_insert.append(numeric_km if numeric_km and numeric_km.lower() != "n/a" else None)
+            except (ValueError, TypeError):
+                print(f"[DB ERROR] Falha ao processar valor '{val}' para 'veiculo_km'. Definindo como None.")
+                values_to_insert.append(None)
+        else:
+            values_to_insert.append(val if val is not None and str(val).lower() != "n/a" else None)
+    return values_to_insert
+
+def _insert_query(table_name, source=None):
+    """
+    INSERT da tabela de lotes. 'source' substitui o 'VALUES (%s, ...)' de uma linha
+    (ex.: 'VALUES %s' do execute_values ou um SELECT). O 'loop' faz upsert pelo link do lote.
+    """
+    spec = INSERT_TABLES[table_name]
+    columns = spec["colunas"]
+    if source is None:
+        source = sql.SQL("VALUES ({})").format(sql.SQL(', ').join(sql.Placeholder() * len(columns)))
+    query = sql.SQL("INSERT INTO {} ({}) {}").format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        source
+    )
+    if spec["conflito"]:
+        atualizadas = [c for c in columns if c != spec["conflito"]] + ["data_extracao"]
+        query = query + sql.SQL(" ON CONFLICT ({}) DO UPDATE SET {}").format(
+            sql.Identifier(spec["conflito"]),
+            sql.SQL(', ').join(sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(c)) for c in atualizadas)
+        )
+    return query
+
+def _unique_rows(table_name, rows):
+    """Numa mesma instrução o upsert não aceita a chave repetida: fica a última ocorrência."""
+    conflito = INSERT_TABLES[table_name]["conflito"]
+    if not conflito:
+        return rows
+    posicao = INSERT_TABLES[table_name]["colunas"].index(conflito)
+    return list({row[posicao]: row for row in rows}.values())
+
+def insert_rows(conn, table_name, data_rows, page_size=1000):
+    """
+    Grava vários dicionários raspados com execute_values (um INSERT por 'page_size' linhas)
+    e um único commit. Mesma conversão de insert_data_*; retorna quantas linhas foram enviadas.
+    """
+    if not data_rows:
+        return 0
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        rows = _unique_rows(table_name, [convert_row_values(table_name, row, verbose=False) for row in data_rows])
+        execute_values(cursor, _insert_query(table_name, sql.SQL("VALUES %s")).as_string(conn), rows, page_size=page_size)
+        conn.commit()
+        return len(rows)
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao inserir lotes em lote na tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cursor:
+            cursor.close()
+
+def copy_insert_rows(conn, table_name, data_rows):
+    """
+    Grava vários dicionários raspados com COPY em uma única transação. Tabelas com upsert
+    ('loop') passam por uma tabela temporária e um INSERT ... SELECT ... ON CONFLICT.
+    Retorna quantas linhas foram enviadas.
+    """
+    if not data_rows:
+        return 0
+    spec = INSERT_TABLES[table_name]
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        rows = _unique_rows(table_name, [convert_row_values(table_name, row, verbose=False) for row in data_rows])
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        columns = sql.SQL(', ').join(map(sql.Identifier, spec["colunas"]))
+        destino = sql.Identifier(table_name)
+        if spec["conflito"]:
+            destino = sql.Identifier(f"_copy_{table_name}")
+            cursor.execute(sql.SQL("CREATE TEMP TABLE {} ON COMMIT DROP AS SELECT {} FROM {} WITH NO DATA").format(
+                destino, columns, sql.Identifier(table_name)
+            ))
+        cursor.copy_expert(
+            sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(destino, columns).as_string(conn), buffer
+        )
+        if spec["conflito"]:
+            cursor.execute(_insert_query(table_name, sql.SQL("SELECT {} FROM {}").format(columns, destino)))
+        conn.commit()
+        return len(rows)
+    except Exception as e:
+        print(f"[DB ERROR] Erro no COPY de lotes para a tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cursor:
+            cursor.close()
+
+def _add_run_id_column(cursor, table_name):
+    """Tabelas criadas antes do registro de execuções ganham a coluna 'run_id' e seu índice."""
+    cursor.execute(sql.SQL("""
+        ALTER TABLE {0} ADD COLUMN IF NOT EXISTS run_id INTEGER;
+        CREATE INDEX IF NOT EXISTS {1} ON {0} (run_id);
+    """).format(sql.Identifier(table_name), sql.Identifier(f"idx_{table_name}_run_id")))
+
 # --- Funções para a Tabela 'parque_leiloes_oficial' ---
 def create_parque_leiloes_oficial_table(conn):
     """
@@ -59,12 +283,18 @@ def create_parque_leiloes_oficial_table(conn):
                 veiculo_final_placa VARCHAR(50),
                 veiculo_tipo_retomada VARCHAR(100),
                 veiculo_tipo VARCHAR(100),
+                veiculo_categoria_site VARCHAR(100), -- rótulo da categoria no site, como veio (ex.: 'utilitarios')
                 veiculo_valor_vendido NUMERIC,
                 veiculo_patio_uf VARCHAR (100),          
-                data_extracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                data_extracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                run_id INTEGER -- scrape_runs.id
             );
         """).format(sql.Identifier(table_name))
         cursor.execute(create_table_query)
+        _add_run_id_column(cursor, table_name)
+        # Tabelas criadas antes de a categoria do site ser guardada
+        cursor.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS veiculo_categoria_site VARCHAR(100);")
+                       .format(sql.Identifier(table_name)))
         conn.commit()
         print(f"[DB] Tabela '{table_name}' verificada/criada com sucesso.")
     except DuplicateTable:
@@ -85,92 +315,20 @@ def insert_data_parque_leiloes_oficial(conn, data_row_dict):
     Inclui logs para comparar as colunas esperadas com as recebidas e ajusta a conversão de tipos.
     """
     cursor = None
+    table_name = "parque_leiloes_oficial"
     try:
         cursor = conn.cursor()
-        table_name = "parque_leiloes_oficial"
-        
-        # Lista de colunas no banco de dados (nomes 'PARA' do mapeamento)
-        columns_to_insert = [
-            "veiculo_titulo",
-            "veiculo_link_lote",
-            "veiculo_imagem",
-            "veiculo_km",
-            "veiculo_lance_inicial",
-            "veiculo_valor_lance_atual",
-            "veiculo_data_leilao",
-            "veiculo_fabricante",
-            "veiculo_final_placa",
-            "veiculo_ano_fabricacao",
-            "veiculo_ano_modelo",
-            "veiculo_possui_chave",
-            "veiculo_condicao_motor",
-            "veiculo_valor_fipe",
-            "veiculo_tipo_combustivel",
-            "veiculo_tipo_retomada",
-            "veiculo_tipo",
-            "veiculo_total_lances",
-            "veiculo_modelo",
-            "veiculo_valor_vendido",
-            "veiculo_patio_uf"
-        ]
-        
-        print(f"[DB DEBUG] Colunas para inserção na tabela '{table_name}': {columns_to_insert}")
-
-        data_keys = set(data_row_dict.keys())
-        expected_columns_set = set(columns_to_insert)
-
-        missing_in_data = expected_columns_set - data_keys
-        extra_in_data = data_keys - expected_columns_set
-
-        if missing_in_data:
-            print(f"[DB WARN] Colunas esperadas no banco de dados, mas ausentes nos dados recebidos: {missing_in_data}")
-            for col in missing_in_data:
-                data_row_dict[col] = None 
-        
-        if extra_in_data:
-            print(f"[DB WARN] Colunas presentes nos dados recebidos, mas não esperadas no banco de dados: {extra_in_data}")
-
-        values_to_insert = []
-        for col_name in columns_to_insert:
-            val = data_row_dict.get(col_name)
-
-            if col_name in ["veiculo_lance_inicial", "veiculo_valor_lance_atual", "veiculo_valor_fipe", "veiculo_valor_vendido", "veiculo_km"]:
-                try:
-                    if isinstance(val, (int, float)):
-                        values_to_insert.append(float(val))
-                    else:
-                        s_val = str(val).replace('R$', '').strip()
-                        s_val = s_val.replace('.', '') 
-                        s_val = s_val.replace(',', '.') 
-                        values_to_insert.append(float(s_val) if s_val and s_val.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao converter valor '{val}' para numérico na coluna '{col_name}'. Definindo como None.")
-                    values_to_insert.append(None)
-            elif col_name in ["veiculo_total_lances", "veiculo_ano_fabricacao", "veiculo_ano_modelo"]:
-                try:
-                    numeric_val = re.sub(r'\D', '', str(val))
-                    values_to_insert.append(int(numeric_val) if numeric_val and numeric_val.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao converter valor '{val}' para inteiro na coluna '{col_name}'. Definindo como None.")
-                    values_to_insert.append(None)
-            else:
-                values_to_insert.append(val if val is not None and str(val).lower() != "n/a" else None)
-
-        insert_query = sql.SQL(
-            "INSERT INTO {} ({}) VALUES ({})"
-        ).format(
-            sql.Identifier(table_name),
-            sql.SQL(', ').join(map(sql.Identifier, columns_to_insert)),
-            sql.SQL(', ').join(sql.Placeholder() * len(columns_to_insert))
-        )
-        
-        cursor.execute(insert_query, values_to_insert)
+        values_to_insert = convert_row_values(table_name, data_row_dict)
+        cursor.execute(_insert_query(table_name), values_to_insert)
         conn.commit()
-        print(f"[DB] Dados inseridos para o lote: {data_row_dict.get('veiculo_titulo', 'N/A')[:50]}...")
+        logger.info("Dados inseridos na tabela '%s' para o lote: %.50s...", table_name, data_row_dict.get('veiculo_titulo', 'N/A'),
+                    extra=amostrar(f"db.insercao.{table_name}"))
+        return True
     except Exception as e:
         print(f"[DB ERROR] Erro ao inserir dados na tabela '{table_name}': {e}")
         if conn:
             conn.rollback()
+        return False
     finally:
         if cursor:
             cursor.close()
@@ -201,10 +359,12 @@ def create_leilo_table(conn):
                 veiculo_titulo VARCHAR(500),
                 veiculo_patio_uf VARCHAR(30),
                 veiculo_valor_lance_atual NUMERIC,
-                data_extracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                data_extracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                run_id INTEGER -- scrape_runs.id
             );
         """).format(sql.Identifier(table_name))
         cursor.execute(create_table_query)
+        _add_run_id_column(cursor, table_name)
         conn.commit()
         print(f"[DB] Tabela '{table_name}' verificada/criada com sucesso.")
     except DuplicateTable:
@@ -224,99 +384,20 @@ def insert_data_leilo(conn, data_row_dict):
     O dicionário 'data_row_dict' DEVE conter chaves com os nomes das colunas 'PARA' do mapeamento.
     """
     cursor = None
+    table_name = "leilo"
     try:
         cursor = conn.cursor()
-        table_name = "leilo"
-        
-        # Lista de colunas esperadas para inserção na tabela 'leilo' (NOMES 'PARA')
-        columns_to_insert = [
-            "veiculo_titulo",
-            "veiculo_link_lote",
-            "veiculo_imagem",
-            "veiculo_patio_uf",
-            "veiculo_ano_fabricacao",
-            "veiculo_km",
-            "veiculo_valor_lance_atual",
-            "veiculo_situacao",
-            "veiculo_data_leilao",
-            "veiculo_tipo_combustivel",
-            "veiculo_cor",
-            "veiculo_possui_chave",
-            "veiculo_tipo_retomada",
-            "veiculo_tipo",
-            "veiculo_valor_fipe",
-            "veiculo_fabricante",
-            "veiculo_modelo"
-        ]
-        
-        print(f"[DB DEBUG] Colunas para inserção na tabela '{table_name}': {columns_to_insert}")
-
-        data_keys = set(data_row_dict.keys())
-        expected_columns_set = set(columns_to_insert)
-
-        missing_in_data = expected_columns_set - data_keys
-        extra_in_data = data_keys - expected_columns_set
-
-        if missing_in_data:
-            print(f"[DB WARN] Colunas esperadas na tabela '{table_name}', mas ausentes nos dados recebidos: {missing_in_data}")
-            for col in missing_in_data:
-                data_row_dict[col] = None 
-        
-        if extra_in_data:
-            print(f"[DB WARN] Colunas presentes nos dados recebidos, mas não esperadas na tabela '{table_name}': {extra_in_data}")
-
-        values_to_insert = []
-        for col_name in columns_to_insert:
-            val = data_row_dict.get(col_name)
-
-            if col_name in ["veiculo_valor_lance_atual", "veiculo_valor_fipe"]:
-                try:
-                    if isinstance(val, (int, float)):
-                        values_to_insert.append(float(val))
-                    else:
-                        s_val = str(val).replace('R$', '').strip()
-                        s_val = s_val.replace('.', '')
-                        s_val = s_val.replace(',', '.')
-                        values_to_insert.append(float(s_val) if s_val and s_val.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao converter valor '{val}' para numérico na coluna '{col_name}'. Definindo como None.")
-                    values_to_insert.append(None)
-            elif col_name in ["veiculo_ano_fabricacao", "veiculo_ano_modelo", "veiculo_total_lances", "veiculo_numero_visualizacoes"]:
-                try:
-                    numeric_val = re.sub(r'\D', '', str(val)) 
-                    values_to_insert.append(int(numeric_val) if numeric_val and numeric_val.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao converter valor '{val}' para inteiro na coluna '{col_name}'. Definindo como None.")
-                    values_to_insert.append(None)
-            elif col_name == "veiculo_km":
-                try:
-                    if isinstance(val, (int, float)):
-                        values_to_insert.append(str(val))
-                    else:
-                        cleaned_km = str(val).lower().replace('km', '').strip()
-                        numeric_km = re.sub(r'[^\d,.]', '', cleaned_km).replace('.', '').replace(',', '.')
-                        values_to_insert.append(numeric_km if numeric_km and numeric_km.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao processar valor '{val}' para 'veiculo_km'. Definindo como None.")
-                    values_to_insert.append(None)
-            else:
-                values_to_insert.append(val if val is not None and str(val).lower() != "n/a" else None)
-
-        insert_query = sql.SQL(
-            "INSERT INTO {} ({}) VALUES ({})"
-        ).format(
-            sql.Identifier(table_name),
-            sql.SQL(', ').join(map(sql.Identifier, columns_to_insert)),
-            sql.SQL(', ').join(sql.Placeholder() * len(columns_to_insert))
-        )
-        
-        cursor.execute(insert_query, values_to_insert)
+        values_to_insert = convert_row_values(table_name, data_row_dict)
+        cursor.execute(_insert_query(table_name), values_to_insert)
         conn.commit()
-        print(f"[DB] Dados inseridos para o lote: {data_row_dict.get('veiculo_titulo', 'N/A')[:50]}...")
+        logger.info("Dados inseridos na tabela '%s' para o lote: %.50s...", table_name, data_row_dict.get('veiculo_titulo', 'N/A'),
+                    extra=amostrar(f"db.insercao.{table_name}"))
+        return True
     except Exception as e:
         print(f"[DB ERROR] Erro ao inserir dados na tabela '{table_name}': {e}")
         if conn:
             conn.rollback()
+        return False
     finally:
         if cursor:
             cursor.close()
@@ -355,10 +436,12 @@ def create_loop_table(conn):
                 veiculo_horario_leilao VARCHAR(50),
                 veiculo_lance_atual NUMERIC(15, 2),
                 veiculo_situacao_lote VARCHAR(100),
-                data_extracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                data_extracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                run_id INTEGER -- scrape_runs.id
             );
         """).format(sql.Identifier(table_name))
         cursor.execute(create_table_query)
+        _add_run_id_column(cursor, table_name)
         conn.commit()
         print(f"[DB] Tabela '{table_name}' verificada/criada com sucesso.")
     except DuplicateTable:
@@ -379,119 +462,952 @@ def insert_data_loop(conn, data_row_dict):
     usando 'veiculo_condicao_motor'.
     """
     cursor = None
+    table_name = "loop"
     try:
         cursor = conn.cursor()
-        table_name = "loop"
-        
-        columns_to_insert = [
-            "veiculo_link_lote",
-            "veiculo_titulo",
-            "veiculo_fabricante",
-            "veiculo_modelo",
-            "veiculo_versao",
-            "veiculo_ano_fabricacao",
-            "veiculo_ano_modelo",
-            "veiculo_valor_fipe",
-            "veiculo_blindado",
-            "veiculo_chave",
-            "veiculo_condicao_motor", # Nomenclatura mantida: veiculo_condicao_motor
-            "veiculo_tipo_combustivel",
-            "veiculo_km",
-            "veiculo_total_lances",
-            "veiculo_numero_visualizacoes",
-            "veiculo_data_leilao",
-            "veiculo_horario_leilao",
-            "veiculo_lance_atual",
-            "veiculo_situacao_lote"
-        ]
-        
-        print(f"[DB DEBUG] Colunas para inserção na tabela '{table_name}': {columns_to_insert}")
+        values_to_insert = convert_row_values(table_name, data_row_dict)
+        cursor.execute(_insert_query(table_name), values_to_insert)
+        conn.commit()
+        logger.info("Dados inseridos/atualizados na tabela '%s' para o lote: %s", table_name, data_row_dict.get('veiculo_link_lote', 'N/A'),
+                    extra=amostrar(f"db.insercao.{table_name}"))
+        return True
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao inserir dados na tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cursor:
+            cursor.close()
 
-        data_keys = set(data_row_dict.keys())
-        expected_columns_set = set(columns_to_insert)
+### Registro das execuções dos scrapers (tabela 'scrape_runs')
 
-        missing_in_data = expected_columns_set - data_keys
-        extra_in_data = data_keys - expected_columns_set
+# Colunas de 'scrape_runs' preenchidas com os contadores do tracer do scraper (common/tracing.py);
+# quando há mais de um contador, a coluna recebe a soma.
+SCRAPE_RUN_COUNTERS = {
+    "paginas": ["paginas"],
+    "lotes_encontrados": ["lotes"],
+    "lotes_detalhados": ["lotes_detalhados"],
+    "lotes_gravados": ["lotes_gravados"],
+    "falhas": ["erros", "timeouts"],
+    "retentativas": ["retentativas", "retentativas_db"],
+    "bytes_baixados": ["bytes_baixados"],
+}
+# Execuções anteriores do mesmo site usadas como referência de vazão na view 'scrape_runs_vazao'
+SCRAPE_RUN_TREND_WINDOW = 10
 
-        if missing_in_data:
-            print(f"[DB WARN] Colunas esperadas na tabela '{table_name}', mas ausentes nos dados recebidos: {missing_in_data}")
-            for col in missing_in_data:
-                data_row_dict[col] = None 
-        
-        if extra_in_data:
-            print(f"[DB WARN] Colunas presentes nos dados recebidos, mas não esperadas na tabela '{table_name}': {extra_in_data}")
-
-        values_to_insert = []
-        for col_name in columns_to_insert:
-            val = data_row_dict.get(col_name)
-
-            if col_name in ["veiculo_valor_fipe", "veiculo_lance_atual"]:
-                try:
-                    if isinstance(val, (int, float)):
-                        values_to_insert.append(float(val))
-                    else:
-                        s_val = str(val).replace('R$', '').strip()
-                        s_val = s_val.replace('.', '')
-                        s_val = s_val.replace(',', '.')
-                        values_to_insert.append(float(s_val) if s_val and s_val.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao converter valor '{val}' para numérico na coluna '{col_name}'. Definindo como None.")
-                    values_to_insert.append(None)
-            elif col_name in ["veiculo_ano_fabricacao", "veiculo_ano_modelo", "veiculo_total_lances", "veiculo_numero_visualizacoes"]:
-                try:
-                    numeric_val = re.sub(r'\D', '', str(val)) 
-                    values_to_insert.append(int(numeric_val) if numeric_val and numeric_val.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao converter valor '{val}' para inteiro na coluna '{col_name}'. Definindo como None.")
-                    values_to_insert.append(None)
-            elif col_name == "veiculo_km":
-                try:
-                    if isinstance(val, (int, float)):
-                        values_to_insert.append(str(val))
-                    else:
-                        cleaned_km = str(val).lower().replace('km', '').strip()
-                        numeric_km = re.sub(r'[^\d,.]', '', cleaned_km).replace('.', '').replace(',', '.')
-                        values_to_insert.append(numeric_km if numeric_km and numeric_km.lower() != "n/a" else None)
-                except (ValueError, TypeError):
-                    print(f"[DB ERROR] Falha ao processar valor '{val}' para 'veiculo_km'. Definindo como None.")
-                    values_to_insert.append(None)
-            else:
-                values_to_insert.append(val if val is not None and str(val).lower() != "n/a" else None)
-
-        insert_query = sql.SQL(
-            "INSERT INTO {} ({}) VALUES ({}) ON CONFLICT (veiculo_link_lote) DO UPDATE SET "
-            "veiculo_titulo = EXCLUDED.veiculo_titulo, "
-            "veiculo_fabricante = EXCLUDED.veiculo_fabricante, "
-            "veiculo_modelo = EXCLUDED.veiculo_modelo, "
-            "veiculo_versao = EXCLUDED.veiculo_versao, "
-            "veiculo_ano_fabricacao = EXCLUDED.veiculo_ano_fabricacao, "
-            "veiculo_ano_modelo = EXCLUDED.veiculo_ano_modelo, "
-            "veiculo_valor_fipe = EXCLUDED.veiculo_valor_fipe, "
-            "veiculo_blindado = EXCLUDED.veiculo_blindado, "
-            "veiculo_chave = EXCLUDED.veiculo_chave, "
-            "veiculo_condicao_motor = EXCLUDED.veiculo_condicao_motor, " # Nomenclatura mantida: veiculo_condicao_motor
-            "veiculo_tipo_combustivel = EXCLUDED.veiculo_tipo_combustivel, "
-            "veiculo_km = EXCLUDED.veiculo_km, "
-            "veiculo_total_lances = EXCLUDED.veiculo_total_lances, "
-            "veiculo_numero_visualizacoes = EXCLUDED.veiculo_numero_visualizacoes, "
-            "veiculo_data_leilao = EXCLUDED.veiculo_data_leilao, "
-            "veiculo_horario_leilao = EXCLUDED.veiculo_horario_leilao, "
-            "veiculo_lance_atual = EXCLUDED.veiculo_lance_atual, "
-            "veiculo_situacao_lote = EXCLUDED.veiculo_situacao_lote, "
-            "data_extracao = EXCLUDED.data_extracao"
-        ).format(
+def create_scrape_runs_table(conn):
+    """
+    Cria 'scrape_runs' (uma linha por execução de scraper, com duração, páginas, lotes encontrados,
+    detalhados e gravados, falhas e bytes) e a view 'scrape_runs_vazao', que compara os lotes/minuto
+    de cada execução com a média das execuções anteriores do mesmo site.
+    """
+    cursor = None
+    table_name = "scrape_runs"
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql.SQL("""
+            CREATE TABLE IF NOT EXISTS scrape_runs (
+                id SERIAL PRIMARY KEY,
+                site VARCHAR(50) NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'em_andamento', -- em_andamento, concluida, sem_lotes, falha
+                inicio TIMESTAMP NOT NULL,
+                fim TIMESTAMP,
+                duracao_s NUMERIC(12, 3),
+                paginas INTEGER,
+                lotes_encontrados INTEGER,
+                lotes_detalhados INTEGER,
+                lotes_gravados INTEGER,
+                falhas INTEGER,
+                retentativas INTEGER,
+                bytes_baixados BIGINT,
+                host VARCHAR(255),
+                erro TEXT,
+                metricas JSONB -- resumo por etapa e contadores do tracer
+            );
+            CREATE INDEX IF NOT EXISTS idx_scrape_runs_site_inicio ON scrape_runs (site, inicio);
+            CREATE OR REPLACE VIEW scrape_runs_vazao AS
+            SELECT *,
+                   ROUND((lotes_por_minuto / NULLIF(media_anteriores, 0) - 1) * 100, 1) AS variacao_pct
+            FROM (
+                SELECT id, site, status, inicio, duracao_s, paginas, lotes_encontrados, lotes_gravados, falhas,
+                       ROUND(falhas::NUMERIC / NULLIF(lotes_encontrados, 0), 4) AS taxa_falhas,
+                       ROUND(lotes_encontrados * 60 / NULLIF(duracao_s, 0), 2) AS lotes_por_minuto,
+                       ROUND(AVG(lotes_encontrados * 60 / NULLIF(duracao_s, 0)) OVER (
+                           PARTITION BY site ORDER BY inicio ROWS BETWEEN {janela} PRECEDING AND 1 PRECEDING
+                       ), 2) AS media_anteriores
+                FROM scrape_runs
+                WHERE status IN ('concluida', 'sem_lotes')
+            ) vazao;
+        """).format(janela=sql.Literal(SCRAPE_RUN_TREND_WINDOW)))
+        conn.commit()
+        print(f"[DB] Tabela '{table_name}' verificada/criada com sucesso.")
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao criar ou verificar a tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def start_scrape_run(conn, site, inicio=None):
+    """Registra o início de uma execução do scraper 'site' e retorna o id (None em caso de erro)."""
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO scrape_runs (site, inicio, host) VALUES (%s, %s, %s) RETURNING id",
+            (site, inicio or datetime.now(), socket.gethostname()),
+        )
+        run_id = cursor.fetchone()[0]
+        conn.commit()
+        return run_id
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao registrar o início da execução de '{site}': {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+def finish_scrape_run(conn, run_id, status, metricas=None, erro=None):
+    """
+    Fecha a execução: fim, duração, status e as contagens de SCRAPE_RUN_COUNTERS tiradas de
+    metricas['contadores'] (o dicionário inteiro vai para a coluna 'metricas').
+    """
+    metricas = metricas or {}
+    contadores = metricas.get("contadores", {})
+    valores = {coluna: sum(contadores.get(nome, 0) for nome in nomes) for coluna, nomes in SCRAPE_RUN_COUNTERS.items()}
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql.SQL("""
+            UPDATE scrape_runs
+               SET status = %(status)s, fim = %(fim)s, duracao_s = EXTRACT(EPOCH FROM %(fim)s - inicio),
+                   erro = %(erro)s, metricas = %(metricas)s, {}
+             WHERE id = %(run_id)s
+        """).format(sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.Identifier(coluna), sql.Placeholder(coluna)) for coluna in valores
+        )), {
+            **valores,
+            "status": status,
+            "fim": datetime.now(),
+            "erro": erro[:2000] if erro else None,
+            "metricas": Json(metricas, dumps=lambda obj: json.dumps(obj, default=str)),
+            "run_id": run_id,
+        })
+        conn.commit()
+        return cursor.rowcount == 1
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao registrar o fim da execução {run_id}: {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+
+def open_scrape_run(site, inicio=None, conn=None):
+    """
+    Chamado pelos scrapers no início de main(): abre a execução em 'scrape_runs' e retorna o
+    run_id. Sem 'conn' usa uma conexão própria; sem banco acessível retorna None e o scraper
+    tenta de novo ao conectar para gravar os lotes.
+    """
+    propria = conn is None
+    conn = conn or connect_db()
+    if not conn:
+        return None
+    try:
+        create_scrape_runs_table(conn)
+        return start_scrape_run(conn, site, inicio)
+    finally:
+        if propria:
+            conn.close()
+
+def close_scrape_run(run_id, site, inicio, status, metricas=None, erro=None, conn=None):
+    """
+    Chamado pelos scrapers no fim de main(), também em falhas: fecha a execução com as métricas
+    do tracer. Se ela não chegou a ser aberta (banco fora do ar no início), é registrada agora.
+    """
+    propria = conn is None
+    conn = conn or connect_db()
+    if not conn:
+        print(f"[WARN] Execução de '{site}' não registrada em scrape_runs: sem conexão com o banco.")
+        return None
+    try:
+        if run_id is None:
+            run_id = open_scrape_run(site, inicio, conn)
+        if run_id is not None and finish_scrape_run(conn, run_id, status, metricas, erro):
+            print(f"[DB] Execução {run_id} de '{site}' registrada em scrape_runs ({status}).")
+        return run_id
+    finally:
+        if propria:
+            conn.close()
+
+def fetch_last_scrape_run(conn, site):
+    """Última execução encerrada de 'site' (dict com id, status, inicio, fim, paginas e lotes_detalhados) ou None."""
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, status, inicio, fim, paginas, lotes_detalhados
+              FROM scrape_runs
+             WHERE site = %s AND fim IS NOT NULL
+             ORDER BY inicio DESC
+             LIMIT 1
+        """, (site,))
+        linha = cursor.fetchone()
+        if linha is None:
+            return None
+        return dict(zip([d[0] for d in cursor.description], linha))
+    except UndefinedTable:
+        conn.rollback()
+        return None
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao consultar a última execução de '{site}': {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+### Agenda de releitura dos lotes (serviço scheduler/)
+
+# Colunas com a data e o horário do leilão em cada tabela de lotes, como o scraper grava
+# ('10/07/2025', '09:30h'). Sem coluna de horário o scheduler usa SCHEDULER_DEFAULT_TIME.
+LOT_SCHEDULE_TABLES = {
+    "leilo": {"data": "veiculo_data_leilao", "horario": None},
+    "loop": {"data": "veiculo_data_leilao", "horario": "veiculo_horario_leilao"},
+    "parque_leiloes_oficial": {"data": "veiculo_data_leilao", "horario": None},
+}
+
+def create_lot_schedule_indexes(conn):
+    """Índice (link, id) nas tabelas de lotes: último registro de cada lote sem varrer a tabela."""
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        for table_name in LOT_SCHEDULE_TABLES:
+            cursor.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} (veiculo_link_lote, id)").format(
+                sql.Identifier(f"idx_{table_name}_link_id"), sql.Identifier(table_name)
+            ))
+        conn.commit()
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao criar os índices da agenda de lotes: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def fetch_lot_schedule(conn, table_name, recent_days=30):
+    """
+    Registro mais recente de cada lote visto nos últimos 'recent_days' dias: lista de
+    (link, data do leilão, horário do leilão ou None), com o texto gravado pelo scraper.
+    """
+    spec = LOT_SCHEDULE_TABLES[table_name]
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql.SQL("""
+            SELECT DISTINCT ON (veiculo_link_lote) veiculo_link_lote, {data}, {horario}
+              FROM {tabela}
+             WHERE veiculo_link_lote IS NOT NULL
+               AND data_extracao >= NOW() - %s * INTERVAL '1 day'
+             ORDER BY veiculo_link_lote, id DESC
+        """).format(
+            data=sql.Identifier(spec["data"]),
+            horario=sql.Identifier(spec["horario"]) if spec["horario"] else sql.SQL("NULL"),
+            tabela=sql.Identifier(table_name),
+        ), (recent_days,))
+        return cursor.fetchall()
+    except UndefinedTable:
+        conn.rollback()
+        return []
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao ler a agenda de lotes da tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return []
+    finally:
+        if cursor:
+            cursor.close()
+
+def update_latest_lot(conn, table_name, link, valores):
+    """
+    Grava 'valores' (colunas de INSERT_TABLES com o texto raspado, convertido como em
+    convert_row_values) no registro mais recente do lote e renova data_extracao.
+    Retorna True se o lote existia.
+    """
+    colunas = [c for c in INSERT_TABLES[table_name]["colunas"] if c in valores]
+    if not colunas:
+        return False
+    # As colunas não informadas vão como 'N/A' só para a conversão (None vira erro nas numéricas)
+    completos = {c: valores.get(c, "N/A") for c in INSERT_TABLES[table_name]["colunas"]}
+    convertidos = dict(zip(INSERT_TABLES[table_name]["colunas"], convert_row_values(table_name, completos, verbose=False)))
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql.SQL("""
+            UPDATE {tabela} SET {atribuicoes}, data_extracao = CURRENT_TIMESTAMP
+             WHERE id = (SELECT MAX(id) FROM {tabela} WHERE veiculo_link_lote = %s)
+        """).format(
+            tabela=sql.Identifier(table_name),
+            atribuicoes=sql.SQL(", ").join(sql.SQL("{} = %s").format(sql.Identifier(c)) for c in colunas),
+        ), [convertidos[c] for c in colunas] + [link])
+        conn.commit()
+        return cursor.rowcount == 1
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao atualizar o lote {link} na tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return False
+    finally:
+        if cursor:
+            cursor.close()
+
+### Histórico de lances (serviço tracker/)
+
+def create_bid_history_table(conn):
+    """
+    Cria 'historico_lances': uma linha por mudança de lance (ou do total de lances) observada
+    pelo tracker nos lotes perto do fim, com o lance anterior e o fim previsto naquele momento.
+    """
+    cursor = None
+    table_name = "historico_lances"
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS historico_lances (
+                id BIGSERIAL PRIMARY KEY,
+                source_table VARCHAR(50) NOT NULL,
+                veiculo_link_lote TEXT NOT NULL,
+                lance NUMERIC(15, 2),
+                lance_anterior NUMERIC(15, 2),
+                total_lances INTEGER,
+                fim_previsto TIMESTAMP,
+                coletado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_historico_lances_link ON historico_lances (veiculo_link_lote, coletado_em);
+        """)
+        conn.commit()
+        print(f"[DB] Tabela '{table_name}' verificada/criada com sucesso.")
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao criar ou verificar a tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def fetch_latest_bids(conn, links):
+    """{link: (lance, total_lances)} da última mudança registrada de cada lote."""
+    if not links:
+        return {}
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT DISTINCT ON (veiculo_link_lote) veiculo_link_lote, lance, total_lances
+              FROM historico_lances
+             WHERE veiculo_link_lote = ANY(%s)
+             ORDER BY veiculo_link_lote, coletado_em DESC
+        """, (list(links),))
+        return {link: (lance, total) for link, lance, total in cursor.fetchall()}
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao ler o histórico de lances: {e}")
+        if conn:
+            conn.rollback()
+        return {}
+    finally:
+        if cursor:
+            cursor.close()
+
+def insert_bid_changes(conn, rows):
+    """
+    Grava as mudanças de lance em 'historico_lances' num único commit. 'rows' são tuplas
+    (source_table, link, lance, lance_anterior, total_lances, fim_previsto, coletado_em).
+    Retorna quantas linhas foram gravadas.
+    """
+    if not rows:
+        return 0
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO historico_lances
+                (source_table, veiculo_link_lote, lance, lance_anterior, total_lances, fim_previsto, coletado_em)
+            VALUES %s
+        """, rows)
+        conn.commit()
+        return len(rows)
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao gravar o histórico de lances: {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cursor:
+            cursor.close()
+
+### Funções para o enriquecimento FIPE (etapa de pipeline baseada no banco)
+
+# Para cada tabela de lotes: coluna com o preço atual do lote e coluna de ano usada na consulta FIPE.
+FIPE_ENRICHMENT_TABLES = {
+    "leilo": {"preco": "veiculo_valor_lance_atual", "ano": "veiculo_ano_fabricacao"},
+    "loop": {"preco": "veiculo_lance_atual", "ano": "veiculo_ano_modelo"},
+    "parque_leiloes_oficial": {"preco": "veiculo_valor_lance_atual", "ano": "veiculo_ano_modelo"},
+}
+
+def create_fipe_cache_table(conn):
+    """
+    Cria a tabela 'fipe_cache', que guarda o resultado de cada consulta à API FIPE
+    por (tipo_veiculo, marca, modelo, ano), evitando repetir chamadas entre execuções.
+    """
+    cursor = None
+    table_name = "fipe_cache"
+    try:
+        cursor = conn.cursor()
+        create_table_query = sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
+                tipo_veiculo VARCHAR(20) NOT NULL,
+                marca VARCHAR(255) NOT NULL,
+                modelo VARCHAR(255) NOT NULL,
+                ano VARCHAR(10) NOT NULL,
+                valor_fipe NUMERIC(15, 2),
+                fipe_status VARCHAR(100),
+                fipe_marca VARCHAR(255),
+                fipe_modelo VARCHAR(255),
+                consultado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (tipo_veiculo, marca, modelo, ano)
+            );
+        """).format(sql.Identifier(table_name))
+        cursor.execute(create_table_query)
+        conn.commit()
+        print(f"[DB] Tabela '{table_name}' verificada/criada com sucesso.")
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao criar ou verificar a tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def add_fipe_enrichment_columns(conn, table_name):
+    """
+    Garante as colunas de resultado do enriquecimento FIPE na tabela de lotes informada.
+    'veiculo_valor_fipe' já existe em todas as tabelas; aqui entram o status e a diferença percentual.
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql.SQL("""
+            ALTER TABLE {}
+                ADD COLUMN IF NOT EXISTS veiculo_fipe_status VARCHAR(100),
+                ADD COLUMN IF NOT EXISTS veiculo_diferenca_percentual NUMERIC(8, 2);
+        """).format(sql.Identifier(table_name)))
+        conn.commit()
+        print(f"[DB] Colunas de enriquecimento FIPE verificadas na tabela '{table_name}'.")
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao adicionar colunas FIPE na tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def fetch_lots_pending_fipe(conn, table_name, batch_size=500, after_id=0):
+    """
+    Retorna um lote de até 'batch_size' registros ainda não enriquecidos (veiculo_fipe_status nulo),
+    em ordem de id e a partir de 'after_id' (paginação por chave, sem OFFSET).
+    Cada item é uma tupla (id, fabricante, modelo, ano, preco, valor_fipe_raspado, titulo).
+    """
+    columns = FIPE_ENRICHMENT_TABLES[table_name]
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        query = sql.SQL("""
+            SELECT id, veiculo_fabricante, veiculo_modelo, {ano}::text, {preco}, veiculo_valor_fipe, veiculo_titulo
+            FROM {table}
+            WHERE veiculo_fipe_status IS NULL AND id > %s
+            ORDER BY id
+            LIMIT %s
+        """).format(
+            ano=sql.Identifier(columns["ano"]),
+            preco=sql.Identifier(columns["preco"]),
+            table=sql.Identifier(table_name)
+        )
+        cursor.execute(query, (after_id, batch_size))
+        return cursor.fetchall()
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao buscar lotes pendentes de FIPE na tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return []
+    finally:
+        if cursor:
+            cursor.close()
+
+def get_fipe_cache_entries(conn, keys):
+    """
+    Busca no 'fipe_cache' as chaves (tipo_veiculo, marca, modelo, ano) informadas, em uma única consulta.
+    Retorna um dicionário chave -> (valor_fipe, fipe_status, fipe_marca, fipe_modelo).
+    """
+    if not keys:
+        return {}
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT tipo_veiculo, marca, modelo, ano, valor_fipe, fipe_status, fipe_marca, fipe_modelo "
+            "FROM fipe_cache WHERE (tipo_veiculo, marca, modelo, ano) IN %s",
+            (tuple(keys),)
+        )
+        return {tuple(row[:4]): tuple(row[4:]) for row in cursor.fetchall()}
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao consultar o cache FIPE: {e}")
+        if conn:
+            conn.rollback()
+        return {}
+    finally:
+        if cursor:
+            cursor.close()
+
+def upsert_fipe_cache_entries(conn, entries):
+    """
+    Grava no 'fipe_cache' uma lista de tuplas
+    (tipo_veiculo, marca, modelo, ano, valor_fipe, fipe_status, fipe_marca, fipe_modelo).
+    """
+    if not entries:
+        return
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO fipe_cache (tipo_veiculo, marca, modelo, ano, valor_fipe, fipe_status, fipe_marca, fipe_modelo)
+            VALUES %s
+            ON CONFLICT (tipo_veiculo, marca, modelo, ano) DO UPDATE SET
+                valor_fipe = EXCLUDED.valor_fipe,
+                fipe_status = EXCLUDED.fipe_status,
+                fipe_marca = EXCLUDED.fipe_marca,
+                fipe_modelo = EXCLUDED.fipe_modelo,
+                consultado_em = CURRENT_TIMESTAMP
+        """, entries)
+        conn.commit()
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao gravar entradas no cache FIPE: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def update_fipe_enrichment(conn, table_name, updates):
+    """
+    Aplica em um único UPDATE ... FROM (VALUES ...) os resultados do enriquecimento FIPE.
+    'updates' é uma lista de tuplas (id, valor_fipe, fipe_status, diferenca_percentual).
+    Um 'veiculo_valor_fipe' já raspado do site é preservado.
+    """
+    if not updates:
+        return 0
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        query = sql.SQL("""
+            UPDATE {table} AS t SET
+                veiculo_valor_fipe = COALESCE(t.veiculo_valor_fipe, v.valor_fipe),
+                veiculo_fipe_status = v.fipe_status,
+                veiculo_diferenca_percentual = v.diferenca_percentual
+            FROM (VALUES %s) AS v (id, valor_fipe, fipe_status, diferenca_percentual)
+            WHERE t.id = v.id
+        """).format(table=sql.Identifier(table_name))
+        execute_values(
+            cursor,
+            query.as_string(conn),
+            updates,
+            template="(%s, %s::numeric, %s, %s::numeric)",
+            page_size=len(updates)
+        )
+        conn.commit()
+        return len(updates)
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao atualizar o enriquecimento FIPE na tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cursor:
+            cursor.close()
+
+def refresh_fipe_differences(conn, table_name):
+    """
+    Recalcula 'veiculo_diferenca_percentual' dos lotes já enriquecidos cujo preço mudou depois do
+    enriquecimento (upsert do loop, releituras do scheduler e do tracker). Retorna quantos mudaram.
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        diferenca = sql.SQL("ROUND(({preco} - veiculo_valor_fipe) / veiculo_valor_fipe * 100, 2)").format(
+            preco=sql.Identifier(FIPE_ENRICHMENT_TABLES[table_name]["preco"])
+        )
+        cursor.execute(sql.SQL("""
+            UPDATE {table} SET veiculo_diferenca_percentual = {diferenca}
+            WHERE veiculo_fipe_status IS NOT NULL AND veiculo_valor_fipe > 0
+              AND veiculo_diferenca_percentual IS DISTINCT FROM {diferenca}
+        """).format(table=sql.Identifier(table_name), diferenca=diferenca))
+        conn.commit()
+        return cursor.rowcount
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao recalcular a diferença FIPE na tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cursor:
+            cursor.close()
+
+### Funções do cubo de tendência de preços (gráfico "Variação de Valores por Modelo e Ano")
+
+# Colunas de cada tabela de lotes usadas no cubo. 'anos' segue a mesma ordem do dashboard
+# (ano de fabricação e, na falta dele, ano modelo).
+PRICE_TREND_TABLES = {
+    "leilo": {"modelo": "veiculo_modelo", "anos": ["veiculo_ano_fabricacao"],
+              "preco": "veiculo_valor_lance_atual", "data": "veiculo_data_leilao"},
+    "parque_leiloes_oficial": {"modelo": "veiculo_modelo", "anos": ["veiculo_ano_fabricacao", "veiculo_ano_modelo"],
+                               "preco": "veiculo_valor_lance_atual", "data": "veiculo_data_leilao"},
+    "loop": {"modelo": "veiculo_modelo", "anos": ["veiculo_ano_fabricacao", "veiculo_ano_modelo"],
+             "preco": "veiculo_lance_atual", "data": "veiculo_data_leilao"},
+}
+# No cubo, ano = 0 agrega todos os anos do modelo (medianas e percentis não podem ser somados depois)
+PRICE_TREND_ALL_YEARS = 0
+
+def create_price_trend_tables(conn):
+    """
+    Cria 'tendencia_precos_diaria' (agregados por modelo, ano, tabela de origem e dia do leilão),
+    'tendencia_precos_controle' (até qual data_extracao cada tabela já foi agregada) e
+    'tendencia_precos_lotes' (em qual grupo (modelo, dia) cada linha foi contada da última vez).
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tendencia_precos_diaria (
+                source_table VARCHAR(50) NOT NULL,
+                modelo VARCHAR(255) NOT NULL,
+                ano SMALLINT NOT NULL,
+                dia DATE NOT NULL,
+                quantidade INTEGER NOT NULL,
+                preco_medio NUMERIC(15, 2),
+                preco_mediano NUMERIC(15, 2),
+                preco_p25 NUMERIC(15, 2),
+                preco_p75 NUMERIC(15, 2),
+                mercado_medio NUMERIC(15, 2),
+                mercado_mediano NUMERIC(15, 2),
+                mercado_p25 NUMERIC(15, 2),
+                mercado_p75 NUMERIC(15, 2),
+                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (modelo, ano, source_table, dia)
+            );
+            CREATE TABLE IF NOT EXISTS tendencia_precos_controle (
+                source_table VARCHAR(50) PRIMARY KEY,
+                ultima_extracao TIMESTAMP,
+                atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE IF NOT EXISTS tendencia_precos_lotes (
+                source_table VARCHAR(50) NOT NULL,
+                lote_id INTEGER NOT NULL,
+                modelo VARCHAR(255) NOT NULL,
+                dia DATE NOT NULL,
+                PRIMARY KEY (source_table, lote_id)
+            );
+        """)
+        conn.commit()
+        print("[DB] Tabelas de tendência de preços verificadas/criadas com sucesso.")
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao criar ou verificar as tabelas de tendência de preços: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def _price_trend_source(table_name):
+    """
+    SELECT com id, modelo, ano, dia, preço e valor FIPE já convertidos para a tabela informada.
+    O "mercado" do cubo é só o valor FIPE (a estimativa do modelo local não fica no banco);
+    aggregate_price_trends, no analyzer, usa a mesma definição.
+    """
+    columns = PRICE_TREND_TABLES[table_name]
+    anos = [sql.SQL("substring({}::text from '\\d{{4}}')::smallint").format(sql.Identifier(col)) for col in columns["anos"]]
+    return sql.SQL("""
+        SELECT id,
+               NULLIF(trim({modelo}), '') AS modelo,
+               COALESCE({anos}) AS ano,
+               to_date(substring({data}::text from '^\\d{{2}}/\\d{{2}}/\\d{{4}}'), 'DD/MM/YYYY') AS dia,
+               NULLIF({preco}, 0)::float8 AS preco,
+               NULLIF(veiculo_valor_fipe, 0)::float8 AS mercado,
+               data_extracao
+        FROM {table}
+    """).format(
+        modelo=sql.Identifier(columns["modelo"]),
+        anos=sql.SQL(", ").join(anos),
+        data=sql.Identifier(columns["data"]),
+        preco=sql.Identifier(columns["preco"]),
+        table=sql.Identifier(table_name),
+    )
+
+def refresh_price_trends(conn, table_name, full=False):
+    """
+    Atualiza o cubo de tendência para uma tabela de lotes. Por padrão é incremental: só os
+    grupos (modelo, dia) com linhas extraídas depois da última atualização são recalculados
+    (cada grupo é recalculado por inteiro, então médias e medianas ficam exatas). O grupo
+    anterior dessas linhas, guardado em 'tendencia_precos_lotes', também é recalculado: um
+    lote que mudou de data (update_latest_lot, upsert do loop) sai do dia antigo.
+    'full=True' refaz a tabela toda (use após alterações que não mudam data_extracao,
+    como o enriquecimento FIPE, ou remoções de lotes).
+    Retorna a quantidade de linhas gravadas no cubo.
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql.SQL("SELECT MAX(data_extracao) FROM {}").format(sql.Identifier(table_name)))
+        ate = cursor.fetchone()[0]
+        cursor.execute("SELECT ultima_extracao FROM tendencia_precos_controle WHERE source_table = %s", (table_name,))
+        row = cursor.fetchone()
+        desde = None if full or row is None else row[0]
+        if desde is not None:
+            # Cubo anterior à tabela de grupos por lote: sem o grupo antigo, refaz tudo uma vez
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM tendencia_precos_lotes WHERE source_table = %s)", (table_name,))
+            if not cursor.fetchone()[0]:
+                desde = None
+
+        if desde is not None and ate is not None and ate <= desde:
+            conn.commit()
+            print(f"[DB] Tendência de preços de '{table_name}' já está atualizada.")
+            return 0
+
+        source = _price_trend_source(table_name)
+        if desde is None:
+            # Carga completa: todos os grupos da tabela
+            cursor.execute("DELETE FROM tendencia_precos_diaria WHERE source_table = %s", (table_name,))
+            cursor.execute("DELETE FROM tendencia_precos_lotes WHERE source_table = %s", (table_name,))
+            touched = sql.SQL("TRUE")
+            affected = sql.SQL("SELECT DISTINCT modelo, dia FROM base WHERE modelo IS NOT NULL AND dia IS NOT NULL")
+            params = {"tabela": table_name}
+        else:
+            touched = sql.SQL("b.data_extracao > %(desde)s AND b.data_extracao <= %(ate)s")
+            # Grupos atuais das linhas novas/alteradas e os grupos em que elas estavam antes
+            affected = sql.SQL("""
+                SELECT modelo, dia FROM base b
+                WHERE modelo IS NOT NULL AND dia IS NOT NULL AND {touched}
+                UNION
+                SELECT l.modelo, l.dia FROM tendencia_precos_lotes l JOIN base b ON b.id = l.lote_id
+                WHERE l.source_table = %(tabela)s AND {touched}
+            """).format(touched=touched)
+            params = {"tabela": table_name, "desde": desde, "ate": ate}
+            cursor.execute(sql.SQL("""
+                WITH base AS ({source}), afetados AS ({affected})
+                DELETE FROM tendencia_precos_diaria t USING afetados a
+                WHERE t.source_table = %(tabela)s AND t.modelo = a.modelo AND t.dia = a.dia
+            """).format(source=source, affected=affected), params)
+
+        # Um agrupamento por (modelo, ano, dia) e outro por (modelo, dia) com ano = 0 (todos os anos)
+        cursor.execute(sql.SQL("""
+            WITH base AS ({source}), afetados AS ({affected})
+            INSERT INTO tendencia_precos_diaria (
+                source_table, modelo, ano, dia, quantidade,
+                preco_medio, preco_mediano, preco_p25, preco_p75,
+                mercado_medio, mercado_mediano, mercado_p25, mercado_p75
+            )
+            SELECT %(tabela)s, modelo, ano, dia, quantidade,
+                   preco_medio, preco_q[2], preco_q[1], preco_q[3],
+                   mercado_medio, mercado_q[2], mercado_q[1], mercado_q[3]
+            FROM (
+                SELECT b.modelo, CASE WHEN GROUPING(b.ano) = 1 THEN {todos} ELSE b.ano END AS ano, b.dia,
+                       COUNT(*) AS quantidade,
+                       AVG(b.preco) AS preco_medio,
+                       percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY b.preco) AS preco_q,
+                       AVG(b.mercado) AS mercado_medio,
+                       percentile_cont(ARRAY[0.25, 0.5, 0.75]) WITHIN GROUP (ORDER BY b.mercado) AS mercado_q
+                FROM base b JOIN afetados a ON a.modelo = b.modelo AND a.dia = b.dia
+                GROUP BY GROUPING SETS ((b.modelo, b.ano, b.dia), (b.modelo, b.dia))
+            ) agregados
+            WHERE ano IS NOT NULL
+            ON CONFLICT (modelo, ano, source_table, dia) DO UPDATE SET
+                quantidade = EXCLUDED.quantidade,
+                preco_medio = EXCLUDED.preco_medio,
+                preco_mediano = EXCLUDED.preco_mediano,
+                preco_p25 = EXCLUDED.preco_p25,
+                preco_p75 = EXCLUDED.preco_p75,
+                mercado_medio = EXCLUDED.mercado_medio,
+                mercado_mediano = EXCLUDED.mercado_mediano,
+                mercado_p25 = EXCLUDED.mercado_p25,
+                mercado_p75 = EXCLUDED.mercado_p75,
+                atualizado_em = CURRENT_TIMESTAMP
+        """).format(source=source, affected=affected, todos=sql.Literal(PRICE_TREND_ALL_YEARS)), params)
+        written = cursor.rowcount
+
+        # Grupo atual de cada linha agregada, para a próxima atualização incremental
+        cursor.execute(sql.SQL("""
+            WITH base AS ({source})
+            DELETE FROM tendencia_precos_lotes l USING base b
+            WHERE l.source_table = %(tabela)s AND l.lote_id = b.id AND {touched}
+        """).format(source=source, touched=touched), params)
+        cursor.execute(sql.SQL("""
+            WITH base AS ({source})
+            INSERT INTO tendencia_precos_lotes (source_table, lote_id, modelo, dia)
+            SELECT %(tabela)s, b.id, b.modelo, b.dia FROM base b
+            WHERE b.modelo IS NOT NULL AND b.dia IS NOT NULL AND {touched}
+        """).format(source=source, touched=touched), params)
+
+        cursor.execute("""
+            INSERT INTO tendencia_precos_controle (source_table, ultima_extracao) VALUES (%s, %s)
+            ON CONFLICT (source_table) DO UPDATE SET
+                ultima_extracao = EXCLUDED.ultima_extracao,
+                atualizado_em = CURRENT_TIMESTAMP
+        """, (table_name, ate))
+        conn.commit()
+        print(f"[DB] Tendência de preços de '{table_name}' atualizada ({'completa' if desde is None else 'incremental'}): {written} linha(s).")
+        return written
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao atualizar a tendência de preços da tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cursor:
+            cursor.close()
+
+def fetch_price_trends(conn, modelo, ano=None):
+    """
+    Linhas do cubo para o modelo (e ano, ou todos os anos), ordenadas por dia e tabela de origem.
+    Cada item é (source_table, dia, quantidade, preco_medio, preco_mediano, preco_p25, preco_p75,
+    mercado_medio, mercado_mediano, mercado_p25, mercado_p75).
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT source_table, dia, quantidade, preco_medio, preco_mediano, preco_p25, preco_p75,
+                   mercado_medio, mercado_mediano, mercado_p25, mercado_p75
+            FROM tendencia_precos_diaria
+            WHERE modelo = %s AND ano = %s
+            ORDER BY dia, source_table
+        """, (modelo, PRICE_TREND_ALL_YEARS if ano is None else ano))
+        return cursor.fetchall()
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao consultar a tendência de preços do modelo '{modelo}': {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if cursor:
+            cursor.close()
+
+### Funções do cache de avaliações de IA (seção "Avaliação Detalhada com IA" do dashboard)
+
+def create_ia_evaluations_table(conn):
+    """
+    Cria a tabela 'avaliacoes_ia', com a resposta do modelo de linguagem para cada lote.
+    'chave' é o hash de (modelo, ano, km, preco_lote, valor_mercado, versão do prompt).
+    """
+    cursor = None
+    table_name = "avaliacoes_ia"
+    try:
+        cursor = conn.cursor()
+        create_table_query = sql.SQL("""
+            CREATE TABLE IF NOT EXISTS {} (
+                chave VARCHAR(64) PRIMARY KEY,
+                modelo VARCHAR(255),
+                ano SMALLINT,
+                km INTEGER,
+                preco_lote NUMERIC(15, 2),
+                valor_mercado NUMERIC(15, 2),
+                prompt_versao VARCHAR(20) NOT NULL,
+                modelo_llm VARCHAR(100),
+                resposta TEXT NOT NULL,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """).format(sql.Identifier(table_name))
+        cursor.execute(create_table_query)
+        conn.commit()
+        print(f"[DB] Tabela '{table_name}' verificada/criada com sucesso.")
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao criar ou verificar a tabela '{table_name}': {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+def get_ia_evaluations(conn, keys):
+    """Busca as avaliações das chaves informadas em uma única consulta. Retorna chave -> resposta."""
+    if not keys:
+        return {}
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT chave, resposta FROM avaliacoes_ia WHERE chave IN %s", (tuple(keys),))
+        return dict(cursor.fetchall())
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao consultar o cache de avaliações de IA: {e}")
+        if conn:
+            conn.rollback()
+        return {}
+    finally:
+        if cursor:
+            cursor.close()
+
+def upsert_ia_evaluations(conn, entries):
+    """
+    Grava no 'avaliacoes_ia' uma lista de tuplas
+    (chave, modelo, ano, km, preco_lote, valor_mercado, prompt_versao, modelo_llm, resposta).
+    """
+    if not entries:
+        return
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        execute_values(cursor, """
+            INSERT INTO avaliacoes_ia (chave, modelo, ano, km, preco_lote, valor_mercado, prompt_versao, modelo_llm, resposta)
+            VALUES %s
+            ON CONFLICT (chave) DO UPDATE SET
+                modelo_llm = EXCLUDED.modelo_llm,
+                resposta = EXCLUDED.resposta,
+                criado_em = CURRENT_TIMESTAMP
+        """, entries)
+        conn.commit()
+    except Exception as e:
+        print(f"[DB ERROR] Erro ao gravar avaliações de IA: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+
+### Carga em massa (COPY)
+
+def copy_rows(conn, table_name, columns, csv_file):
+    """
+    Carrega na tabela as linhas de um arquivo CSV (sem cabeçalho, na ordem de 'columns')
+    com um único COPY ... FROM STDIN. Campos vazios viram NULL. Retorna quantas linhas entraram.
+    """
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        query = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
             sql.Identifier(table_name),
-            sql.SQL(', ').join(map(sql.Identifier, columns_to_insert)),
-            sql.SQL(', ').join(sql.Placeholder() * len(columns_to_insert))
+            sql.SQL(', ').join(map(sql.Identifier, columns))
         )
-        
-        cursor.execute(insert_query, values_to_insert)
+        cursor.copy_expert(query.as_string(conn), csv_file)
         conn.commit()
-        print(f"[DB] Dados inseridos/atualizados para o lote: {data_row_dict.get('veiculo_link_lote', 'N/A')}")
+        return cursor.rowcount
     except Exception as e:
-        print(f"[DB ERROR] Erro ao inserir dados na tabela '{table_name}': {e}")
+        print(f"[DB ERROR] Erro no COPY para a tabela '{table_name}': {e}")
         if conn:
             conn.rollback()
+        return 0
     finally:
         if cursor:
             cursor.close()
@@ -0,0 +1,3 @@
+"""Pipeline de ETL único para os CSVs dos scrapers (leilo, loop, parque)."""
+from etl.engine import apply_spec, find_csv_files, find_latest_csv, process_file
+from etl.specs import SITE_SPECS
@@ -0,0 +1,140 @@
+"""
+CLI do ETL.
+
+Exemplos (a partir da raiz do repositório):
+    python -m etl leilo                      # todos os CSVs ainda não processados (manifesto)
+    python -m etl leilo --latest             # só o CSV mais recente
+    python -m etl parque --file parque/etl/leilao_parque_data_20250713_014758.csv
+    python -m etl loop --dir loop/webscraping  # todos os CSVs do diretório
+"""
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from common import tracing
+from etl.engine import (
+    TIMESTAMP_FORMAT,
+    find_csv_files,
+    find_latest_csv,
+    get_site_spec,
+    process_file,
+    report_file_age,
+    resolve_path
+)
+from etl.manifest import connect_manifest, file_sha256, filter_unprocessed, record_processed
+from etl.specs import SITE_SPECS
+
+
+def _file_timestamp(csv_path, file_pattern):
+    """Timestamp do nome do arquivo; se o nome fugir do padrão, usa a data de modificação."""
+    match = re.fullmatch(file_pattern, os.path.basename(csv_path))
+    if match:
+        try:
+            return datetime.strptime(match.group(1), TIMESTAMP_FORMAT)
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(os.path.getmtime(csv_path))
+
+def _process_task(site, csv_path, file_timestamp, output_dir, output_format, preview_rows):
+    """Trata o arquivo e devolve (caminho da saída, sha256 do CSV)."""
+    sha256 = file_sha256(csv_path)
+    with tracing.span("etl.arquivo", site=site, arquivo=os.path.basename(csv_path)):
+        output_path = process_file(site, csv_path, file_timestamp, output_dir, output_format, preview_rows)
+    tracing.contar("arquivos")
+    return output_path, sha256
+
+def _process_task_pool(*args):
+    """Executado nos processos do pool: devolve também as métricas do arquivo, agregadas no processo principal."""
+    output_path, sha256 = _process_task(*args)
+    return output_path, sha256, tracing.drenar()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m etl", description="Trata os CSVs gerados pelos scrapers.")
+    parser.add_argument("site", choices=list(SITE_SPECS), help="Site cujos CSVs serão tratados.")
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument("--file", help="Processa um único CSV.")
+    modo.add_argument("--dir", help="Processa todos os CSVs do site encontrados neste diretório.")
+    modo.add_argument("--latest", action="store_true", help="Processa só o CSV mais recente.")
+    modo.add_argument("--new", action="store_true",
+                      help="Processa todos os CSVs ainda não registrados no manifesto (padrão).")
+    parser.add_argument("--output-dir", help="Diretório de saída (padrão: PARQUET_DIR para parquet, o da especificação do site para xlsx/csv).")
+    parser.add_argument("--format", choices=["parquet", "xlsx", "csv"], default="parquet", help="Formato do arquivo tratado.")
+    parser.add_argument("--preview", type=int, default=5, help="Linhas exibidas de cada resultado (0 para nenhuma).")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Processos usados quando há mais de um arquivo.")
+    parser.add_argument("--manifest", help="Caminho do manifesto SQLite (padrão: ETL_MANIFEST_PATH ou data/etl_manifest.sqlite).")
+    args = parser.parse_args(argv)
+
+    spec = get_site_spec(args.site)
+    print(f"--- Iniciando processamento de dados ETL ({args.site}) ---")
+    tracer = tracing.configurar(f"etl_{args.site}")
+
+    manifest = connect_manifest(args.manifest)
+    if args.file:
+        targets = [(args.file, _file_timestamp(args.file, spec["file_pattern"]))]
+    elif args.dir:
+        targets = find_csv_files(resolve_path(args.dir), spec["file_pattern"])
+    elif args.latest:
+        csv_dir = resolve_path(spec["csv_dir"])
+        latest_csv, latest_timestamp = find_latest_csv(csv_dir, spec["file_pattern"])
+        targets = [(latest_csv, latest_timestamp)] if latest_csv else []
+        if latest_csv:
+            report_file_age(latest_timestamp)
+    else:
+        candidates = find_csv_files(resolve_path(spec["csv_dir"]), spec["file_pattern"])
+        targets = filter_unprocessed(manifest, args.site, candidates)
+        print(f"[INFO] {len(targets)} arquivo(s) novo(s) de {len(candidates)} encontrado(s).")
+        if candidates and not targets:
+            print("[INFO] Nada a processar: todos os CSVs já constam no manifesto.")
+            manifest.close()
+            tracing.finalizar()
+            return 0
+
+    if not targets:
+        print(f"[ERRO] Nenhum arquivo CSV do site '{args.site}' encontrado.")
+        print("Certifique-se de que o scraper foi executado com sucesso e o CSV foi gerado.")
+        manifest.close()
+        tracing.finalizar()
+        return 1
+
+    failures = 0
+    if len(targets) == 1 or args.workers <= 1:
+        for csv_path, file_timestamp in targets:
+            print(f"[INFO] Processando '{csv_path}'.")
+            output_path, sha256 = _process_task(args.site, csv_path, file_timestamp, args.output_dir, args.format, args.preview)
+            if output_path is None:
+                failures += 1
+            else:
+                record_processed(manifest, args.site, csv_path, sha256, output_path)
+    else:
+        # Arquivos independentes: um por processo. O manifesto só é gravado aqui, no processo principal.
+        # Os processos gravam os spans no mesmo trace e devolvem os agregados de cada arquivo.
+        print(f"[INFO] Processando {len(targets)} arquivos com {args.workers} processos.")
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=tracing.configurar,
+                                 initargs=(tracer.servico, tracer.caminho, "")) as executor:
+            futures = {
+                executor.submit(_process_task_pool, args.site, csv_path, file_timestamp, args.output_dir, args.format, 0): csv_path
+                for csv_path, file_timestamp in targets
+            }
+            for future in as_completed(futures):
+                csv_path = futures[future]
+                try:
+                    output_path, sha256, metricas = future.result()
+                    tracing.mesclar(metricas)
+                except Exception as e:
+                    print(f"[ERRO] Falha ao processar '{csv_path}': {e}")
+                    output_path = None
+                if output_path is None:
+                    failures += 1
+                else:
+                    record_processed(manifest, args.site, csv_path, sha256, output_path)
+    manifest.close()
+
+    print(f"[INFO] ETL concluído: {len(targets) - failures} de {len(targets)} arquivo(s) processado(s).")
+    tracing.finalizar()
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
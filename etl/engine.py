@@ -0,0 +1,247 @@
+"""
+Engine de ETL compartilhado pelos sites.
+
+Localiza os CSVs gerados pelos scrapers, carrega, aplica as etapas da especificação do
+site (etl/specs.py) com operações vetorizadas do pandas e exporta o resultado tratado.
+"""
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+
+from common import tracing
+from common.parquet_store import LAYER_TRATADO, write_partition
+from etl.specs import SITE_SPECS
+
+# Raiz do repositório: os caminhos das especificações são relativos a ela
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def get_site_spec(site):
+    if site not in SITE_SPECS:
+        raise ValueError(f"Site '{site}' sem especificação de ETL. Disponíveis: {', '.join(SITE_SPECS)}")
+    return SITE_SPECS[site]
+
+def resolve_path(path):
+    return path if os.path.isabs(path) else os.path.join(REPO_ROOT, path)
+
+def find_csv_files(directory, file_pattern):
+    """
+    Lista os CSVs de 'directory' cujo nome casa com 'file_pattern'.
+    Retorna [(caminho, timestamp), ...] ordenado do mais antigo para o mais recente.
+    """
+    if not os.path.isdir(directory):
+        print(f"[ERRO] O diretório '{directory}' para os arquivos CSV não foi encontrado.")
+        return []
+
+    csv_pattern = re.compile(file_pattern)
+    found = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = csv_pattern.fullmatch(entry.name)
+            if not match or not entry.is_file():
+                continue
+            try:
+                found.append((entry.path, datetime.strptime(match.group(1), TIMESTAMP_FORMAT)))
+            except ValueError:
+                print(f"[WARN] Impossível parsear timestamp do arquivo: {entry.name}")
+    found.sort(key=lambda item: item[1])
+    return found
+
+def find_latest_csv(directory, file_pattern):
+    """Retorna (caminho, timestamp) do CSV mais recente, ou (None, None)."""
+    files = find_csv_files(directory, file_pattern)
+    return files[-1] if files else (None, None)
+
+def report_file_age(file_timestamp):
+    """Compara a hora atual com o timestamp do nome do arquivo."""
+    time_difference = datetime.now() - file_timestamp
+    if time_difference.total_seconds() < 0:
+        print(f"[WARN] O arquivo CSV foi gerado no futuro em relação à hora atual do ETL: {abs(time_difference)}")
+        print("[WARN] Isso pode indicar um problema de sincronização de relógio ou fuso horário no ambiente do scraper.")
+    else:
+        print(f"[INFO] Diferença de tempo desde a geração do arquivo CSV: {time_difference}")
+
+def load_csv(csv_path):
+    # Tudo como string: o tratamento preserva a formatação original (ex.: '45.223', 'R$ 32.000,00')
+    return pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+
+
+### Etapas de transformação
+
+def _first_column(df, source):
+    """Retorna a primeira coluna candidata existente em df (ou None)."""
+    candidates = [source] if isinstance(source, str) else source
+    return next((col for col in candidates if col in df.columns), None)
+
+def _as_text(series):
+    return series.fillna('').astype(str)
+
+def step_rename(df, step):
+    return df.rename(columns=step["mapping"])
+
+def step_select(df, step):
+    return df[[col for col in step["columns"] if col in df.columns]]
+
+def step_remove_pattern(df, step):
+    col = _first_column(df, step["source"])
+    if col is None:
+        print(f"[WARN] Coluna {step['source']} não encontrada. Pulando a remoção de '{step['pattern']}'.")
+        return df
+    df[col] = _as_text(df[col]).str.replace(step["pattern"], '', flags=re.IGNORECASE, regex=True).str.strip()
+    return df
+
+def step_split(df, step):
+    """Divide 'source' no primeiro 'sep': a primeira parte vai para into[0] e o restante para into[1]."""
+    col = _first_column(df, step["source"])
+    if col is None:
+        print(f"[WARN] Coluna {step['source']} não encontrada. Não foi possível criar {step['into']}.")
+        return df
+    parts = _as_text(df[col]).str.partition(step["sep"])
+    df[step["into"][0]] = parts[0].str.strip()
+    df[step["into"][1]] = parts[2].str.strip()
+    return df
+
+def step_replace_values(df, step):
+    if step["source"] in df.columns:
+        df[step["source"]] = df[step["source"]].replace(step["mapping"])
+    return df
+
+def step_extract(df, step):
+    """Extrai uma coluna por regex de um campo de texto livre."""
+    col = _first_column(df, step["source"])
+    if col is None:
+        for target in step["patterns"]:
+            if target not in df.columns:
+                df[target] = step.get("default", '')
+        return df
+    text = _as_text(df[col])
+    for target, pattern in step["patterns"].items():
+        extracted = text.str.extract(pattern, flags=re.IGNORECASE | re.MULTILINE)[0]
+        df[target] = extracted.fillna('').str.strip()
+    if step.get("drop_source"):
+        df = df.drop(columns=[col])
+    return df
+
+def step_title_years(df, step):
+    """
+    Extrai os anos 'AA/AA' do final do título ('COBALT 19/20' -> 2019/2020), limpa o título e
+    grava os anos em 'targets', mantendo o valor já existente quando o título não os traz.
+    """
+    col = _first_column(df, step["source"])
+    if col is None:
+        print(f"[WARN] Coluna {step['source']} não encontrada. Anos do veículo podem estar incompletos.")
+        return df
+    title = _as_text(df[col])
+    extracted = title.str.extract(r"^(.*?)\s*(\d{2})/(\d{2})(?:$|\s.*)")
+    for group, target in zip((1, 2), step["targets"]):
+        years = ("20" + extracted[group]).fillna('')
+        current = _as_text(df[target]) if target in df.columns else pd.Series('', index=df.index)
+        df[target] = years.mask(years == '', current).replace('', 'N/A')
+    df[col] = extracted[0].str.strip().fillna(title)
+    return df
+
+def step_auction_date(df, step):
+    """
+    Cria 'target' (dd/mm/aaaa) com a data do leilão. Sem coluna de data, usa o fallback
+    'Leilão ao vivo em: 4 dias 14h45s': extrai uma data explícita ou soma os dias da
+    contagem regressiva à data de hoje.
+    """
+    col = _first_column(df, step["source"])
+    if col is not None:
+        df[step["target"]] = _as_text(df[col]).str.strip()
+        return df
+
+    fallback = _first_column(df, step.get("fallback", []))
+    if fallback is None:
+        print(f"[WARN] Nenhuma coluna {step['source']} ou {step.get('fallback')} encontrada. '{step['target']}' ficará como N/A.")
+        df[step["target"]] = 'N/A'
+        return df
+
+    text = _as_text(df[fallback]).str.replace("Leilão ao vivo em: ", "", regex=False).str.strip()
+    explicit_date = text.str.extract(r"(\d{2}/\d{2}/\d{4})")[0]
+    is_countdown = text.str.contains(r"\d+\s*h", regex=True)
+    days = pd.to_numeric(text.str.extract(r"(\d+)\s*dias?")[0], errors="coerce").fillna(0)
+    countdown_date = (pd.Timestamp.now().normalize() + pd.to_timedelta(days, unit="D")).dt.strftime("%d/%m/%Y")
+    df[step["target"]] = explicit_date.fillna(countdown_date.where(is_countdown)).fillna('')
+    return df
+
+TRANSFORMS = {
+    "rename": step_rename,
+    "select": step_select,
+    "remove_pattern": step_remove_pattern,
+    "split": step_split,
+    "replace_values": step_replace_values,
+    "extract": step_extract,
+    "title_years": step_title_years,
+    "auction_date": step_auction_date,
+}
+
+def apply_spec(df, spec):
+    """Aplica, em ordem, as etapas da especificação do site."""
+    for step in spec["steps"]:
+        df = TRANSFORMS[step["op"]](df, step)
+    return df
+
+
+### Exportação
+
+def export_frame(df, site, spec, file_timestamp, output_dir=None, output_format="parquet"):
+    """
+    Grava o resultado tratado. O nome usa o timestamp do CSV de origem, então reprocessar
+    o mesmo arquivo sobrescreve a saída em vez de duplicá-la.
+    Parquet vai para a camada 'tratado' particionada por site/data (output_dir é a raiz);
+    xlsx/csv vão para o diretório de saída do site.
+    """
+    file_stem = f"{spec['output_prefix']}_{file_timestamp.strftime(TIMESTAMP_FORMAT)}"
+    if output_format == "parquet":
+        return write_partition(df, site, file_timestamp, file_stem, layer=LAYER_TRATADO,
+                               column_types=spec.get("column_types"),
+                               base_dir=resolve_path(output_dir) if output_dir else None)
+
+    output_dir = resolve_path(output_dir or spec["output_dir"])
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, f"{file_stem}.{output_format}")
+    if output_format == "xlsx":
+        df.to_excel(output_path, index=False)
+    else:
+        df.to_csv(output_path, index=False, encoding="utf-8-sig")
+    return output_path
+
+def process_file(site, csv_path, file_timestamp, output_dir=None, output_format="parquet", preview_rows=5):
+    """Executa o ETL completo de um CSV. Retorna o caminho da saída (ou None em caso de erro)."""
+    spec = get_site_spec(site)
+    try:
+        with tracing.span("etl.ler", site=site):
+            df = load_csv(csv_path)
+    except pd.errors.EmptyDataError:
+        print(f"[WARN] O arquivo CSV '{csv_path}' está vazio. Nenhum dado para processar.")
+        return None
+    except Exception as e:
+        print(f"[ERRO] Ocorreu um erro ao ler o CSV '{csv_path}': {e}")
+        return None
+    print(f"[INFO] {len(df)} registros carregados de '{csv_path}'.")
+    tracing.contar("linhas", len(df))
+
+    try:
+        with tracing.span("etl.transformar", site=site, linhas=len(df)):
+            df = apply_spec(df, spec)
+    except Exception as e:
+        print(f"[ERRO] Ocorreu um erro ao processar o CSV '{csv_path}': {e}")
+        return None
+
+    if preview_rows:
+        print(df.head(preview_rows).to_string())
+
+    try:
+        with tracing.span("etl.exportar", site=site, formato=output_format):
+            output_path = export_frame(df, site, spec, file_timestamp, output_dir, output_format)
+    except Exception as e:
+        print(f"[ERRO] Ocorreu um erro ao exportar os dados tratados: {e}")
+        print("Verifique as permissões de escrita para o caminho de saída ou se o arquivo já está aberto.")
+        return None
+    print(f"[INFO] Dados exportados com sucesso para '{output_path}'.")
+    return output_path
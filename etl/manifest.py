@@ -0,0 +1,96 @@
+"""
+Manifesto do ETL: registra em SQLite os CSVs já processados (nome, tamanho, data de
+modificação e sha256) para que cada execução trate apenas os arquivos novos ou alterados.
+"""
+import hashlib
+import os
+import sqlite3
+from datetime import datetime
+
+from etl.engine import REPO_ROOT
+
+DEFAULT_MANIFEST_PATH = os.getenv("ETL_MANIFEST_PATH", os.path.join(REPO_ROOT, "data", "etl_manifest.sqlite"))
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def connect_manifest(path=None):
+    """Abre (e cria, se preciso) o manifesto."""
+    path = path or DEFAULT_MANIFEST_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS etl_processed_files (
+            site TEXT NOT NULL,
+            file_name TEXT NOT NULL,
+            file_size INTEGER NOT NULL,
+            file_mtime REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            output_path TEXT,
+            processed_at TEXT NOT NULL,
+            PRIMARY KEY (site, file_name)
+        )
+    """)
+    conn.commit()
+    return conn
+
+def _processed_entries(conn, site):
+    rows = conn.execute(
+        "SELECT file_name, file_size, file_mtime, sha256 FROM etl_processed_files WHERE site = ?", (site,)
+    )
+    return {file_name: (file_size, file_mtime, sha256) for file_name, file_size, file_mtime, sha256 in rows}
+
+def filter_unprocessed(conn, site, candidates):
+    """
+    Recebe [(caminho, timestamp), ...] e devolve só os arquivos ainda não processados.
+    Nome, tamanho e mtime iguais ao manifesto bastam para pular o arquivo; se só o mtime
+    mudou, o sha256 decide (evita reprocessar um arquivo apenas copiado ou tocado) e o
+    mtime novo é gravado, para o hash não ser recalculado a cada execução.
+    CSVs vazios (0 bytes, ex.: scraper interrompido) são registrados sem saída e pulados;
+    se o arquivo for reescrito com dados, o tamanho muda e ele volta a ser tratado.
+    """
+    processed = _processed_entries(conn, site)
+    pending = []
+    for path, file_timestamp in candidates:
+        entry = processed.get(os.path.basename(path))
+        stat = os.stat(path)
+        if entry is not None:
+            file_size, file_mtime, sha256 = entry
+            if stat.st_size == file_size and stat.st_mtime == file_mtime:
+                continue
+            if stat.st_size == file_size and file_sha256(path) == sha256:
+                conn.execute(
+                    "UPDATE etl_processed_files SET file_mtime = ? WHERE site = ? AND file_name = ?",
+                    (stat.st_mtime, site, os.path.basename(path)),
+                )
+                continue
+        if stat.st_size == 0:
+            print(f"[WARN] O arquivo CSV '{path}' está vazio; registrado no manifesto sem processamento.")
+            record_processed(conn, site, path, file_sha256(path), None)
+            continue
+        pending.append((path, file_timestamp))
+    conn.commit()
+    return pending
+
+def record_processed(conn, site, path, sha256, output_path):
+    stat = os.stat(path)
+    conn.execute(
+        """
+        INSERT INTO etl_processed_files (site, file_name, file_size, file_mtime, sha256, output_path, processed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (site, file_name) DO UPDATE SET
+            file_size = excluded.file_size,
+            file_mtime = excluded.file_mtime,
+            sha256 = excluded.sha256,
+            output_path = excluded.output_path,
+            processed_at = excluded.processed_at
+        """,
+        (site, os.path.basename(path), stat.st_size, stat.st_mtime, sha256, output_path,
+         datetime.now().isoformat(timespec="seconds")),
+    )
+    conn.commit()
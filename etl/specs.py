@@ -0,0 +1,121 @@
+"""
+Especificações de ETL por site.
+
+Cada site é um dicionário com onde estão os CSVs do scraper, o padrão do nome do arquivo
+(com o timestamp YYYYMMDD_HHMMSS no primeiro grupo), o prefixo do arquivo de saída e a
+lista ordenada de etapas ('steps') executadas pelo engine (ver etl/engine.py).
+'column_types' tipa as colunas criadas pelo ETL na saída Parquet; as colunas originais do
+scraper já têm tipo em common/parquet_store.py (SITE_COLUMN_TYPES), que só conhece os
+cabeçalhos atuais: CSVs com cabeçalhos de versões antigas começam por um 'rename' para eles.
+
+Nas etapas, 'source' pode ser uma lista de colunas candidatas: a primeira que existir no
+CSV é usada. Assim a mesma especificação atende os CSVs antigos e os atuais do scraper.
+Adicionar um site novo é só adicionar uma entrada em SITE_SPECS.
+"""
+
+# Padronização dos fabricantes para os nomes usados pela FIPE
+FABRICANTE_FIPE_MAP = {
+    'VOLKSWAGEN': 'VW - VolksWagen',
+    'CHEVROLET': 'GM - Chevrolet'
+}
+
+SITE_SPECS = {
+    "leilo": {
+        "csv_dir": "leilo/etl",
+        "file_pattern": r"(?:leilao_leilo_data|leilao_data|leilo)_(\d{8}_\d{6})\.csv",
+        "output_dir": "leilo/etl_tratado",
+        "output_prefix": "leilo_tratado",
+        "column_types": {"KM": "int", "data leilão": "date"},
+        "steps": [
+            # Remove apenas o texto 'km', mantendo a numeração e a pontuação como string
+            {"op": "remove_pattern", "source": ["KM", "veiculo_km"], "pattern": r"km"},
+            # 'FIAT/ARGO' -> Fabricante_Veiculo='FIAT', Modelo='ARGO'
+            {"op": "split", "source": ["Título", "veiculo_titulo"], "sep": "/", "into": ["Fabricante_Veiculo", "Modelo"]},
+            {"op": "replace_values", "source": "Fabricante_Veiculo", "mapping": FABRICANTE_FIPE_MAP},
+            # 'POLO COMFORTLINE AB (4P)' -> Modelo_Veiculo='POLO', Modelo='COMFORTLINE AB (4P)'
+            {"op": "split", "source": "Modelo", "sep": " ", "into": ["Modelo_Veiculo", "Modelo"]},
+            {"op": "auction_date", "source": ["Data Leilão", "veiculo_data_leilao"],
+             "fallback": ["Situação", "veiculo_situacao"], "target": "data leilão"},
+        ],
+    },
+    "loop": {
+        "csv_dir": "loop/webscraping",
+        "file_pattern": r"loopbrasil_(\d{8}_\d{6})\.csv",
+        "output_dir": "loop/etl_tratado",
+        "output_prefix": "dados_loop_processado",
+        "column_types": {
+            "Tabela FIPE": "brl", "KM": "int", "Numero de Lances": "int", "Numero de Visualizacoes": "int",
+            "Data do Leilao": "date", "Lance Atual": "brl",
+        },
+        "steps": [
+            {"op": "rename", "mapping": {
+                'Nome do Veículo (Header)': 'Nome do Veículo',
+                'Fipe': 'Tabela FIPE',
+                'Chave': 'Chaves',
+                'Km': 'KM',
+                'Número de Lances': 'Numero de Lances',
+                'Número de Visualizações': 'Numero de Visualizacoes',
+                'Data do Leilão': 'Data do Leilao',
+                'Horário do Leilão': 'Horario do Leilao',
+                'Situação do Lote': 'Situacao do Lote',
+            }},
+            # Mantém apenas estas colunas, nesta ordem (as ausentes no CSV são ignoradas)
+            {"op": "select", "columns": [
+                'URL do Lote', 'Nome do Veículo', 'Marca', 'Modelo', 'Versão', 'Ano de Fabricação',
+                'Ano Modelo', 'Tabela FIPE', 'Blindado', 'Chaves', 'Funcionando', 'Combustível', 'KM',
+                'Numero de Lances', 'Numero de Visualizacoes', 'Data do Leilao', 'Horario do Leilao',
+                'Lance Atual', 'Situacao do Lote',
+            ]},
+        ],
+    },
+    "parque": {
+        "csv_dir": "parque/etl",
+        "file_pattern": r"leilao_parque_data_(\d{8}_\d{6})\.csv",
+        "output_dir": "parque/etl_tratado",
+        "output_prefix": "dados_leilao_processado",
+        # As colunas do scraper já têm tipo em SITE_COLUMN_TYPES (depois do 'rename' abaixo)
+        "column_types": {"data leilão": "date"},
+        "steps": [
+            # Cabeçalhos de versões antigas do scraper -> os atuais, para cada campo virar uma
+            # coluna só (e tipada) na camada tratada, em vez de uma por versão do CSV
+            {"op": "rename", "mapping": {
+                'Título': 'titulo', 'Link': 'link', 'Imagem': 'imagem', 'KM Veiculo': 'km_veiculo',
+                'Lance Inicial': 'lance_inicial', 'Valor do Lance': 'valor_do_lance', 'data leilão': 'data_leilao',
+                'Marca Veiculo': 'marca_veiculo', 'Final da Placa Veiculo': 'final_da_placa_veiculo',
+                'Ano Fabricacao Veiculo': 'ano_fabricacao_veiculo', 'Ano Modelo Veiculo': 'ano_modelo_veiculo',
+                'Chaves Veiculo': 'chaves_veiculo', 'Condicao Motor Veiculo': 'condicao_motor_veiculo',
+                'Tabela FIPE Veiculo': 'tabela_fipe_veiculo', 'Combustivel Veiculo': 'combustivel_veiculo',
+                'Procedencia Veiculo': 'procedencia_veiculo',
+                'Veiculo_Titulo': 'titulo', 'Veiculo_Link_Lote': 'link', 'Veiculo_Imagem': 'imagem',
+                'Veiculo_KM': 'km_veiculo', 'Veiculo_Lance_Inicial': 'lance_inicial',
+                'Veiculo_Valor_Lance_Atual': 'valor_do_lance', 'Veiculo_Data_Leilao': 'data_leilao',
+                'Veiculo_Fabricante': 'marca_veiculo', 'Veiculo_Final_Placa': 'final_da_placa_veiculo',
+                'Veiculo_Ano_Fabricacao': 'ano_fabricacao_veiculo', 'Veiculo_Ano_Modelo': 'ano_modelo_veiculo',
+                'Veiculo_Possui_Chave': 'chaves_veiculo', 'Veiculo_Condicao_Motor': 'condicao_motor_veiculo',
+                'Veiculo_Valor_Fipe': 'tabela_fipe_veiculo', 'Veiculo_Tipo_Combustivel': 'combustivel_veiculo',
+                'Veiculo_Tipo_Retomada': 'procedencia_veiculo', 'Veiculo_Total_Lances': 'total_lances',
+                'Veiculo_Modelo': 'modelo_veiculo',
+            }},
+            # CSVs antigos traziam os detalhes do veículo em um único bloco de texto
+            {"op": "extract", "source": "Descricao Detalhada", "drop_source": True, "default": "N/A", "patterns": {
+                'marca_veiculo': r"Marca:\s*(.+?)\n",
+                'modelo_veiculo': r"Modelo:\s*(.+?)\n",
+                'versao_veiculo': r"Versão:\s*(.+?)\n",
+                'km_veiculo': r"KM:\s*(.+?)\n",
+                'ano_fabricacao_veiculo': r"Ano de Fabricação:\s*(.+?)\n",
+                'ano_modelo_veiculo': r"Ano Modelo:\s*(.+?)\n",
+                'chaves_veiculo': r"Chaves:\s*(.+?)\n",
+                'condicao_motor_veiculo': r"Condição[\s\xA0]do[\s\xA0]Motor:[\s\xA0]*(.+?)(?:[\s\xA0]*\n|$)",
+                'tabela_fipe_veiculo': r"Tabela FIPE R\$?\s*(.+?)\n",
+                'final_da_placa_veiculo': r"Final da Placa:\s*(.+?)\n",
+                'combustivel_veiculo': r"Combustível:\s*(.+?)\n",
+                'procedencia_veiculo': r"Procedência:\s*(.+)",
+            }},
+            # 'CHEVROLET COBALT 19/20' -> título limpo e anos 2019/2020 (prioritários sobre a descrição)
+            {"op": "title_years", "source": ["titulo"],
+             "targets": ["ano_fabricacao_veiculo", "ano_modelo_veiculo"]},
+            {"op": "auction_date", "source": ["Data Término", "data_leilao"],
+             "fallback": ["Situação"], "target": "data leilão"},
+        ],
+    },
+}
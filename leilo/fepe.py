@@ -4,12 +4,28 @@ import re
 from datetime import datetime
 import requests
 import time
+import pyarrow.dataset as ds
+
+from common.logging_setup import configurar_logging, debug_ativo, obter_logger
+from common.parquet_store import LAYER_TRATADO, read_lots
+
+logger = obter_logger("fepe")
 
 # --- Configurações de Caminho ---
 CSV_DIRECTORY = r"C:\Users\anton\Desktop\parque_leiloes_scraper\app\leilo\etl_tratado"
 EXCEL_OUTPUT_DIR = r"C:\Users\anton\Desktop\parque_leiloes_scraper\app\leilo"
 
 
+# Cabeçalhos atuais do scraper -> nomes usados abaixo (os tratados antigos já vêm com estes)
+COLUNAS_TRATADO = {
+    "veiculo_titulo": "Título",
+    "veiculo_data_leilao": "Data Leilão",
+    "veiculo_situacao": "Situação",
+    "veiculo_ano_fabricacao": "Ano",
+    "veiculo_valor_lance_atual": "Valor do Lance",
+}
+
+
 # --- Configurações da API FIPE ---
 FIPE_API_BASE_URL = "https://parallelum.com.br/fipe/api/v1"
 
@@ -87,22 +103,46 @@ def find_latest_excel(directory):
         print(f"[ERRO] Ocorreu um erro ao listar arquivos no diretório {directory}: {e}")
         return None
 
+def load_latest_tratado():
+    """
+    Lotes do dia mais recente da camada 'tratado' do leilo em Parquet (saída padrão do ETL),
+    com os nomes de coluna de COLUNAS_TRATADO. Retorna None se não houver arquivos.
+    """
+    datas = read_lots("leilo", columns=["date"], layer=LAYER_TRATADO)
+    if datas.empty:
+        return None
+    ultima_data = datas["date"].max()
+    df = read_lots("leilo", layer=LAYER_TRATADO, row_filter=ds.field("date") == ultima_data)
+    # Os arquivos são lidos na ordem do nome (timestamp da extração): fica a leitura mais recente de cada lote
+    if "veiculo_link_lote" in df.columns:
+        df = df.drop_duplicates(subset="veiculo_link_lote", keep="last", ignore_index=True)
+    for atual, legado in COLUNAS_TRATADO.items():
+        if atual in df.columns:
+            df[legado] = df[atual] if legado not in df.columns else df[legado].fillna(df[atual])
+    if "Data Leilão" in df.columns:
+        # A data vem tipada do Parquet; a saída mantém o formato dd/mm/aaaa do Excel
+        df["Data Leilão"] = pd.to_datetime(df["Data Leilão"]).dt.strftime("%d/%m/%Y")
+    print(f"[INFO] Dados carregados da camada tratada em Parquet (leilo, {ultima_data}).")
+    return df
+
 def process_and_display_data():
     print("--- Iniciando processamento de dados ETL e consulta FIPE ---")
 
-    EXCEL_FILE_PATH = find_latest_excel(CSV_DIRECTORY)
-
-    if not EXCEL_FILE_PATH:
-        print(f"[ERRO] Nenhum arquivo Excel com o padrão 'leilo_tratado_YYYYMMDD_HHMMSS.xlsx' encontrado em '{CSV_DIRECTORY}'.")
-        print("Certifique-se de que o scraper foi executado com sucesso e o arquivo Excel foi gerado.")
-        print("Verifique também o mapeamento de volumes no seu docker-compose.yml, se aplicável.")
-        return
-
-    print(f"[INFO] Processando o arquivo Excel mais recente: '{EXCEL_FILE_PATH}'.")
-
     try:
-        df = pd.read_excel(EXCEL_FILE_PATH)
-        print(f"[INFO] Dados carregados com sucesso do '{EXCEL_FILE_PATH}'.")
+        df = load_latest_tratado()
+        if df is None:
+            # Saída antiga do ETL (python -m etl leilo --format xlsx)
+            EXCEL_FILE_PATH = find_latest_excel(CSV_DIRECTORY)
+
+            if not EXCEL_FILE_PATH:
+                print(f"[ERRO] Nenhum Parquet tratado do leilo nem arquivo Excel com o padrão 'leilo_tratado_YYYYMMDD_HHMMSS.xlsx' encontrado em '{CSV_DIRECTORY}'.")
+                print("Certifique-se de que o scraper e o ETL foram executados com sucesso.")
+                print("Verifique também o mapeamento de volumes no seu docker-compose.yml, se aplicável.")
+                return
+
+            print(f"[INFO] Processando o arquivo Excel mais recente: '{EXCEL_FILE_PATH}'.")
+            df = pd.read_excel(EXCEL_FILE_PATH)
+            print(f"[INFO] Dados carregados com sucesso do '{EXCEL_FILE_PATH}'.")
         print(f"[INFO] Total de {len(df)} registros encontrados.")
 
         if 'Título' in df.columns:
@@ -115,7 +155,7 @@ def process_and_display_data():
                 df['Modelo'] = ''
             print("[INFO] Coluna 'Título' desmembrada em 'Marca' e 'Modelo' (modelo extraído até o primeiro espaço).")
         else:
-            print("[WARN] Coluna 'Título' não encontrada no Excel. Não foi possível desmembrar.")
+            print("[WARN] Coluna 'Título' não encontrada nos dados tratados. Não foi possível desmembrar.")
             df['Marca'] = ''
             df['Modelo'] = ''
 
@@ -252,9 +292,13 @@ def process_and_display_data():
             df.at[index, 'FIPE_Modelo_Correspondente'] = fipe_model_name
             df.at[index, 'Status_FIPE'] = fipe_status
 
-            scraped_valor_str = str(row.get('Valor do Lance', '0')).replace("R$", "").replace(".", "").replace(",", ".").strip()
+            valor_lance = row.get('Valor do Lance', '0')
             try:
-                scraped_valor = float(scraped_valor_str)
+                # No Parquet o lance já é numérico; no Excel antigo vem como 'R$ 32.000,00'
+                if isinstance(valor_lance, (int, float)):
+                    scraped_valor = float(valor_lance)
+                else:
+                    scraped_valor = float(str(valor_lance).replace("R$", "").replace(".", "").replace(",", ".").strip())
                 if fipe_price is not None and fipe_price > 0:
                     diferenca_percentual = ((scraped_valor - fipe_price) / fipe_price) * 100
                     df.at[index, 'Diferenca_Valor (%)'] = f"{diferenca_percentual:.2f}%"
@@ -272,13 +316,14 @@ def process_and_display_data():
         )
         print("[INFO] Coluna 'valor_fipe' formatada para o padrão 'R$ X.XXX,XX'.")
 
-        pd.set_option('display.max_columns', None)
-        pd.set_option('display.width', 1000)
-        pd.set_option('display.max_rows', None)
-
-        print("\n--- Tabela de Dados Processados (com FIPE) ---")
-        print(df.to_string())
-        print("\n--- Fim da Tabela ---")
+        # O frame inteiro só é formatado com LOG_LEVEL=DEBUG
+        if debug_ativo(logger):
+            pd.set_option('display.max_columns', None)
+            pd.set_option('display.width', 1000)
+            pd.set_option('display.max_rows', None)
+            logger.debug("Tabela de Dados Processados (com FIPE):\n%s", df.to_string())
+        else:
+            print(f"[INFO] {len(df)} linhas processadas (LOG_LEVEL=DEBUG imprime a tabela completa).")
 
         timestamp_excel_output = datetime.now().strftime("%Y%m%d_%H%M%S")
         EXCEL_OUTPUT_FILE_NAME = f"comparacao_fipe_{timestamp_excel_output}.xlsx"
@@ -294,7 +339,8 @@ def process_and_display_data():
             print("Verifique as permissões de escrita para o caminho de saída ou se o arquivo já está aberto.")
 
     except Exception as e:
-        print(f"[ERRO] Ocorreu um erro ao ler ou processar o arquivo Excel para comparação com FIPE: {e}")
+        print(f"[ERRO] Ocorreu um erro ao ler ou processar os dados tratados para comparação com FIPE: {e}")
 
 if __name__ == "__main__":
+    configurar_logging()
     process_and_display_data()
\ No newline at end of file
@@ -1,32 +1,70 @@
-import pandas as pd
-import os
+import argparse
+import numbers
 import re
-from datetime import datetime
 import requests
 import time
 
-# --- Configurações de Caminho ---
-CSV_DIRECTORY = r"C:\Users\anton\Desktop\parque_leiloes_scraper\app\leilo\etl_tratado"
-EXCEL_OUTPUT_DIR = r"C:\Users\anton\Desktop\parque_leiloes_scraper\app\leilo"
+# Importa as funções de banco de dados do seu módulo db_utils
+from db_utils.db_operations import (
+    FIPE_ENRICHMENT_TABLES,
+    connect_db,
+    create_fipe_cache_table,
+    create_price_trend_tables,
+    refresh_price_trends,
+    add_fipe_enrichment_columns,
+    fetch_lots_pending_fipe,
+    get_fipe_cache_entries,
+    refresh_fipe_differences,
+    upsert_fipe_cache_entries,
+    update_fipe_enrichment
+)
+# Classificador de tipo de veículo compartilhado (carros, motos, caminhoes)
+from common.vehicle_type import classify_vehicle_types
+# Tempo por etapa e contadores (requisições, 429, retentativas) em JSON lines
+from common import tracing
 
 
 # --- Configurações da API FIPE ---
 FIPE_API_BASE_URL = "https://parallelum.com.br/fipe/api/v1"
 
+# Quantidade de lotes lidos do banco e atualizados por vez
+DEFAULT_BATCH_SIZE = 500
+
+# Padronização dos fabricantes raspados para os nomes usados pela FIPE
+FABRICANTE_FIPE_MAP = {
+    'VOLKSWAGEN': 'VW - VolksWagen',
+    'CHEVROLET': 'GM - Chevrolet',
+    'MERCEDES-BENZ': 'Mercedes-Benz',
+    'SCANIA': 'Scania',
+    'VOLVO': 'Volvo'
+}
+
+# Status que indicam falha da API (e não ausência do veículo na FIPE): não vão para o cache e o
+# lote fica sem status, para ser tentado de novo na próxima execução.
+FIPE_STATUS_TRANSITORIOS = {"Marcas FIPE não encontradas", "Modelos FIPE não encontrados", "Anos FIPE não encontrados"}
+
 class FipeApiClient:
     def __init__(self, base_url, max_retries=5, initial_delay=0.5):
         self.base_url = base_url
         self.max_retries = max_retries
         self.initial_delay = initial_delay
+        # Memória das listas de marcas/modelos/anos já baixadas nesta execução
+        self._responses = {}
 
     def _make_request(self, endpoint):
         for attempt in range(self.max_retries):
+            if attempt:
+                tracing.contar("fipe_retentativas")
             try:
-                response = requests.get(f"{self.base_url}{endpoint}", timeout=20)
+                tracing.contar("fipe_requisicoes")
+                with tracing.span("fipe.http", endpoint=endpoint) as span:
+                    response = requests.get(f"{self.base_url}{endpoint}", timeout=20)
+                    span["status"] = response.status_code
                 response.raise_for_status()
                 return response.json()
             except requests.exceptions.HTTPError as e:
                 if e.response.status_code == 429:
+                    tracing.contar("http_429")
                     delay = self.initial_delay * (2 ** attempt)
                     print(f"[WARN API FIPE] Tentativa {attempt + 1}/{self.max_retries}: Too Many Requests (429). Aguardando {delay:.2f} segundos antes de re-tentar...")
                     time.sleep(delay)
@@ -44,15 +82,24 @@ class FipeApiClient:
                     return None
         return None
 
-    # Métodos que estavam faltando ou incompletos:
+    def _cached_request(self, endpoint):
+        if endpoint in self._responses:
+            tracing.contar("fipe_cache_memoria")
+        else:
+            data = self._make_request(endpoint)
+            if data is None:
+                return None
+            self._responses[endpoint] = data
+        return self._responses[endpoint]
+
     def get_brands(self, vehicle_type):
-        return self._make_request(f"/{vehicle_type}/marcas")
+        return self._cached_request(f"/{vehicle_type}/marcas")
 
     def get_models(self, vehicle_type, brand_id):
-        return self._make_request(f"/{vehicle_type}/marcas/{brand_id}/modelos")
+        return self._cached_request(f"/{vehicle_type}/marcas/{brand_id}/modelos")
 
     def get_years(self, vehicle_type, brand_id, model_id):
-        return self._make_request(f"/{vehicle_type}/marcas/{brand_id}/modelos/{model_id}/anos")
+        return self._cached_request(f"/{vehicle_type}/marcas/{brand_id}/modelos/{model_id}/anos")
 
     def get_vehicle_value(self, vehicle_type, brand_id, model_id, year_id):
         data = self._make_request(f"/{vehicle_type}/marcas/{brand_id}/modelos/{model_id}/anos/{year_id}")
@@ -61,28 +108,6 @@ class FipeApiClient:
         return None
 
 
-def determine_vehicle_type(brand_name, model_name):
-    """
-    Determina o tipo de veículo (carros, motos, caminhoes) com base na marca e modelo.
-    Mais robusto, verifica palavras-chave comuns.
-    """
-    brand_name_lower = brand_name.lower() if brand_name else ''
-    model_name_lower = model_name.lower() if model_name else ''
-
-    # Marcas/Palavras-chave comuns para motos
-    moto_keywords = ["moto", "honda", "yamaha", "suzuki", "kawasaki", "bmw gs", "triumph", "harley"]
-    if any(keyword in brand_name_lower or keyword in model_name_lower for keyword in moto_keywords):
-        return "motos"
-    
-    # Marcas/Palavras-chave comuns para caminhões
-    caminhao_keywords = ["caminhao", "mercedes benz caminhao", "volkswagen caminhao", "iveco", "scania", "volvo caminhao", "ford cargo", "agrle"]
-    if any(keyword in brand_name_lower or keyword in model_name_lower for keyword in caminhao_keywords):
-        return "caminhoes"
-    
-    # Padrão, se não for moto nem caminhão, assume carro
-    return "carros"
-
-
 def clean_and_normalize_name(name):
     if not isinstance(name, str):
         return ""
@@ -90,266 +115,202 @@ def clean_and_normalize_name(name):
     cleaned = re.sub(r'\s+', ' ', cleaned).strip().lower()
     return cleaned
 
-def find_latest_excel(directory):
-    latest_excel = None
-    latest_timestamp = None
-    
-    excel_pattern = re.compile(r"leilo_tratado_(\d{8}_\d{6})\.xlsx")
-
-    if not os.path.exists(directory):
-        print(f"[ERRO] O diretório '{directory}' para os arquivos Excel não foi encontrado.")
+def parse_brl_value(value):
+    """Converte 'R$ 12.345,67' (ou um número) para float. Retorna None se não for possível."""
+    if value is None:
         return None
-
+    # Valores NUMERIC do banco chegam como Decimal
+    if isinstance(value, numbers.Number):
+        return float(value)
     try:
-        files = os.listdir(directory)
-        for filename in files:
-            match = excel_pattern.match(filename)
-            if match:
-                current_timestamp_str = match.group(1)
-                try:
-                    current_timestamp = datetime.strptime(current_timestamp_str, "%Y%m%d_%H%M%S")
-                    if latest_timestamp is None or current_timestamp > latest_timestamp:
-                        latest_timestamp = current_timestamp
-                        latest_excel = os.path.join(directory, filename)
-                except ValueError:
-                    print(f"[WARN] Impossível parsear timestamp do arquivo: {filename}")
-        return latest_excel
-    except Exception as e:
-        print(f"[ERRO] Ocorreu um erro ao listar arquivos no diretório {directory}: {e}")
+        return float(str(value).replace("R$", "").replace(".", "").replace(",", ".").strip())
+    except (ValueError, TypeError):
         return None
 
-def process_and_display_data():
-    print("--- Iniciando processamento de dados ETL e consulta FIPE ---")
-
-    EXCEL_FILE_PATH = find_latest_excel(CSV_DIRECTORY)
-
-    if not EXCEL_FILE_PATH:
-        print(f"[ERRO] Nenhum arquivo Excel com o padrão 'leilo_tratado_YYYYMMDD_HHMMSS.xlsx' encontrado em '{CSV_DIRECTORY}'.")
-        print("Certifique-se de que o scraper foi executado com sucesso e o arquivo Excel foi gerado.")
-        print("Verifique também o mapeamento de volumes no seu docker-compose.yml, se aplicável.")
-        return
-
-    print(f"[INFO] Processando o arquivo Excel mais recente: '{EXCEL_FILE_PATH}'.")
-
-    try:
-        df = pd.read_excel(EXCEL_FILE_PATH)
-        print(f"[INFO] Dados carregados com sucesso do '{EXCEL_FILE_PATH}'.")
-        print(f"[INFO] Total de {len(df)} registros encontrados.")
-
-        # --- Desmembrar a coluna 'Título' e criar 'Fabricante_Veiculo' e 'Modelo_Veiculo' ---
-        if 'Título' in df.columns:
-            split_title = df['Título'].str.split('/', n=1, expand=True).fillna('')
-            # Criando 'Fabricante_Veiculo' diretamente
-            df['Fabricante_Veiculo'] = split_title[0].str.strip() 
-            
-            if len(split_title.columns) > 1:
-                # Criando 'Modelo_Veiculo' com a primeira palavra do que sobrou do título
-                df['Modelo_Veiculo'] = split_title[1].str.split(' ', n=1, expand=True)[0].str.strip()
-            else:
-                df['Modelo_Veiculo'] = ''
-            
-            print("[INFO] Coluna 'Título' desmembrada em 'Fabricante_Veiculo' e 'Modelo_Veiculo'.")
-        else:
-            print("[WARN] Coluna 'Título' não encontrada no Excel. Não foi possível desmembrar.")
-            df['Fabricante_Veiculo'] = '' # Garante que as colunas existam mesmo que vazias
-            df['Modelo_Veiculo'] = ''
-
-
-        # --- AJUSTE NA COLUNA 'Fabricante_Veiculo' (se necessário) ---
-        if 'Fabricante_Veiculo' in df.columns:
-            df['Fabricante_Veiculo'] = df['Fabricante_Veiculo'].replace({
-                'VOLKSWAGEN': 'VW - VolksWagen',
-                'CHEVROLET': 'GM - Chevrolet',
-                'MERCEDES-BENZ': 'Mercedes-Benz', # Adicionado para padronização se aparecer assim
-                'SCANIA': 'Scania',
-                'VOLVO': 'Volvo'
-            })
-            print("[INFO] Coluna 'Fabricante_Veiculo' padronizada para algumas marcas comuns.")
-        else:
-            print("[WARN] Coluna 'Fabricante_Veiculo' não encontrada para padronização.")
-
-
-        # --- Duplicar e formatar a coluna 'Data Leilão' para 'data leilão' ---
-        if 'Data Leilão' in df.columns:
-            df['data leilão'] = df['Data Leilão'].astype(str).str.strip()
-            print("[INFO] Coluna 'Data Leilão' usada para 'data leilão'.")
-        elif 'Situação' in df.columns:
-            df['data leilão'] = df['Situação'].astype(str)
-            df['data leilão'] = df['data leilão'].str.replace("Leilão ao vivo em: ", "", regex=False).str.strip()
-            try:
-                def format_date_from_situacao(text):
-                    if pd.isna(text) or not text.strip():
-                        return ''
-                    
-                    date_match = re.search(r'(\d{2}/\d{2}/\d{4})', text)
-                    if date_match:
-                        return date_match.group(1)
-                    
-                    time_match = re.search(r'(\d{2}h\d{2}m\d{2}s)', text)
-                    if time_match:
-                        # Se for só hora, assume a data atual para o leilão
-                        current_date = datetime.now().strftime("%d/%m/%Y")
-                        return current_date
-                    
-                    return ''
-                
-                df['data leilão'] = df['data leilão'].apply(format_date_from_situacao)
-                print("[INFO] Coluna 'Situação' usada como fallback e formatada para 'data leilão' (dd/mm/aaaa).")
-            except Exception as e:
-                print(f"[ERRO] Ocorreu um erro ao formatar a coluna 'data leilão' do fallback: {e}.")
-        else:
-            print("[WARN] Nenhuma coluna 'Data Leilão' ou 'Situação' encontrada. Não foi possível criar 'data leilão'.")
-            df['data leilão'] = ''
-
-        fipe_client = FipeApiClient(FIPE_API_BASE_URL)
-        
-        # Novas colunas para os resultados da FIPE
-        df['FIPE_Marca_Correspondente'] = None
-        df['FIPE_Modelo_Correspondente'] = None
-        df['Diferenca_Valor (%)'] = None
-        df['Status_FIPE'] = "Não Processado"
-        df['valor_fipe'] = None
-
-        for index, row in df.iterrows():
-            # Usando as novas colunas renomeadas
-            marca_scraped = row['Fabricante_Veiculo']
-            modelo_scraped_veiculo = row['Modelo_Veiculo'] 
-            ano_scraped = str(row['Ano'])
-
-            print(f"\nConsulta FIPE para: Fabricante_Veiculo='{marca_scraped}', Modelo_Veiculo='{modelo_scraped_veiculo}', Ano='{ano_scraped}'")
-            
-            # A função `determine_vehicle_type` agora recebe `Fabricante_Veiculo` e `Modelo_Veiculo`
-            vehicle_type = determine_vehicle_type(marca_scraped, modelo_scraped_veiculo)
-            if not vehicle_type:
-                print(f"[WARN] Tipo de veículo não determinado para Fabricante_Veiculo: '{marca_scraped}', Modelo_Veiculo: '{modelo_scraped_veiculo}'. Pulando FIPE.")
-                df.at[index, 'Status_FIPE'] = "Tipo não determinado"
-                continue
+def build_fipe_key(fabricante, modelo, ano, vehicle_type):
+    """
+    Monta a chave (tipo_veiculo, marca, modelo, ano) usada no cache FIPE,
+    já com o fabricante padronizado e nomes normalizados.
+    'vehicle_type' vem de 'classify_vehicle_types', aplicado ao lote inteiro.
+    Retorna None se faltar informação para consultar a FIPE.
+    """
+    fabricante = (fabricante or '').strip()
+    modelo = (modelo or '').strip()
+    ano_match = re.search(r'\d{4}', ano or '')
+    if not fabricante or fabricante == "N/A" or not modelo or modelo == "N/A" or not ano_match:
+        return None
+    marca_fipe = FABRICANTE_FIPE_MAP.get(fabricante.upper(), fabricante)
+    # O modelo raspado pode trazer a versão; a busca usa a primeira palavra
+    modelo_base = modelo.split(' ', 1)[0]
+    return (vehicle_type, clean_and_normalize_name(marca_fipe), clean_and_normalize_name(modelo_base), ano_match.group(0))
 
-            fipe_brand_name = None
-            fipe_model_name = None
-            fipe_price = None
-            fipe_status = "Não Encontrado"
-
-            brands_data = fipe_client.get_brands(vehicle_type)
-            if brands_data:
-                normalized_scraped_brand = clean_and_normalize_name(marca_scraped)
-                # Buscando a marca correspondente na FIPE
-                matched_brand = next((b for b in brands_data if normalized_scraped_brand == clean_and_normalize_name(b['nome'])), None)
-                
-                if matched_brand:
-                    fipe_brand_name = matched_brand['nome']
-                    brand_id = matched_brand['codigo']
-                    
-                    models_data = fipe_client.get_models(vehicle_type, brand_id)
-                    if models_data and 'modelos' in models_data:
-                        normalized_scraped_model_veiculo = clean_and_normalize_name(modelo_scraped_veiculo)
-                        matched_model = None
-
-                        # TENTATIVA 1: Procurar pelo Modelo_Veiculo exato ou como substring
-                        for m in models_data['modelos']:
-                            normalized_fipe_model = clean_and_normalize_name(m['nome'])
-                            if normalized_scraped_model_veiculo == normalized_fipe_model or \
-                               (normalized_scraped_model_veiculo in normalized_fipe_model and len(normalized_scraped_model_veiculo) > 2): # Ajuste o > 2 para uma correspondência mais precisa
-                                matched_model = m
-                                print(f"    - [INFO] Modelo_Veiculo '{modelo_scraped_veiculo}' encontrado como '{m['nome']}' na FIPE.")
-                                break
-                        
-                        if matched_model:
-                            fipe_model_name = matched_model['nome']
-                            model_id = matched_model['codigo']
-
-                            years_data = fipe_client.get_years(vehicle_type, brand_id, model_id)
-                            if years_data:
-                                matched_year_code = None
-                                for y in years_data:
-                                    fipe_year_part = y['codigo'].split('-')[0] 
-                                    if ano_scraped == fipe_year_part:
-                                        matched_year_code = y['codigo']
-                                        break
-
-                                # Se o ano específico não for encontrado, tenta buscar pelo "Ano Zero KM" (código 32000-1) se disponível.
-                                if not matched_year_code and "32000-1" in [y['codigo'] for y in years_data]:
-                                    matched_year_code = "32000-1"
-                                    print(f"    - [INFO] Ano '{ano_scraped}' não encontrado na FIPE. Usando 'Ano Zero KM' (32000-1).")
-                                
-                                if matched_year_code:
-                                    fipe_value_raw = fipe_client.get_vehicle_value(vehicle_type, brand_id, model_id, matched_year_code)
-                                    if fipe_value_raw:
-                                        fipe_value_numeric = float(fipe_value_raw.replace("R$", "").replace(".", "").replace(",", ".").strip())
-                                        fipe_price = fipe_value_numeric
-                                        fipe_status = "Sucesso"
-                                        print(f"    - Valor FIPE encontrado: {fipe_value_raw}")
-                                    else:
-                                        fipe_status = "Valor FIPE não encontrado"
-                                        print(f"    - [WARN] Valor FIPE não encontrado para Ano: {ano_scraped}, Fabricante: {fipe_brand_name}, Modelo: {fipe_model_name}")
-                                else:
-                                    fipe_status = "Ano FIPE não encontrado"
-                                    print(f"    - [WARN] Ano FIPE '{ano_scraped}' não encontrado para Fabricante: {fipe_brand_name}, Modelo: {fipe_model_name}")
-                            else:
-                                fipe_status = "Anos FIPE não encontrados"
-                                print(f"    - [WARN] Anos FIPE não encontrados para Fabricante: {fipe_brand_name}, Modelo: {fipe_model_name}")
-                        else:
-                            fipe_status = "Modelo FIPE não encontrado"
-                            print(f"    - [WARN] Modelo FIPE não encontrado para Fabricante_Veiculo: '{marca_scraped}', Modelo_Veiculo: '{modelo_scraped_veiculo}'")
-                    else:
-                        fipe_status = "Modelos FIPE não encontrados"
-                        print(f"    - [WARN] Modelos FIPE não encontrados para Fabricante_Veiculo: '{fipe_brand_name}'")
-                else:
-                    fipe_status = "Fabricante FIPE não encontrada"
-                    print(f"    - [WARN] Fabricante FIPE não encontrada para '{marca_scraped}'")
-            else:
-                fipe_status = "Marcas FIPE não encontradas"
-                print(f"    - [WARN] Marcas FIPE não encontradas para Tipo: {vehicle_type}")
-
-            df.at[index, 'valor_fipe'] = fipe_price
-            df.at[index, 'FIPE_Marca_Correspondente'] = fipe_brand_name
-            df.at[index, 'FIPE_Modelo_Correspondente'] = fipe_model_name
-            df.at[index, 'Status_FIPE'] = fipe_status
-
-            scraped_valor_str = str(row.get('Valor do Lance', '0')).replace("R$", "").replace(".", "").replace(",", ".").strip()
-            try:
-                scraped_valor = float(scraped_valor_str)
-                if fipe_price is not None and fipe_price > 0:
-                    diferenca_percentual = ((scraped_valor - fipe_price) / fipe_price) * 100
-                    df.at[index, 'Diferenca_Valor (%)'] = f"{diferenca_percentual:.2f}%"
-                    print(f"    - Valor Raspado: R$ {scraped_valor:.2f}, Valor FIPE: R$ {fipe_price:.2f}, Diferença: {diferenca_percentual:.2f}%")
-                else:
-                    print(f"    - Não é possível calcular diferença para Lote {index}: Valor FIPE não disponível ou zero.")
-            except ValueError:
-                print(f"    - [WARN] Não foi possível converter 'Valor do Lance' raspado '{row.get('Valor do Lance', 'N/A')}' para número.")
-                df.at[index, 'Diferenca_Valor (%)'] = "Erro de Valor Raspado"
+def resolve_fipe_price(fipe_client, key):
+    """
+    Consulta a API FIPE para uma chave do cache e retorna
+    (valor_fipe, fipe_status, fipe_marca, fipe_modelo).
+    """
+    vehicle_type, normalized_brand, normalized_model, ano = key
+
+    brands_data = fipe_client.get_brands(vehicle_type)
+    if not brands_data:
+        return (None, "Marcas FIPE não encontradas", None, None)
+
+    matched_brand = next((b for b in brands_data if normalized_brand == clean_and_normalize_name(b['nome'])), None)
+    if not matched_brand:
+        return (None, "Fabricante FIPE não encontrada", None, None)
+    fipe_brand_name = matched_brand['nome']
+    brand_id = matched_brand['codigo']
+
+    models_data = fipe_client.get_models(vehicle_type, brand_id)
+    if not models_data or 'modelos' not in models_data:
+        return (None, "Modelos FIPE não encontrados", fipe_brand_name, None)
+
+    # Procura o modelo exato ou como substring
+    matched_model = None
+    for m in models_data['modelos']:
+        normalized_fipe_model = clean_and_normalize_name(m['nome'])
+        if normalized_model == normalized_fipe_model or \
+           (normalized_model in normalized_fipe_model and len(normalized_model) > 2): # Ajuste o > 2 para uma correspondência mais precisa
+            matched_model = m
+            break
+    if not matched_model:
+        return (None, "Modelo FIPE não encontrado", fipe_brand_name, None)
+    fipe_model_name = matched_model['nome']
+    model_id = matched_model['codigo']
+
+    years_data = fipe_client.get_years(vehicle_type, brand_id, model_id)
+    if not years_data:
+        return (None, "Anos FIPE não encontrados", fipe_brand_name, fipe_model_name)
+
+    matched_year_code = next((y['codigo'] for y in years_data if y['codigo'].split('-')[0] == ano), None)
+    # Se o ano específico não for encontrado, tenta buscar pelo "Ano Zero KM" (código 32000-1) se disponível.
+    if not matched_year_code and "32000-1" in [y['codigo'] for y in years_data]:
+        matched_year_code = "32000-1"
+    if not matched_year_code:
+        return (None, "Ano FIPE não encontrado", fipe_brand_name, fipe_model_name)
+
+    fipe_value_raw = fipe_client.get_vehicle_value(vehicle_type, brand_id, model_id, matched_year_code)
+    fipe_price = parse_brl_value(fipe_value_raw)
+    if fipe_price is None:
+        return (None, "Valor FIPE não encontrado", fipe_brand_name, fipe_model_name)
+    return (fipe_price, "Sucesso", fipe_brand_name, fipe_model_name)
+
+def calcular_diferenca_percentual(preco, valor_fipe):
+    if preco is None or valor_fipe is None or valor_fipe <= 0:
+        return None
+    return round(((preco - valor_fipe) / valor_fipe) * 100, 2)
 
+def enrich_table(conn, table_name, fipe_client, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Enriquece com a FIPE todos os lotes pendentes de uma tabela, em lotes de 'batch_size':
+    lê os registros sem 'veiculo_fipe_status', resolve cada chave distinta pelo cache
+    (e só então pela API) e grava o resultado com um único UPDATE por lote.
+    """
+    print(f"\n--- Enriquecimento FIPE da tabela '{table_name}' ---")
+    after_id = 0
+    total_updated = 0
+    total_api_lookups = 0
+
+    while True:
+        with tracing.span("fipe.ler_pendentes", tabela=table_name):
+            rows = fetch_lots_pending_fipe(conn, table_name, batch_size, after_id)
+        if not rows:
+            break
+        after_id = rows[-1][0]
+
+        # O tipo é classificado pelo modelo completo (a versão ajuda a separar motos de carros) e pelo
+        # título, que muitas vezes é o único campo com a marca
+        vehicle_types = classify_vehicle_types([row[1] for row in rows], [row[2] for row in rows],
+                                               [row[6] for row in rows])
+        row_keys = {row[0]: build_fipe_key(row[1], row[2], row[3], vehicle_type)
+                    for row, vehicle_type in zip(rows, vehicle_types)}
+        distinct_keys = {key for key in row_keys.values() if key is not None}
+
+        with tracing.span("fipe.ler_cache", chaves=len(distinct_keys)):
+            resolved = get_fipe_cache_entries(conn, distinct_keys)
+        missing_keys = distinct_keys - set(resolved)
+        tracing.contar("fipe_cache_acertos", len(distinct_keys) - len(missing_keys))
+        new_cache_entries = []
+        for key in sorted(missing_keys):
+            with tracing.span("fipe.resolver_chave") as span:
+                result = resolve_fipe_price(fipe_client, key)
+                span["status"] = result[1]
+            total_api_lookups += 1
+            resolved[key] = result
+            if result[1] not in FIPE_STATUS_TRANSITORIOS:
+                new_cache_entries.append(key + result)
             # Pequena pausa para evitar sobrecarregar a API, mesmo com o backoff
             time.sleep(0.1)
+        upsert_fipe_cache_entries(conn, new_cache_entries)
+
+        updates = []
+        adiados = 0
+        for lot_id, fabricante, modelo, ano, preco_raw, valor_fipe_raspado, _titulo in rows:
+            preco = parse_brl_value(preco_raw)
+            valor_fipe_site = parse_brl_value(valor_fipe_raspado)
+            if valor_fipe_site:
+                # O site já informa o valor FIPE; não é necessário consultar a API
+                updates.append((lot_id, valor_fipe_site, "Sucesso (Site)", calcular_diferenca_percentual(preco, valor_fipe_site)))
+                continue
 
-        df['valor_fipe'] = df['valor_fipe'].apply(
-            lambda x: f"R$ {x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".") if pd.notnull(x) else None
-        )
-        print("[INFO] Coluna 'valor_fipe' formatada para o padrão 'R$ X.XXX,XX'.")
-
-        pd.set_option('display.max_columns', None)
-        pd.set_option('display.width', 1000)
-        pd.set_option('display.max_rows', None)
-
-        print("\n--- Tabela de Dados Processados (com FIPE) ---")
-        print(df.to_string())
-        print("\n--- Fim da Tabela ---")
-
-        timestamp_excel_output = datetime.now().strftime("%Y%m%d_%H%M%S")
-        EXCEL_OUTPUT_FILE_NAME = f"comparacao_fipe_{timestamp_excel_output}.xlsx"
-        EXCEL_FULL_PATH = os.path.join(EXCEL_OUTPUT_DIR, EXCEL_OUTPUT_FILE_NAME)
-
-        os.makedirs(EXCEL_OUTPUT_DIR, exist_ok=True)
+            key = row_keys[lot_id]
+            if key is None:
+                updates.append((lot_id, None, "Dados insuficientes", None))
+                continue
 
-        try:
-            df.to_excel(EXCEL_FULL_PATH, index=False)
-            print(f"\n--- Comparação com FIPE concluída e salva em '{EXCEL_FULL_PATH}' ---")
-        except Exception as excel_err:
-            print(f"[ERRO] Ocorreu um erro ao exportar os resultados para Excel: {excel_err}")
-            print("Verifique as permissões de escrita para o caminho de saída ou se o arquivo já está aberto.")
+            valor_fipe, fipe_status = resolved[key][0], resolved[key][1]
+            if fipe_status in FIPE_STATUS_TRANSITORIOS:
+                adiados += 1
+                continue
+            valor_fipe = parse_brl_value(valor_fipe)
+            updates.append((lot_id, valor_fipe, fipe_status, calcular_diferenca_percentual(preco, valor_fipe)))
+
+        with tracing.span("fipe.gravar", tabela=table_name, lotes=len(updates)):
+            total_updated += update_fipe_enrichment(conn, table_name, updates)
+        tracing.contar("lotes", len(rows))
+        tracing.contar("fipe_adiados", adiados)
+        print(f"[INFO] '{table_name}': {total_updated} lotes enriquecidos até o id {after_id} ({len(missing_keys)} chaves consultadas na API neste lote"
+              f"{f', {adiados} adiados por falha da API' if adiados else ''}).")
+
+    print(f"[INFO] Tabela '{table_name}' concluída: {total_updated} lotes atualizados, {total_api_lookups} consultas à API FIPE.")
+    return total_updated
+
+def main():
+    parser = argparse.ArgumentParser(description="Enriquece os lotes do banco com o valor FIPE.")
+    parser.add_argument("--tabelas", nargs="+", default=list(FIPE_ENRICHMENT_TABLES),
+                        choices=list(FIPE_ENRICHMENT_TABLES), help="Tabelas de lotes a enriquecer.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Quantidade de lotes lidos e atualizados por vez.")
+    args = parser.parse_args()
+
+    print("--- Iniciando enriquecimento FIPE a partir do banco de dados ---")
+    tracing.configurar("fipe")
+    conn = connect_db()
+    if not conn:
+        print("[ERRO] Não foi possível conectar ao banco de dados. Enriquecimento FIPE abortado.")
+        tracing.finalizar()
+        return
 
-    except Exception as e:
-        print(f"[ERRO] Ocorreu um erro ao ler ou processar o arquivo Excel para comparação com FIPE: {e}")
+    try:
+        create_fipe_cache_table(conn)
+        create_price_trend_tables(conn)
+        fipe_client = FipeApiClient(FIPE_API_BASE_URL)
+        for table_name in args.tabelas:
+            add_fipe_enrichment_columns(conn, table_name)
+            with tracing.span("fipe.tabela", tabela=table_name):
+                atualizados = enrich_table(conn, table_name, fipe_client, args.batch_size)
+            # Lotes enriquecidos antes cujo lance mudou desde então
+            with tracing.span("db.diferenca_fipe", tabela=table_name):
+                recalculados = refresh_fipe_differences(conn, table_name)
+            print(f"[INFO] '{table_name}': diferença FIPE recalculada em {recalculados} lotes com lance novo.")
+            if atualizados:
+                # O enriquecimento não altera data_extracao: o cubo de tendência é refeito por inteiro
+                with tracing.span("db.tendencias", tabela=table_name):
+                    refresh_price_trends(conn, table_name, full=True)
+    finally:
+        conn.close()
+        print("[INFO] Conexão com o banco de dados fechada.")
+        tracing.finalizar()
 
 if __name__ == "__main__":
-    process_and_display_data()
\ No newline at end of file
+    main()
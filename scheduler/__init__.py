@@ -0,0 +1,6 @@
+"""
+Scheduler das raspagens: releitura dos lotes por proximidade do fim do leilão e rodadas completas.
+
+O serviço (scheduler.servico) importa o Selenium; a agenda não, e é usada também pelo tracker/.
+"""
+from scheduler.agenda import Agenda, OrcamentoPaginas, Tarefa, fim_do_leilao, intervalo_atualizacao
@@ -0,0 +1,73 @@
+"""
+CLI do scheduler.
+
+Exemplos (a partir da raiz do repositório):
+    python -m scheduler                                # serviço contínuo (container 'scheduler')
+    python -m scheduler --plano                        # agenda montada a partir do banco, sem executar nada
+    python -m scheduler --sites loop parque --orcamento 300 --horas-rodada 0
+    python -m scheduler --uma-vez --horas-rodada 0     # só as releituras já vencidas
+"""
+import argparse
+import signal
+import sys
+from collections import Counter
+from datetime import datetime
+
+from common import tracing
+from common.logging_setup import configurar_logging, encerrar_logging
+from scheduler.agenda import TIPO_LOTE, intervalo_atualizacao
+from scheduler.servico import DEFAULT_CRAWL_HOURS, DEFAULT_PAGE_BUDGET, SITES, Scheduler
+
+
+def imprimir_plano(scheduler, limite):
+    agora = datetime.now()
+    tarefas = scheduler.agenda.tarefas()
+    faixas = Counter(
+        (tarefa.site, str(intervalo_atualizacao(tarefa.fim - agora)) if tarefa.tipo == TIPO_LOTE else "rodada")
+        for _, tarefa in tarefas
+    )
+    print(f"{'site':<10}{'intervalo':<12}{'tarefas':>8}")
+    for (site, intervalo), n in sorted(faixas.items()):
+        print(f"{site:<10}{intervalo:<12}{n:>8}")
+    print(f"\nPróximas {min(limite, len(tarefas))} de {len(tarefas)} tarefas:")
+    for vence_em, tarefa in tarefas[:limite]:
+        fim = f"fim {tarefa.fim:%d/%m %H:%M}" if tarefa.fim else ""
+        print(f"    {vence_em:%d/%m %H:%M:%S}  {tarefa.tipo:<7}{tarefa.site:<8}{fim:<16}{tarefa.link or ''}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m scheduler",
+                                     description="Agenda as raspagens pela proximidade do fim dos leilões.")
+    parser.add_argument("--sites", nargs="+", choices=list(SITES), default=list(SITES))
+    parser.add_argument("--orcamento", type=int, default=DEFAULT_PAGE_BUDGET,
+                        help="Carregamentos de página por hora, somando todos os sites (SCHEDULER_PAGE_BUDGET).")
+    parser.add_argument("--horas-rodada", type=float, default=DEFAULT_CRAWL_HOURS,
+                        help="Intervalo entre as rodadas completas de cada site; 0 desliga (SCHEDULER_CRAWL_HOURS).")
+    parser.add_argument("--uma-vez", action="store_true", help="Executa as tarefas já vencidas e sai.")
+    parser.add_argument("--plano", type=int, nargs="?", const=30, default=None, metavar="N",
+                        help="Mostra a agenda (e as N próximas tarefas) e sai.")
+    args = parser.parse_args(argv)
+
+    configurar_logging()
+    scheduler = Scheduler(args.sites, args.orcamento, args.horas_rodada)
+    if args.plano is not None:
+        scheduler.carregar_lotes()
+        scheduler.agendar_rodadas()
+        imprimir_plano(scheduler, args.plano)
+        scheduler.encerrar()
+        return
+
+    tracing.configurar("scheduler")
+    # docker stop envia SIGTERM: encerra pelo mesmo caminho do Ctrl+C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"[INFO] Scheduler iniciado: sites {', '.join(args.sites)}, {args.orcamento} páginas/hora.")
+    try:
+        scheduler.executar(uma_vez=args.uma_vez)
+    except KeyboardInterrupt:
+        print("[INFO] Scheduler interrompido.")
+    finally:
+        scheduler.encerrar()
+        tracing.finalizar()
+        encerrar_logging()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Agenda do scheduler: fila de prioridade das tarefas e orçamento global de páginas.
+
+As tarefas ficam em 'pendentes', ordenadas pelo horário em que vencem; as vencidas passam
+para 'prontas' e sai primeiro a mais urgente. A urgência de um lote é o tempo que falta para
+o fim do leilão, então com o orçamento apertado os lotes que estão acabando passam na frente;
+os já encerrados (ainda na tolerância, pelo lance final) ficam atrás dos que terminam dentro
+de TOLERANCIA_FIM. A rodada completa de um site concorre como um lote que
+termina em URGENCIA_RODADA, menos o atraso acumulado, para não ficar sempre para trás.
+"""
+import heapq
+import itertools
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+# Intervalo entre as releituras de um lote conforme o tempo que falta para o fim do leilão:
+# (falta até, intervalo). Lotes além da última faixa ficam só com as rodadas completas.
+FAIXAS_ATUALIZACAO = [
+    (timedelta(hours=1), timedelta(minutes=2)),
+    (timedelta(hours=6), timedelta(minutes=15)),
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=7), timedelta(hours=6)),
+]
+# Depois do horário previsto o lote ainda é relido por este tempo (prorrogação e lance final)
+TOLERANCIA_FIM = timedelta(minutes=30)
+# Tabelas sem coluna de horário (leilo, parque): o leilão é considerado no fim do dia
+HORARIO_PADRAO = os.getenv("SCHEDULER_DEFAULT_TIME", "23:59")
+URGENCIA_RODADA = timedelta(hours=6)
+
+TIPO_LOTE = "lote"
+TIPO_RODADA = "rodada"
+
+RE_DATA = re.compile(r"(\d{2})/(\d{2})/(\d{4})")
+RE_HORARIO = re.compile(r"(\d{1,2})\s*[:hH]\s*(\d{2})")
+
+
+def fim_do_leilao(data_texto, horario_texto=None):
+    """Fim do leilão a partir do texto gravado ('10/07/2025', '09:30h'); None se a data não for legível."""
+    match = RE_DATA.search(data_texto or "")
+    if not match:
+        return None
+    horario = RE_HORARIO.search(horario_texto or "") or RE_HORARIO.search(HORARIO_PADRAO)
+    dia, mes, ano = map(int, match.groups())
+    try:
+        return datetime(ano, mes, dia, int(horario.group(1)), int(horario.group(2)))
+    except ValueError:
+        return None
+
+def intervalo_atualizacao(falta):
+    """Intervalo da faixa do lote, ou None se ele está longe demais ou já passou da tolerância."""
+    if falta < -TOLERANCIA_FIM:
+        return None
+    for limite, intervalo in FAIXAS_ATUALIZACAO:
+        if falta <= limite:
+            return intervalo
+    return None
+
+
+class OrcamentoPaginas:
+    """Carregamentos de página permitidos numa janela deslizante, somando todos os sites."""
+
+    def __init__(self, limite, janela=timedelta(hours=1), relogio=time.monotonic):
+        self.limite = limite
+        self.janela_s = janela.total_seconds()
+        self.relogio = relogio
+        self._gastos = deque()  # (instante, páginas), em ordem de instante
+        self._total = 0
+
+    def _expirar(self):
+        corte = self.relogio() - self.janela_s
+        while self._gastos and self._gastos[0][0] <= corte:
+            self._total -= self._gastos.popleft()[1]
+
+    def disponivel(self):
+        self._expirar()
+        return self.limite - self._total
+
+    def consumir(self, paginas, instante=None):
+        """
+        Registra 'paginas' carregadas. 'instante' (do relógio do orçamento) permite lançar
+        uma rodada completa no início dela, quando o total real só é conhecido no fim.
+        """
+        if paginas > 0:
+            self._gastos.append((self.relogio() if instante is None else instante, paginas))
+            self._total += paginas
+
+    def espera(self, paginas=1):
+        """Segundos até sobrar orçamento para 'paginas' páginas (no máximo o limite inteiro)."""
+        self._expirar()
+        excesso = self._total - self.limite + min(paginas, self.limite)
+        if excesso <= 0:
+            return 0.0
+        for instante, paginas in self._gastos:
+            excesso -= paginas
+            if excesso <= 0:
+                return max(0.0, instante + self.janela_s - self.relogio())
+        return 0.0
+
+
+class Tarefa:
+    """Releitura de um lote (link e fim do leilão) ou rodada completa de um site (intervalo)."""
+
+    __slots__ = ("tipo", "site", "link", "fim", "intervalo")
+
+    def __init__(self, tipo, site, link=None, fim=None, intervalo=None):
+        self.tipo = tipo
+        self.site = site
+        self.link = link
+        self.fim = fim
+        self.intervalo = intervalo
+
+    def __repr__(self):
+        return f"Tarefa({self.tipo}, {self.site}, {self.link or ''})"
+
+
+class Agenda:
+    def __init__(self, relogio=datetime.now):
+        self.relogio = relogio
+        self._pendentes = []  # (vence_em, seq, tarefa)
+        self._prontas = []    # (vence_em, tarefa)
+        self._seq = itertools.count()
+        self.lotes = {}       # (site, link) -> Tarefa agendada
+
+    def agendar(self, tarefa, vence_em):
+        heapq.heappush(self._pendentes, (vence_em, next(self._seq), tarefa))
+
+    def urgencia(self, tarefa, vence_em, agora):
+        """Segundos 'até o fim': quanto menor, mais urgente."""
+        if tarefa.tipo == TIPO_LOTE:
+            falta = (tarefa.fim - agora).total_seconds()
+            if falta < 0:
+                # Encerrado: a leitura do lance final não passa na frente de quem ainda está aberto
+                return TOLERANCIA_FIM.total_seconds() - falta
+            return falta
+        return (URGENCIA_RODADA - (agora - vence_em)).total_seconds()
+
+    def sincronizar_lotes(self, site, lotes, agora=None):
+        """
+        Atualiza a agenda com os lotes lidos do banco ({link: fim do leilão}). Lotes novos dentro
+        das faixas entram já vencidos; os agendados só têm o fim atualizado (leilão adiado).
+        Retorna quantos lotes entraram.
+        """
+        agora = agora or self.relogio()
+        novos = 0
+        for link, fim in lotes.items():
+            tarefa = self.lotes.get((site, link))
+            if tarefa is not None:
+                tarefa.fim = fim
+                continue
+            if intervalo_atualizacao(fim - agora) is None:
+                continue
+            tarefa = Tarefa(TIPO_LOTE, site, link, fim)
+            self.lotes[(site, link)] = tarefa
+            self.agendar(tarefa, agora)
+            novos += 1
+        return novos
+
+    def proxima(self, agora=None):
+        """
+        (tarefa, 0) com a tarefa vencida mais urgente, já retirada da agenda; ou (None, segundos
+        até a próxima vencer), com None nos segundos se a agenda está vazia.
+        """
+        agora = agora or self.relogio()
+        while self._pendentes and self._pendentes[0][0] <= agora:
+            vence_em, _, tarefa = heapq.heappop(self._pendentes)
+            self._prontas.append((vence_em, tarefa))
+        if not self._prontas:
+            if not self._pendentes:
+                return None, None
+            return None, max(0.0, (self._pendentes[0][0] - agora).total_seconds())
+        escolhida = min(self._prontas, key=lambda item: self.urgencia(item[1], item[0], agora))
+        self._prontas.remove(escolhida)
+        return escolhida[1], 0
+
+    def reagendar(self, tarefa, agora=None):
+        """Devolve a tarefa executada à agenda; retorna quando ela vence de novo (None se o lote saiu)."""
+        agora = agora or self.relogio()
+        if tarefa.tipo == TIPO_RODADA:
+            vence_em = agora + tarefa.intervalo
+        else:
+            intervalo = intervalo_atualizacao(tarefa.fim - agora)
+            if intervalo is None:
+                self.lotes.pop((tarefa.site, tarefa.link), None)
+                return None
+            vence_em = agora + intervalo
+            # A leitura no horário previsto do fim não é pulada por um intervalo longo
+            if agora < tarefa.fim < vence_em:
+                vence_em = tarefa.fim
+        self.agendar(tarefa, vence_em)
+        return vence_em
+
+    def tarefas(self):
+        """(vence_em, tarefa) de toda a agenda, em ordem de vencimento."""
+        itens = [(vence_em, tarefa) for vence_em, _, tarefa in self._pendentes] + list(self._prontas)
+        return sorted(itens, key=lambda item: item[0])
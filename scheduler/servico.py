@@ -0,0 +1,279 @@
+"""
+Serviço do scheduler: executa as tarefas da agenda, uma por vez, dentro do orçamento de páginas.
+
+  - releitura de lote: abre a página do lote com a função do próprio scraper e grava o lance
+    (no loop também total de lances, situação, data e horário) no registro mais recente do lote;
+  - rodada completa: roda o script do scraper num subprocesso, como o container dele faz, e
+    depois recarrega os lotes do banco.
+O leilo só mostra o lance na listagem: seus lotes são atualizados pelas rodadas completas.
+
+Uma sessão só (common/webdriver_broker), reaproveitada entre as releituras, trocada a cada
+SELENIUM_PAGES_PER_SESSION páginas e fechada antes de cada rodada (o Selenium standalone do
+docker-compose atende uma sessão por vez).
+"""
+import importlib.util
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+
+from common import tracing
+from common.logging_setup import amostrar, obter_logger
+from db_utils.db_operations import (connect_db, create_lot_schedule_indexes, fetch_last_scrape_run,
+                                    fetch_lot_schedule, update_latest_lot)
+from common.webdriver_broker import BrokerSessoes
+from scheduler.agenda import TIPO_RODADA, Agenda, OrcamentoPaginas, Tarefa, fim_do_leilao
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Carregamentos de página por hora, somando releituras e rodadas de todos os sites
+DEFAULT_PAGE_BUDGET = int(os.getenv("SCHEDULER_PAGE_BUDGET", "600"))
+# Intervalo entre as rodadas completas de cada site (0 desliga as rodadas)
+DEFAULT_CRAWL_HOURS = float(os.getenv("SCHEDULER_CRAWL_HOURS", "6"))
+CRAWL_TIMEOUT = timedelta(minutes=int(os.getenv("SCHEDULER_CRAWL_TIMEOUT_MINUTES", "180")))
+# Lotes vistos nos últimos N dias entram na agenda; ela é recarregada do banco a cada RECARGA
+RECENT_DAYS = int(os.getenv("SCHEDULER_RECENT_DAYS", "30"))
+RECARGA = timedelta(minutes=10)
+# Páginas de uma rodada sem histórico em scrape_runs
+CUSTO_RODADA_PADRAO = 200
+# Maior pausa do laço principal (recarga e sinais continuam sendo atendidos)
+ESPERA_MAXIMA_S = 60
+
+logger = obter_logger("scheduler")
+
+
+def _limpar(valor):
+    return valor is not None and str(valor).strip() not in ("", "N/A")
+
+def _paginas_execucao(execucao):
+    """Páginas de uma execução de scrape_runs: listagens mais páginas de detalhe."""
+    return (execucao["paginas"] or 0) + (execucao["lotes_detalhados"] or 0)
+
+def reler_loop(scraper, driver, link):
+    dados = scraper.extract_data_from_lot_detail_page(driver, link)
+    return {
+        "veiculo_lance_atual": dados.get("Lance Atual"),
+        "veiculo_total_lances": dados.get("Número de Lances"),
+        "veiculo_numero_visualizacoes": dados.get("Número de Visualizações"),
+        "veiculo_situacao_lote": dados.get("Situação do Lote"),
+        "veiculo_data_leilao": dados.get("Data do Leilão"),
+        "veiculo_horario_leilao": dados.get("Horário do Leilão"),
+    }
+
+def reler_parque(scraper, driver, link):
+    return {"veiculo_valor_lance_atual": scraper.extract_lot_bid(driver, link)}
+
+# Por site: tabela de lotes, script do scraper (relativo à raiz) e a releitura de um lote
+SITES = {
+    "leilo": {"tabela": "leilo", "script": os.path.join("leilo", "scraper.py"), "releitura": None},
+    "loop": {"tabela": "loop", "script": os.path.join("loop", "loop.py"), "releitura": reler_loop},
+    "parque": {"tabela": "parque_leiloes_oficial", "script": os.path.join("parque", "parquedosleiloes.py"),
+               "releitura": reler_parque},
+}
+_scrapers = {}
+
+def carregar_scraper(site):
+    """Importa o módulo do scraper pelo caminho (o fluxo de raspagem só roda em main())."""
+    if site not in _scrapers:
+        spec = importlib.util.spec_from_file_location(f"{site}_scraper", os.path.join(RAIZ_REPO, SITES[site]["script"]))
+        modulo = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(modulo)
+        _scrapers[site] = modulo
+    return _scrapers[site]
+
+
+class Scheduler:
+    def __init__(self, sites, orcamento=DEFAULT_PAGE_BUDGET, horas_rodada=DEFAULT_CRAWL_HOURS):
+        self.sites = sites
+        self.agenda = Agenda()
+        self.orcamento = OrcamentoPaginas(orcamento)
+        self.intervalo_rodada = timedelta(hours=horas_rodada) if horas_rodada > 0 else None
+        self.conn = None
+        self.broker = None
+        self.driver = None
+        self.proxima_recarga = None
+
+    def _conexao(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = connect_db()
+            if self.conn:
+                create_lot_schedule_indexes(self.conn)
+        return self.conn
+
+    def _navegador(self):
+        if self.broker is None:
+            options = Options()
+            options.add_argument("--headless")
+            options.add_argument("--disable-gpu")
+            options.add_argument("--no-sandbox")
+            options.add_argument("--disable-dev-shm-usage")
+            options.add_argument("--window-size=1920,1080")
+            self.broker = BrokerSessoes(options)
+        # Entre duas releituras a sessão pode ter expirado no Selenium: renovar() abre outra
+        self.driver = self.broker.renovar(self.driver) if self.driver is not None else self.broker.obter()
+        return self.driver
+
+    def _fechar_navegador(self):
+        if self.driver is not None:
+            self.broker.descartar(self.driver)
+            self.driver = None
+
+    def carregar_lotes(self):
+        """Lê data/horário do leilão do último registro de cada lote e sincroniza a agenda."""
+        self.proxima_recarga = datetime.now() + RECARGA
+        conn = self._conexao()
+        if not conn:
+            print("[WARN] Sem conexão com o banco: agenda de lotes não recarregada.")
+            return
+        for site in self.sites:
+            if SITES[site]["releitura"] is None:
+                continue
+            lotes = {}
+            for link, data, horario in fetch_lot_schedule(conn, SITES[site]["tabela"], RECENT_DAYS):
+                fim = fim_do_leilao(data, horario)
+                if fim is not None:
+                    lotes[link] = fim
+            novos = self.agenda.sincronizar_lotes(site, lotes)
+            print(f"[INFO] {site}: {len(lotes)} lotes com data de leilão, {novos} novos na agenda.")
+
+    def agendar_rodadas(self):
+        if self.intervalo_rodada is None:
+            return
+        for site in self.sites:
+            self.agenda.agendar(Tarefa(TIPO_RODADA, site, intervalo=self.intervalo_rodada), datetime.now())
+
+    def reler_lote(self, tarefa):
+        spec = SITES[tarefa.site]
+        scraper = carregar_scraper(tarefa.site)
+        driver = self._navegador()
+        try:
+            with tracing.span("scheduler.lote", site=tarefa.site):
+                valores = spec["releitura"](scraper, driver, tarefa.link)
+        except WebDriverException:
+            # Sessão perdida: a próxima releitura abre outro navegador
+            self._fechar_navegador()
+            raise
+        finally:
+            self.orcamento.consumir(1)
+        valores = {coluna: valor for coluna, valor in valores.items() if _limpar(valor)}
+        if not valores:
+            tracing.contar("releituras_vazias")
+            logger.warning("Nada lido na página do lote %s", tarefa.link, extra=amostrar("scheduler.vazio"))
+            return
+        conn = self._conexao()
+        if conn and update_latest_lot(conn, spec["tabela"], tarefa.link, valores):
+            tracing.contar("lotes_atualizados")
+        # Leilão adiado ou prorrogado: o loop traz o fim novo na própria página
+        fim = fim_do_leilao(valores.get("veiculo_data_leilao"), valores.get("veiculo_horario_leilao"))
+        if fim is not None:
+            tarefa.fim = fim
+        logger.info("Lote %s (%s) relido, fim %s: %s", tarefa.link, tarefa.site, tarefa.fim, valores,
+                    extra=amostrar("scheduler.lote"))
+
+    def custo_rodada(self, site):
+        """
+        Páginas esperadas para uma rodada do site: as da última em scrape_runs ou
+        CUSTO_RODADA_PADRAO, limitadas ao orçamento inteiro (senão a rodada nunca caberia).
+        """
+        conn = self._conexao()
+        anterior = fetch_last_scrape_run(conn, site) if conn else None
+        custo = _paginas_execucao(anterior) if anterior else CUSTO_RODADA_PADRAO
+        return min(custo, self.orcamento.limite)
+
+    def rodada(self, tarefa):
+        """Raspagem completa do site num subprocesso; as páginas reais (scrape_runs) entram no orçamento."""
+        self._fechar_navegador()
+        script = os.path.join(RAIZ_REPO, SITES[tarefa.site]["script"])
+        conn = self._conexao()
+        anterior = fetch_last_scrape_run(conn, tarefa.site) if conn else None
+        inicio, instante = datetime.now(), self.orcamento.relogio()
+        print(f"[INFO] Rodada completa de {tarefa.site} ({script}).")
+        # PYTHONSAFEPATH: a pasta do script não entra no sys.path (parque/db_utils é uma cópia antiga)
+        ambiente = {**os.environ, "PYTHONSAFEPATH": "1"}
+        try:
+            with tracing.span("scheduler.rodada", site=tarefa.site):
+                retorno = subprocess.run([sys.executable, script], cwd=os.path.dirname(script), env=ambiente,
+                                         timeout=CRAWL_TIMEOUT.total_seconds()).returncode
+        except subprocess.TimeoutExpired:
+            retorno = None
+            tracing.contar("rodadas_timeout")
+            print(f"[WARN] Rodada de {tarefa.site} interrompida após {CRAWL_TIMEOUT}.")
+        conn = self._conexao()
+        ultima = fetch_last_scrape_run(conn, tarefa.site) if conn else None
+        if ultima and ultima["inicio"] >= inicio:
+            paginas = _paginas_execucao(ultima)
+        elif anterior:
+            paginas = _paginas_execucao(anterior)
+        else:
+            paginas = CUSTO_RODADA_PADRAO
+        self.orcamento.consumir(paginas, instante)
+        tracing.contar("rodadas")
+        print(f"[INFO] Rodada de {tarefa.site} encerrada (código {retorno}, {paginas} páginas no orçamento).")
+        self.carregar_lotes()
+
+    def adiar_rodada(self, tarefa, agora):
+        """
+        As páginas da rodada só entram no orçamento quando o subprocesso termina: antes de
+        começar, confere se o custo esperado cabe. Se não cabe, a rodada volta para a agenda
+        e vence quando o orçamento liberar; enquanto isso as releituras de lotes seguem.
+        """
+        custo = self.custo_rodada(tarefa.site)
+        disponivel = self.orcamento.disponivel()
+        if disponivel >= custo:
+            return False
+        espera = max(self.orcamento.espera(custo), 1)
+        self.agenda.agendar(tarefa, agora + timedelta(seconds=espera))
+        tracing.contar("rodadas_adiadas")
+        print(f"[INFO] Rodada de {tarefa.site} adiada {espera:.0f}s: {disponivel} páginas no orçamento, {custo} esperadas.")
+        return True
+
+    def executar(self, uma_vez=False):
+        """
+        Laço principal. Com 'uma_vez', executa só as tarefas já vencidas (e enquanto houver
+        orçamento) e retorna.
+        """
+        self.carregar_lotes()
+        self.agendar_rodadas()
+        while True:
+            agora = datetime.now()
+            if agora >= self.proxima_recarga:
+                self.carregar_lotes()
+            if self.orcamento.disponivel() <= 0:
+                espera = self.orcamento.espera()
+                tracing.contar("esperas_orcamento")
+                logger.info("Orçamento de páginas esgotado; próxima página em %.0fs", espera,
+                            extra=amostrar("scheduler.orcamento"))
+                if uma_vez:
+                    return
+                time.sleep(min(max(espera, 1), ESPERA_MAXIMA_S))
+                continue
+            tarefa, espera = self.agenda.proxima(agora)
+            if tarefa is None:
+                if uma_vez:
+                    return
+                ate_recarga = (self.proxima_recarga - agora).total_seconds()
+                time.sleep(max(1, min(espera if espera is not None else ESPERA_MAXIMA_S, ate_recarga, ESPERA_MAXIMA_S)))
+                continue
+            if tarefa.tipo == TIPO_RODADA and self.adiar_rodada(tarefa, agora):
+                continue
+            try:
+                if tarefa.tipo == TIPO_RODADA:
+                    self.rodada(tarefa)
+                else:
+                    self.reler_lote(tarefa)
+            except Exception as e:
+                tracing.contar("erros")
+                print(f"[ERRO] Falha na tarefa {tarefa}: {e}")
+            finally:
+                self.agenda.reagendar(tarefa)
+
+    def encerrar(self):
+        self._fechar_navegador()
+        if self.broker is not None:
+            self.broker.encerrar()
+        if self.conn is not None and not self.conn.closed:
+            self.conn.close()
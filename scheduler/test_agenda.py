@@ -0,0 +1,133 @@
+"""
+Orçamento de páginas, urgência e reagendamento da agenda, com relógio falso.
+
+    python -m pytest -q scheduler/test_agenda.py
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import servico
+from scheduler.agenda import (TIPO_LOTE, TIPO_RODADA, TOLERANCIA_FIM, URGENCIA_RODADA, Agenda, OrcamentoPaginas,
+                              Tarefa)
+
+AGORA = datetime(2025, 7, 15, 14, 0)
+HORA = timedelta(hours=1)
+
+
+class RelogioFalso:
+    """Relógio monotônico (segundos) controlado pelo teste."""
+
+    def __init__(self, agora=0.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+def _lote(fim, link="https://exemplo/lote/1"):
+    return Tarefa(TIPO_LOTE, "loop", link, fim)
+
+
+def test_orcamento_espera():
+    relogio = RelogioFalso()
+    orcamento = OrcamentoPaginas(10, janela=HORA, relogio=relogio)
+    assert orcamento.espera() == 0.0
+
+    orcamento.consumir(4)
+    relogio.agora = 100
+    orcamento.consumir(6)
+    relogio.agora = 150
+    assert orcamento.disponivel() == 0
+    # Uma página: basta expirar o primeiro gasto; cinco páginas: também o segundo
+    assert orcamento.espera() == 3600 - 150
+    assert orcamento.espera(5) == 3700 - 150
+    # Mais que o limite espera o orçamento inteiro, não para sempre
+    assert orcamento.espera(50) == orcamento.espera(10)
+
+    relogio.agora = 3600
+    assert orcamento.disponivel() == 4
+    assert orcamento.espera() == 0.0
+
+def test_consumir_no_instante_da_rodada():
+    relogio = RelogioFalso(1000)
+    orcamento = OrcamentoPaginas(10, janela=HORA, relogio=relogio)
+    # Rodada que começou em 0 e terminou em 1000: as páginas contam desde o início dela
+    orcamento.consumir(10, instante=0)
+    assert orcamento.espera() == 3600 - 1000
+
+def test_urgencia():
+    agenda = Agenda(relogio=lambda: AGORA)
+    assert agenda.urgencia(_lote(AGORA + timedelta(minutes=20)), AGORA, AGORA) == 20 * 60
+    # Encerrado há 10 minutos: fica atrás de um lote que ainda acaba dentro da tolerância
+    encerrado = agenda.urgencia(_lote(AGORA - timedelta(minutes=10)), AGORA, AGORA)
+    assert encerrado == TOLERANCIA_FIM.total_seconds() + 10 * 60
+    assert encerrado > agenda.urgencia(_lote(AGORA + timedelta(minutes=29)), AGORA, AGORA)
+    # A rodada fica mais urgente quanto mais atrasada
+    rodada = Tarefa(TIPO_RODADA, "loop", intervalo=6 * HORA)
+    assert agenda.urgencia(rodada, AGORA, AGORA) == URGENCIA_RODADA.total_seconds()
+    assert agenda.urgencia(rodada, AGORA - 2 * HORA, AGORA) == (URGENCIA_RODADA - 2 * HORA).total_seconds()
+
+def test_proxima_escolhe_o_mais_urgente():
+    agenda = Agenda(relogio=lambda: AGORA)
+    longe = _lote(AGORA + 5 * HORA, "longe")
+    perto = _lote(AGORA + timedelta(minutes=5), "perto")
+    agenda.agendar(longe, AGORA - timedelta(minutes=1))
+    agenda.agendar(perto, AGORA)
+    agenda.agendar(_lote(AGORA + timedelta(minutes=1), "futuro"), AGORA + timedelta(minutes=3))
+
+    assert agenda.proxima(AGORA) == (perto, 0)
+    assert agenda.proxima(AGORA) == (longe, 0)
+    assert agenda.proxima(AGORA) == (None, 180.0)
+
+@pytest.mark.parametrize("falta, esperado", [
+    # Faixa de até 1 h (releitura a cada 2 min): o fim em 1 min vem antes do intervalo
+    (timedelta(minutes=1), timedelta(minutes=1)),
+    (timedelta(minutes=30), timedelta(minutes=2)),
+    (timedelta(hours=3), timedelta(minutes=15)),
+    # Já passou do fim, mas está na tolerância: continua no intervalo da primeira faixa
+    (timedelta(minutes=-10), timedelta(minutes=2)),
+])
+def test_reagendar(falta, esperado):
+    agenda = Agenda(relogio=lambda: AGORA)
+    tarefa = _lote(AGORA + falta)
+    assert agenda.reagendar(tarefa, AGORA) == AGORA + esperado
+    assert agenda.tarefas() == [(AGORA + esperado, tarefa)]
+
+def test_reagendar_lote_encerrado_sai_da_agenda():
+    agenda = Agenda(relogio=lambda: AGORA)
+    agenda.sincronizar_lotes("loop", {"a": AGORA + timedelta(minutes=10)}, AGORA)
+    tarefa, _ = agenda.proxima(AGORA)
+    depois = AGORA + timedelta(minutes=10) + TOLERANCIA_FIM + timedelta(minutes=1)
+    assert agenda.reagendar(tarefa, depois) is None
+    assert agenda.lotes == {}
+    assert agenda.tarefas() == []
+
+def test_rodada_adiada_sem_orcamento(monkeypatch):
+    relogio = RelogioFalso()
+    scheduler = servico.Scheduler(["loop"], orcamento=100, horas_rodada=6)
+    scheduler.orcamento.relogio = relogio
+    monkeypatch.setattr(scheduler, "_conexao", lambda: object())
+    monkeypatch.setattr(servico, "fetch_last_scrape_run",
+                        lambda conn, site: {"paginas": 30, "lotes_detalhados": 20, "inicio": AGORA})
+    rodada = Tarefa(TIPO_RODADA, "loop", intervalo=6 * HORA)
+
+    scheduler.orcamento.consumir(60)
+    relogio.agora = 600
+    # 40 páginas livres e a última rodada gastou 50: volta para a agenda até a janela liberar
+    assert scheduler.custo_rodada("loop") == 50
+    assert scheduler.adiar_rodada(rodada, AGORA)
+    assert scheduler.agenda.tarefas() == [(AGORA + timedelta(seconds=3600 - 600), rodada)]
+
+    relogio.agora = 3600
+    assert not scheduler.adiar_rodada(rodada, AGORA + timedelta(seconds=3000))
+
+def test_custo_rodada_sem_historico(monkeypatch):
+    scheduler = servico.Scheduler(["loop"], orcamento=100, horas_rodada=6)
+    monkeypatch.setattr(scheduler, "_conexao", lambda: None)
+    # CUSTO_RODADA_PADRAO (200) é maior que o orçamento: a rodada espera a janela inteira
+    assert scheduler.custo_rodada("loop") == 100
@@ -0,0 +1,2 @@
+"""Acompanhamento dos lances dos lotes na janela de fechamento do leilão (asyncio + aiohttp, sem navegador)."""
+from tracker.monitor import FONTES, MonitorLances, ler_pagina
@@ -0,0 +1,55 @@
+"""
+CLI do tracker de lances.
+
+Exemplos (a partir da raiz do repositório):
+    python -m tracker                                   # serviço contínuo (container 'tracker')
+    python -m tracker --sites loop --intervalo 3 --janela 30
+    python -m tracker --duracao 120                     # acompanha por 2 minutos e sai
+"""
+import argparse
+import asyncio
+import signal
+from datetime import timedelta
+
+from common import tracing
+from common.logging_setup import configurar_logging, encerrar_logging
+from tracker.monitor import DEFAULT_CONNECTIONS, DEFAULT_POLL_SECONDS, DEFAULT_WINDOW, FONTES, MonitorLances
+
+
+async def executar(monitor, duracao):
+    tarefa = asyncio.current_task()
+    # docker stop envia SIGTERM: cancela o laço e grava as mudanças pendentes
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, tarefa.cancel)
+    try:
+        await monitor.executar(duracao)
+    except asyncio.CancelledError:
+        print("[INFO] Tracker interrompido.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tracker",
+                                     description="Registra os lances dos lotes nos minutos finais do leilão.")
+    parser.add_argument("--sites", nargs="+", choices=list(FONTES), default=list(FONTES))
+    parser.add_argument("--intervalo", type=float, default=DEFAULT_POLL_SECONDS,
+                        help="Segundos entre as consultas de um lote (TRACKER_POLL_SECONDS).")
+    parser.add_argument("--janela", type=int, default=int(DEFAULT_WINDOW.total_seconds() // 60),
+                        help="Minutos antes do fim em que o lote passa a ser acompanhado (TRACKER_WINDOW_MINUTES).")
+    parser.add_argument("--conexoes", type=int, default=DEFAULT_CONNECTIONS,
+                        help="Conexões HTTP simultâneas (TRACKER_CONNECTIONS).")
+    parser.add_argument("--duracao", type=float, default=None, help="Segundos de execução; sem ele roda até ser parado.")
+    args = parser.parse_args(argv)
+
+    configurar_logging()
+    tracing.configurar("tracker")
+    monitor = MonitorLances(args.sites, args.intervalo, timedelta(minutes=args.janela), args.conexoes)
+    print(f"[INFO] Tracker iniciado: sites {', '.join(args.sites)}, consulta a cada {args.intervalo:g}s "
+          f"nos {args.janela} minutos finais.")
+    try:
+        asyncio.run(executar(monitor, args.duracao))
+    except KeyboardInterrupt:
+        print("[INFO] Tracker interrompido.")
+    finally:
+        tracing.finalizar()
+        encerrar_logging()
+
+if __name__ == "__main__":
+    main()
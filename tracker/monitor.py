@@ -0,0 +1,310 @@
+"""
+Acompanhamento dos lances dos lotes nos minutos finais, sem navegador.
+
+Os lotes cujo fim (data e horário do leilão gravados pelos scrapers) cai na janela de
+fechamento são consultados a cada poucos segundos com um GET da própria página, por uma
+sessão aiohttp com poucas conexões. Só o lance e a contagem de lances são lidos, com
+expressões regulares sobre o HTML (sem montar o DOM); cada mudança vai para
+'historico_lances' e atualiza o registro mais recente do lote.
+
+loop e parque usam a mesma plataforma (classes LL_*), que entrega o lance no HTML. O leilo
+monta a página no navegador: o lance não vem no HTML e não há endpoint conhecido no projeto,
+então ele fica de fora.
+
+O parque não grava o horário do leilão: lotes dele com leilão no dia são sondados a cada
+SONDA, e o horário de fim da página (li.LL_data_fim) passa a valer para a janela. A mesma
+leitura acompanha prorrogações durante a janela.
+"""
+import asyncio
+import os
+import random
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+
+import aiohttp
+
+from common import tracing
+from common.logging_setup import amostrar, obter_logger
+from db_utils.db_operations import (connect_db, create_bid_history_table, create_lot_schedule_indexes,
+                                    fetch_latest_bids, fetch_lot_schedule, insert_bid_changes, update_latest_lot)
+from scheduler.agenda import fim_do_leilao
+
+# Por site: tabela de lotes e colunas atualizadas a cada mudança
+FONTES = {
+    "loop": {"tabela": "loop", "lance": "veiculo_lance_atual", "total": "veiculo_total_lances"},
+    "parque": {"tabela": "parque_leiloes_oficial", "lance": "veiculo_valor_lance_atual", "total": "veiculo_total_lances"},
+}
+DEFAULT_POLL_SECONDS = float(os.getenv("TRACKER_POLL_SECONDS", "5"))
+# Minutos antes do fim previsto em que o lote passa a ser acompanhado
+DEFAULT_WINDOW = timedelta(minutes=int(os.getenv("TRACKER_WINDOW_MINUTES", "15")))
+DEFAULT_CONNECTIONS = int(os.getenv("TRACKER_CONNECTIONS", "4"))
+# Depois do fim previsto o lote segue acompanhado por este tempo, se a página não trouxer um fim novo
+TOLERANCIA_FIM = timedelta(minutes=10)
+SONDA = timedelta(minutes=10)
+RECARGA_S = 60
+GRAVACAO_S = 5
+# Teto do intervalo de um lote que recebeu 429 (o intervalo dobra a cada 429)
+INTERVALO_MAXIMO_S = 60
+RECENT_DAYS = 2
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+
+RE_LANCE = re.compile(r'class="[^"]*\bLL_lance_atual\b[^"]*"[^>]*>.*?<b\b[^>]*>(.*?)</b>', re.S)
+RE_CONTAGEM = re.compile(r'class="[^"]*\bcontagem\b[^"]*"[^>]*>(.*?)</p>', re.S)
+RE_TOTAL_LANCES = re.compile(r"(\d+)\s*Lances", re.I)
+RE_FIM = re.compile(r'class="[^"]*\bLL_data_fim\b[^"]*"[^>]*>.*?<data\b[^>]*>(.*?)</data>.*?<hora\b[^>]*>(.*?)</hora>', re.S)
+RE_TAG = re.compile(r"<[^>]+>")
+
+logger = obter_logger("tracker")
+
+
+def _valor(texto):
+    """'R$ 14.435,44' -> 14435.44; None se não houver número."""
+    numero = re.sub(r"[^\d,]", "", RE_TAG.sub("", texto)).replace(",", ".")
+    try:
+        return float(numero) if numero else None
+    except ValueError:
+        return None
+
+def ler_pagina(html):
+    """(lance, total de lances, fim do leilão) lidos do HTML da página do lote; None no que não aparecer."""
+    match = RE_LANCE.search(html)
+    lance = _valor(match.group(1)) if match else None
+    match = RE_CONTAGEM.search(html)
+    total = RE_TOTAL_LANCES.search(RE_TAG.sub(" ", match.group(1))) if match else None
+    match = RE_FIM.search(html)
+    fim = fim_do_leilao(RE_TAG.sub("", match.group(1)), RE_TAG.sub("", match.group(2))) if match else None
+    return lance, int(total.group(1)) if total else None, fim
+
+
+class LoteAcompanhado:
+    __slots__ = ("site", "link", "fim", "horario_conhecido", "lance", "total", "etag", "intervalo", "tarefa", "sondado_em")
+
+    def __init__(self, site, link, fim, horario_conhecido, intervalo):
+        self.site = site
+        self.link = link
+        self.fim = fim
+        self.horario_conhecido = horario_conhecido
+        self.lance = None
+        self.total = None
+        self.etag = None
+        self.intervalo = intervalo
+        self.tarefa = None
+        self.sondado_em = None
+
+
+class MonitorLances:
+    def __init__(self, sites, poll_s=DEFAULT_POLL_SECONDS, janela=DEFAULT_WINDOW, conexoes=DEFAULT_CONNECTIONS):
+        self.sites = sites
+        self.poll_s = poll_s
+        self.janela = janela
+        self.conexoes = conexoes
+        self.lotes = {}  # link -> LoteAcompanhado (na janela ou aguardando sonda)
+        self.fins_lidos = {}  # link -> fim do leilão lido na página (vale mais que o gravado no banco)
+        self.mudancas = []
+        self.estatisticas = Counter()
+        self.conn = None
+        self.sessao = None
+        # psycopg2 bloqueia: as chamadas ao banco vão para uma thread, uma de cada vez
+        self._banco_lock = asyncio.Lock()
+
+    ### Banco
+
+    async def _banco(self, funcao, *args):
+        async with self._banco_lock:
+            return await asyncio.to_thread(funcao, *args)
+
+    def _conexao(self):
+        if self.conn is None or self.conn.closed:
+            self.conn = connect_db()
+            if self.conn:
+                create_bid_history_table(self.conn)
+                create_lot_schedule_indexes(self.conn)
+        return self.conn
+
+    def _ler_agenda(self):
+        conn = self._conexao()
+        if not conn:
+            return {}
+        return {site: fetch_lot_schedule(conn, FONTES[site]["tabela"], RECENT_DAYS) for site in self.sites}
+
+    def _ler_ultimos_lances(self, links):
+        conn = self._conexao()
+        return fetch_latest_bids(conn, links) if conn else {}
+
+    def _gravar(self, mudancas):
+        conn = self._conexao()
+        if not conn:
+            return 0
+        linhas = [(FONTES[lote.site]["tabela"], lote.link, lance, anterior, total, lote.fim, coletado_em)
+                  for lote, lance, anterior, total, coletado_em in mudancas]
+        gravadas = insert_bid_changes(conn, linhas)
+        # No registro do lote fica só a última leitura de cada um
+        ultimas = {lote.link: (lote, lance, total) for lote, lance, _, total, _ in mudancas}
+        for lote, lance, total in ultimas.values():
+            fonte = FONTES[lote.site]
+            valores = {coluna: valor for coluna, valor in ((fonte["lance"], lance), (fonte["total"], total)) if valor is not None}
+            update_latest_lot(conn, fonte["tabela"], lote.link, valores)
+        return gravadas
+
+    ### Agenda da janela de fechamento
+
+    async def carregar(self):
+        """Põe na janela os lotes que terminam em breve e marca para sonda os sem horário com leilão hoje."""
+        agenda = await self._banco(self._ler_agenda)
+        agora = datetime.now()
+        self.fins_lidos = {link: fim for link, fim in self.fins_lidos.items() if fim >= agora - timedelta(days=1)}
+        entrando = []
+        for site, linhas in agenda.items():
+            for link, data, horario in linhas:
+                if link in self.lotes:
+                    continue
+                fim = self.fins_lidos.get(link) or fim_do_leilao(data, horario)
+                if fim is None:
+                    continue
+                conhecido = link in self.fins_lidos or bool(horario and horario.strip() not in ("", "N/A"))
+                if conhecido and agora - TOLERANCIA_FIM <= fim <= agora + self.janela:
+                    entrando.append(LoteAcompanhado(site, link, fim, True, self.poll_s))
+                elif not conhecido and fim.date() == agora.date():
+                    self.lotes[link] = LoteAcompanhado(site, link, fim, False, self.poll_s)
+        if entrando:
+            ultimos = await self._banco(self._ler_ultimos_lances, [lote.link for lote in entrando])
+            for lote in entrando:
+                lote.lance, lote.total = ultimos.get(lote.link, (None, None))
+                lote.lance = float(lote.lance) if lote.lance is not None else None
+                self._iniciar(lote)
+
+    def _iniciar(self, lote):
+        self.lotes[lote.link] = lote
+        lote.tarefa = asyncio.create_task(self.acompanhar(lote))
+        logger.info("Acompanhando %s (%s), fim %s", lote.link, lote.site, lote.fim, extra=amostrar("tracker.entrada"))
+
+    async def sondar(self):
+        """Lê o horário de fim na página dos lotes sem horário gravado; os que caem na janela passam a ser acompanhados."""
+        agora = datetime.now()
+        for lote in [item for item in self.lotes.values() if not item.horario_conhecido and item.tarefa is None]:
+            if lote.sondado_em and agora - lote.sondado_em < SONDA:
+                continue
+            lote.sondado_em = agora
+            try:
+                html = await self._buscar(lote, condicional=False)
+            except Exception as e:
+                self.estatisticas["erros"] += 1
+                logger.warning("Sonda de %s falhou: %s", lote.link, e, extra=amostrar("tracker.sonda"))
+                continue
+            fim = ler_pagina(html)[2] if html else None
+            if fim is None:
+                continue
+            lote.fim, lote.horario_conhecido = fim, True
+            self.fins_lidos[lote.link] = fim
+            if agora - TOLERANCIA_FIM <= fim <= agora + self.janela:
+                ultimos = await self._banco(self._ler_ultimos_lances, [lote.link])
+                lance, lote.total = ultimos.get(lote.link, (None, None))
+                lote.lance = float(lance) if lance is not None else None
+                self._iniciar(lote)
+            else:
+                # Fora da janela: volta pela recarga (com o fim lido) quando chegar a hora
+                del self.lotes[lote.link]
+
+    ### Consultas
+
+    async def _buscar(self, lote, condicional=True):
+        """HTML da página do lote; None se não mudou (304)."""
+        cabecalhos = {"If-None-Match": lote.etag} if condicional and lote.etag else {}
+        async with self.sessao.get(lote.link, headers=cabecalhos) as resposta:
+            self.estatisticas["consultas"] += 1
+            tracing.contar("consultas")
+            if resposta.status == 304:
+                self.estatisticas["nao_modificadas"] += 1
+                tracing.contar("nao_modificadas")
+                return None
+            if resposta.status == 429:
+                tracing.contar("http_429")
+                lote.intervalo = min(lote.intervalo * 2, INTERVALO_MAXIMO_S)
+                return None
+            resposta.raise_for_status()
+            lote.etag = resposta.headers.get("ETag")
+            lote.intervalo = self.poll_s
+            html = await resposta.text()
+            self.estatisticas["bytes"] += len(html)
+            return html
+
+    async def acompanhar(self, lote):
+        """Consulta o lote a cada 'intervalo' até passar da tolerância depois do fim."""
+        try:
+            while datetime.now() <= lote.fim + TOLERANCIA_FIM:
+                inicio = asyncio.get_running_loop().time()
+                try:
+                    html = await self._buscar(lote)
+                    if html:
+                        self._registrar(lote, html)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.estatisticas["erros"] += 1
+                    tracing.contar("erros")
+                    logger.warning("Consulta de %s falhou: %s", lote.link, e, extra=amostrar("tracker.erro"))
+                decorrido = asyncio.get_running_loop().time() - inicio
+                # Espalha as consultas dos lotes que entraram juntos na janela
+                await asyncio.sleep(max(0.0, lote.intervalo - decorrido) + random.uniform(0, lote.intervalo * 0.1))
+        finally:
+            self.lotes.pop(lote.link, None)
+
+    def _registrar(self, lote, html):
+        lance, total, fim = ler_pagina(html)
+        if fim is not None and fim != lote.fim:
+            logger.info("Fim de %s mudou de %s para %s", lote.link, lote.fim, fim)
+            lote.fim = fim
+        if fim is not None:
+            self.fins_lidos[lote.link] = fim
+        if lance is None and total is None:
+            self.estatisticas["sem_lance"] += 1
+            return
+        if (lance, total) == (lote.lance, lote.total):
+            return
+        self.mudancas.append((lote, lance, lote.lance, total, datetime.now()))
+        self.estatisticas["mudancas"] += 1
+        tracing.contar("mudancas_lance")
+        lote.lance, lote.total = lance, total
+
+    async def descarregar(self):
+        mudancas, self.mudancas = self.mudancas, []
+        if mudancas:
+            gravadas = await self._banco(self._gravar, mudancas)
+            tracing.contar("lances_gravados", gravadas)
+
+    def resumo(self):
+        acompanhados = sum(1 for lote in self.lotes.values() if lote.tarefa is not None)
+        e = self.estatisticas
+        print(f"[INFO] Lances: {acompanhados} lotes na janela, {len(self.lotes) - acompanhados} aguardando sonda; "
+              f"{e['consultas']} consultas ({e['nao_modificadas']} sem mudança no servidor, "
+              f"{e['bytes'] / 1024 / 1024:.1f} MB), {e['mudancas']} mudanças, {e['erros']} erros.")
+
+    async def executar(self, duracao=None):
+        """Recarrega a janela a cada RECARGA_S e grava as mudanças a cada GRAVACAO_S; 'duracao' em segundos encerra."""
+        fim_execucao = asyncio.get_running_loop().time() + duracao if duracao else None
+        conector = aiohttp.TCPConnector(limit=self.conexoes, limit_per_host=self.conexoes)
+        async with aiohttp.ClientSession(connector=conector, timeout=aiohttp.ClientTimeout(total=20),
+                                         headers={"User-Agent": USER_AGENT}) as sessao:
+            self.sessao = sessao
+            proxima_recarga = 0
+            try:
+                while fim_execucao is None or asyncio.get_running_loop().time() < fim_execucao:
+                    agora = asyncio.get_running_loop().time()
+                    if agora >= proxima_recarga:
+                        await self.carregar()
+                        await self.sondar()
+                        self.resumo()
+                        proxima_recarga = agora + RECARGA_S
+                    await asyncio.sleep(GRAVACAO_S)
+                    await self.descarregar()
+            finally:
+                tarefas = [lote.tarefa for lote in self.lotes.values() if lote.tarefa is not None]
+                for tarefa in tarefas:
+                    tarefa.cancel()
+                await asyncio.gather(*tarefas, return_exceptions=True)
+                await self.descarregar()
+                self.resumo()
+                if self.conn is not None and not self.conn.closed:
+                    self.conn.close()
@@ -0,0 +1,44 @@
+"""
+Leitura do lance, da contagem de lances e do fim do leilão no HTML das páginas gravadas
+em benchmarks/fixtures.
+
+    python -m pytest -q tracker/test_monitor.py
+"""
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+RAIZ_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ_REPO)
+
+from tracker.monitor import _valor, ler_pagina
+
+FIXTURES_DIR = os.path.join(RAIZ_REPO, "benchmarks", "fixtures")
+
+
+def _fixture(site, tipo):
+    with open(os.path.join(FIXTURES_DIR, site, f"{tipo}.html"), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_pagina_do_lote_loop():
+    assert ler_pagina(_fixture("loop", "detail")) == (14435.44, 5, datetime(2025, 8, 8, 14, 0))
+
+def test_pagina_parque():
+    # Mesma plataforma (blocos LL_*); a página do parque não mostra a contagem de lances.
+    # Na listagem vale o primeiro lote.
+    assert ler_pagina(_fixture("parque", "listing")) == (70305.77, None, datetime(2025, 8, 27, 9, 0))
+
+def test_pagina_sem_lance():
+    assert ler_pagina("<html><body><p>Lote não encontrado</p></body></html>") == (None, None, None)
+
+@pytest.mark.parametrize("texto, esperado", [
+    ("R$ 14.435,44", 14435.44),
+    ('<span class="fz15">R$ 500,00</span>', 500.0),
+    ("R$ 1.000", 1000.0),
+    ("--", None),
+])
+def test_valor(texto, esperado):
+    assert _valor(texto) == esperado